@@ -254,9 +254,18 @@ class TFLiteCompiler(TensorFlowOptimizer):
         converter.inference_output_type = tf.as_dtype(self.inferenceoutputtype)
 
         if self.dataset is not None and self.target != 'default':
+            # samples are batched as inputs of the model, if the batch size
+            # is fixed
+            batchdim = io_spec['input'][0]['shape'][0]
+            # None and -1 denote the dynamic batch size
+            fixedbatch = batchdim is not None and int(batchdim) > 0
+            batch_size = int(batchdim) if fixedbatch else 1
+
             def generator():
                 for entry in self.dataset.calibration_dataset_generator(
-                        self.dataset_percentage):
+                        self.dataset_percentage,
+                        batch_size=batch_size,
+                        pad_last_batch=fixedbatch):
                     yield [np.array(entry, dtype=np.float32)]
             converter.representative_dataset = generator
 
@@ -405,13 +405,20 @@ class TVMCompiler(Optimizer):
         ]
 
         if self.use_int8_precision:
+            # TODO add support for any number of inputs
+            assert len(io_spec['input']) == 1, \
+                'Currently only single-input models are supported ' + \
+                'during quantization'
+            batchdim = io_spec['input'][0]['shape'][0]
+            # None and -1 denote the dynamic batch size
+            fixedbatch = batchdim is not None and int(batchdim) > 0
+            batch_size = int(batchdim) if fixedbatch else 1
+
             def generator():
                 for sample in self.dataset.calibration_dataset_generator(
-                        self.dataset_percentage):
-                    # TODO add support for any number of inputs
-                    assert len(io_spec['input']) == 1, \
-                        'Currently only single-input models are supported ' + \
-                        'during quantization'
+                        self.dataset_percentage,
+                        batch_size=batch_size,
+                        pad_last_batch=fixedbatch):
                     yield {io_spec['input'][0]['name']: tvm.nd.array(sample)}
             with relay.quantize.qconfig(
                     calibrate_mode='kl_divergence',
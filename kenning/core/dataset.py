@@ -6,16 +6,76 @@
 Provides an API for dataset loading, creation and configuration.
 """
 
-from typing import Tuple, List, Any, Dict, Optional, Generator
+from typing import Tuple, List, Any, Dict, Optional, Generator, Union
+from collections import deque
+import hashlib
+from concurrent.futures import Executor, ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
 import random
 import argparse
 from pathlib import Path
+import numpy as np
 from tqdm import tqdm
 
 from .measurements import Measurements
 from kenning.utils.args_manager import add_parameterschema_argument, add_argparse_argument, get_parsed_json_dict  # noqa: E501
 
 
+# Dataset used by prefetching worker processes
+_worker_dataset = None
+
+
+def _init_prefetch_worker(dataset: 'Dataset'):
+    """
+    Stores the dataset in the prefetching worker process.
+
+    Parameters
+    ----------
+    dataset : Dataset
+        Dataset from which batches are loaded
+    """
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+def _prefetch_batch(start: int, end: int) -> Tuple[List, List]:
+    """
+    Loads the batch in the prefetching worker process.
+
+    Parameters
+    ----------
+    start : int
+        Index of the first sample in the batch
+    end : int
+        Index after the last sample in the batch
+
+    Returns
+    -------
+    Tuple[List, List] :
+        Prepared inputs and outputs of the batch
+    """
+    return _worker_dataset._load_batch(start, end)
+
+
+def _prepare_worker_samples(samples: List) -> List:
+    """
+    Preprocesses input samples in the worker process.
+
+    Parameters
+    ----------
+    samples : List
+        Input samples to be processed
+
+    Returns
+    -------
+    List :
+        Preprocessed input samples
+    """
+    return _worker_dataset.prepare_input_samples(samples)
+
+
 class Dataset(object):
     """
     Wraps the datasets for training, evaluation and optimization.
@@ -43,8 +103,37 @@ class Dataset(object):
         The batch size for the dataset
     _dataindex : int
         ID of the next data to be delivered for inference
+    prefetch_workers : int
+        Number of workers loading next batches during iteration, 0 if
+        batches are loaded on demand
+    prefetch_depth : int
+        Maximum number of batches loaded ahead of the current one
+    prefetch_executor : str
+        Type of prefetching workers, 'thread' or 'process'
+    samples_cache_dir : Optional[Path]
+        Directory with the persistent cache of preprocessed input samples,
+        None if samples are not cached
+    num_shards : int
+        Number of shards the dataset is split into, 1 if it is not sharded
+    shard_index : int
+        Index of the shard provided by the dataset
     """
 
+    # Arguments that do not affect preprocessing of samples, and are not
+    # part of the samples cache key
+    cache_ignored_arguments = [
+        'root',
+        'batch_size',
+        'download_dataset',
+        'external_calibration_dataset',
+        'prefetch_workers',
+        'prefetch_depth',
+        'prefetch_executor',
+        'samples_cache_dir',
+        'num_shards',
+        'shard_index',
+    ]
+
     arguments_structure = {
         'root': {
             'argparse_name': '--dataset-root',
@@ -69,6 +158,43 @@ class Dataset(object):
             'type': Path,
             'nullable': True,
             'default': None
+        },
+        'prefetch_workers': {
+            'argparse_name': '--prefetch-workers',
+            'description': 'Number of workers loading next batches in the background during iteration, 0 loads batches on demand',  # noqa: E501
+            'type': int,
+            'default': 0
+        },
+        'prefetch_depth': {
+            'argparse_name': '--prefetch-depth',
+            'description': 'Maximum number of batches loaded ahead of the current one',  # noqa: E501
+            'type': int,
+            'default': 2
+        },
+        'prefetch_executor': {
+            'argparse_name': '--prefetch-executor',
+            'description': 'Type of prefetching workers - threads are suitable for loading that releases GIL (i.e. file reads, image decoding), processes for preprocessing in Python',  # noqa: E501
+            'default': 'thread',
+            'enum': ['thread', 'process']
+        },
+        'samples_cache_dir': {
+            'argparse_name': '--samples-cache-dir',
+            'description': 'Path to the directory with the persistent cache of preprocessed input samples, reused by later runs with the same dataset and preprocessing parameters',  # noqa: E501
+            'type': Path,
+            'nullable': True,
+            'default': None
+        },
+        'num_shards': {
+            'argparse_name': '--num-shards',
+            'description': 'Number of shards the dataset is split into, i.e. to spread the evaluation across multiple devices',  # noqa: E501
+            'type': int,
+            'default': 1
+        },
+        'shard_index': {
+            'argparse_name': '--shard-index',
+            'description': 'Index of the shard of the dataset to use, from 0 to num_shards - 1',  # noqa: E501
+            'type': int,
+            'default': 0
         }
     }
 
@@ -77,7 +203,13 @@ class Dataset(object):
             root: Path,
             batch_size: int = 1,
             download_dataset: bool = False,
-            external_calibration_dataset: Optional[Path] = None):
+            external_calibration_dataset: Optional[Path] = None,
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0):
         """
         Initializes dataset object.
 
@@ -98,10 +230,42 @@ class Dataset(object):
             Path to the external calibration dataset that can be used for
             quantizing the model. If it is not provided, the calibration
             dataset is generated from the actual dataset.
+        prefetch_workers : int
+            Number of workers loading next batches in the background during
+            iteration. If 0, batches are loaded on demand.
+        prefetch_depth : int
+            Maximum number of batches loaded ahead of the current one
+        prefetch_executor : str
+            Type of prefetching workers, 'thread' or 'process'
+        samples_cache_dir : Optional[Path]
+            Path to the directory with the persistent cache of preprocessed
+            input samples. If None, samples are not cached.
+        num_shards : int
+            Number of shards the dataset is split into. The dataset provides
+            only samples from the shard_index shard, see shard method.
+        shard_index : int
+            Index of the shard provided by the dataset
         """
         assert batch_size > 0
+        assert prefetch_workers >= 0
+        assert prefetch_depth > 0
+        assert prefetch_executor in ['thread', 'process'], \
+            f'Unsupported prefetch executor {prefetch_executor}'
         self.root = Path(root)
         self._dataindex = 0
+        self.prefetch_workers = prefetch_workers
+        self.prefetch_depth = prefetch_depth
+        self.prefetch_executor = prefetch_executor
+        self._prefetchpool: Optional[Executor] = None
+        self._prefetchqueue: deque = deque()
+        self._prefetchindex = 0
+        self.samples_cache_dir = None if samples_cache_dir is None else Path(samples_cache_dir)  # noqa: E501
+        self._samplescache = None
+        # preprocessed calibration samples for (percentage, seed) pairs
+        self._calibrationsets: Dict[Tuple[float, int], Any] = {}
+        self.num_shards = 1
+        self.shard_index = 0
+        self._unshardeddata = None
         self.dataX = []
         self.dataY = []
         self.batch_size = batch_size
@@ -110,6 +274,8 @@ class Dataset(object):
         if download_dataset:
             self.download_dataset_fun()
         self.prepare()
+        if num_shards != 1 or shard_index != 0:
+            self.shard(num_shards, shard_index)
 
         self.actions = {
             'stream': self.action_stream
@@ -183,7 +349,13 @@ class Dataset(object):
         return cls(
             args.dataset_root,
             args.inference_batch_size,
-            args.download_dataset
+            args.download_dataset,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index
         )
 
     @classmethod
@@ -260,12 +432,29 @@ class Dataset(object):
         Each data sample is a tuple (X, y), where X are the model inputs,
         and y are the model outputs.
 
+        If prefetch_workers is greater than 0, next batches are loaded in the
+        background by a pool of workers, in the order of iteration.
+
         Returns
         -------
         Dataset :
             this object
         """
         self._dataindex = 0
+        self.stop_prefetching()
+        # the cache is opened again, in case samples changed
+        self._samplescache = None
+        if self.prefetch_workers > 0:
+            if self.prefetch_executor == 'process':
+                self._prefetchpool = ProcessPoolExecutor(
+                    self.prefetch_workers,
+                    initializer=_init_prefetch_worker,
+                    initargs=(self,)
+                )
+            else:
+                self._prefetchpool = ThreadPoolExecutor(self.prefetch_workers)
+            self._prefetchindex = 0
+            self._fill_prefetch_queue()
         return self
 
     def __next__(self) -> Tuple[List, List]:
@@ -284,12 +473,204 @@ class Dataset(object):
         if self._dataindex < len(self.dataX):
             prev = self._dataindex
             self._dataindex += self.batch_size
-            return (
-                self.prepare_input_samples(self.dataX[prev:self._dataindex]),
-                self.prepare_output_samples(self.dataY[prev:self._dataindex])
-            )
+            if self._prefetchpool is not None:
+                return self._next_prefetched(prev, self._dataindex)
+            return self._load_batch(prev, self._dataindex)
+        self.stop_prefetching()
         raise StopIteration
 
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        # the pool and pending batches are not passed to worker processes
+        state['_prefetchpool'] = None
+        state['_prefetchqueue'] = deque()
+        # worker processes open the samples cache on their own
+        state['_samplescache'] = None
+        state['_calibrationsets'] = {}
+        return state
+
+    def _load_batch(self, start: int, end: int) -> Tuple[List, List]:
+        """
+        Loads the batch of samples.
+
+        Parameters
+        ----------
+        start : int
+            Index of the first sample in the batch
+        end : int
+            Index after the last sample in the batch
+
+        Returns
+        -------
+        Tuple[List, List] :
+            Prepared inputs and outputs of the batch
+        """
+        if self.samples_cache_dir is None:
+            samples = self.prepare_input_samples(self.dataX[start:end])
+        else:
+            if self._samplescache is None:
+                from kenning.utils.samples_cache import SamplesCache
+                self._samplescache = SamplesCache(
+                    self.samples_cache_dir,
+                    self.get_cache_parameters(),
+                    len(self.dataX)
+                )
+            samples = self._samplescache.get(start, end)
+            if samples is None:
+                samples = self.prepare_input_samples(self.dataX[start:end])
+                self._samplescache.put(start, samples)
+        return (
+            samples,
+            self.prepare_output_samples(self.dataY[start:end])
+        )
+
+    def get_cache_parameters(self) -> Dict[str, Any]:
+        """
+        Returns parameters identifying preprocessed input samples.
+
+        They are used as the key of the samples cache. By default, they
+        contain the class of the dataset, its root, the hash of input
+        samples' representations (dataX) and values of all arguments from
+        ``arguments_structure`` of the class and its bases, except for
+        ``cache_ignored_arguments``, that are stored in attributes with the
+        same names.
+
+        Datasets with preprocessing depending on other values should extend
+        this method.
+
+        Returns
+        -------
+        Dict[str, Any] :
+            Parameters affecting preprocessed input samples
+        """
+        samples = hashlib.sha256(
+            '\n'.join(str(sample) for sample in self.dataX).encode()
+        ).hexdigest()
+        parameters = {
+            'class': f'{type(self).__module__}.{type(self).__qualname__}',
+            'root': str(self.root.resolve()),
+            'samples': samples
+        }
+        for cls in type(self).__mro__:
+            for name in getattr(cls, 'arguments_structure', {}):
+                if name in self.cache_ignored_arguments or \
+                        not hasattr(self, name):
+                    continue
+                parameters[name] = getattr(self, name)
+        return parameters
+
+    def _fill_prefetch_queue(self):
+        """
+        Schedules loading of next batches, up to prefetch_depth batches.
+        """
+        while (len(self._prefetchqueue) < self.prefetch_depth and
+                self._prefetchindex < len(self.dataX)):
+            start = self._prefetchindex
+            end = start + self.batch_size
+            if self.prefetch_executor == 'process':
+                future = self._prefetchpool.submit(_prefetch_batch, start, end)
+            else:
+                future = self._prefetchpool.submit(self._load_batch, start, end)  # noqa: E501
+            self._prefetchqueue.append((start, end, future))
+            self._prefetchindex = end
+
+    def _next_prefetched(self, start: int, end: int) -> Tuple[List, List]:
+        """
+        Returns the prefetched batch and schedules loading of next batches.
+
+        If the expected batch was not prefetched (i.e. the batch size was
+        changed during iteration), pending batches are dropped and
+        prefetching restarts from the expected batch.
+
+        Parameters
+        ----------
+        start : int
+            Index of the first sample in the batch
+        end : int
+            Index after the last sample in the batch
+
+        Returns
+        -------
+        Tuple[List, List] :
+            Prepared inputs and outputs of the batch
+        """
+        if self._prefetchqueue and self._prefetchqueue[0][:2] == (start, end):
+            _, _, future = self._prefetchqueue.popleft()
+            self._fill_prefetch_queue()
+            return future.result()
+        self._drop_prefetched()
+        self._prefetchindex = end
+        self._fill_prefetch_queue()
+        return self._load_batch(start, end)
+
+    def _drop_prefetched(self):
+        """
+        Cancels loading of pending batches and drops loaded ones.
+        """
+        for _, _, future in self._prefetchqueue:
+            future.cancel()
+        self._prefetchqueue.clear()
+
+    def stop_prefetching(self):
+        """
+        Stops prefetching workers and drops pending batches.
+
+        It is called when the iteration ends or restarts, and should be
+        called when the iteration is interrupted.
+        """
+        if self._prefetchpool is None:
+            return
+        self._drop_prefetched()
+        self._prefetchpool.shutdown(wait=False)
+        self._prefetchpool = None
+
+    def shard(self, num_shards: int, index: int) -> 'Dataset':
+        """
+        Restricts the dataset to a single shard of samples.
+
+        The dataset is split into num_shards disjoint shards, where the shard
+        with the given index contains every num_shards-th sample, starting
+        from the index-th one. The split depends only on the order of samples
+        in dataX, so it is the same on every device, and shards put together
+        contain all samples of the dataset.
+
+        Iteration, get_data_unloaded, get_data and
+        calibration_dataset_generator provide only samples from the shard.
+        Calling the method again selects a shard of the whole dataset, so
+        ``shard(1, 0)`` restores all samples.
+
+        Parameters
+        ----------
+        num_shards : int
+            Number of shards
+        index : int
+            Index of the selected shard, from 0 to num_shards - 1
+
+        Returns
+        -------
+        Dataset :
+            this object
+        """
+        assert num_shards > 0, 'Number of shards should be positive'
+        assert 0 <= index < num_shards, \
+            f'Shard index {index} out of range for {num_shards} shards'
+        self.stop_prefetching()
+        self._samplescache = None
+        self._calibrationsets = {}
+        self._dataindex = 0
+        if self._unshardeddata is None:
+            self._unshardeddata = (self.dataX, self.dataY)
+        dataX, dataY = self._unshardeddata
+        self.num_shards = num_shards
+        self.shard_index = index
+        if num_shards == 1:
+            self.dataX, self.dataY = dataX, dataY
+            self._unshardeddata = None
+        else:
+            self.dataX = dataX[index::num_shards]
+            self.dataY = dataY[index::num_shards]
+        return self
+
     def __len__(self) -> int:
         """
         Returns the number of data samples.
@@ -380,6 +761,9 @@ class Dataset(object):
         The representations can be opened using prepare_input_samples and
         prepare_output_samples.
 
+        For sharded datasets, only representations from the current shard are
+        returned.
+
         Returns
         -------
         Tuple[List, List] :
@@ -442,12 +826,14 @@ class Dataset(object):
             )
         return (dataXtrain, dataXtest, dataYtrain, dataYtest)
 
-    def calibration_dataset_generator(
+    def select_calibration_samples(
             self,
             percentage: float = 0.25,
-            seed: int = 12345) -> Generator[List[Any], None, None]:
+            seed: int = 12345) -> List[Any]:
         """
-        Creates generator for the calibration data.
+        Selects representations of input samples used for calibration.
+
+        For sharded datasets, only samples from the current shard are used.
 
         Parameters
         ----------
@@ -455,6 +841,12 @@ class Dataset(object):
             The fraction of data to use for calibration
         seed : int
             The seed for random state
+
+        Returns
+        -------
+        List[Any] :
+            Representations of samples usable by the prepare_input_samples
+            method
         """
         if self.external_calibration_dataset is None:
             _, X, _, _ = self.train_test_split_representations(
@@ -463,9 +855,154 @@ class Dataset(object):
             )
         else:
             X = self.prepare_external_calibration_dataset(percentage, seed)
+            X = X[self.shard_index::self.num_shards]
+        return X
+
+    def prepare_calibration_samples(
+            self,
+            percentage: float = 0.25,
+            seed: int = 12345) -> Union[np.ndarray, List[Any]]:
+        """
+        Prepares input samples used for calibration.
+
+        Samples are selected and preprocessed once for given percentage and
+        seed, in parallel - by ``prefetch_workers`` workers of the
+        ``prefetch_executor`` type, or by a thread per CPU if prefetching is
+        disabled. Samples of the same shape and type are stacked into a
+        single array, which is also stored in ``samples_cache_dir``, if
+        provided, and memory-mapped by later calls, also by other instances
+        of the dataset with the same parameters.
+
+        Parameters
+        ----------
+        percentage : float
+            The fraction of data to use for calibration
+        seed : int
+            The seed for random state
+
+        Returns
+        -------
+        Union[np.ndarray, List[Any]] :
+            Array of stacked samples or, if samples can not be stacked, the
+            list of samples
+        """
+        key = (percentage, seed)
+        if key in self._calibrationsets:
+            return self._calibrationsets[key]
+        samples = self.select_calibration_samples(percentage, seed)
+
+        cachepath = None
+        if self.samples_cache_dir is not None:
+            parameters = dict(
+                self.get_cache_parameters(),
+                calibration_samples=hashlib.sha256(
+                    '\n'.join(str(sample) for sample in samples).encode()
+                ).hexdigest(),
+                percentage=percentage,
+                seed=seed
+            )
+            keyhash = hashlib.sha256(
+                json.dumps(parameters, sort_keys=True, default=str).encode()
+            ).hexdigest()[:16]
+            cachepath = self.samples_cache_dir / f'calibration-{keyhash}.npy'
+            if cachepath.exists():
+                self._calibrationsets[key] = np.load(cachepath, mmap_mode='r')
+                return self._calibrationsets[key]
+
+        prepared = self._prepare_samples_in_pool(samples)
+        if len(prepared) > 0 and \
+                all(isinstance(s, np.ndarray) for s in prepared) and \
+                len(set((s.shape, s.dtype) for s in prepared)) == 1:
+            prepared = np.stack(prepared)
+            if cachepath is not None:
+                from kenning.utils.atomic_file import create_exclusive
+
+                def writer(path: Path):
+                    with open(path, 'wb') as cachefile:
+                        np.save(cachefile, prepared)
+
+                cachepath.parent.mkdir(parents=True, exist_ok=True)
+                create_exclusive(cachepath, writer)
+        self._calibrationsets[key] = prepared
+        return prepared
+
+    def _prepare_samples_in_pool(self, samples: List[Any]) -> List[Any]:
+        """
+        Preprocesses input samples in parallel, keeping their order.
 
-        for x in tqdm(X):
-            yield self.prepare_input_samples([x])
+        Parameters
+        ----------
+        samples : List[Any]
+            Representations of input samples
+
+        Returns
+        -------
+        List[Any] :
+            Preprocessed input samples
+        """
+        workers = self.prefetch_workers if self.prefetch_workers > 0 \
+            else os.cpu_count()
+        chunksize = max(1, -(-len(samples) // (4 * workers)))
+        chunks = [
+            samples[start:start + chunksize]
+            for start in range(0, len(samples), chunksize)
+        ]
+        if self.prefetch_executor == 'process':
+            pool = ProcessPoolExecutor(
+                workers,
+                initializer=_init_prefetch_worker,
+                initargs=(self,)
+            )
+            prepare = _prepare_worker_samples
+        else:
+            pool = ThreadPoolExecutor(workers)
+            prepare = self.prepare_input_samples
+        prepared = []
+        with pool:
+            for chunk in tqdm(
+                    pool.map(prepare, chunks),
+                    total=len(chunks),
+                    desc='Preparing calibration samples'):
+                prepared.extend(chunk)
+        return prepared
+
+    def calibration_dataset_generator(
+            self,
+            percentage: float = 0.25,
+            seed: int = 12345,
+            batch_size: int = 1,
+            pad_last_batch: bool = False) -> Generator[List[Any], None, None]:  # noqa: E501
+        """
+        Creates generator for the calibration data.
+
+        For sharded datasets, only samples from the current shard are used.
+        Samples are prepared once with `prepare_calibration_samples`, so
+        subsequent calls with the same parameters do not preprocess them
+        again.
+
+        Parameters
+        ----------
+        percentage : float
+            The fraction of data to use for calibration
+        seed : int
+            The seed for random state
+        batch_size : int
+            Number of samples in yielded batches
+        pad_last_batch : bool
+            True if the last batch should be filled up to `batch_size` with
+            samples from the beginning of the calibration set, for models
+            with the fixed batch size. Otherwise the last batch can be
+            smaller.
+        """
+        samples = self.prepare_calibration_samples(percentage, seed)
+        for start in range(0, len(samples), batch_size):
+            batch = list(samples[start:start + batch_size])
+            if pad_last_batch:
+                batch += [
+                    samples[i % len(samples)]
+                    for i in range(batch_size - len(batch))
+                ]
+            yield batch
 
     def prepare_external_calibration_dataset(
             self,
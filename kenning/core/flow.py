@@ -10,6 +10,7 @@ from typing import Dict, Any, List
 import jsonschema
 
 from kenning.core.runner import Runner
+from kenning.core.tracing import TraceCollector
 from kenning.utils import logger
 from kenning.utils.class_loader import load_class
 
@@ -224,7 +225,8 @@ class KenningFlow:
                     self.should_close = True
                     break
 
-                runner._run(self.flow_state)
+                with TraceCollector.span(type(runner).__name__, 'flow'):
+                    runner._run(self.flow_state)
         except Exception:
             self.cleanup()
             raise
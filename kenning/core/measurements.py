@@ -6,13 +6,20 @@
 Module containing decorators for benchmark data gathering.
 """
 
-from typing import List, Dict, Union, Any, Callable, Optional, Type
+from typing import List, Dict, Union, Any, Callable, Optional, Type, Tuple
 from types import TracebackType
+from enum import Enum
+import logging
 import time
+import tracemalloc
+import warnings
 from kenning.utils import logger
+from kenning.core.tracing import TraceCollector
+from kenning.core.powersampler import PowerSampler
 import psutil
 import subprocess
 import re
+import sys
 import numpy as np
 from pathlib import Path
 import json
@@ -22,10 +29,11 @@ try:
     from pynvml.smi import nvidia_smi
 except ImportError:
     nvidia_smi = None
-from threading import Thread, Condition
+from threading import Thread, Condition, Lock, local, get_ident
 
 from shutil import which
 
+from copy import deepcopy
 from functools import wraps
 
 logger = logger.get_logger()
@@ -33,6 +41,355 @@ logger = logger.get_logger()
 
 is_nvidia_smi_loadable = True
 
+NUMERIC_TYPES = (int, float, np.number, np.bool_)
+_FLOAT64 = np.dtype(np.float64)
+
+# Measurements describing the evaluated model and the flow, that are the same
+# for all shards of the dataset
+SHARD_INVARIANT_MEASUREMENTS = [
+    'model_framework',
+    'model_version',
+    'compilers',
+    'command',
+    'build_cfg',
+    'class_names',
+    'compiled_model_size',
+]
+
+# Measurements stored as lists (i.e. after loading from JSON) that are summed
+# element-wise when shards are merged
+SHARD_SUMMED_MEASUREMENTS = [
+    'eval_confusion_matrix',
+]
+
+
+class InstrumentationLevel(Enum):
+    """
+    Enum representing the amount of collected performance data.
+
+    OFF - measurement decorators call decorated functions directly, system
+    statistics are not collected
+    MINIMAL - only timings and tags are collected, debug logs, trace spans
+    for tags and system statistics are skipped
+    FULL - all performance data is collected
+    """
+
+    OFF = 0
+    MINIMAL = 1
+    FULL = 2
+
+
+_instrumentation_level = InstrumentationLevel.FULL
+
+
+def set_instrumentation_level(
+        level: Union[InstrumentationLevel, str]) -> InstrumentationLevel:
+    """
+    Sets the global instrumentation level.
+
+    Parameters
+    ----------
+    level : Union[InstrumentationLevel, str]
+        New level, or its name (case-insensitive)
+
+    Returns
+    -------
+    InstrumentationLevel : previous level
+    """
+    global _instrumentation_level
+    if isinstance(level, str):
+        level = InstrumentationLevel[level.upper()]
+    previous = _instrumentation_level
+    _instrumentation_level = level
+    return previous
+
+
+def get_instrumentation_level() -> InstrumentationLevel:
+    """
+    Returns the global instrumentation level.
+
+    Returns
+    -------
+    InstrumentationLevel : current level
+    """
+    return _instrumentation_level
+
+
+class MeasurementSeries(object):
+    """
+    Growable, typed numpy buffer storing a numeric time series.
+
+    Every entry of the series is either a number or a fixed-shape array of
+    numbers (i.e. per-core CPU utilization). Entries are stored in one
+    contiguous buffer that grows geometrically, so appending does not create
+    Python objects for every value.
+
+    If a value that does not fit the current dtype is added (i.e. float to an
+    integer series), the buffer is converted to a common type.
+    """
+    def __init__(
+            self,
+            dtype: np.dtype = np.float64,
+            shape: Tuple[int, ...] = (),
+            capacity: int = 256):
+        """
+        Creates an empty series.
+
+        Parameters
+        ----------
+        dtype : np.dtype
+            Type of the values in the series
+        shape : Tuple[int, ...]
+            Shape of a single entry in the series, empty for scalars
+        capacity : int
+            Initial number of entries allocated in the buffer
+        """
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self._buffer = np.empty((max(capacity, 1),) + self.shape, self.dtype)
+        self._size = 0
+
+    @classmethod
+    def from_values(
+            cls,
+            values: Union[List, np.ndarray]) -> Optional['MeasurementSeries']:
+        """
+        Creates a series from the list of numeric values.
+
+        Parameters
+        ----------
+        values : Union[List, np.ndarray]
+            Non-empty list of numbers or of equally-shaped lists of numbers
+
+        Returns
+        -------
+        Optional[MeasurementSeries] :
+            Series with given values, or None if the values are not numeric
+        """
+        if len(values) == 0:
+            return None
+        if not isinstance(values, np.ndarray):
+            first = values[0]
+            while isinstance(first, (list, tuple)) and len(first) > 0:
+                first = first[0]
+            if not isinstance(first, NUMERIC_TYPES):
+                return None
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            try:
+                array = np.asarray(values)
+            except ValueError:
+                return None
+        if array.dtype.kind not in 'biuf' or array.ndim == 0:
+            return None
+        series = cls(array.dtype, array.shape[1:], max(len(array), 256))
+        series.extend(array)
+        return series
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __array__(self, dtype: Optional[np.dtype] = None) -> np.ndarray:
+        return np.asarray(self.numpy(), dtype=dtype)
+
+    def numpy(self) -> np.ndarray:
+        """
+        Returns the stored values without copying them.
+
+        Returns
+        -------
+        np.ndarray : view of the filled part of the buffer
+        """
+        return self._buffer[:self._size]
+
+    def tolist(self) -> List:
+        """
+        Returns the stored values as a list of Python objects.
+
+        Returns
+        -------
+        List : list of values
+        """
+        return self.numpy().tolist()
+
+    def _reserve(self, size: int):
+        """
+        Makes sure the buffer can hold ``size`` entries.
+
+        Parameters
+        ----------
+        size : int
+            Required number of entries
+        """
+        if size <= len(self._buffer):
+            return
+        capacity = max(size, 2 * len(self._buffer))
+        buffer = np.empty((capacity,) + self.shape, self.dtype)
+        buffer[:self._size] = self._buffer[:self._size]
+        self._buffer = buffer
+
+    def _promote(self, dtype: np.dtype):
+        """
+        Converts the buffer to the type able to hold values of ``dtype``.
+
+        Parameters
+        ----------
+        dtype : np.dtype
+            Type of the added values
+        """
+        if np.can_cast(dtype, self.dtype, 'safe'):
+            return
+        self.dtype = np.result_type(self.dtype, dtype)
+        self._buffer = self._buffer.astype(self.dtype)
+
+    def append(self, value: Any):
+        """
+        Appends a single entry to the series.
+
+        Parameters
+        ----------
+        value : Any
+            Number or array of numbers matching the shape of the series
+
+        Raises
+        ------
+        ValueError : Raised if the value does not match the series
+        """
+        # fast path for timings, appended for every sample
+        size = self._size
+        if type(value) is float and self.dtype is _FLOAT64 and \
+                not self.shape and size < len(self._buffer):
+            self._buffer[size] = value
+            self._size = size + 1
+            return
+        if self.shape or not isinstance(value, NUMERIC_TYPES):
+            self.extend([value])
+            return
+        if isinstance(value, np.generic):
+            dtype = value.dtype
+        elif isinstance(value, bool):
+            dtype = np.dtype(np.bool_)
+        elif isinstance(value, int):
+            dtype = np.dtype(np.int64)
+        else:
+            dtype = np.dtype(np.float64)
+        if dtype != self.dtype:
+            self._promote(dtype)
+        self._reserve(self._size + 1)
+        self._buffer[self._size] = value
+        self._size += 1
+
+    def extend(self, values: Union[List, np.ndarray]):
+        """
+        Appends multiple entries to the series at once.
+
+        Parameters
+        ----------
+        values : Union[List, np.ndarray]
+            List or array of entries matching the shape of the series
+
+        Raises
+        ------
+        ValueError : Raised if the values do not match the series
+        """
+        array = np.asarray(values)
+        if len(array) == 0:
+            return
+        if array.dtype.kind not in 'biuf':
+            raise ValueError(f'Non-numeric values of type {array.dtype}')
+        if array.shape[1:] != self.shape:
+            raise ValueError(
+                f'Values of shape {array.shape[1:]} do not match {self.shape}'
+            )
+        self._promote(array.dtype)
+        self._reserve(self._size + len(array))
+        self._buffer[self._size:self._size + len(array)] = array
+        self._size += len(array)
+
+
+class SparseUpdate(object):
+    """
+    Increments of selected entries of an accumulated array measurement.
+
+    It is used to accumulate large arrays (i.e. confusion matrices) without
+    creating a dense array for every update. Measurements apply the update
+    in place to the accumulated array, only at given positions, and convert
+    it to a dense array only when the measurement does not exist yet.
+    """
+
+    # makes numpy call __radd__ instead of converting the update to an array
+    __array_ufunc__ = None
+
+    def __init__(
+            self,
+            shape: Tuple[int, ...],
+            indices: Tuple[np.ndarray, ...],
+            dtype: np.dtype = np.int64):
+        """
+        Creates the update adding one at every given position.
+
+        Parameters
+        ----------
+        shape : Tuple[int, ...]
+            Shape of the accumulated array
+        indices : Tuple[np.ndarray, ...]
+            Indices of incremented entries along every axis, positions can
+            repeat
+        dtype : np.dtype
+            Type of the accumulated array
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.flatindices = np.ravel_multi_index(
+            tuple(np.asarray(index, dtype=np.intp) for index in indices),
+            self.shape
+        )
+
+    def apply(self, array: np.ndarray) -> np.ndarray:
+        """
+        Increments entries of the array in place.
+
+        Parameters
+        ----------
+        array : np.ndarray
+            Accumulated array
+
+        Returns
+        -------
+        np.ndarray : the updated array
+        """
+        positions, counts = np.unique(self.flatindices, return_counts=True)
+        # positions are unique, so fancy indexing does not lose increments
+        array[np.unravel_index(positions, self.shape)] += counts
+        return array
+
+    def toarray(self) -> np.ndarray:
+        """
+        Creates a dense array with the update.
+
+        Returns
+        -------
+        np.ndarray : array with counts of every position
+        """
+        return self.apply(np.zeros(self.shape, dtype=self.dtype))
+
+    def __radd__(self, other: Any) -> np.ndarray:
+        if isinstance(other, np.ndarray):
+            return self.apply(other.copy())
+        return self.toarray() + other
+
+    def __add__(self, other: 'SparseUpdate') -> 'SparseUpdate':
+        if not isinstance(other, SparseUpdate):
+            return NotImplemented
+        assert self.shape == other.shape
+        merged = SparseUpdate.__new__(SparseUpdate)
+        merged.shape = self.shape
+        merged.dtype = np.promote_types(self.dtype, other.dtype)
+        merged.flatindices = np.concatenate(
+            [self.flatindices, other.flatindices]
+        )
+        return merged
+
 
 class Measurements(object):
     """
@@ -47,19 +404,119 @@ class Measurements(object):
     There can be other values assigned to a given measurement type than list,
     but it requires explicit initialization.
 
+    Lists of numeric values are stored internally in MeasurementSeries
+    buffers. The ``to_dict`` and ``get_values`` methods present them as
+    lists, ``get_array`` gives direct access to the underlying arrays.
+
     Attributes
     ----------
     data : dict
-        Dictionary storing lists of values
+        Copy of measurements, check ``to_dict``
     """
     def __init__(self):
-        self.data = dict()
+        self._data = dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns a copy of all measurements, series are converted to lists.
+
+        Lists and arrays are copied, so modifying the returned dictionary
+        does not change the measurements - they should be modified with
+        ``add_measurement``, ``accumulate`` or ``initialize_measurement``.
+
+        Returns
+        -------
+        Dict[str, Any] : measurements of every type
+        """
+        result = {}
+        for k, v in list(self._data.items()):
+            if isinstance(v, MeasurementSeries):
+                v = v.tolist()
+            elif isinstance(v, np.ndarray):
+                v = v.copy()
+            elif isinstance(v, list):
+                v = list(v)
+            result[k] = v
+        return result
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """
+        Copy of all measurements, equal to ``to_dict()``.
+
+        It is created on every access and changes made to it are not stored.
+        """
+        return self.to_dict()
 
     def __iadd__(self, other: Union[Dict, 'Measurements']) -> 'Measurements':
         self.update_measurements(other)
         return self
 
-    def initialize_measurement(self, measurement_type: str, value: Any):
+    def __contains__(self, measurementtype: str) -> bool:
+        return measurementtype in self._data
+
+    def _extend(self, measurementtype: str, values: Union[List, np.ndarray]):
+        """
+        Appends the list of values to a given measurement type.
+
+        Numeric values are stored in a MeasurementSeries. If new values do not
+        fit the existing series, it is converted back to a list.
+
+        Parameters
+        ----------
+        measurementtype : str
+            The type (name) of the measurement
+        values : Union[List, np.ndarray]
+            Values to append
+        """
+        current = self._data.get(measurementtype)
+        if isinstance(current, MeasurementSeries):
+            try:
+                current.extend(values)
+                return
+            except ValueError:
+                current = current.tolist()
+                self._data[measurementtype] = current
+        if current is None or (isinstance(current, list) and not current):
+            series = MeasurementSeries.from_values(values)
+            if series is not None:
+                self._data[measurementtype] = series
+                return
+            if current is None:
+                current = list()
+                self._data[measurementtype] = current
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        self._data[measurementtype] += values
+
+    def append(self, measurementtype: str, value: Any):
+        """
+        Appends a single value to a given measurement type.
+
+        It is equivalent to adding a single-element list, but does not create
+        intermediate containers.
+
+        Parameters
+        ----------
+        measurementtype : str
+            The type (name) of the measurement
+        value : Any
+            The value to append
+        """
+        current = self._data.get(measurementtype)
+        if isinstance(current, MeasurementSeries):
+            try:
+                current.append(value)
+                return
+            except ValueError:
+                pass
+        elif type(current) is list and current:
+            # non-numeric values, i.e. tags
+            current.append(value)
+            return
+        self._extend(measurementtype, [value])
+
+    def initialize_measurement(self, measurementtype: str, value: Any):
         """
         Sets the initial value for a given measurement type.
 
@@ -72,12 +529,12 @@ class Measurements(object):
 
         Parameters
         ----------
-        measurement_type : str
+        measurementtype : str
             The type (name) of the measurement
         value : Any
             The initial value for the measurement type
         """
-        self.data[measurement_type] = value
+        self._data[measurementtype] = value
 
     def update_measurements(self, other: Union[Dict, 'Measurements']):
         """
@@ -94,18 +551,30 @@ class Measurements(object):
             every entry.
         """
         assert isinstance(other, dict) or isinstance(other, Measurements)
+        if isinstance(other, MeasurementsScope):
+            other = other.merge()
         if isinstance(other, Measurements):
-            for k, v in other.data.items():
-                if k not in self.data:
-                    self.data[k] = other.data[k]
-                else:
-                    self.data[k] += other.data[k]
-        else:
-            for k, v in other.items():
-                if k not in self.data:
-                    self.data[k] = other[k]
-                else:
-                    self.data[k] += other[k]
+            other = other._data
+        # items are copied first, other threads can add new entries
+        for k, v in list(other.items()):
+            if isinstance(v, MeasurementSeries):
+                self._extend(k, v.numpy())
+            elif isinstance(v, list) and (
+                    k not in self._data or
+                    isinstance(self._data[k], (list, MeasurementSeries))):
+                self._extend(k, v)
+            elif isinstance(v, SparseUpdate) and \
+                    isinstance(self._data.get(k), np.ndarray):
+                v.apply(self._data[k])
+            elif k not in self._data:
+                if isinstance(v, SparseUpdate):
+                    v = v.toarray()
+                elif isinstance(v, np.ndarray):
+                    # stored arrays are updated in place by next updates
+                    v = v.copy()
+                self._data[k] = v
+            else:
+                self._data[k] += v
 
     def add_measurements_list(
             self,
@@ -123,9 +592,7 @@ class Measurements(object):
         """
         assert isinstance(valueslist, list)
         assert isinstance(measurementtype, str)
-        if measurementtype not in self.data:
-            self.data[measurementtype] = list()
-        self.data[measurementtype] += valueslist
+        self._extend(measurementtype, valueslist)
 
     def add_measurement(
             self,
@@ -145,9 +612,16 @@ class Measurements(object):
             the initial value for the measurement
         """
         assert isinstance(measurementtype, str)
-        if measurementtype not in self.data:
-            self.data[measurementtype] = initialvaluefunc()
-        self.data[measurementtype] += value
+        if measurementtype not in self._data:
+            initialvalue = initialvaluefunc()
+            if not (isinstance(initialvalue, list) and not initialvalue):
+                self._data[measurementtype] = initialvalue
+        if isinstance(value, list) and isinstance(
+                self._data.get(measurementtype, []),
+                (list, MeasurementSeries)):
+            self._extend(measurementtype, value)
+        else:
+            self._data[measurementtype] += value
 
     def get_values(self, measurementtype: str) -> List:
         """
@@ -162,7 +636,31 @@ class Measurements(object):
         -------
         List : list of values for a given measurement type
         """
-        return self.data[measurementtype]
+        value = self._data[measurementtype]
+        if isinstance(value, MeasurementSeries):
+            return value.tolist()
+        return value
+
+    def get_array(self, measurementtype: str) -> np.ndarray:
+        """
+        Returns values for a given measurement type as numpy array.
+
+        For numeric series the array is a view of the internal buffer, so it
+        should not be modified.
+
+        Parameters
+        ----------
+        measurementtype : str
+            The name of the measurement type
+
+        Returns
+        -------
+        np.ndarray : values for a given measurement type
+        """
+        value = self._data[measurementtype]
+        if isinstance(value, MeasurementSeries):
+            return value.numpy()
+        return np.asarray(value)
 
     def accumulate(
             self,
@@ -188,38 +686,381 @@ class Measurements(object):
         initvaluefunc : Callable[[], Any]
             The initial value of the measurement, default 0
         """
-        if measurementtype not in self.data:
-            self.data[measurementtype] = initvaluefunc()
-        self.data[measurementtype] += valuetoadd
+        if measurementtype not in self._data:
+            self._data[measurementtype] = initvaluefunc()
+        if isinstance(valuetoadd, SparseUpdate) and \
+                isinstance(self._data[measurementtype], np.ndarray):
+            valuetoadd.apply(self._data[measurementtype])
+        else:
+            self._data[measurementtype] += valuetoadd
 
     def clear(self):
         """
         Clears measurement data.
         """
-        self.data.clear()
+        self._data.clear()
+
+
+class _ActiveScopes(local):
+    """
+    Stack of MeasurementsScope objects activated in the current thread.
+
+    It also caches the buffer of the current thread in the active scope
+    (check ``_direct_buffer``), valid as long as ``generation`` is equal to
+    ``_buffers_generation``.
+    """
+    def __init__(self):
+        self.stack = []
+        self.buffer = None
+        self.generation = -1
+
+
+_active_scopes = _ActiveScopes()
+
+# Incremented when cached buffers of all threads become invalid, i.e. when
+# buffers are cleared or the sink of a scope changes
+_buffers_generation = 0
+
+
+def _invalidate_buffers():
+    """
+    Invalidates buffers cached by ``_direct_buffer`` in all threads.
+    """
+    global _buffers_generation
+    _buffers_generation += 1
+
+
+def _direct_buffer() -> Optional['Measurements']:
+    """
+    Returns the buffer of the current thread in the active scope.
+
+    It is a fast path for decorators called for every sample, which skips
+    looking up the active scope and its sink on every added measurement.
+
+    Returns
+    -------
+    Optional[Measurements] :
+        Buffer of the current thread, or None if the active scope streams
+        measurements to the sink, so they have to be added to the scope
+    """
+    active = _active_scopes
+    if active.generation != _buffers_generation:
+        generation = _buffers_generation
+        scope = MeasurementsCollector.measurements._scope()
+        active.buffer = scope._thread_buffer() if scope.sink is None else None
+        active.generation = generation
+    return active.buffer
+
+
+class MeasurementsScope(Measurements):
+    """
+    Measurements collected independently by each thread.
+
+    Every thread writing to the scope gets its own Measurements buffer, so
+    concurrent writes do not need synchronization. Methods reading the data
+    (``to_dict``, ``get_values``, ``get_array``) merge buffers from all
+    threads on every call, so results should be reused.
+
+    The scope can be activated in a thread with the ``with`` statement. Then,
+    measurements added to ``MeasurementsCollector.measurements`` in this
+    thread are stored in this scope. It allows to run multiple pipelines in
+    one process without mixing their measurements. Worker threads started
+    within the scope have to enter it explicitly.
+
+    Measurements collected in other processes should be returned to the
+    parent process and added to the scope with ``+=``.
+
+    If ``sink`` is set (check ``MeasurementsCollector.start_stream``), all
+    added measurements are also passed to it as they arrive.
+    """
+    def __init__(self, follow_active: bool = False):
+        """
+        Creates an empty scope.
+
+        Parameters
+        ----------
+        follow_active : bool
+            If True, the scope redirects all operations to the scope that is
+            active in the current thread, if there is any
+        """
+        self.follow_active = follow_active
+        self._sink = None
+        self._lock = Lock()
+        self._buffers = dict()
+
+    @property
+    def sink(self):
+        return self._sink
+
+    @sink.setter
+    def sink(self, sink):
+        self._sink = sink
+        _invalidate_buffers()
+
+    def __enter__(self) -> 'MeasurementsScope':
+        _active_scopes.stack.append(self)
+        _active_scopes.generation = -1
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_value: Optional[BaseException],
+            traceback: Optional[TracebackType]) -> bool:
+        _active_scopes.stack.pop()
+        _active_scopes.generation = -1
+        return False
+
+    def _scope(self) -> 'MeasurementsScope':
+        """
+        Returns the scope that should handle the operation.
+
+        Returns
+        -------
+        MeasurementsScope : active scope or this object
+        """
+        if self.follow_active:
+            stack = _active_scopes.stack
+            if stack:
+                return stack[-1]
+        return self
+
+    @property
+    def _data(self) -> Dict[str, Any]:
+        return self.get_buffer()._data
+
+    def get_buffer(self) -> Measurements:
+        """
+        Returns the buffer of the current thread.
+
+        Returns
+        -------
+        Measurements : measurements collected by the current thread
+        """
+        return self._scope()._thread_buffer()
+
+    def _thread_buffer(self) -> Measurements:
+        """
+        Returns the buffer of the current thread in this scope.
+
+        Returns
+        -------
+        Measurements : measurements collected by the current thread
+        """
+        buffer = self._buffers.get(get_ident())
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.setdefault(get_ident(), Measurements())
+        return buffer
+
+    def merge(self) -> Measurements:
+        """
+        Merges measurements collected by all threads.
+
+        Returns
+        -------
+        Measurements : new object with measurements from all buffers
+        """
+        scope = self._scope()
+        with scope._lock:
+            buffers = list(scope._buffers.values())
+        merged = Measurements()
+        for buffer in buffers:
+            merged += buffer
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.merge().to_dict()
+
+    def update_measurements(self, other: Union[Dict, Measurements]):
+        scope = self._scope()
+        if scope.sink is not None:
+            scope.sink.write_update(other)
+        scope._thread_buffer().update_measurements(other)
+
+    def append(self, measurementtype: str, value: Any):
+        scope = self._scope()
+        if scope.sink is not None:
+            scope.sink.write_update({measurementtype: [value]})
+        scope._thread_buffer().append(measurementtype, value)
+
+    def initialize_measurement(self, measurementtype: str, value: Any):
+        scope = self._scope()
+        if scope.sink is not None:
+            scope.sink.write_initialize(measurementtype, value)
+        scope._thread_buffer().initialize_measurement(measurementtype, value)
+
+    def add_measurements_list(
+            self,
+            measurementtype: str,
+            valueslist: List):
+        scope = self._scope()
+        if scope.sink is not None:
+            scope.sink.write_update({measurementtype: valueslist})
+        scope._thread_buffer().add_measurements_list(
+            measurementtype,
+            valueslist
+        )
+
+    def add_measurement(
+            self,
+            measurementtype: str,
+            value: Any,
+            initialvaluefunc: Callable[[], Any] = lambda: list()):
+        scope = self._scope()
+        if scope.sink is not None:
+            if isinstance(value, list):
+                scope.sink.write_update({measurementtype: value})
+            else:
+                scope.sink.write_accumulate(measurementtype, value)
+        scope._thread_buffer().add_measurement(
+            measurementtype,
+            value,
+            initialvaluefunc
+        )
+
+    def accumulate(
+            self,
+            measurementtype: str,
+            valuetoadd: Any,
+            initvaluefunc: Callable[[], Any] = lambda: 0) -> List:
+        scope = self._scope()
+        if scope.sink is not None:
+            scope.sink.write_accumulate(measurementtype, valuetoadd)
+        scope._thread_buffer().accumulate(
+            measurementtype,
+            valuetoadd,
+            initvaluefunc
+        )
+
+    def __contains__(self, measurementtype: str) -> bool:
+        scope = self._scope()
+        with scope._lock:
+            buffers = list(scope._buffers.values())
+        return any(measurementtype in buffer for buffer in buffers)
+
+    def get_values(self, measurementtype: str) -> List:
+        return self.merge().get_values(measurementtype)
+
+    def get_array(self, measurementtype: str) -> np.ndarray:
+        return self.merge().get_array(measurementtype)
+
+    def clear(self):
+        scope = self._scope()
+        with scope._lock:
+            scope._buffers.clear()
+        _invalidate_buffers()
 
 
 class MeasurementsCollector(object):
     """
     It is a 'static' class collecting measurements from various sources.
+
+    The ``measurements`` object stores data in the scope active in the
+    current thread (check ``scope``), or in the global scope if none is
+    active.
     """
-    measurements = Measurements()
+    measurements = MeasurementsScope(follow_active=True)
+
+    @classmethod
+    def scope(cls) -> MeasurementsScope:
+        """
+        Creates a new scope for measurements.
+
+        Activating the returned scope with the ``with`` statement redirects
+        measurements from the current thread to it:
+
+        .. code-block:: python
+
+            with MeasurementsCollector.scope() as measurements:
+                runtime.run_locally(dataset, model, modelpath)
+            print(measurements.to_dict())
+
+        Returns
+        -------
+        MeasurementsScope : new, empty scope
+        """
+        return MeasurementsScope()
+
+    @classmethod
+    def current_scope(cls) -> MeasurementsScope:
+        """
+        Returns the scope active in the current thread.
+
+        It can be passed to worker threads, which should activate it with
+        the ``with`` statement.
+
+        Returns
+        -------
+        MeasurementsScope : active scope
+        """
+        return cls.measurements._scope()
+
+    @classmethod
+    def start_stream(
+            cls,
+            streampath: Path,
+            flush_interval: float = 1.0,
+            fsync: bool = False):
+        """
+        Starts streaming measurements of the current scope to a file.
+
+        Measurements collected so far are written first, then every added
+        measurement is appended to the JSON Lines file. The stream can be
+        read with ``kenning.utils.measurements_io.load_measurements``.
+
+        Parameters
+        ----------
+        streampath : Path
+            Path to the JSON Lines file
+        flush_interval : float
+            Maximal time between writes to the file, in seconds
+        fsync : bool
+            If True, the file is synchronized with the storage on every
+            flush
+        """
+        from kenning.utils.measurements_io import MeasurementsStreamWriter
+        cls.stop_stream()
+        scope = cls.current_scope()
+        sink = MeasurementsStreamWriter(streampath, flush_interval, fsync)
+        sink.write_update(scope)
+        scope.sink = sink
+
+    @classmethod
+    def stop_stream(cls):
+        """
+        Flushes and closes the stream of the current scope, if there is any.
+        """
+        scope = cls.current_scope()
+        if scope.sink is not None:
+            scope.sink.close()
+            scope.sink = None
 
     @classmethod
     def save_measurements(cls, resultpath: Path):
         """
         Saves measurements to JSON file.
 
+        If the path has the ``.measurements`` suffix, measurements are saved
+        in the binary format instead (check
+        ``kenning.utils.measurements_io.save_measurements_binary``).
+
         Parameters
         ----------
         resultpath : Path
             Path to the saved JSON file
         """
-        if 'eval_confusion_matrix' in cls.measurements.data:
-            cls.measurements.data['eval_confusion_matrix'] = cls.measurements.data['eval_confusion_matrix'].tolist()  # noqa: E501
+        from kenning.utils.measurements_io import BINARY_SUFFIX
+        from kenning.utils.measurements_io import save_measurements_binary
+        if Path(resultpath).suffix == BINARY_SUFFIX:
+            save_measurements_binary(cls.measurements, resultpath)
+            return
+        data = cls.measurements.to_dict()
+        if 'eval_confusion_matrix' in data:
+            data['eval_confusion_matrix'] = data['eval_confusion_matrix'].tolist()  # noqa: E501
         with open(resultpath, 'w') as measurementsfile:
             json.dump(
-                cls.measurements.data,
+                data,
                 measurementsfile,
                 indent=2
             )
@@ -232,6 +1073,64 @@ class MeasurementsCollector(object):
         cls.measurements.clear()
 
 
+def merge_measurements(
+        shards: List[Union[Dict[str, Any], Measurements]]) -> Measurements:
+    """
+    Combines measurements collected on separate shards of the dataset.
+
+    Measurements of every type are merged depending on their values:
+
+    * measurements from ``SHARD_INVARIANT_MEASUREMENTS``, strings,
+      dictionaries and booleans are taken from the first shard containing
+      them,
+    * numbers are summed (i.e. numbers of samples, ground truth counts),
+    * measurements from ``SHARD_SUMMED_MEASUREMENTS`` are summed
+      element-wise (i.e. confusion matrices),
+    * lists, series and arrays are concatenated along the first axis in the
+      order of shards (i.e. per-class detections, inference times).
+
+    Timestamps of different shards come from different clocks, so merged
+    time series should not be used to plot the course of the benchmark.
+
+    Parameters
+    ----------
+    shards : List[Union[Dict[str, Any], Measurements]]
+        Measurements of shards, or their data (i.e. loaded from files)
+
+    Returns
+    -------
+    Measurements : measurements of the whole dataset
+    """
+    merged = Measurements()
+    for shard in shards:
+        if isinstance(shard, MeasurementsScope):
+            shard = shard.merge()
+        if isinstance(shard, Measurements):
+            shard = shard._data
+        for name, value in list(shard.items()):
+            if name in merged and (
+                    name in SHARD_INVARIANT_MEASUREMENTS or
+                    isinstance(value, (str, dict, bool, np.bool_))):
+                continue
+            if name in SHARD_SUMMED_MEASUREMENTS:
+                value = np.asarray(value)
+                if name in merged:
+                    merged._data[name] = merged._data[name] + value
+                else:
+                    merged._data[name] = value.copy()
+            elif name in SHARD_INVARIANT_MEASUREMENTS or \
+                    name not in merged and not isinstance(
+                        value, (list, MeasurementSeries, np.ndarray)):
+                merged._data[name] = deepcopy(value)
+            elif isinstance(value, MeasurementSeries):
+                merged._extend(name, value.numpy())
+            elif isinstance(value, (list, np.ndarray)):
+                merged._extend(name, value)
+            else:
+                merged._data[name] = merged._data[name] + value
+    return merged
+
+
 def tagmeasurements(tagname: str):
     """
     Decorator for adding tags for measurements and saving their timestamps.
@@ -244,17 +1143,30 @@ def tagmeasurements(tagname: str):
     def statistics_decorator(function):
         @wraps(function)
         def statistics_wrapper(*args):
+            level = _instrumentation_level
+            if level is InstrumentationLevel.OFF:
+                return function(*args)
             starttimestamp = time.perf_counter()
             returnvalue = function(*args)
             endtimestamp = time.perf_counter()
-            logger.debug(
-                f'{function.__name__} start: {starttimestamp * 1000} ms end: {endtimestamp * 1000} ms'  # noqa: E501
+            buffer = _direct_buffer()
+            if buffer is None:
+                buffer = MeasurementsCollector.measurements
+            buffer.append(
+                'tags',
+                {'name': tagname, 'start': starttimestamp, 'end': endtimestamp}  # noqa: E501
             )
-            MeasurementsCollector.measurements += {
-                'tags': [
-                    {'name': tagname, 'start': starttimestamp, 'end': endtimestamp}  # noqa: E501
-                ]
-            }
+            if level is InstrumentationLevel.FULL:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        f'{function.__name__} start: {starttimestamp * 1000} ms end: {endtimestamp * 1000} ms'  # noqa: E501
+                    )
+                TraceCollector.add_span(
+                    tagname,
+                    starttimestamp,
+                    endtimestamp,
+                    'tags'
+                )
             return returnvalue
         return statistics_wrapper
     return statistics_decorator
@@ -271,24 +1183,65 @@ def timemeasurements(measurementname: str):
     measurementname : str
         The name of the measurement type.
     """
+    timestampname = f'{measurementname}_timestamp'
+
     def statistics_decorator(function):
         @wraps(function)
         def statistics_wrapper(*args):
+            level = _instrumentation_level
+            if level is InstrumentationLevel.OFF:
+                return function(*args)
             start = time.perf_counter()
             returnvalue = function(*args)
-            duration = time.perf_counter() - start
-            logger.debug(
-                f'{function.__name__} time:  {duration * 1000} ms'
-            )
-            MeasurementsCollector.measurements += {
-                measurementname: [duration],
-                f'{measurementname}_timestamp': [time.perf_counter()]
-            }
+            end = time.perf_counter()
+            duration = end - start
+            buffer = _direct_buffer()
+            if buffer is None:
+                buffer = MeasurementsCollector.measurements
+            buffer.append(measurementname, duration)
+            buffer.append(timestampname, end)
+            if (level is InstrumentationLevel.FULL and
+                    logger.isEnabledFor(logging.DEBUG)):
+                logger.debug(
+                    f'{function.__name__} time:  {duration * 1000} ms'
+                )
             return returnvalue
         return statistics_wrapper
     return statistics_decorator
 
 
+def _read_proc_stats(pid: int) -> Dict[str, int]:
+    """
+    Reads process statistics not provided by psutil from procfs.
+
+    Parameters
+    ----------
+    pid : int
+        ID of the process
+
+    Returns
+    -------
+    Dict[str, int] :
+        Page faults and peak RSS (bytes) of the process, empty if procfs is
+        not available
+    """
+    stats = {}
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as statfile:
+            # fields after the process name, which can contain spaces
+            fields = statfile.read().rsplit(')', 1)[1].split()
+        stats['page_faults_minor'] = int(fields[7])
+        stats['page_faults_major'] = int(fields[9])
+        with open(f'/proc/{pid}/status', 'r') as statusfile:
+            for line in statusfile:
+                if line.startswith('VmHWM:'):
+                    stats['peak_rss'] = int(line.split()[1]) * 1024
+                    break
+    except (OSError, IndexError, ValueError):
+        pass
+    return stats
+
+
 class SystemStatsCollector(Thread):
     """
     It is a separate thread used for collecting system statistics.
@@ -298,12 +1251,22 @@ class SystemStatsCollector(Thread):
     * CPU utilization,
     * RAM utilization,
     * GPU utilization,
-    * GPU Memory utilization.
+    * GPU Memory utilization,
+    * resources used by the observed process (memory, CPU time, threads,
+      context switches, page faults, I/O),
+    * energy consumed by power domains of the device, if a PowerSampler is
+      available.
 
     It can be executed in parallel to another function to check its
     utilization of resources.
     """
-    def __init__(self, prefix: str, step: float = 0.1):
+    def __init__(
+            self,
+            prefix: str,
+            step: float = 0.1,
+            pid: Optional[int] = None,
+            include_children: bool = False,
+            power_sampler: Optional[PowerSampler] = None):
         """
         Prepares thread for execution.
 
@@ -313,12 +1276,26 @@ class SystemStatsCollector(Thread):
             The prefix used in measurements
         step : float
             The step for the measurements, in seconds
+        pid : Optional[int]
+            ID of the observed process, current process by default
+        include_children : bool
+            If True, resources used by child processes of the observed
+            process are added to its statistics
+        power_sampler : Optional[PowerSampler]
+            Source of energy readings. By default, on Linux, powercap and
+            hwmon interfaces are used if they are available
         """
         global is_nvidia_smi_loadable
         Thread.__init__(self)
         self.measurements = Measurements()
         self.running = True
         self.prefix = prefix
+        self.process = psutil.Process(pid)
+        self.include_children = include_children
+        if power_sampler is None and sys.platform.startswith('linux'):
+            from kenning.powersamplers.linux import LinuxPowerSampler
+            power_sampler = LinuxPowerSampler.detect()
+        self.power_sampler = power_sampler
         if is_nvidia_smi_loadable and nvidia_smi is not None:
             try:
                 self.nvidia_smi = nvidia_smi.getInstance()
@@ -359,18 +1336,108 @@ class SystemStatsCollector(Thread):
         * `<prefix>_mem_percent`: gives overall memory usage (%),
         * `<prefix>_gpu_utilization`: gives overall GPU utilization (%),
         * `<prefix>_gpu_mem_utilization`: gives overall memory utilization (%),
+        * `<prefix>_process_rss`, `<prefix>_process_uss`,
+          `<prefix>_process_peak_rss`: give resident, unique and peak
+          resident memory of the observed process (bytes),
+        * `<prefix>_process_cpu_percent`: gives CPU utilization of the
+          observed process since the previous sample (%, 100 per core),
+        * `<prefix>_process_cpu_user`, `<prefix>_process_cpu_system`: give
+          CPU time spent by the process in user and kernel mode (s),
+        * `<prefix>_process_threads`: gives the number of threads,
+        * `<prefix>_process_ctx_switches_voluntary`,
+          `<prefix>_process_ctx_switches_involuntary`: give the number of
+          context switches,
+        * `<prefix>_process_page_faults_minor`,
+          `<prefix>_process_page_faults_major`: give the number of page
+          faults,
+        * `<prefix>_process_read_bytes`, `<prefix>_process_write_bytes`: give
+          the number of bytes read from and written to the storage,
+        * `<prefix>_energy/<domain>`: gives the energy consumed by the power
+          domain since the start of the collector (J),
+        * `<prefix>_sampling_overhead`: gives the time spent on collecting
+          every sample (s),
         * `<prefix>_timestamp`: gives the timestamp of above measurements (ns).
 
+        CPU times, context switches, page faults and I/O are cumulative
+        counters. Process statistics not supported by the platform are
+        skipped.
+
         Returns
         -------
         Measurements : Measurements object.
         """
         return self.measurements
 
+    def _get_processes(self) -> List[psutil.Process]:
+        """
+        Returns the observed processes.
+
+        Returns
+        -------
+        List[psutil.Process] : observed process and optionally its children
+        """
+        processes = [self.process]
+        if self.include_children:
+            try:
+                processes += self.process.children(recursive=True)
+            except psutil.Error:
+                pass
+        return processes
+
+    def _sample_process(self) -> Dict[str, float]:
+        """
+        Collects resource usage of the observed processes.
+
+        Returns
+        -------
+        Dict[str, float] : statistics summed over observed processes
+        """
+        stats = {}
+
+        def add(name: str, value: float):
+            stats[name] = stats.get(name, 0) + value
+
+        for process in self._get_processes():
+            try:
+                with process.oneshot():
+                    add('rss', process.memory_info().rss)
+                    try:
+                        add('uss', process.memory_full_info().uss)
+                    except (psutil.AccessDenied, AttributeError):
+                        pass
+                    cputimes = process.cpu_times()
+                    add('cpu_user', cputimes.user)
+                    add('cpu_system', cputimes.system)
+                    add('threads', process.num_threads())
+                    ctxswitches = process.num_ctx_switches()
+                    add('ctx_switches_voluntary', ctxswitches.voluntary)
+                    add('ctx_switches_involuntary', ctxswitches.involuntary)
+                    try:
+                        iocounters = process.io_counters()
+                        add('read_bytes', iocounters.read_bytes)
+                        add('write_bytes', iocounters.write_bytes)
+                    except (psutil.AccessDenied, AttributeError):
+                        pass
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                # child processes can finish during sampling
+                continue
+            procstats = _read_proc_stats(process.pid)
+            for name in ('page_faults_minor', 'page_faults_major'):
+                if name in procstats:
+                    add(name, procstats[name])
+            if process.pid == self.process.pid and 'peak_rss' in procstats:
+                stats['peak_rss'] = procstats['peak_rss']
+        return stats
+
     def run(self):
         self.measurements = Measurements()
         self.running = True
         tegrastatsoutputfd = None
+        processkeys = None
+        peakrss = 0
+        lastcputime = None
+        lasttimestamp = None
+        lastenergy = None
         try:
             tegrastats = which('tegrastats')
             if tegrastats is not None:
@@ -382,13 +1449,84 @@ class SystemStatsCollector(Thread):
                     stdout=tegrastatsoutputfd
                 )
             while self.running:
+                samplestart = time.perf_counter()
                 cpus = psutil.cpu_percent(interval=0, percpu=True)
                 mem = psutil.virtual_memory()
-                self.measurements += {
-                    f'{self.prefix}_cpus_percent': [cpus],
-                    f'{self.prefix}_mem_percent': [mem.percent],
-                    f'{self.prefix}_timestamp': [time.perf_counter()],
-                }
+                procstats = self._sample_process()
+                energy = None
+                if self.power_sampler is not None:
+                    energy = self.power_sampler.read_energy()
+                timestamp = time.perf_counter()
+                self.measurements.append(f'{self.prefix}_cpus_percent', cpus)
+                self.measurements.append(
+                    f'{self.prefix}_mem_percent',
+                    mem.percent
+                )
+                self.measurements.append(
+                    f'{self.prefix}_timestamp',
+                    timestamp
+                )
+                # statistics available in the first sample are collected
+                # for the whole session, so all series have equal lengths
+                if processkeys is None:
+                    processkeys = [k for k in procstats if k != 'peak_rss']
+                peakrss = max(
+                    peakrss,
+                    procstats.get('rss', 0),
+                    procstats.get('peak_rss', 0)
+                )
+                procstats['peak_rss'] = peakrss
+                cputime = (
+                    procstats.get('cpu_user', 0) +
+                    procstats.get('cpu_system', 0)
+                )
+                cpupercent = 0.0
+                if lastcputime is not None and timestamp > lasttimestamp:
+                    cpupercent = 100.0 * max(cputime - lastcputime, 0) / (
+                        timestamp - lasttimestamp
+                    )
+                if energy is not None:
+                    for domain, value in energy.items():
+                        self.measurements.append(
+                            f'{self.prefix}_energy/{domain}',
+                            value
+                        )
+                    if lastenergy is not None and timestamp > lasttimestamp:
+                        TraceCollector.add_counter(
+                            f'{self.prefix}_power',
+                            {
+                                domain: (value - lastenergy[domain]) / (
+                                    timestamp - lasttimestamp
+                                )
+                                for domain, value in energy.items()
+                            },
+                            timestamp,
+                            'system_stats'
+                        )
+                    lastenergy = energy
+                lastcputime, lasttimestamp = cputime, timestamp
+                procstats['cpu_percent'] = cpupercent
+                for name in processkeys + ['peak_rss', 'cpu_percent']:
+                    self.measurements.append(
+                        f'{self.prefix}_process_{name}',
+                        procstats.get(name, np.nan)
+                    )
+                TraceCollector.add_counter(
+                    f'{self.prefix}_utilization',
+                    {
+                        'cpus_percent_avg': sum(cpus) / max(len(cpus), 1),
+                        'mem_percent': mem.percent,
+                        'process_cpu_percent': cpupercent
+                    },
+                    timestamp,
+                    'system_stats'
+                )
+                TraceCollector.add_counter(
+                    f'{self.prefix}_process_memory',
+                    {'rss': procstats.get('rss', 0)},
+                    timestamp,
+                    'system_stats'
+                )
                 if self.nvidia_smi is not None:
                     gpu = self.nvidia_smi.DeviceQuery(
                         'memory.free, memory.total, utilization.gpu'
@@ -406,6 +1544,10 @@ class SystemStatsCollector(Thread):
                         ],
                         f'{self.prefix}_gpu_timestamp': [time.perf_counter()],
                     }
+                self.measurements.append(
+                    f'{self.prefix}_sampling_overhead',
+                    time.perf_counter() - samplestart
+                )
                 with self.runningcondition:
                     self.runningcondition.wait(timeout=self.step)
             if tegrastats:
@@ -518,6 +1660,8 @@ def systemstatsmeasurements(measurementname: str, step: float = 0.5):
     def statistics_decorator(function):
         @wraps(function)
         def statistics_wrapper(*args):
+            if _instrumentation_level is not InstrumentationLevel.FULL:
+                return function(*args)
             with (SystemStatsCollector(measurementname, step)
                     as measurementsthread):
                 returnvalue = function(*args)
@@ -526,3 +1670,156 @@ def systemstatsmeasurements(measurementname: str, step: float = 0.5):
             return returnvalue
         return statistics_wrapper
     return statistics_decorator
+
+
+# Memory stages entered and not exited yet, the innermost is the last one
+_active_memory_stages: List['MemoryStage'] = []
+
+
+def set_python_allocations_tracking(enabled: bool):
+    """
+    Enables or disables tracking of Python allocations in memory stages.
+
+    Tracking is based on the tracemalloc module, which slows down memory
+    allocations, so it is disabled by default.
+
+    Parameters
+    ----------
+    enabled : bool
+        True if peaks of Python allocations should be recorded
+    """
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Resets the peak RSS (VmHWM) of the current process.
+
+    Returns
+    -------
+    bool : True if the peak was reset, False if it is not supported
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clearrefs:
+            clearrefs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class MemoryStage(object):
+    """
+    Context manager recording memory usage of a stage of the pipeline.
+
+    On entry of the outermost stage, the peak RSS of the process (VmHWM) is
+    reset, so the peak read on exit is the peak of the stage. Nested stages
+    do not reset the peak, so peaks of enclosing stages are kept - the peak
+    of the nested stage is known only if it exceeds the peak read on its
+    entry, otherwise the higher of RSS values on entry and exit is used.
+    The same applies to all stages if the peak cannot be reset.
+
+    If Python allocations are tracked (check
+    set_python_allocations_tracking), the peak of memory allocated by
+    Python is recorded in the same way.
+
+    The record is appended to the `memory_stages` list in
+    MeasurementsCollector.measurements. It contains the name of the stage,
+    its start and end timestamps, RSS on entry and exit, peak RSS and its
+    increase over RSS on entry (in bytes). Stages are recorded only with
+    the FULL instrumentation level.
+    """
+
+    def __init__(self, stagename: str):
+        """
+        Creates the stage.
+
+        Parameters
+        ----------
+        stagename : str
+            The name of the stage
+        """
+        self.stagename = stagename
+        self.active = False
+
+    def __enter__(self) -> 'MemoryStage':
+        if _instrumentation_level is not InstrumentationLevel.FULL:
+            return self
+        self.active = True
+        self.initialpeak = _read_proc_stats('self').get('peak_rss')
+        self.tracing = tracemalloc.is_tracing()
+        pythonmemory = tracemalloc.get_traced_memory() \
+            if self.tracing else (0, 0)
+        # resetting peaks in nested stages would discard peaks of enclosing
+        # stages
+        outermost = len(_active_memory_stages) == 0
+        self.resetpeak = outermost and _reset_peak_rss()
+        self.resetpythonpeak = outermost and self.tracing
+        if self.resetpythonpeak:
+            tracemalloc.reset_peak()
+        self.pythonstart = pythonmemory[0]
+        self.initialpythonpeak = pythonmemory[1]
+        self.rssstart = psutil.Process().memory_info().rss
+        self.start = time.perf_counter()
+        _active_memory_stages.append(self)
+        return self
+
+    def __exit__(
+            self,
+            exc_type: Optional[Type[BaseException]],
+            exc_value: Optional[BaseException],
+            traceback: Optional[TracebackType]):
+        if not self.active:
+            return
+        self.active = False
+        end = time.perf_counter()
+        _active_memory_stages.remove(self)
+        rssend = psutil.Process().memory_info().rss
+        peak = _read_proc_stats('self').get('peak_rss')
+        if peak is not None and (
+                self.resetpeak or peak > (self.initialpeak or 0)):
+            peakrss = peak
+        else:
+            peakrss = max(self.rssstart, rssend)
+        record = {
+            'name': self.stagename,
+            'start': self.start,
+            'end': end,
+            'rss_start': self.rssstart,
+            'rss_end': rssend,
+            'peak_rss': peakrss,
+            'peak_rss_delta': peakrss - self.rssstart
+        }
+        if self.tracing and tracemalloc.is_tracing():
+            pythoncurrent, pythonpeak = tracemalloc.get_traced_memory()
+            if not self.resetpythonpeak and \
+                    pythonpeak <= self.initialpythonpeak:
+                pythonpeak = max(self.pythonstart, pythoncurrent)
+            record['python_peak'] = pythonpeak
+            record['python_peak_delta'] = pythonpeak - self.pythonstart
+        MeasurementsCollector.measurements.append('memory_stages', record)
+
+
+def memorymeasurements(stagename: str):
+    """
+    Decorator for recording peak memory usage of the function.
+
+    Check MemoryStage for description of recorded values.
+
+    Parameters
+    ----------
+    stagename : str
+        The name of the stage
+    """
+
+    def statistics_decorator(function):
+        @wraps(function)
+        def statistics_wrapper(*args):
+            if _instrumentation_level is not InstrumentationLevel.FULL:
+                return function(*args)
+            with MemoryStage(stagename):
+                return function(*args)
+        return statistics_wrapper
+    return statistics_decorator
@@ -2,14 +2,31 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
+from scipy import stats
 
 from kenning.utils import logger
 
 log = logger.get_logger()
 EPS = 1e-8
+MB = 1024 * 1024
+
+# Cumulative counters of the process statistics from SystemStatsCollector
+PROCESS_COUNTERS = [
+    'cpu_user',
+    'cpu_system',
+    'ctx_switches_voluntary',
+    'ctx_switches_involuntary',
+    'page_faults_minor',
+    'page_faults_major',
+    'read_bytes',
+    'write_bytes',
+]
+
+# Percentiles of latency reported as <name>_p<percentile>
+LATENCY_PERCENTILES = [50, 90, 95, 99, 99.9]
 
 
 def accuracy(confusion_matrix: Union[List[List[int]], np.ndarray]):
@@ -69,6 +86,112 @@ def g_mean(confusion_matrix: Union[List[List[int]], np.ndarray]):
     ), 1.0 / np.array(confusion_matrix).shape[0])
 
 
+def compute_span_energy(
+        timestamps: np.ndarray,
+        energy: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray) -> np.ndarray:
+    """
+    Computes energy consumed within given time spans.
+
+    Cumulative energy readings are linearly interpolated at span boundaries,
+    so for spans shorter than the sampling interval the energy is computed
+    from the average power between surrounding readings.
+
+    Parameters
+    ----------
+    timestamps : np.ndarray
+        Timestamps of energy readings
+    energy : np.ndarray
+        Cumulative energy readings, in joules
+    starts : np.ndarray
+        Start timestamps of spans
+    ends : np.ndarray
+        End timestamps of spans
+
+    Returns
+    -------
+    np.ndarray : energy consumed within every span, in joules
+    """
+    return np.interp(ends, timestamps, energy) - \
+        np.interp(starts, timestamps, energy)
+
+
+def compute_latency_metrics(
+        metric_name: str,
+        latencies: Union[List[float], np.ndarray],
+        timestamps: Optional[Union[List[float], np.ndarray]] = None,
+        confidence: float = 0.95) -> Dict[str, float]:
+    """
+    Computes tail latency, jitter and throughput statistics.
+
+    Computes:
+
+    * percentiles from LATENCY_PERCENTILES as
+      `<metric_name>_p<percentile>`, with dots replaced with underscores
+      (i.e. `inferencetime_p99_9`),
+    * minimum and maximum as `<metric_name>_<min|max>`,
+    * confidence interval of the mean, based on Student's t-distribution,
+      as `<metric_name>_mean_ci_<low|high>`.
+
+    If timestamps of the ends of measured operations are provided, it also
+    computes:
+
+    * mean time between ends of consecutive operations as
+      `<metric_name>_interarrival_mean`,
+    * jitter, as standard deviation of times between consecutive operations,
+      as `<metric_name>_jitter`,
+    * achieved throughput, in operations per second, as
+      `<metric_name>_throughput`.
+
+    Parameters
+    ----------
+    metric_name : str
+        Prefix of names of computed metrics
+    latencies : Union[List[float], np.ndarray]
+        Durations of operations, in seconds
+    timestamps : Optional[Union[List[float], np.ndarray]]
+        Timestamps of the ends of operations, in seconds
+    confidence : float
+        Confidence level of the interval for the mean
+
+    Returns
+    -------
+    Dict[str, float] :
+        Computed metrics, empty if there are no latencies
+    """
+    latencies = np.asarray(latencies, dtype=np.float64)
+    if len(latencies) == 0:
+        return {}
+    metrics = {}
+    percentiles = np.percentile(latencies, LATENCY_PERCENTILES)
+    for percentile, value in zip(LATENCY_PERCENTILES, percentiles):
+        percentilename = f'{percentile:g}'.replace('.', '_')
+        metrics[f'{metric_name}_p{percentilename}'] = value
+    metrics[f'{metric_name}_min'] = np.min(latencies)
+    metrics[f'{metric_name}_max'] = np.max(latencies)
+
+    if len(latencies) > 1:
+        mean = np.mean(latencies)
+        margin = stats.t.ppf((1 + confidence) / 2, len(latencies) - 1) * \
+            np.std(latencies, ddof=1) / np.sqrt(len(latencies))
+        metrics[f'{metric_name}_mean_ci_low'] = mean - margin
+        metrics[f'{metric_name}_mean_ci_high'] = mean + margin
+
+    if timestamps is None or len(timestamps) != len(latencies):
+        return metrics
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if len(timestamps) > 1:
+        interarrival = np.diff(timestamps)
+        metrics[f'{metric_name}_interarrival_mean'] = np.mean(interarrival)
+        metrics[f'{metric_name}_jitter'] = np.std(interarrival)
+    # the first operation starts before its end timestamp
+    duration = timestamps[-1] - (timestamps[0] - latencies[0])
+    if duration > 0:
+        metrics[f'{metric_name}_throughput'] = len(latencies) / duration
+    return metrics
+
+
 def compute_performance_metrics(measurementsdata: Dict[str, List]) -> Dict:
     """
     Computes performance metrics based on `measurementsdata` argument.
@@ -88,6 +211,48 @@ def compute_performance_metrics(measurementsdata: Dict[str, List]) -> Dict:
     as `inferencetime_first` and average utilization
     of all cpus used as `session_utilization_cpus_percent_avg` key.
 
+    For inference time it also computes percentiles, extreme values,
+    confidence interval of the mean, jitter and throughput (see
+    compute_latency_metrics). If the number of processed samples is
+    available (`total`), the throughput in samples per second is stored
+    as `inferencetime_samples_throughput`.
+
+    For the statistics of the runtime process it computes:
+
+    * mean, standard deviation and median of RSS in MB
+      (`session_utilization_process_rss_mb`) and of CPU utilization
+      (`session_utilization_process_cpu_percent`),
+    * peak RSS in MB as `session_utilization_process_peak_rss_mb`,
+    * increase of cumulative counters (CPU times, context switches, page
+      faults, I/O bytes) during the session as
+      `session_utilization_process_<counter>_total`,
+    * mean, standard deviation and median of the time spent on sampling, and
+      its percentage of the session time as
+      `session_utilization_sampling_overhead_percent`.
+
+    For every stage with recorded memory usage (`memory_stages`) it
+    computes the number of its executions as `memory_stage_count/<stage>`
+    and maximum values over executions, in MB, of:
+
+    * peak RSS as `memory_stage_peak_rss_mb/<stage>`,
+    * increase of peak RSS over RSS at the start of the stage as
+      `memory_stage_peak_rss_delta_mb/<stage>`,
+    * increase of peak Python allocations, if tracked, as
+      `memory_stage_python_peak_delta_mb/<stage>`.
+
+    For every power domain with energy readings
+    (`session_utilization_energy/<domain>`) it computes:
+
+    * consumed energy as `session_utilization_energy_total/<domain>`,
+    * mean power as `session_utilization_power_mean/<domain>`,
+    * power between readings as `session_utilization_power/<domain>`, with
+      timestamps in `session_utilization_power_timestamp`,
+    * energy per inference as
+      `session_utilization_energy_per_inference/<domain>`, based on
+      `inference` tags,
+    * mean power during every tagged stage (i.e. preprocessing, inference)
+      as `session_utilization_power_<stage>/<domain>`.
+
     Parameters
     ----------
     measurementsdata : Dict[str, List]
@@ -112,7 +277,7 @@ def compute_performance_metrics(measurementsdata: Dict[str, List]) -> Dict:
             Values that are used to evaluate the metric
             If it is none then `measurementsdata[metric_name]` is used.
         """
-        if not metric_value:
+        if metric_value is None:
             metric_value = measurementsdata[metric_name]
         operations = {
             'mean': np.mean,
@@ -131,6 +296,17 @@ def compute_performance_metrics(measurementsdata: Dict[str, List]) -> Dict:
 
     if inference_step:
         compute_metrics('inferencetime', measurementsdata[inference_step])
+        computed_metrics |= compute_latency_metrics(
+            'inferencetime',
+            measurementsdata[inference_step],
+            measurementsdata.get(f'{inference_step}_timestamp')
+        )
+        total = measurementsdata.get('total')
+        if ('inferencetime_throughput' in computed_metrics and
+                isinstance(total, (int, float, np.number))):
+            computed_metrics['inferencetime_samples_throughput'] = \
+                computed_metrics['inferencetime_throughput'] * total / \
+                len(measurementsdata[inference_step])
 
     # mem_percent
     if 'session_utilization_mem_percent' in measurementsdata:
@@ -156,6 +332,113 @@ def compute_performance_metrics(measurementsdata: Dict[str, List]) -> Dict:
     if 'session_utilization_gpu_utilization' in measurementsdata:
         compute_metrics('session_utilization_gpu_utilization')
 
+    # process memory
+    if len(measurementsdata.get('session_utilization_process_rss', [])) > 0:
+        rss_mb = np.asarray(
+            measurementsdata['session_utilization_process_rss'],
+            dtype=np.float64
+        ) / MB
+        computed_metrics['session_utilization_process_rss_mb'] = rss_mb
+        compute_metrics('session_utilization_process_rss_mb', rss_mb)
+        peak_rss = np.nanmax(measurementsdata.get(
+            'session_utilization_process_peak_rss',
+            rss_mb * MB
+        ))
+        # memory stages reset the peak RSS, so their peaks are included
+        timestamps = measurementsdata.get('session_utilization_timestamp', [])
+        if len(timestamps) > 0:
+            stagepeaks = [
+                stage['peak_rss']
+                for stage in measurementsdata.get('memory_stages', [])
+                if stage['end'] >= timestamps[0] and
+                stage['start'] <= timestamps[-1]
+            ]
+            peak_rss = max([peak_rss] + stagepeaks)
+        computed_metrics['session_utilization_process_peak_rss_mb'] = \
+            peak_rss / MB
+
+    # process cpu
+    if 'session_utilization_process_cpu_percent' in measurementsdata:
+        compute_metrics('session_utilization_process_cpu_percent')
+
+    # process counters
+    for counter in PROCESS_COUNTERS:
+        values = measurementsdata.get(f'session_utilization_process_{counter}')
+        if values is not None and len(values) > 0:
+            computed_metrics[f'session_utilization_process_{counter}_total'] = values[-1] - values[0]  # noqa: E501
+
+    # sampling overhead
+    if len(measurementsdata.get('session_utilization_sampling_overhead', [])) > 0:  # noqa: E501
+        compute_metrics('session_utilization_sampling_overhead')
+        timestamps = measurementsdata['session_utilization_timestamp']
+        duration = timestamps[-1] - timestamps[0]
+        if duration > 0:
+            computed_metrics['session_utilization_sampling_overhead_percent'] = 100.0 * np.sum(  # noqa: E501
+                measurementsdata['session_utilization_sampling_overhead'][:-1]
+            ) / duration
+
+    # memory stages
+    memorystages = {}
+    for stage in measurementsdata.get('memory_stages', []):
+        memorystages.setdefault(stage['name'], []).append(stage)
+    for stage, records in memorystages.items():
+        computed_metrics[f'memory_stage_count/{stage}'] = len(records)
+        for key in ('peak_rss', 'peak_rss_delta', 'python_peak_delta'):
+            values = [record[key] for record in records if key in record]
+            if len(values) > 0:
+                computed_metrics[f'memory_stage_{key}_mb/{stage}'] = \
+                    np.max(values) / MB
+
+    # energy
+    energyprefix = 'session_utilization_energy/'
+    energykeys = [
+        key for key in measurementsdata.keys() if key.startswith(energyprefix)
+    ]
+    timestamps = np.asarray(
+        measurementsdata.get('session_utilization_timestamp', []),
+        dtype=np.float64
+    )
+    tags = measurementsdata.get('tags', [])
+    stages = {}
+    for tag in tags:
+        stages.setdefault(tag['name'], []).append((tag['start'], tag['end']))
+    for key in energykeys:
+        domain = key[len(energyprefix):]
+        energy = np.asarray(measurementsdata[key], dtype=np.float64)
+        if len(energy) < 2 or len(energy) != len(timestamps):
+            continue
+        duration = timestamps[-1] - timestamps[0]
+        total = energy[-1] - energy[0]
+        computed_metrics[f'session_utilization_energy_total/{domain}'] = total
+        if duration <= 0:
+            continue
+        computed_metrics[f'session_utilization_power_mean/{domain}'] = \
+            total / duration
+        computed_metrics[f'session_utilization_power/{domain}'] = \
+            np.diff(energy) / np.maximum(np.diff(timestamps), EPS)
+        computed_metrics['session_utilization_power_timestamp'] = \
+            timestamps[1:]
+        for stage, spans in stages.items():
+            spans = np.asarray(spans, dtype=np.float64)
+            # only spans covered by energy readings are taken into account
+            spans = spans[
+                (spans[:, 0] >= timestamps[0]) &
+                (spans[:, 1] <= timestamps[-1])
+            ]
+            if len(spans) == 0:
+                continue
+            spanenergy = compute_span_energy(
+                timestamps,
+                energy,
+                spans[:, 0],
+                spans[:, 1]
+            )
+            spanduration = np.sum(spans[:, 1] - spans[:, 0])
+            if spanduration > 0:
+                computed_metrics[f'session_utilization_power_{stage}/{domain}'] = np.sum(spanenergy) / spanduration  # noqa: E501
+            if stage == 'inference':
+                computed_metrics[f'session_utilization_energy_per_inference/{domain}'] = np.mean(spanenergy)  # noqa: E501
+
     return computed_metrics
 
 
@@ -181,7 +464,8 @@ def compute_classification_metrics(measurementsdata: Dict[str, List]) -> Dict:
     # If confusion matrix is not present in the measurementsdata, then
     # classification metrics can not be calculated.
     if 'eval_confusion_matrix' in measurementsdata:
-        confusion_matrix = np.asarray(
+        # copy, the matrix can be a read-only memory-mapped array
+        confusion_matrix = np.array(
             measurementsdata['eval_confusion_matrix'])
         confusion_matrix[np.isnan(confusion_matrix)] = 0.
         return {
@@ -195,32 +479,80 @@ def compute_classification_metrics(measurementsdata: Dict[str, List]) -> Dict:
     return {}
 
 
-def compute_detection_metrics(measurementsdata: Dict[str, List]) -> Dict:
+def compute_detection_metrics(
+        measurementsdata: Dict[str, List],
+        detectionmetrics: Optional[Any] = None) -> Dict:
     """
     Computes detection metrics based on `measurementsdata` argument.
     If there is no detection metrics returns an empty dictionary.
 
-    Computes mAP values.
+    Computes mAP values - for IoU threshold 0.5 (``mAP``) and, if
+    measurements contain results for multiple IoU thresholds, averaged over
+    IoU thresholds 0.50:0.95 (``mAP_50_95``), also for small, medium and
+    large objects, if their areas are available. Area ranges without ground
+    truths are skipped.
 
     Parameters
     ----------
     measurementsdata : Dict[str, List]
         Statistics from the Measurements class
+    detectionmetrics : Optional[Any]
+        DetectionMetrics object created from `measurementsdata`, created if
+        not provided
 
     Returns
     -------
     Dict :
         Gathered computed metrics
     """
-    from kenning.datasets.helpers.detection_and_segmentation import \
-        compute_map_per_threshold
+    from kenning.datasets.helpers.detection_metrics import DetectionMetrics
 
     # If ground truths count is not present in the measurementsdata, then
     # mAP metric can not be calculated.
     if any(
             [key.startswith('eval_gtcount') for key in measurementsdata.keys()]
     ):
+        if detectionmetrics is None:
+            detectionmetrics = DetectionMetrics(measurementsdata)
+        metrics = {
+            'mAP': detectionmetrics.map_per_threshold([0.0])[0]
+        }
+        if len(detectionmetrics.iou_thresholds) > 1:
+            metrics['mAP_50_95'] = detectionmetrics.mean_average_precision()
+        if detectionmetrics.has_areas:
+            for arearange in ['small', 'medium', 'large']:
+                rangemap = detectionmetrics.mean_average_precision(
+                    arearange=arearange
+                )
+                if rangemap is not None:
+                    metrics[f'mAP_{arearange}'] = rangemap
+        return metrics
+    return {}
+
+
+def compute_speech_metrics(measurementsdata: Dict[str, List]) -> Dict:
+    """
+    Computes speech-to-text metrics based on `measurementsdata` argument.
+    If there is no speech-to-text metrics returns an empty dictionary.
+
+    Computes character and word error rates (``CER``, ``WER``) from errors
+    and lengths of ground truths accumulated for all transcripts.
+
+    Parameters
+    ----------
+    measurementsdata : Dict[str, List]
+        Statistics from the Measurements class
+
+    Returns
+    -------
+    Dict :
+        Gathered computed metrics
+    """
+    if 'eval_stt_chars' in measurementsdata:
         return {
-            'mAP': compute_map_per_threshold(measurementsdata, [0.0])[0]
+            'CER': measurementsdata['eval_stt_char_errors'] /
+            max(measurementsdata['eval_stt_chars'], 1),
+            'WER': measurementsdata['eval_stt_word_errors'] /
+            max(measurementsdata['eval_stt_words'], 1)
         }
     return {}
@@ -17,6 +17,7 @@ from kenning.core.measurements import Measurements
 from kenning.core.measurements import MeasurementsCollector
 from kenning.core.measurements import timemeasurements
 from kenning.core.measurements import systemstatsmeasurements
+from kenning.core.measurements import MemoryStage
 from kenning.interfaces.io_interface import IOInterface
 from kenning.utils.args_manager import add_parameterschema_argument, add_argparse_argument, get_parsed_json_dict  # noqa: E501
 
@@ -368,11 +369,12 @@ class ModelWrapper(IOInterface):
 
         measurements = Measurements()
 
-        for X, y in tqdm(iter(self.dataset)):
-            prepX = self._preprocess_input(X)
-            preds = self._run_inference(prepX)
-            posty = self._postprocess_outputs(preds)
-            measurements += self.dataset.evaluate(posty, y)
+        with MemoryStage('inference_loop'):
+            for X, y in tqdm(iter(self.dataset)):
+                prepX = self._preprocess_input(X)
+                preds = self._run_inference(prepX)
+                posty = self._postprocess_outputs(preds)
+                measurements += self.dataset.evaluate(posty, y)
 
         MeasurementsCollector.measurements += measurements
 
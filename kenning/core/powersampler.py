@@ -0,0 +1,42 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Provides an API for reading energy consumption of the device.
+"""
+
+from typing import Dict, List
+
+
+class PowerSampler(object):
+    """
+    Source of energy readings used by SystemStatsCollector.
+
+    The device can provide several power domains (i.e. CPU package, DRAM,
+    whole board). For every domain the sampler returns the energy consumed
+    since the sampler was created, so readings from different sources
+    (energy counters, power meters) can be processed in the same way.
+    """
+
+    def get_domains(self) -> List[str]:
+        """
+        Returns names of the measured power domains.
+
+        Returns
+        -------
+        List[str] : names of the domains
+        """
+        raise NotImplementedError
+
+    def read_energy(self) -> Dict[str, float]:
+        """
+        Reads energy consumed by every power domain.
+
+        Returns
+        -------
+        Dict[str, float] :
+            Energy in joules consumed since the creation of the sampler, for
+            every domain
+        """
+        raise NotImplementedError
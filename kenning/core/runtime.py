@@ -10,8 +10,13 @@ Runtimes implement running and testing deployed models on target devices.
 
 import argparse
 from pathlib import Path
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterable, Generator
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import copy
 import json
+import mmap
+import queue
 import numpy as np
 
 from kenning.core.dataset import Dataset
@@ -28,6 +33,13 @@ from kenning.core.measurements import tagmeasurements
 from kenning.core.measurements import SystemStatsCollector
 from kenning.utils.logger import get_logger
 from kenning.core.measurements import systemstatsmeasurements
+from kenning.core.measurements import InstrumentationLevel
+from kenning.core.measurements import get_instrumentation_level
+from kenning.core.measurements import set_instrumentation_level
+from kenning.core.measurements import MemoryStage
+from kenning.core.measurements import memorymeasurements
+from kenning.core.tracing import TraceCollector
+from kenning.utils.atomic_file import replace_file
 from kenning.utils.args_manager import add_parameterschema_argument, add_argparse_argument, get_parsed_json_dict  # noqa: E501
 
 
@@ -72,13 +84,27 @@ class Runtime(object):
             'description': 'Disable collection and processing of performance metrics',  # noqa: E501
             'type': bool,
             'default': True
+        },
+        'stats_sampling_interval': {
+            'argparse_name': '--stats-sampling-interval',
+            'description': 'Interval between samples of resource usage, in seconds',  # noqa: E501
+            'type': float,
+            'default': 0.1
+        },
+        'stats_include_children': {
+            'argparse_name': '--stats-include-children',
+            'description': 'Include child processes in the resource usage of the runtime process',  # noqa: E501
+            'type': bool,
+            'default': False
         }
     }
 
     def __init__(
             self,
             protocol: RuntimeProtocol,
-            collect_performance_data: bool = True):
+            collect_performance_data: bool = True,
+            stats_sampling_interval: float = 0.1,
+            stats_include_children: bool = False):
         """
         Creates Runtime object.
 
@@ -88,6 +114,11 @@ class Runtime(object):
             The implementation of the host-target communication  protocol
         collect_performance_data : bool
             Disable collection and processing of performance metrics
+        stats_sampling_interval : float
+            Interval between samples of resource usage, in seconds
+        stats_include_children : bool
+            Include child processes in the resource usage of the runtime
+            process
         """
         self.protocol = protocol
         self.shouldwork = True
@@ -100,8 +131,11 @@ class Runtime(object):
             MessageType.IOSPEC: self._prepare_io_specification
         }
         self.statsmeasurements = None
+        self._previous_instrumentation_level = None
         self.log = get_logger()
         self.collect_performance_data = collect_performance_data
+        self.stats_sampling_interval = stats_sampling_interval
+        self.stats_include_children = stats_include_children
 
         self.input_spec = None
         self.output_spec = None
@@ -165,7 +199,9 @@ class Runtime(object):
         """
         return cls(
             protocol,
-            args.disable_performance_measurements
+            args.disable_performance_measurements,
+            args.stats_sampling_interval,
+            args.stats_include_children
         )
 
     @classmethod
@@ -252,12 +288,22 @@ class Runtime(object):
 
         This method should be called once the client has connected to a server.
 
-        This will enable performance tracking.
+        This will enable performance tracking. If collection of performance
+        data is disabled, the instrumentation level is set to OFF until the
+        end of the session.
         """
-        if self.collect_performance_data:
+        if (not self.collect_performance_data and
+                self._previous_instrumentation_level is None):
+            self._previous_instrumentation_level = set_instrumentation_level(
+                InstrumentationLevel.OFF
+            )
+        if (self.collect_performance_data and
+                get_instrumentation_level() is InstrumentationLevel.FULL):
             if self.statsmeasurements is None:
                 self.statsmeasurements = SystemStatsCollector(
-                    'session_utilization'
+                    'session_utilization',
+                    self.stats_sampling_interval,
+                    include_children=self.stats_include_children
                 )
             self.statsmeasurements.start()
         else:
@@ -278,6 +324,9 @@ class Runtime(object):
             MeasurementsCollector.measurements += \
                 self.statsmeasurements.get_measurements()
             self.statsmeasurements = None
+        if self._previous_instrumentation_level is not None:
+            set_instrumentation_level(self._previous_instrumentation_level)
+            self._previous_instrumentation_level = None
 
     def close_server(self):
         """
@@ -340,7 +389,14 @@ class Runtime(object):
         bool : True if succeded
         """
         self.inference_session_start()
-        ret = self.prepare_model(input_data)
+        if input_data:
+            # the uploaded model is flushed to disk first so the runtime can
+            # map it from the file instead of keeping a second copy in RAM
+            self.save_model_data(input_data)
+            input_data = None
+        ret = memorymeasurements('model_loading')(self.prepare_model)(
+            input_data
+        )
         if ret:
             self.protocol.request_success()
         else:
@@ -370,6 +426,56 @@ class Runtime(object):
         """
         raise NotImplementedError
 
+    def save_model_data(
+            self,
+            input_data: bytes,
+            modelpath: Optional[Path] = None):
+        """
+        Saves the model received from the client to the file.
+
+        The model is written to a temporary file in the same directory and
+        moved over the previous file. The previous file is replaced, not
+        truncated, so existing memory mappings of it (check
+        ``map_model_file``) remain valid until they are closed.
+
+        Parameters
+        ----------
+        input_data : bytes
+            Model data delivered by the client
+        modelpath : Optional[Path]
+            Path where the model should be saved, by default the ``modelpath``
+            of the runtime is used
+        """
+        if modelpath is None:
+            modelpath = self.modelpath
+        replace_file(modelpath, lambda outmodel: outmodel.write(input_data))
+
+    def map_model_file(self, modelpath: Optional[Path] = None) -> mmap.mmap:
+        """
+        Memory-maps the model file in read-only mode.
+
+        Mapped pages are backed by the file, so the model data is loaded
+        lazily and can be evicted by the system instead of occupying the
+        process memory. The returned object implements the buffer protocol
+        and can be passed directly to backends accepting model buffers.
+
+        The mapping should be kept alive as long as the backend uses it.
+
+        Parameters
+        ----------
+        modelpath : Optional[Path]
+            Path to the model file, by default the ``modelpath`` of the
+            runtime is used
+
+        Returns
+        -------
+        mmap.mmap : read-only mapping of the model file
+        """
+        if modelpath is None:
+            modelpath = self.modelpath
+        with open(modelpath, 'rb') as modelfile:
+            return mmap.mmap(modelfile.fileno(), 0, access=mmap.ACCESS_READ)
+
     def _prepare_io_specification(
             self,
             input_data: Optional[bytes]) -> bool:
@@ -714,7 +820,7 @@ class Runtime(object):
         bytes : statistics to be sent to the client
         """
         self.log.debug('Uploading stats')
-        stats = json.dumps(MeasurementsCollector.measurements.data)
+        stats = json.dumps(MeasurementsCollector.measurements.to_dict())
         return stats.encode('utf-8')
 
     def upload_essentials(self, compiledmodelpath: Path):
@@ -743,8 +849,8 @@ class Runtime(object):
         -------
         bool: True if initialized successfully
         """
-        return (self.prepare_model(None) and
-                self.prepare_io_specification(None))
+        return (memorymeasurements('model_loading')(self.prepare_model)(None)
+                and self.prepare_io_specification(None))
 
     @systemstatsmeasurements('full_run_statistics')
     def run_locally(
@@ -770,27 +876,32 @@ class Runtime(object):
         """
         compiledmodelpath = Path(compiledmodelpath)
         from tqdm import tqdm
-        measurements = Measurements()
         try:
             self.inference_session_start()
             self.prepare_local()
-            for X, y in tqdm(iter(dataset)):
-                prepX = tagmeasurements("preprocessing")(modelwrapper._preprocess_input)(X)  # noqa: 501
-                prepX = modelwrapper.convert_input_to_bytes(prepX)
-                succeed = self.prepare_input(prepX)
-                if not succeed:
-                    return False
-                self._run()
-                outbytes = self.upload_output(None)
-                preds = modelwrapper.convert_output_from_bytes(outbytes)
-                posty = tagmeasurements("postprocessing")(modelwrapper._postprocess_outputs)(preds)  # noqa: 501
-                measurements += dataset.evaluate(posty, y)
+            with MemoryStage('inference_loop'):
+                for X, y in tqdm(iter(dataset)):
+                    prepX = tagmeasurements("preprocessing")(modelwrapper._preprocess_input)(X)  # noqa: 501
+                    prepX = modelwrapper.convert_input_to_bytes(prepX)
+                    succeed = self.prepare_input(prepX)
+                    if not succeed:
+                        return False
+                    self._run()
+                    outbytes = self.upload_output(None)
+                    preds = modelwrapper.convert_output_from_bytes(outbytes)
+                    posty = tagmeasurements("postprocessing")(modelwrapper._postprocess_outputs)(preds)  # noqa: 501
+                    # results are added for every batch, so they can be
+                    # streamed
+                    MeasurementsCollector.measurements += dataset.evaluate(
+                        posty,
+                        y
+                    )
         except KeyboardInterrupt:
             self.log.info("Stopping benchmark...")
             return False
         finally:
+            dataset.stop_prefetching()
             self.inference_session_end()
-            MeasurementsCollector.measurements += measurements
         return True
 
     def infer(
@@ -828,6 +939,67 @@ class Runtime(object):
 
         return preds
 
+    def prepare_session(self) -> bool:
+        """
+        Prepares a new execution context in a copy of the runtime.
+
+        The method is called on a shallow copy of the runtime with the loaded
+        model by ``create_session``. It should replace every attribute that
+        holds per-request state (inputs, outputs, executors) so that the
+        copy can run inference independently from the original runtime.
+
+        Backends that can share the loaded model between execution contexts
+        should override this method to reuse it. By default, the model is
+        loaded again from ``modelpath``.
+
+        Returns
+        -------
+        bool : True if succeded
+        """
+        return self.prepare_model(None)
+
+    def create_session(self) -> 'Runtime':
+        """
+        Creates an independent execution context over the loaded model.
+
+        The returned runtime shares the configuration and, where the backend
+        allows it, the loaded model with this runtime, but has its own
+        inference state, so both can run inference in separate threads.
+
+        Returns
+        -------
+        Runtime : runtime object with a separate execution context
+
+        Raises
+        ------
+        ModelNotPreparedError : Raised if the session could not be prepared
+        """
+        session = copy.copy(self)
+        session.statsmeasurements = None
+        if not session.prepare_session():
+            raise ModelNotPreparedError(
+                'Failed to prepare a new execution context'
+            )
+        return session
+
+    def create_session_pool(self, num_sessions: int) -> 'RuntimeSessionPool':
+        """
+        Creates a pool of execution contexts for concurrent inference.
+
+        The model has to be prepared (i.e. with ``prepare_local``) before the
+        pool is created. This runtime is used as one of the contexts.
+
+        Parameters
+        ----------
+        num_sessions : int
+            Number of execution contexts in the pool
+
+        Returns
+        -------
+        RuntimeSessionPool : pool of execution contexts
+        """
+        return RuntimeSessionPool(self, num_sessions)
+
     def run_client(
             self,
             dataset: Dataset,
@@ -869,21 +1041,28 @@ class Runtime(object):
         self.upload_essentials(compiledmodelpath)
         measurements = Measurements()
         try:
-            for X, y in tqdm(iter(dataset)):
-                prepX = tagmeasurements("preprocessing")(modelwrapper._preprocess_input)(X)  # noqa: 501
-                prepX = modelwrapper.convert_input_to_bytes(prepX)
-                check_request(self.protocol.upload_input(prepX), 'send input')
-                check_request(self.protocol.request_processing(), 'inference')
-                _, preds = check_request(
-                    self.protocol.download_output(),
-                    'receive output'
-                )
-                self.log.debug(
-                    f'Received output ({len(preds)} bytes)'
-                )
-                preds = modelwrapper.convert_output_from_bytes(preds)
-                posty = tagmeasurements("postprocessing")(modelwrapper._postprocess_outputs)(preds)  # noqa: 501
-                measurements += dataset.evaluate(posty, y)
+            with MemoryStage('inference_loop'):
+                for X, y in tqdm(iter(dataset)):
+                    prepX = tagmeasurements("preprocessing")(modelwrapper._preprocess_input)(X)  # noqa: 501
+                    prepX = modelwrapper.convert_input_to_bytes(prepX)
+                    check_request(
+                        self.protocol.upload_input(prepX),
+                        'send input'
+                    )
+                    check_request(
+                        self.protocol.request_processing(),
+                        'inference'
+                    )
+                    _, preds = check_request(
+                        self.protocol.download_output(),
+                        'receive output'
+                    )
+                    self.log.debug(
+                        f'Received output ({len(preds)} bytes)'
+                    )
+                    preds = modelwrapper.convert_output_from_bytes(preds)
+                    posty = tagmeasurements("postprocessing")(modelwrapper._postprocess_outputs)(preds)  # noqa: 501
+                    measurements += dataset.evaluate(posty, y)
 
             measurements += self.protocol.download_statistics()
         except RequestFailure as ex:
@@ -891,6 +1070,8 @@ class Runtime(object):
             return False
         else:
             MeasurementsCollector.measurements += measurements
+        finally:
+            dataset.stop_prefetching()
         self.protocol.disconnect()
         return True
 
@@ -915,10 +1096,128 @@ class Runtime(object):
                         self.log.error('Too many messages')
                         self.close_server()
                         self.shouldwork = False
-                    msgtype, content = self.protocol.parse_message(data[0])
-                    self.callbacks[msgtype](content)
+                    # the message is removed from the list so that only the
+                    # parsed content stays in memory during processing
+                    message = data.pop(0)
+                    msgtype, content = self.protocol.parse_message(message)
+                    del message
+                    if msgtype == MessageType.MODEL and content:
+                        # the model is saved before the callback, so that
+                        # the payload is released before the model is loaded
+                        self.save_model_data(content)
+                        content = None
+                    with TraceCollector.span(msgtype.name, 'protocol'):
+                        self.callbacks[msgtype](content)
                 elif status == ServerStatus.DATA_INVALID:
                     self.log.error('Invalid message received')
                     self.log.error('Client will be disconnected')
                     self.disconnect()
         self.protocol.disconnect()
+
+
+class RuntimeSessionPool(object):
+    """
+    Pool of independent execution contexts over one loaded model.
+
+    A single Runtime stores per-request state (inputs, outputs) and cannot
+    be used from multiple threads. The pool keeps a number of execution
+    contexts created with ``Runtime.create_session`` and dispatches each
+    inference request to a free one, so ``infer`` can be called from many
+    threads at once.
+    """
+    def __init__(self, runtime: Runtime, num_sessions: int):
+        """
+        Creates the pool of execution contexts.
+
+        Parameters
+        ----------
+        runtime : Runtime
+            Runtime with the prepared model, it is used as the first context
+        num_sessions : int
+            Number of execution contexts in the pool
+        """
+        assert num_sessions > 0
+        self.runtime = runtime
+        self.num_sessions = num_sessions
+        self.sessions = [runtime] + [
+            runtime.create_session() for _ in range(num_sessions - 1)
+        ]
+        self.freesessions = queue.Queue()
+        for session in self.sessions:
+            self.freesessions.put(session)
+
+    @contextmanager
+    def session(self) -> Generator[Runtime, None, None]:
+        """
+        Acquires a free execution context for the duration of the block.
+
+        The call blocks until one of the contexts is available.
+
+        Yields
+        ------
+        Runtime : execution context reserved for the caller
+        """
+        session = self.freesessions.get()
+        try:
+            yield session
+        finally:
+            self.freesessions.put(session)
+
+    def infer(
+            self,
+            X: np.ndarray,
+            modelwrapper: ModelWrapper,
+            postprocess: bool = True) -> Any:
+        """
+        Runs inference on a single batch using a free execution context.
+
+        The method is thread-safe.
+
+        Parameters
+        ----------
+        X : np.ndarray
+            Batch of data provided for inference
+        modelwrapper : ModelWrapper
+            Model that is executed on target hardware
+        postprocess : bool
+            Indicates if model output should be postprocessed
+
+        Returns
+        -------
+        Any :
+            obtained values
+        """
+        with self.session() as session:
+            return session.infer(X, modelwrapper, postprocess)
+
+    def infer_all(
+            self,
+            batches: Iterable[np.ndarray],
+            modelwrapper: ModelWrapper,
+            postprocess: bool = True) -> List[Any]:
+        """
+        Runs inference on all batches using all execution contexts.
+
+        Parameters
+        ----------
+        batches : Iterable[np.ndarray]
+            Batches of data provided for inference
+        modelwrapper : ModelWrapper
+            Model that is executed on target hardware
+        postprocess : bool
+            Indicates if model output should be postprocessed
+
+        Returns
+        -------
+        List[Any] :
+            obtained values, in the order of the batches
+        """
+        # workers store measurements in the scope of the calling thread
+        scope = MeasurementsCollector.current_scope()
+
+        def infer(X):
+            with scope:
+                return self.infer(X, modelwrapper, postprocess)
+
+        with ThreadPoolExecutor(max_workers=self.num_sessions) as executor:
+            return list(executor.map(infer, batches))
@@ -0,0 +1,412 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Module providing timeline tracing of the pipeline execution.
+
+Recorded spans and counters can be exported to the Chrome Trace Event
+format, which can be loaded in Perfetto or chrome://tracing.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+import json
+import os
+import threading
+import time
+
+# Event phases from the Chrome Trace Event format
+PHASE_COMPLETE = 'X'
+PHASE_COUNTER = 'C'
+PHASE_INSTANT = 'i'
+
+
+class TraceRecorder(object):
+    """
+    Records trace events in a bounded ring buffer.
+
+    Events are stored as tuples with timestamps from ``time.perf_counter``,
+    the same clock as used by Measurements. When the buffer is full, the
+    oldest events are dropped.
+
+    Spans are stored as complete events, nested spans from the same thread
+    are presented as a call stack by the trace viewers.
+    """
+    def __init__(self, capacity: int = 1000000):
+        """
+        Creates the recorder.
+
+        Parameters
+        ----------
+        capacity : int
+            Maximum number of stored events
+        """
+        self.events = deque(maxlen=capacity)
+        self.threadnames = {}
+
+    def _record(
+            self,
+            phase: str,
+            name: str,
+            category: str,
+            timestamp: float,
+            duration: float = 0.0,
+            args: Optional[Dict[str, Any]] = None):
+        """
+        Stores a single event.
+
+        Parameters
+        ----------
+        phase : str
+            Phase of the event in the Chrome Trace Event format
+        name : str
+            Name of the event
+        category : str
+            Category of the event
+        timestamp : float
+            Start of the event, in seconds
+        duration : float
+            Duration of the event, in seconds
+        args : Optional[Dict[str, Any]]
+            Additional arguments of the event
+        """
+        tid = threading.get_native_id()
+        if tid not in self.threadnames:
+            self.threadnames[tid] = threading.current_thread().name
+        self.events.append(
+            (phase, name, category, timestamp, duration, os.getpid(), tid,
+             args)
+        )
+
+    def add_span(
+            self,
+            name: str,
+            start: float,
+            end: float,
+            category: str = 'kenning',
+            args: Optional[Dict[str, Any]] = None):
+        """
+        Records a span that already finished.
+
+        Parameters
+        ----------
+        name : str
+            Name of the span
+        start : float
+            Start timestamp from ``time.perf_counter``
+        end : float
+            End timestamp from ``time.perf_counter``
+        category : str
+            Category of the span
+        args : Optional[Dict[str, Any]]
+            Additional arguments of the span
+        """
+        self._record(PHASE_COMPLETE, name, category, start, end - start, args)
+
+    def add_counter(
+            self,
+            name: str,
+            values: Dict[str, float],
+            timestamp: Optional[float] = None,
+            category: str = 'kenning'):
+        """
+        Records values of a counter, i.e. resource utilization.
+
+        Parameters
+        ----------
+        name : str
+            Name of the counter
+        values : Dict[str, float]
+            Values of the counter series
+        timestamp : Optional[float]
+            Timestamp from ``time.perf_counter``, current time by default
+        category : str
+            Category of the counter
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        self._record(PHASE_COUNTER, name, category, timestamp, args=values)
+
+    def add_instant(
+            self,
+            name: str,
+            category: str = 'kenning',
+            args: Optional[Dict[str, Any]] = None):
+        """
+        Records an instant event, i.e. received message.
+
+        Parameters
+        ----------
+        name : str
+            Name of the event
+        category : str
+            Category of the event
+        args : Optional[Dict[str, Any]]
+            Additional arguments of the event
+        """
+        self._record(
+            PHASE_INSTANT, name, category, time.perf_counter(), args=args
+        )
+
+    @contextmanager
+    def span(
+            self,
+            name: str,
+            category: str = 'kenning',
+            args: Optional[Dict[str, Any]] = None):
+        """
+        Records a span covering the execution of the ``with`` block.
+
+        Parameters
+        ----------
+        name : str
+            Name of the span
+        category : str
+            Category of the span
+        args : Optional[Dict[str, Any]]
+            Additional arguments of the span
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), category, args)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        Converts recorded events to the Chrome Trace Event format.
+
+        Returns
+        -------
+        Dict[str, Any] : trace in the JSON object format
+        """
+        events = []
+        pids = set()
+        threads = set()
+        for phase, name, category, timestamp, duration, pid, tid, args in \
+                list(self.events):
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': phase,
+                'ts': timestamp * 1e6,
+                'pid': pid,
+                'tid': tid
+            }
+            if phase == PHASE_COMPLETE:
+                event['dur'] = duration * 1e6
+            elif phase == PHASE_INSTANT:
+                event['s'] = 't'
+            if args:
+                event['args'] = args
+            events.append(event)
+            pids.add(pid)
+            threads.add((pid, tid))
+        for pid, tid in sorted(threads):
+            events.append({
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': pid,
+                'tid': tid,
+                'args': {'name': self.threadnames.get(tid, str(tid))}
+            })
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms'
+        }
+
+    def save(self, path: Path):
+        """
+        Saves recorded events in the Chrome Trace Event JSON format.
+
+        Parameters
+        ----------
+        path : Path
+            Path to the output JSON file
+        """
+        with open(path, 'w') as tracefile:
+            json.dump(self.to_chrome_trace(), tracefile)
+
+    def add_measurements(self, measurementsdata: Dict[str, Any]):
+        """
+        Adds events based on data stored in Measurements.
+
+        It converts ``tags`` to spans and ``session_utilization`` series to
+        counters, so a timeline can be created for existing measurements
+        files.
+
+        Parameters
+        ----------
+        measurementsdata : Dict[str, Any]
+            Data from the Measurements object
+        """
+        for tag in measurementsdata.get('tags', []):
+            self.add_span(tag['name'], tag['start'], tag['end'], 'tags')
+        counters: List[Tuple[str, str]] = [
+            ('session_utilization_mem_percent', 'mem_percent'),
+            ('session_utilization_cpus_percent', 'cpus_percent'),
+        ]
+        timestamps = measurementsdata.get('session_utilization_timestamp', [])
+        for measurementname, countername in counters:
+            for timestamp, value in zip(
+                    timestamps,
+                    measurementsdata.get(measurementname, [])):
+                if isinstance(value, list):
+                    value = sum(value) / max(len(value), 1)
+                self.add_counter(countername, {'value': value}, timestamp)
+
+    def clear(self):
+        """
+        Removes all recorded events.
+        """
+        self.events.clear()
+        self.threadnames.clear()
+
+
+class TraceCollector(object):
+    """
+    It is a 'static' class collecting trace events from various sources.
+
+    Tracing is disabled by default, ``enable`` has to be called to start
+    recording events.
+    """
+    recorder = TraceRecorder()
+    enabled = False
+
+    @classmethod
+    def enable(cls, capacity: Optional[int] = None):
+        """
+        Enables recording of trace events.
+
+        Parameters
+        ----------
+        capacity : Optional[int]
+            Maximum number of stored events, if given the recorder is
+            recreated
+        """
+        if capacity is not None:
+            cls.recorder = TraceRecorder(capacity)
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls):
+        """
+        Disables recording of trace events.
+        """
+        cls.enabled = False
+
+    @classmethod
+    def add_span(
+            cls,
+            name: str,
+            start: float,
+            end: float,
+            category: str = 'kenning',
+            args: Optional[Dict[str, Any]] = None):
+        """
+        Records a finished span if tracing is enabled.
+
+        Check TraceRecorder.add_span for parameters.
+        """
+        if cls.enabled:
+            cls.recorder.add_span(name, start, end, category, args)
+
+    @classmethod
+    def add_counter(
+            cls,
+            name: str,
+            values: Dict[str, float],
+            timestamp: Optional[float] = None,
+            category: str = 'kenning'):
+        """
+        Records counter values if tracing is enabled.
+
+        Check TraceRecorder.add_counter for parameters.
+        """
+        if cls.enabled:
+            cls.recorder.add_counter(name, values, timestamp, category)
+
+    @classmethod
+    def add_instant(
+            cls,
+            name: str,
+            category: str = 'kenning',
+            args: Optional[Dict[str, Any]] = None):
+        """
+        Records an instant event if tracing is enabled.
+
+        Check TraceRecorder.add_instant for parameters.
+        """
+        if cls.enabled:
+            cls.recorder.add_instant(name, category, args)
+
+    @classmethod
+    @contextmanager
+    def span(
+            cls,
+            name: str,
+            category: str = 'kenning',
+            args: Optional[Dict[str, Any]] = None):
+        """
+        Records a span covering the ``with`` block if tracing is enabled.
+
+        Check TraceRecorder.span for parameters.
+        """
+        if not cls.enabled:
+            yield
+            return
+        with cls.recorder.span(name, category, args):
+            yield
+
+    @classmethod
+    def save_trace(cls, resultpath: Path):
+        """
+        Saves trace to JSON file in the Chrome Trace Event format.
+
+        Parameters
+        ----------
+        resultpath : Path
+            Path to the saved JSON file
+        """
+        cls.recorder.save(resultpath)
+
+    @classmethod
+    def clear(cls):
+        """
+        Clears recorded events.
+        """
+        cls.recorder.clear()
+
+
+def tracespan(name: str, category: str = 'kenning'):
+    """
+    Decorator recording a span for every call of the function.
+
+    Parameters
+    ----------
+    name : str
+        The name of the span
+    category : str
+        The category of the span
+    """
+    def trace_decorator(function):
+        @wraps(function)
+        def trace_wrapper(*args, **kwargs):
+            if not TraceCollector.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                TraceCollector.recorder.add_span(
+                    name,
+                    start,
+                    time.perf_counter(),
+                    category
+                )
+        return trace_wrapper
+    return trace_decorator
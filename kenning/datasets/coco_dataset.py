@@ -4,13 +4,16 @@
 
 import cv2
 import numpy as np
+import os
 from pathlib import Path
 import tempfile
 from zipfile import ZipFile
 from tqdm import tqdm
-from collections import defaultdict
-from typing import Optional
+from typing import Dict, Optional
 
+from kenning.utils.annotation_index import ANNOTATION_INDEX_DIR
+from kenning.utils.annotation_index import group_by_image
+from kenning.utils.annotation_index import load_annotation_index
 from kenning.utils.logger import download_url, get_logger
 
 from pycocotools.coco import COCO
@@ -55,8 +58,17 @@ class COCODataset2017(ObjectDetectionSegmentationDataset):
     *NOTE*: the license does not include the images, only annotations.
 
     *Page*: `COCO Dataset site <https://cocodataset.org>`_.
+
+    Annotations are parsed once to the columnar index in the dataset
+    directory (``AnnotationIndex``), loaded by subsequent instantiations
+    as long as the annotations file is not modified.
     """
 
+    cache_ignored_arguments = \
+        ObjectDetectionSegmentationDataset.cache_ignored_arguments + [
+            'use_annotation_index'
+        ]
+
     annotationsurls = {
         'train2017': {
             'images': ['http://images.cocodataset.org/zips/train2017.zip'],
@@ -83,6 +95,12 @@ class COCODataset2017(ObjectDetectionSegmentationDataset):
             'description': 'Type of dataset to download and use',  # noqa: E501
             'default': 'val2017',
             'enum': list(annotationsurls.keys())
+        },
+        'use_annotation_index': {
+            'argparse_name': '--disable-annotation-index',
+            'description': 'Parse annotations on every instantiation instead of loading the cached annotation index',  # noqa: E501
+            'type': bool,
+            'default': True
         }
     }
 
@@ -97,11 +115,20 @@ class COCODataset2017(ObjectDetectionSegmentationDataset):
             image_memory_layout: str = 'NCHW',
             show_on_eval: bool = False,
             image_width: int = 416,
-            image_height: int = 416):
+            image_height: int = 416,
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0,
+            use_annotation_index: bool = True):
         assert image_memory_layout in ['NHWC', 'NCHW']
         self.numclasses = 80
         self.log = get_logger()
         self.dataset_type = dataset_type
+        self.use_annotation_index = use_annotation_index
+        self._coco = None
         super().__init__(
             root,
             batch_size,
@@ -111,7 +138,13 @@ class COCODataset2017(ObjectDetectionSegmentationDataset):
             image_memory_layout,
             show_on_eval,
             image_width,
-            image_height
+            image_height,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
         )
 
     @classmethod
@@ -126,7 +159,14 @@ class COCODataset2017(ObjectDetectionSegmentationDataset):
             args.image_memory_layout,
             args.show_predictions_on_eval,
             args.image_width,
-            args.image_height
+            args.image_height,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index,
+            use_annotation_index=args.use_annotation_index
         )
 
     def download_dataset_fun(self):
@@ -137,47 +177,140 @@ class COCODataset2017(ObjectDetectionSegmentationDataset):
             for url in self.annotationsurls[self.dataset_type][self.task]:
                 download_and_extract(url, self.root, Path(tmpdir) / 'data.zip')
 
-    def prepare(self):
-        annotationspath = self.root / f'annotations/instances_{self.dataset_type}.json'  # noqa: E501
-        self.coco = COCO(annotationspath)
-        self.classmap = {}
-        self.classnames = []
-
-        for classid in self.coco.cats.keys():
-            self.classmap[classid] = self.coco.cats[classid]['name']
-            self.classnames.append(self.coco.cats[classid]['name'])
-
-        cocokeys = list(self.coco.imgs.keys())
-        self.keystoimgs = dict()
-        self.imgstokeys = dict()
-
-        for key, imgdata in zip(cocokeys, self.coco.loadImgs(cocokeys)):
-            filepath = str(
-                self.root / self.dataset_type / imgdata['file_name']
+    @property
+    def annotationspath(self) -> Path:
+        return self.root / f'annotations/instances_{self.dataset_type}.json'
+
+    @property
+    def coco(self) -> COCO:
+        """
+        COCO API object with annotations, loaded on first use.
+        """
+        if self._coco is None:
+            self._coco = COCO(self.annotationspath)
+        return self._coco
+
+    def parse_annotations(self) -> Dict[str, np.ndarray]:
+        """
+        Parses the annotations file to columns of the annotation index.
+
+        Returns
+        -------
+        Dict[str, np.ndarray] :
+            Categories, images and objects with boxes relative to image sizes
+        """
+        categories = list(self.coco.cats.values())
+        categoryindices = {
+            cat['id']: i for i, cat in enumerate(categories)
+        }
+        images = self.coco.loadImgs(list(self.coco.imgs.keys()))
+        imageindices = {img['id']: i for i, img in enumerate(images)}
+        anns = list(self.coco.anns.values())
+
+        objectimages = np.array(
+            [imageindices[ann['image_id']] for ann in anns],
+            dtype=np.int64
+        )
+        widths = np.array([img['width'] for img in images], dtype=np.float64)
+        heights = np.array(
+            [img['height'] for img in images],
+            dtype=np.float64
+        )
+        bboxes = np.array(
+            [ann['bbox'] for ann in anns],
+            dtype=np.float64
+        ).reshape(-1, 4)
+        objectwidths = widths[objectimages]
+        objectheights = heights[objectimages]
+        return {
+            'category_ids': np.array(
+                [cat['id'] for cat in categories],
+                dtype=np.int64
+            ),
+            'category_names': np.array(
+                [cat['name'] for cat in categories],
+                dtype=str
+            ),
+            'image_ids': np.array(
+                [img['id'] for img in images],
+                dtype=np.int64
+            ),
+            'image_files': np.array(
+                [img['file_name'] for img in images],
+                dtype=str
+            ),
+            'image_widths': widths,
+            'image_heights': heights,
+            'object_images': objectimages,
+            'object_categories': np.array(
+                [categoryindices[ann['category_id']] for ann in anns],
+                dtype=np.int64
+            ),
+            'object_boxes': np.stack([
+                bboxes[:, 0] / objectwidths,
+                bboxes[:, 1] / objectheights,
+                (bboxes[:, 0] + bboxes[:, 2]) / objectwidths,
+                (bboxes[:, 1] + bboxes[:, 3]) / objectheights
+            ], axis=1),
+            'object_iscrowd': np.array(
+                [ann['iscrowd'] == 1 for ann in anns],
+                dtype=bool
             )
-            self.dataX.append(filepath)
-            self.keystoimgs[key] = filepath
-            self.imgstokeys[filepath] = key
-
-        annotations = defaultdict(list)
-        for annkey, anndata in self.coco.anns.items():
-            bbox = anndata['bbox']
-            width = self.coco.imgs[anndata['image_id']]['width']
-            height = self.coco.imgs[anndata['image_id']]['height']
-            annotations[
-                self.keystoimgs[anndata['image_id']]].append(DectObject(
-                    clsname=self.classmap[anndata['category_id']],
-                    xmin=bbox[0] / width,
-                    ymin=bbox[1] / height,
-                    xmax=(bbox[0] + bbox[2]) / width,
-                    ymax=(bbox[1] + bbox[3]) / height,
-                    score=1.0,
-                    iscrowd=anndata['iscrowd'] == 1
-                )
+        }
+
+    def prepare(self):
+        if self.use_annotation_index:
+            columns = load_annotation_index(
+                self.root / ANNOTATION_INDEX_DIR,
+                [self.annotationspath],
+                {'dataset': 'COCODataset2017', 'dataset_type': self.dataset_type},  # noqa: E501
+                self.parse_annotations
             )
+        else:
+            columns = self.parse_annotations()
 
-        for inputid in self.dataX:
-            self.dataY.append(annotations[inputid])
+        self.classnames = columns['category_names'].tolist()
+        self.classmap = dict(zip(
+            columns['category_ids'].tolist(),
+            self.classnames
+        ))
+
+        cocokeys = columns['image_ids'].tolist()
+        imagesdir = str(self.root / self.dataset_type)
+        self.dataX = [
+            os.path.join(imagesdir, filename)
+            for filename in columns['image_files'].tolist()
+        ]
+        self.keystoimgs = dict(zip(cocokeys, self.dataX))
+        self.imgstokeys = dict(zip(self.dataX, cocokeys))
+        self.imagesizes = dict(zip(self.dataX, zip(
+            columns['image_widths'].tolist(),
+            columns['image_heights'].tolist()
+        )))
+
+        objects = [
+            DectObject(
+                clsname=self.classnames[category],
+                xmin=xmin,
+                ymin=ymin,
+                xmax=xmax,
+                ymax=ymax,
+                score=1.0,
+                iscrowd=iscrowd
+            )
+            for category, (xmin, ymin, xmax, ymax), iscrowd in zip(
+                columns['object_categories'].tolist(),
+                columns['object_boxes'].tolist(),
+                columns['object_iscrowd'].tolist()
+            )
+        ]
+        self.dataY = [
+            [objects[i] for i in group.tolist()]
+            for group in group_by_image(
+                columns['object_images'],
+                len(self.dataX)
+            )
+        ]
 
     def prepare_input_samples(self, samples):
         result = []
@@ -201,9 +334,7 @@ class COCODataset2017(ObjectDetectionSegmentationDataset):
         currindex = self._dataindex - len(predictions)
         for pred, groundtruth in zip(predictions, truth):
             for p in pred:
-                cocoid = self.imgstokeys[self.dataX[currindex]]
-                width = self.coco.imgs[cocoid]['width']
-                height = self.coco.imgs[cocoid]['height']
+                width, height = self.imagesizes[self.dataX[currindex]]
                 xmin = max(min(p.xmin * width, width), 0)
                 xmax = max(min(p.xmax * width, width), 0)
                 ymin = max(min(p.ymin * height, height), 0)
@@ -219,4 +350,5 @@ class COCODataset2017(ObjectDetectionSegmentationDataset):
                         'score': p.score
                     }]
                 )
+            currindex += 1
         return measurements
@@ -7,10 +7,12 @@ Mozilla Common Voice Dataset wrapper
 """
 
 from typing import Any, List, Tuple, Union, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
+import os
 import tarfile
 import tempfile
-import string
 import numpy as np
 import pandas as pd
 import wave
@@ -18,13 +20,20 @@ import librosa
 
 from kenning.core.dataset import Dataset
 from kenning.core.measurements import Measurements
-from kenning.utils.logger import download_url
+from kenning.datasets.helpers.speech_metrics import levenshtein_distance
+from kenning.datasets.helpers.speech_metrics import normalize_transcript
+from kenning.datasets.helpers.speech_metrics import transcript_errors
+from kenning.utils.audio_store import AudioStore
+from kenning.utils.logger import download_url, get_logger
 
 
 def dynamic_levenshtein_distance(a: str, b: str) -> int:
     """
     Computes the Levenshtein Distance metric between strings.
 
+    The distance is computed with the bit-parallel algorithm from
+    `kenning.datasets.helpers.speech_metrics`.
+
     Parameters
     ----------
     a : str
@@ -37,21 +46,7 @@ def dynamic_levenshtein_distance(a: str, b: str) -> int:
     int :
         Levenshtein Distance
     """
-    la, lb = len(a), len(b)
-    dynamic_array = np.zeros((lb + 1, la + 1), dtype=int)
-
-    dynamic_array[0, :] = np.arange(1, la + 2)
-    dynamic_array[:, 0] = np.arange(1, lb + 2)
-
-    for j in range(1, lb + 1):
-        for i in range(1, la + 1):
-            cost = int(a[i-1] != b[j-1])
-            dynamic_array[j, i] = min(
-                dynamic_array[j, i-1] + 1,
-                dynamic_array[j-1, i] + 1,
-                dynamic_array[j-1, i-1] + cost
-            )
-    return dynamic_array[lb][la]
+    return levenshtein_distance(a, b)
 
 
 def char_eval(pred: str, gt: str) -> float:
@@ -59,7 +54,7 @@ def char_eval(pred: str, gt: str) -> float:
     Evaluates the prediction on a character basis.
 
     The algorithm used to determine the distance between the
-    strings is a dynamic programming implementation of the
+    strings is a bit-parallel implementation of the
     Levenshtein Distance metric.
 
     Parameters
@@ -75,12 +70,10 @@ def char_eval(pred: str, gt: str) -> float:
         the ratio of the Levenshtein Distance to the ground truth length
     """
     # sanitize the Ground Truth from punctuation and uppercase letters
-    gt = gt.translate(
-        str.maketrans('', '', string.punctuation)
-    ).lower().strip()
+    gt = normalize_transcript(gt)
     pred = pred.strip()
     dld = dynamic_levenshtein_distance(pred, gt)
-    return 1 - float(dld)/float(len(gt))
+    return 1 - float(dld)/float(max(len(gt), 1))
 
 
 def resample_wave(
@@ -136,6 +129,42 @@ def convert_mp3_to_wav(abspath: Path, subdir: str) -> Path:
     return dst
 
 
+def load_recording(path: Union[str, Path], sample_rate: int) -> np.ndarray:
+    """
+    Decodes the recording and resamples it to the given sample rate.
+
+    MP3 files are decoded in memory, without intermediate WAV files.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        Path to the MP3 or WAV file
+    sample_rate : int
+        Target sample rate
+
+    Returns
+    -------
+    np.ndarray :
+        16-bit samples of the recording
+    """
+    path = Path(path)
+    if path.suffix == '.mp3':
+        from pydub import AudioSegment
+        sound = AudioSegment.from_mp3(str(path)).set_sample_width(2)
+        audio = np.frombuffer(sound.raw_data, np.int16)
+        framerate = sound.frame_rate
+    else:
+        with wave.open(str(path), 'rb') as loaded_wav:
+            audio = np.frombuffer(
+                loaded_wav.readframes(loaded_wav.getnframes()),
+                np.int16
+            )
+            framerate = loaded_wav.getframerate()
+    if framerate != sample_rate:
+        audio = resample_wave(audio, framerate, sample_rate)
+    return audio
+
+
 class CommonVoiceDataset(Dataset):
     """
     The Mozilla Common Voice Dataset
@@ -150,6 +179,11 @@ class CommonVoiceDataset(Dataset):
     *License*: CC0 1.0 Universal (CC0 1.0) Public Domain Dedication License.
 
     *Page*: `Common Voice site <https://commonvoice.mozilla.org/>`_.
+
+    Selected recordings are decoded and resampled once, by a pool of
+    processes, to a memory-mapped store in the dataset directory
+    (``AudioStore``), so loading samples during iteration is a slice of the
+    store.
     """
 
     languages = ['en']
@@ -160,6 +194,11 @@ class CommonVoiceDataset(Dataset):
         '12.0'
     ]
 
+    cache_ignored_arguments = Dataset.cache_ignored_arguments + [
+        'use_audio_store',
+        'decode_workers'
+    ]
+
     arguments_structure = {
         'language': {
             'argparse_name': '--language',
@@ -196,6 +235,18 @@ class CommonVoiceDataset(Dataset):
             'description': 'Version of the dataset',
             'default': '12.0',
             'enum': dataset_versions
+        },
+        'use_audio_store': {
+            'argparse_name': '--disable-audio-store',
+            'description': 'Decode recordings on access instead of decoding them once to the memory-mapped store',  # noqa: E501
+            'type': bool,
+            'default': True
+        },
+        'decode_workers': {
+            'argparse_name': '--decode-workers',
+            'description': 'Number of processes decoding recordings to the store, 0 uses all CPUs',  # noqa: E501
+            'type': int,
+            'default': 0
         }
     }
 
@@ -210,7 +261,15 @@ class CommonVoiceDataset(Dataset):
             sample_size: int = 1000,
             sample_rate: int = 16000,
             selection_method: str = 'accent',
-            dataset_version: str = '12.0'):
+            dataset_version: str = '12.0',
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0,
+            use_audio_store: bool = True,
+            decode_workers: int = 0):
         """
         Prepares all structures and data required for providing data samples.
 
@@ -234,6 +293,26 @@ class CommonVoiceDataset(Dataset):
             Size of sampled data.
         selection_method : str
             Method to group the data.
+        prefetch_workers : int
+            Number of workers loading next batches in the background during
+            iteration. If 0, batches are loaded on demand.
+        prefetch_depth : int
+            Maximum number of batches loaded ahead of the current one
+        prefetch_executor : str
+            Type of prefetching workers, 'thread' or 'process'
+        samples_cache_dir : Optional[Path]
+            Path to the directory with the persistent cache of preprocessed
+            input samples. If None, samples are not cached.
+        num_shards : int
+            Number of shards the dataset is split into
+        shard_index : int
+            Index of the shard provided by the dataset
+        use_audio_store : bool
+            True if recordings should be decoded once to the memory-mapped
+            store, False if they should be decoded on every access
+        decode_workers : int
+            Number of processes decoding recordings to the store, 0 uses all
+            CPUs
         """
         assert language in self.languages, (
             f'Unsupported language {language}, should be one'
@@ -250,12 +329,23 @@ class CommonVoiceDataset(Dataset):
         self.sample_rate = sample_rate
         self.selection_method = selection_method
         self.dataset_version = dataset_version
+        self.use_audio_store = use_audio_store
+        self.decode_workers = decode_workers
+        self.audiostore = None
         super().__init__(
             root,
             batch_size,
             download_dataset,
-            external_calibration_dataset
+            external_calibration_dataset,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
         )
+        if self.use_audio_store:
+            self.decode_recordings()
 
     @classmethod
     def from_argparse(cls, args):
@@ -267,7 +357,15 @@ class CommonVoiceDataset(Dataset):
             annotations_type=args.annotations_type,
             sample_size=args.sample_size,
             selection_method=args.selection_method,
-            dataset_version=args.dataset_version
+            dataset_version=args.dataset_version,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index,
+            use_audio_store=args.use_audio_store,
+            decode_workers=args.decode_workers
         )
 
     def download_dataset_fun(self):
@@ -337,27 +435,47 @@ class CommonVoiceDataset(Dataset):
             assert self.sample_size <= len(self.dataX)
             self.select_representative_sample(metric_values)
 
+    def decode_recordings(self):
+        """
+        Decodes and resamples current recordings to the audio store.
+
+        Recordings are decoded in parallel by a pool of processes. The store
+        is identified by paths, sizes and modification times of recordings
+        and the sample rate, so it is reused by subsequent runs with the same
+        recordings, and built again if any of them changes.
+        """
+        paths = [str(x) for x in self.dataX]
+        recordings = []
+        for path in sorted(paths):
+            stat = os.stat(path)
+            recordings.append([path, stat.st_size, stat.st_mtime_ns])
+        self.audiostore = AudioStore(
+            self.root / 'audio-store',
+            {'recordings': recordings, 'sample_rate': self.sample_rate}
+        )
+        if self.audiostore.complete:
+            return
+        get_logger().info(f'Decoding {len(paths)} recordings')
+        workers = self.decode_workers if self.decode_workers > 0 \
+            else os.cpu_count()
+        with ProcessPoolExecutor(workers) as executor:
+            self.audiostore.build(
+                paths,
+                executor.map(
+                    load_recording,
+                    paths,
+                    repeat(self.sample_rate),
+                    chunksize=max(1, len(paths) // (4 * workers))
+                )
+            )
+
     def prepare_input_samples(self, samples: List):
         result = []
         for sample in samples:
-            x = Path(sample)
-            # check file type
-            if x.suffix == '.mp3':
-                audio_path = str(convert_mp3_to_wav(x, 'waves'))
+            if self.audiostore is not None and str(sample) in self.audiostore:
+                result.append(self.audiostore.get(str(sample)))
             else:
-                audio_path = str(x)
-            loaded_wav = wave.open(audio_path, 'rb')
-            audio = np.frombuffer(
-                loaded_wav.readframes(loaded_wav.getnframes()),
-                np.int16
-            )
-            if loaded_wav.getframerate() != self.sample_rate:
-                audio = resample_wave(
-                    audio,
-                    loaded_wav.getframerate(),
-                    self.sample_rate
-                )
-            result.append(audio)
+                result.append(load_recording(sample, self.sample_rate))
         return result
 
     def select_representative_sample(self, metric_values: List[Any]):
@@ -398,13 +516,22 @@ class CommonVoiceDataset(Dataset):
         MIN_SCORE_FOUND_GT = 0.6
         measurements = Measurements()
         currindex = self._dataindex - len(predictions)
-        for pred, gt in zip(predictions, ground_truths):
+        texts, suffixes = [], []
+        for gt in ground_truths:
             if isinstance(gt, tuple):
                 gt, metric = gt
-                type_suffix = f'/{metric}'
+                suffixes.append(f'/{metric}')
             else:
-                type_suffix = ''
-            score = char_eval(pred, gt)
+                suffixes.append('')
+            texts.append(gt)
+        charerrors, chars, worderrors, words = transcript_errors(
+            predictions,
+            texts
+        )
+        for i, (pred, gt, type_suffix) in enumerate(
+                zip(predictions, texts, suffixes)):
+            # the same distance as in character errors, computed once
+            score = 1 - float(charerrors[i]) / float(max(chars[i], 1))
             found_gt = 1 if score >= MIN_SCORE_FOUND_GT else 0
             # not a detector therefore no confidence score is given so a new
             # render report method will need to be added for STT Models
@@ -413,10 +540,12 @@ class CommonVoiceDataset(Dataset):
                 [{
                     'found_ground_truth': float(found_gt),
                     'score': float(score),
+                    'char_errors': int(charerrors[i]),
+                    'word_errors': int(worderrors[i]),
                     'true_text': gt,
                     'predicted_text': pred,
                     'audio_path': str(
-                        Path(self.dataX[currindex]).relative_to(self.root)
+                        Path(self.dataX[currindex + i]).relative_to(self.root)
                     )
                 }],
                 lambda: list()
@@ -426,6 +555,16 @@ class CommonVoiceDataset(Dataset):
                 1,
                 lambda: 0
             )
+            for name, value in (
+                    ('char_errors', charerrors[i]),
+                    ('chars', chars[i]),
+                    ('word_errors', worderrors[i]),
+                    ('words', words[i])):
+                measurements.accumulate(
+                    f'eval_stt_{name}',
+                    int(value),
+                    lambda: 0
+                )
         return measurements
 
     def train_test_split_representations(
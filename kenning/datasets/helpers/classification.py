@@ -0,0 +1,116 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Vectorized evaluation of classification models.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+from kenning.core.measurements import Measurements
+from kenning.core.measurements import SparseUpdate
+
+
+class ClassificationEvaluator(object):
+    """
+    Computes classification measurements for batches of predictions.
+
+    The whole batch is processed with vectorized numpy operations:
+
+    * predicted classes are computed with a single argmax over the batch,
+    * the confusion matrix is updated with counts of (label, prediction)
+      pairs present in the batch (``SparseUpdate``), so the dense integer
+      matrix is allocated only once, when the first batch is added to the
+      collected measurements,
+    * top-k classes are selected with ``np.argpartition``, without sorting
+      all class scores.
+    """
+
+    def __init__(
+            self,
+            numclasses: int,
+            top_k: Optional[int] = 5,
+            record_top_k: bool = False):
+        """
+        Creates the evaluator.
+
+        Parameters
+        ----------
+        numclasses : int
+            Number of classes
+        top_k : Optional[int]
+            Number of best classes checked for the top-k accuracy
+            (``top_<k>_count`` measurement), None if it is not computed
+        record_top_k : bool
+            True if top-k classes of every sample should be recorded in the
+            ``top_<k>`` measurement, sorted by score
+        """
+        self.numclasses = numclasses
+        self.top_k = top_k
+        self.record_top_k = record_top_k and top_k is not None
+
+    def evaluate(
+            self,
+            predictions: List,
+            truth: List,
+            names: Optional[List[str]] = None) -> Measurements:
+        """
+        Evaluates the batch of predictions.
+
+        Parameters
+        ----------
+        predictions : List
+            Scores of classes for every sample
+        truth : List
+            One-hot encoded labels (or class indices) of samples
+        names : Optional[List[str]]
+            Names of samples used in ``top_<k>`` records
+
+        Returns
+        -------
+        Measurements :
+            Confusion matrix update, top-k count and the number of samples
+        """
+        measurements = Measurements()
+        count = len(predictions)
+        if count == 0:
+            return measurements
+        scores = np.asarray(predictions).reshape(count, -1)
+        labels = np.asarray(truth)
+        if labels.ndim > 1 or labels.dtype.kind == 'f':
+            labels = labels.reshape(count, -1).argmax(axis=1)
+        predicted = scores.argmax(axis=1)
+
+        measurements.initialize_measurement(
+            'eval_confusion_matrix',
+            SparseUpdate(
+                (self.numclasses, self.numclasses),
+                (labels, predicted)
+            )
+        )
+        if self.top_k is not None:
+            k = min(self.top_k, scores.shape[1])
+            topk = np.argpartition(scores, -k, axis=1)[:, -k:]
+            hits = np.count_nonzero(topk == labels[:, np.newaxis])
+            measurements.accumulate(f'top_{self.top_k}_count', hits, lambda: 0)
+            if self.record_top_k:
+                order = np.argsort(
+                    -np.take_along_axis(scores, topk, axis=1),
+                    axis=1,
+                    kind='stable'
+                )
+                topk = np.take_along_axis(topk, order, axis=1)
+                if names is None:
+                    names = [str(i) for i in range(count)]
+                measurements.add_measurement(
+                    f'top_{self.top_k}',
+                    [
+                        {name: classes}
+                        for name, classes in zip(names, topk.tolist())
+                    ]
+                )
+        measurements.accumulate('total', count, lambda: 0)
+        return measurements
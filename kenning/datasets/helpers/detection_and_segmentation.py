@@ -12,6 +12,12 @@ from pathlib import Path
 from kenning.utils.logger import get_logger
 from kenning.core.dataset import Dataset
 from kenning.core.measurements import Measurements
+from kenning.datasets.helpers.detection_metrics import DetectionMetrics
+from kenning.datasets.helpers.detection_metrics import IOU_THRESHOLDS
+from kenning.datasets.helpers.rle import RLEMask
+from kenning.datasets.helpers.rle import compute_rle_iou_matrix
+from kenning.datasets.helpers.rle import mask_to_array
+from kenning.datasets.helpers.rle import to_rle
 from kenning.utils.args_manager import add_parameterschema_argument, add_argparse_argument  # noqa: E501
 
 from matplotlib import pyplot as plt
@@ -71,8 +77,8 @@ maskpath : Path
     path to mask file
 xmin,ymin,xmax,ymax : float
     coordinates of the bounding box
-mask : np.array
-    loaded mask image
+mask : Union[np.array, RLEMask]
+    loaded mask image, or its run-length encoding
 score : float
     the probability of correctness of the detected object
 iscrowd : Optional[bool]
@@ -130,41 +136,10 @@ def get_recall_precision(
     List[Tuple[List[float], List[float]]] : List with per-class lists of recall
     and precision values
     """
-    lines = -np.ones(
-        [len(measurementsdata['class_names']), 2, recallpoints],
-        dtype=np.float32
-    )
-    for clsid, cls in enumerate(measurementsdata['class_names']):
-        gt_count = measurementsdata[f'eval_gtcount/{cls}'] if f'eval_gtcount/{cls}' in measurementsdata else 0  # noqa: E501
-        if gt_count == 0:
-            continue
-        dets = measurementsdata[f'eval_det/{cls}'] if f'eval_det/{cls}' in measurementsdata else []  # noqa: E501
-        dets = [d for d in dets if d[0] >= scorethresh]
-        dets.sort(key=lambda d: -d[0])
-        tps = np.array([entry[1] != 0.0 for entry in dets])
-        fps = np.array([entry[1] == 0.0 for entry in dets])
-        tpacc = np.cumsum(tps).astype(dtype=np.float)
-        fpacc = np.cumsum(fps).astype(dtype=np.float)
-
-        recalls = tpacc / gt_count
-        precisions = tpacc / (fpacc + tpacc + np.spacing(1))
-
-        for i in range(len(precisions) - 1, 0, -1):
-            if precisions[i] > precisions[i - 1]:
-                precisions[i - 1] = precisions[i]
-
-        recallthresholds = np.linspace(0.0, 1.0, num=recallpoints)
-        inds = np.searchsorted(recalls, recallthresholds, side='left')
-        newprecisions = np.zeros(recallthresholds.shape, dtype=np.float32)
-        try:
-            for oldid, newid in enumerate(inds):
-                newprecisions[oldid] = precisions[newid]
-        except IndexError:
-            pass
-
-        lines[clsid, 0] = recallthresholds
-        lines[clsid, 1] = newprecisions
-    return lines
+    return DetectionMetrics(
+        measurementsdata,
+        recallpoints
+    ).recall_precision(scorethresh)
 
 
 def compute_map_per_threshold(
@@ -181,13 +156,9 @@ def compute_map_per_threshold(
     scorethresholds : List[float]
         List of threshold values to verify the mAP for
     """
-    maps = []
-    for thresh in scorethresholds:
-        recallprecisions = get_recall_precision(measurementsdata, thresh)
-        precisions = recallprecisions[:, 1, :]
-        maps.append(np.mean(precisions[precisions > -1]))
-
-    return np.array(maps, dtype=np.float32)
+    return DetectionMetrics(measurementsdata).map_per_threshold(
+        scorethresholds
+    )
 
 
 def compute_dect_iou(b1: DectObject, b2: DectObject) -> float:
@@ -231,21 +202,27 @@ def compute_dect_iou(b1: DectObject, b2: DectObject) -> float:
     return iou
 
 
-def compute_segm_iou(mask1: np.array, mask2: np.array) -> float:
+def compute_segm_iou(
+        mask1: Union[np.array, RLEMask],
+        mask2: Union[np.array, RLEMask]) -> float:
     """
     Computes IoU between two masks
 
     Parameters
     ----------
-    mask1 : np.array
+    mask1 : Union[np.array, RLEMask]
         First mask
-    mask2 : np.array
+    mask2 : Union[np.array, RLEMask]
         Second mask
 
     Returns
     -------
     float : IoU value
     """
+    if isinstance(mask1, RLEMask) or isinstance(mask2, RLEMask):
+        return float(
+            compute_rle_iou_matrix([to_rle(mask1)], [to_rle(mask2)])[0, 0]
+        )
 
     mask_i = np.logical_and(mask1, mask2)
     mask_u = np.logical_or(mask1, mask2)
@@ -259,6 +236,173 @@ def compute_segm_iou(mask1: np.array, mask2: np.array) -> float:
     return align
 
 
+def compute_dect_iou_matrix(
+        preds: List[DectObject],
+        groundtruths: List[DectObject]) -> np.ndarray:
+    """
+    Computes IoU between all pairs of predicted and ground truth boxes.
+
+    It is a vectorized version of ``compute_dect_iou``, with the same
+    handling of crowd ground truths. Coordinates are processed as double
+    precision floats.
+
+    Parameters
+    ----------
+    preds : List[DectObject]
+        Predicted bounding boxes
+    groundtruths : List[DectObject]
+        Ground truth bounding boxes
+
+    Returns
+    -------
+    np.ndarray :
+        Matrix of IoU values, with a row for every prediction and a column
+        for every ground truth
+    """
+    predboxes = np.array(
+        [[p.xmin, p.ymin, p.xmax, p.ymax] for p in preds],
+        dtype=np.float64
+    ).reshape(-1, 4)
+    gtboxes = np.array(
+        [[g.xmin, g.ymin, g.xmax, g.ymax] for g in groundtruths],
+        dtype=np.float64
+    ).reshape(-1, 4)
+    iscrowd = np.array([bool(g.iscrowd) for g in groundtruths], dtype=bool)
+
+    xmn = np.maximum(predboxes[:, np.newaxis, 0], gtboxes[np.newaxis, :, 0])
+    ymn = np.maximum(predboxes[:, np.newaxis, 1], gtboxes[np.newaxis, :, 1])
+    xmx = np.minimum(predboxes[:, np.newaxis, 2], gtboxes[np.newaxis, :, 2])
+    ymx = np.minimum(predboxes[:, np.newaxis, 3], gtboxes[np.newaxis, :, 3])
+    width = xmx - xmn
+    height = ymx - ymn
+    # matches max(0, x), which returns 0 for NaN
+    intersectarea = np.where(width > 0, width, 0.0) * \
+        np.where(height > 0, height, 0.0)
+
+    predarea = (predboxes[:, 2] - predboxes[:, 0]) * \
+        (predboxes[:, 3] - predboxes[:, 1])
+    gtarea = (gtboxes[:, 2] - gtboxes[:, 0]) * (gtboxes[:, 3] - gtboxes[:, 1])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(
+            iscrowd[np.newaxis, :],
+            intersectarea / predarea[:, np.newaxis],
+            intersectarea / (
+                predarea[:, np.newaxis] + gtarea[np.newaxis, :] -
+                intersectarea
+            )
+        )
+
+
+def compute_segm_iou_matrix(
+        preds: List[SegmObject],
+        groundtruths: List[SegmObject]) -> np.ndarray:
+    """
+    Computes IoU between masks of all pairs of predictions and ground truths.
+
+    IoU is computed as in ``compute_segm_iou``, for pairs with empty union
+    it is 0. Dense masks are run-length encoded once, and IoU is computed
+    directly on run lengths.
+
+    Parameters
+    ----------
+    preds : List[SegmObject]
+        Predicted masks
+    groundtruths : List[SegmObject]
+        Ground truth masks
+
+    Returns
+    -------
+    np.ndarray :
+        Matrix of IoU values, with a row for every prediction and a column
+        for every ground truth
+    """
+    return compute_rle_iou_matrix(
+        [to_rle(p.mask) for p in preds],
+        [to_rle(g.mask) for g in groundtruths]
+    )
+
+
+def match_predictions(
+        ious: np.ndarray,
+        iscrowd: np.ndarray,
+        iouthresholds: List[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:  # noqa: E501
+    """
+    Greedily matches predictions to ground truths of the same class.
+
+    Predictions, sorted by descending score, are matched one by one with the
+    ground truth with the highest IoU (the last one in case of ties) that is
+    not matched yet or is a crowd. The prediction is a true positive if the
+    IoU is at least the IoU threshold. Matching is performed separately for
+    every IoU threshold, since ground truths left unmatched at a higher
+    threshold can be matched with subsequent predictions.
+
+    Parameters
+    ----------
+    ious : np.ndarray
+        IoU matrix of predictions sorted by score and ground truths
+    iscrowd : np.ndarray
+        Flags telling if ground truths are crowds
+    iouthresholds : List[float]
+        Minimal IoU values of true positives
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray] :
+        Flags of true positives for every prediction and IoU threshold, IoU
+        with the best-matching ground truth for the first IoU threshold (0 if
+        there is no such ground truth), and indices of matched ground truths
+        for every prediction and IoU threshold (-1 if the prediction is not a
+        true positive)
+    """
+    numpreds, numgts = ious.shape
+    # ground truths ordered by descending IoU for every prediction, the last
+    # ones first in case of ties
+    order = numgts - 1 - np.argsort(-ious[:, ::-1], axis=1, kind='stable')
+    sortedious = np.take_along_axis(ious, order, axis=1).tolist()
+    order = order.tolist()
+    nanrows = np.isnan(ious).any(axis=1).tolist()
+    iscrowd = [bool(crowd) for crowd in iscrowd]
+
+    def best_candidate(predid: int, matched: List[bool]) -> Tuple[float, int]:
+        bestiou, bestgt = 0.0, -1
+        if nanrows[predid]:
+            # NaN breaks the ordering, candidates are compared one by one
+            for gtid in range(numgts):
+                if matched[gtid] and not iscrowd[gtid]:
+                    continue
+                iou = ious[predid, gtid]
+                if iou < bestiou:
+                    continue
+                bestiou, bestgt = iou, gtid
+        else:
+            for gtid, iou in zip(order[predid], sortedious[predid]):
+                if matched[gtid] and not iscrowd[gtid]:
+                    continue
+                if iou >= 0.0:
+                    bestiou, bestgt = iou, gtid
+                break
+        return bestiou, bestgt
+
+    matched = [[False] * numgts for _ in iouthresholds]
+    truepositives = np.zeros((numpreds, len(iouthresholds)), dtype=np.float64)
+    bestious = np.zeros(numpreds, dtype=np.float64)
+    matchedgts = -np.ones((numpreds, len(iouthresholds)), dtype=np.int64)
+    for predid in range(numpreds):
+        for thresholdid, miniou in enumerate(iouthresholds):
+            bestiou, bestgt = best_candidate(predid, matched[thresholdid])
+            if bestgt == -1:
+                continue
+            if thresholdid == 0:
+                bestious[predid] = bestiou
+            if bestiou < miniou:
+                continue
+            truepositives[predid, thresholdid] = 1.0
+            matched[thresholdid][bestgt] = True
+            matchedgts[predid, thresholdid] = bestgt
+    return truepositives, bestious, matchedgts
+
+
 class ObjectDetectionSegmentationDataset(Dataset):
     arguments_structure = {
         'task': {
@@ -301,7 +445,13 @@ class ObjectDetectionSegmentationDataset(Dataset):
             image_memory_layout: str = 'NCHW',
             show_on_eval: bool = False,
             image_width: int = 416,
-            image_height: int = 416):
+            image_height: int = 416,
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0):
         assert image_memory_layout in ['NHWC', 'NCHW']
         self.task = task
         self.classmap = {}
@@ -314,7 +464,13 @@ class ObjectDetectionSegmentationDataset(Dataset):
             root,
             batch_size,
             download_dataset,
-            external_calibration_dataset
+            external_calibration_dataset,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
         )
 
     @classmethod
@@ -437,7 +593,62 @@ class ObjectDetectionSegmentationDataset(Dataset):
         if self.task == 'object_detection':
             return compute_dect_iou(b1, b2)
         elif self.task == 'instance_segmentation':
-            return compute_segm_iou(b1, b2)
+            return compute_segm_iou(b1.mask, b2.mask)
+
+    def compute_iou_matrix(
+            self,
+            preds: List[Union[DectObject, SegmObject]],
+            groundtruths: List[Union[DectObject, SegmObject]]) -> np.ndarray:
+        """
+        Computes IoU between all pairs of predictions and ground truths.
+
+        Parameters
+        ----------
+        preds : List[Union[DectObject, SegmObject]]
+            Predicted objects
+        groundtruths : List[Union[DectObject, SegmObject]]
+            Ground truth objects
+
+        Returns
+        -------
+        np.ndarray :
+            Matrix of IoU values, with a row for every prediction and a
+            column for every ground truth
+        """
+        if self.task == 'object_detection':
+            return compute_dect_iou_matrix(preds, groundtruths)
+        elif self.task == 'instance_segmentation':
+            return compute_segm_iou_matrix(preds, groundtruths)
+
+    def compute_areas(
+            self,
+            objects: List[Union[DectObject, SegmObject]]) -> np.ndarray:
+        """
+        Computes areas of objects, relative to the area of the image.
+
+        Parameters
+        ----------
+        objects : List[Union[DectObject, SegmObject]]
+            Predicted or ground truth objects
+
+        Returns
+        -------
+        np.ndarray : areas of bounding boxes, or of masks for segmentation
+        """
+        if self.task == 'instance_segmentation':
+            areas = []
+            for obj in objects:
+                mask = None if obj.mask is None else to_rle(obj.mask)
+                if mask is not None and np.prod(mask.size) > 0:
+                    areas.append(mask.area() / np.prod(mask.size))
+                else:
+                    areas.append((obj.xmax - obj.xmin) * (obj.ymax - obj.ymin))  # noqa: E501
+            return np.array(areas, dtype=np.float64)
+        boxes = np.array(
+            [[obj.xmin, obj.ymin, obj.xmax, obj.ymax] for obj in objects],
+            dtype=np.float64
+        ).reshape(-1, 4)
+        return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
 
     def show_dect_eval_images(self, predictions, truth):
         """
@@ -513,13 +724,19 @@ class ObjectDetectionSegmentationDataset(Dataset):
             int_img = cv2.cvtColor(int_img, cv2.COLOR_BGR2GRAY)
             int_img = cv2.cvtColor(int_img, cv2.COLOR_GRAY2RGB)
             for i in gt:
-                mask_img = cv2.cvtColor(i.mask, cv2.COLOR_GRAY2RGB)
+                mask_img = cv2.cvtColor(
+                    mask_to_array(i.mask),
+                    cv2.COLOR_GRAY2RGB
+                )
                 mask_img = mask_img.astype('float32') / 255.0
                 mask_img *= np.array([0.1, 0.1, 0.5])
                 mask_img = np.multiply(mask_img, 255).astype('uint8')
                 int_img = cv2.addWeighted(int_img, 1, mask_img, 0.7, 0)
             for i in pred:
-                mask_img = cv2.cvtColor(i.mask, cv2.COLOR_GRAY2RGB)
+                mask_img = cv2.cvtColor(
+                    mask_to_array(i.mask),
+                    cv2.COLOR_GRAY2RGB
+                )
                 mask_img = mask_img.astype('float32') / 255.0
                 mask_img *= np.array([0.1, 0.5, 0.1])
                 mask_img = np.multiply(mask_img, 255).astype('uint8')
@@ -551,13 +768,9 @@ class ObjectDetectionSegmentationDataset(Dataset):
             self.show_segm_eval_images(predictions, truth)
 
     def evaluate(self, predictions, truth):
-        MIN_IOU = 0.5
         MAX_DETS = 100
         measurements = Measurements()
 
-        # TODO add support for specifying ground truth area ranges
-        # TODO add support for specifying IoU ranges
-
         for preds, groundtruths in zip(predictions, truth):
             # operate on a single image
             # first, let's sort predictions by score
@@ -565,56 +778,64 @@ class ObjectDetectionSegmentationDataset(Dataset):
 
             preds = preds[:MAX_DETS]
 
-            # store array of matched ground truth bounding boxes
-            matchedgt = np.zeros([len(groundtruths)], dtype=np.int32)
-
-            # for each prediction
-            for predid, pred in enumerate(preds):
-                # store index of best-matching ground truth
-                bestiou = 0.0
-                bestgt = -1
-                # iterate over ground truth
-                for gtid, gt in enumerate(groundtruths):
-                    # skip mismatching classes
-                    if pred.clsname != gt.clsname:
-                        continue
-                    # skip if ground truth is already matched and is not a
-                    # crowd
-                    if matchedgt[gtid] > 0 and not gt.iscrowd:
-                        continue
-                    iou = self.compute_iou(pred, gt)
-                    if iou < bestiou:
-                        continue
-                    bestiou = iou
-                    bestgt = gtid
-                if bestgt == -1 or bestiou < MIN_IOU:
-                    measurements.add_measurement(
-                        f'eval_det/{pred.clsname}',
-                        [[
-                            float(pred.score),
-                            float(0),
-                            float(bestiou)
-                        ]],
-                        lambda: list()
+            # predictions are matched only with ground truths of the same
+            # class, so classes are processed separately
+            classpreds = {}
+            for pred in preds:
+                classpreds.setdefault(pred.clsname, []).append(pred)
+            classgts = {}
+            for gt in groundtruths:
+                classgts.setdefault(gt.clsname, []).append(gt)
+
+            for clsname, clspreds in classpreds.items():
+                clsgts = classgts.get(clsname, [])
+                truepositives, bestious, matchedgts = match_predictions(
+                    self.compute_iou_matrix(clspreds, clsgts),
+                    np.array([bool(gt.iscrowd) for gt in clsgts], dtype=bool),  # noqa: E501
+                    IOU_THRESHOLDS
+                )
+                scores = np.array(
+                    [pred.score for pred in clspreds],
+                    dtype=np.float64
+                )
+                # for every IoU threshold, true positives are assigned to
+                # area ranges by the area of the matched ground truth, false
+                # positives by their own area
+                areas = np.repeat(
+                    self.compute_areas(clspreds)[:, np.newaxis],
+                    len(IOU_THRESHOLDS),
+                    axis=1
+                )
+                if len(clsgts) > 0:
+                    areas = np.where(
+                        matchedgts >= 0,
+                        self.compute_areas(clsgts)[matchedgts],
+                        areas
                     )
-                    continue
                 measurements.add_measurement(
-                    f'eval_det/{pred.clsname}',
-                    [[
-                        float(pred.score),
-                        float(1),
-                        float(bestiou)
-                    ]],
+                    f'eval_det/{clsname}',
+                    np.column_stack([
+                        scores,
+                        truepositives[:, 0],
+                        bestious,
+                        areas[:, 0],
+                        truepositives[:, 1:],
+                        areas[:, 1:]
+                    ]).tolist(),
                     lambda: list()
                 )
-                matchedgt[bestgt] = 1
 
-            for gt in groundtruths:
+            for clsname, clsgts in classgts.items():
                 measurements.accumulate(
-                    f'eval_gtcount/{gt.clsname}',
-                    1,
+                    f'eval_gtcount/{clsname}',
+                    len(clsgts),
                     lambda: 0
                 )
+                measurements.add_measurement(
+                    f'eval_gtareas/{clsname}',
+                    self.compute_areas(clsgts).tolist(),
+                    lambda: list()
+                )
 
         if self.show_on_eval:
             self.show_eval_images(predictions, truth)
@@ -0,0 +1,417 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Computation of detection quality metrics from collected measurements.
+
+Detections of every class are stored in ``eval_det/<class>`` measurements as
+rows with columns described by ``DET_*`` constants. Rows created by older
+versions of Kenning contain only the first three columns, in which case
+metrics are available only for IoU threshold 0.5 and without area ranges.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# IoU thresholds used in COCO evaluation (0.50:0.05:0.95)
+IOU_THRESHOLDS = [round(0.5 + 0.05 * i, 2) for i in range(10)]
+
+# Columns of detection records
+# score of the detection
+DET_SCORE = 0
+# 1 if the detection is a true positive at IoU threshold 0.5, 0 otherwise
+DET_TP = 1
+# IoU with the best-matching ground truth at IoU threshold 0.5
+DET_IOU = 2
+# area of the ground truth matched at IoU threshold 0.5, or of the detection
+# if it is not matched
+DET_AREA = 3
+# first of the true positive flags for IOU_THRESHOLDS[1:]
+DET_TP_IOUS = 4
+# first of the areas of matched ground truths (or of the detection) for
+# IOU_THRESHOLDS[1:]
+DET_AREA_IOUS = DET_TP_IOUS + len(IOU_THRESHOLDS) - 1
+
+DET_COLUMNS = DET_AREA_IOUS + len(IOU_THRESHOLDS) - 1
+
+# COCO area ranges for 640x480 images, as fractions of the image area, since
+# coordinates of objects are relative to image size
+AREA_RANGES = {
+    'all': (0.0, np.inf),
+    'small': (0.0, 32 ** 2 / (640 * 480)),
+    'medium': (32 ** 2 / (640 * 480), 96 ** 2 / (640 * 480)),
+    'large': (96 ** 2 / (640 * 480), np.inf),
+}
+
+
+def _to_rows(dets: Any) -> np.ndarray:
+    """
+    Converts detection records to a two-dimensional array.
+
+    Records with different numbers of columns (i.e. merged from different
+    versions) are truncated to the common columns.
+
+    Parameters
+    ----------
+    dets : Any
+        List or array of detection records
+
+    Returns
+    -------
+    np.ndarray : detection records, one per row
+    """
+    try:
+        rows = np.asarray(dets, dtype=np.float64)
+    except ValueError:
+        width = min(len(row) for row in dets)
+        rows = np.array([row[:width] for row in dets], dtype=np.float64)
+    if len(rows) == 0:
+        return np.zeros((0, DET_COLUMNS), dtype=np.float64)
+    return rows.reshape(len(rows), -1)
+
+
+class DetectionMetrics(object):
+    """
+    Computes recall-precision curves and mean Average Precision.
+
+    Detections of every class are converted to columnar arrays and sorted by
+    descending score once. Cumulative sums of true positives are computed
+    once per area range for all IoU thresholds, and then reused for all
+    score thresholds - the detections above the score threshold are a prefix
+    of the sorted detections. The precision envelope is computed with
+    ``np.maximum.accumulate``.
+    """
+
+    def __init__(self, measurementsdata: Dict, recallpoints: int = 101):
+        """
+        Prepares detections from measurements.
+
+        Parameters
+        ----------
+        measurementsdata : Dict
+            Data from Measurements object with ``class_names``,
+            ``eval_gtcount/<class>`` and ``eval_det/<class>`` fields, and
+            optionally ``eval_gtareas/<class>`` fields
+        recallpoints : int
+            Number of points to use for recall-precision curves, default 101
+            (as in COCO dataset evaluation)
+        """
+        self.class_names = list(measurementsdata['class_names'])
+        self.recallpoints = recallpoints
+        self.recallthresholds = np.linspace(0.0, 1.0, num=recallpoints)
+        self.gtcounts = []
+        self.gtareas = []
+        self.dets = []
+        width = DET_COLUMNS
+        for cls in self.class_names:
+            self.gtcounts.append(
+                measurementsdata.get(f'eval_gtcount/{cls}', 0)
+            )
+            gtareas = measurementsdata.get(f'eval_gtareas/{cls}')
+            self.gtareas.append(
+                None if gtareas is None
+                else np.asarray(gtareas, dtype=np.float64)
+            )
+            dets = _to_rows(measurementsdata.get(f'eval_det/{cls}', []))
+            # stable sort keeps the order of detections with equal scores
+            order = np.argsort(-dets[:, DET_SCORE], kind='stable')
+            # columns are stored as contiguous arrays
+            self.dets.append(np.ascontiguousarray(dets[order].T))
+            if len(dets) > 0:
+                width = min(width, dets.shape[1])
+        self.iou_thresholds = IOU_THRESHOLDS if width >= DET_AREA_IOUS \
+            else IOU_THRESHOLDS[:1]
+        # records without areas for every IoU threshold use the area from
+        # IoU threshold 0.5
+        self.has_threshold_areas = width >= DET_COLUMNS
+        self.has_areas = width > DET_AREA and all(
+            gtareas is not None or gtcount == 0
+            for gtareas, gtcount in zip(self.gtareas, self.gtcounts)
+        )
+        self._curves = {}
+
+    def _class_curves(
+            self,
+            clsid: int,
+            arearange: str) -> Optional[Tuple[np.ndarray, ...]]:
+        """
+        Computes cumulative recalls and precisions of the class.
+
+        Curves for all IoU thresholds are computed at once.
+
+        Parameters
+        ----------
+        clsid : int
+            Index of the class
+        arearange : str
+            Name of the area range from AREA_RANGES
+
+        Returns
+        -------
+        Optional[Tuple[np.ndarray, ...]] :
+            Scores of detections sorted by score, and recalls and precisions
+            of these detections, with a row for every IoU threshold, or None
+            if the class has no ground truths in the area range. Detections
+            outside of the area range repeat values of preceding detections,
+            so they do not affect interpolated precisions.
+        """
+        key = (clsid, arearange)
+        if key in self._curves:
+            return self._curves[key]
+        dets = self.dets[clsid]
+        gtcount = self.gtcounts[clsid]
+        columns = [DET_TP] + list(range(
+            DET_TP_IOUS,
+            DET_TP_IOUS + len(self.iou_thresholds) - 1
+        ))
+        scores = dets[DET_SCORE]
+        tps = dets[columns] != 0.0
+        if arearange != 'all':
+            if not self.has_areas:
+                raise ValueError('Measurements do not contain object areas')
+            low, high = AREA_RANGES[arearange]
+            if gtcount > 0:
+                gtareas = self.gtareas[clsid]
+                gtcount = np.count_nonzero(
+                    (gtareas >= low) & (gtareas <= high)
+                )
+            if self.has_threshold_areas:
+                areas = dets[[DET_AREA] + list(range(
+                    DET_AREA_IOUS,
+                    DET_AREA_IOUS + len(self.iou_thresholds) - 1
+                ))]
+            else:
+                areas = np.repeat(
+                    dets[DET_AREA][np.newaxis],
+                    len(self.iou_thresholds),
+                    axis=0
+                )
+            # detections in the range differ between IoU thresholds
+            inrange = (areas >= low) & (areas <= high)
+        else:
+            inrange = np.ones(tps.shape, dtype=bool)
+        if gtcount == 0:
+            self._curves[key] = None
+            return None
+        # detections outside of the range are excluded from cumulative sums
+        tpacc = np.cumsum(tps & inrange, axis=1).astype(np.float64)
+        # the number of true and false positives among first detections
+        detacc = np.cumsum(inrange, axis=1).astype(np.float64)
+        recalls = tpacc / gtcount
+        precisions = tpacc / (detacc + np.spacing(1))
+        self._curves[key] = (scores, recalls, precisions)
+        return self._curves[key]
+
+    def _interpolated_precisions(
+            self,
+            recalls: np.ndarray,
+            precisions: np.ndarray) -> np.ndarray:
+        """
+        Computes precisions at recall thresholds.
+
+        Parameters
+        ----------
+        recalls : np.ndarray
+            Cumulative recalls of detections sorted by score
+        precisions : np.ndarray
+            Cumulative precisions of detections sorted by score
+
+        Returns
+        -------
+        np.ndarray :
+            Highest precisions for recalls not lower than recall thresholds,
+            0 for recalls that are not reached
+        """
+        result = np.zeros(self.recallpoints, dtype=np.float32)
+        if len(precisions) == 0:
+            return result
+        envelope = np.maximum.accumulate(precisions[::-1])[::-1]
+        inds = np.searchsorted(recalls, self.recallthresholds, side='left')
+        valid = inds < len(envelope)
+        result[valid] = envelope[inds[valid]]
+        return result
+
+    def _precisions_per_threshold(
+            self,
+            clsid: int,
+            scorethresholds: List[float],
+            iouthresh: float,
+            arearange: str) -> Optional[List[np.ndarray]]:
+        """
+        Computes interpolated precisions of the class for score thresholds.
+
+        Parameters
+        ----------
+        clsid : int
+            Index of the class
+        scorethresholds : List[float]
+            Minimal scores of detections
+        iouthresh : float
+            IoU threshold, one of ``iou_thresholds``
+        arearange : str
+            Name of the area range from AREA_RANGES
+
+        Returns
+        -------
+        Optional[List[np.ndarray]] :
+            Interpolated precisions for every score threshold, or None if the
+            class has no ground truths in the area range
+        """
+        curves = self._class_curves(clsid, arearange)
+        if curves is None:
+            return None
+        thresholdid = self.iou_thresholds.index(iouthresh)
+        scores = curves[0]
+        recalls = curves[1][thresholdid]
+        precisions = curves[2][thresholdid]
+        # scores are sorted, so detections above a threshold form a prefix
+        counts = np.searchsorted(
+            -scores,
+            -np.asarray(scorethresholds, dtype=np.float64),
+            side='right'
+        )
+        results = {}
+        for count in set(counts.tolist()):
+            results[count] = self._interpolated_precisions(
+                recalls[:count],
+                precisions[:count]
+            )
+        return [results[count] for count in counts.tolist()]
+
+    def recall_precision(
+            self,
+            scorethresh: float = 0.5,
+            iouthresh: float = 0.5,
+            arearange: str = 'all') -> np.ndarray:
+        """
+        Computes recall and precision values at a given objectness threshold.
+
+        Parameters
+        ----------
+        scorethresh : float
+            Minimal objectness score threshold for detections
+        iouthresh : float
+            IoU threshold, one of ``iou_thresholds``
+        arearange : str
+            Name of the area range from AREA_RANGES
+
+        Returns
+        -------
+        np.ndarray :
+            Array with per-class recall and precision values, filled with -1
+            for classes without ground truths
+        """
+        lines = -np.ones(
+            [len(self.class_names), 2, self.recallpoints],
+            dtype=np.float32
+        )
+        for clsid in range(len(self.class_names)):
+            precisions = self._precisions_per_threshold(
+                clsid,
+                [scorethresh],
+                iouthresh,
+                arearange
+            )
+            if precisions is None:
+                continue
+            lines[clsid, 0] = self.recallthresholds
+            lines[clsid, 1] = precisions[0]
+        return lines
+
+    def map_per_threshold(
+            self,
+            scorethresholds: List[float],
+            iouthresh: float = 0.5,
+            arearange: str = 'all') -> np.ndarray:
+        """
+        Computes mAP values depending on the objectness threshold.
+
+        Parameters
+        ----------
+        scorethresholds : List[float]
+            List of threshold values to verify the mAP for
+        iouthresh : float
+            IoU threshold, one of ``iou_thresholds``
+        arearange : str
+            Name of the area range from AREA_RANGES
+
+        Returns
+        -------
+        np.ndarray :
+            mAP values for every threshold, NaN if there are no ground truths
+            in the area range
+        """
+        perclass = []
+        for clsid in range(len(self.class_names)):
+            precisions = self._precisions_per_threshold(
+                clsid,
+                scorethresholds,
+                iouthresh,
+                arearange
+            )
+            if precisions is not None:
+                perclass.append(precisions)
+        if not perclass:
+            # no ground truths in the area range
+            return np.full(len(scorethresholds), np.nan, dtype=np.float32)
+        return np.array(
+            [
+                np.mean(np.concatenate(
+                    [precisions[thresholdid] for precisions in perclass]
+                ))
+                for thresholdid in range(len(scorethresholds))
+            ],
+            dtype=np.float32
+        )
+
+    def mean_average_precision(
+            self,
+            iouthresholds: Optional[List[float]] = None,
+            arearange: str = 'all',
+            scorethresh: float = 0.0) -> Optional[float]:
+        """
+        Computes mAP averaged over IoU thresholds, as in COCO evaluation.
+
+        Parameters
+        ----------
+        iouthresholds : Optional[List[float]]
+            IoU thresholds, by default all available ``iou_thresholds``
+        arearange : str
+            Name of the area range from AREA_RANGES
+        scorethresh : float
+            Minimal objectness score threshold for detections
+
+        Returns
+        -------
+        Optional[float] :
+            mean Average Precision, or None if there are no ground truths in
+            the area range
+        """
+        if iouthresholds is None:
+            iouthresholds = self.iou_thresholds
+        if all(
+                self._class_curves(clsid, arearange) is None
+                for clsid in range(len(self.class_names))):
+            return None
+        return float(np.mean([
+            self.map_per_threshold([scorethresh], iouthresh, arearange)[0]
+            for iouthresh in iouthresholds
+        ]))
+
+    def true_positive_ious(self, clsid: int) -> np.ndarray:
+        """
+        Returns IoU values of true positives of the class at IoU 0.5.
+
+        Parameters
+        ----------
+        clsid : int
+            Index of the class
+
+        Returns
+        -------
+        np.ndarray : IoU values of true positives
+        """
+        dets = self.dets[clsid]
+        return dets[DET_IOU][dets[DET_TP] != 0.0]
@@ -0,0 +1,322 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Run-length encoded binary masks, compatible with the COCO RLE format.
+
+Masks are encoded in column-major order, as lengths of alternating runs of
+background and foreground pixels, starting with background (so the first
+count is 0 for masks starting with foreground). IoU of masks is computed
+directly on runs, without decoding masks.
+"""
+
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+
+def _counts_to_string(counts: np.ndarray) -> str:
+    """
+    Compresses run lengths to the COCO string format (as in pycocotools).
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Run lengths
+
+    Returns
+    -------
+    str : compressed run lengths
+    """
+    chars = []
+    counts = counts.tolist()
+    for i, count in enumerate(counts):
+        value = count - counts[i - 2] if i > 2 else count
+        more = True
+        while more:
+            char = value & 0x1f
+            value >>= 5
+            more = value != -1 if char & 0x10 else value != 0
+            if more:
+                char |= 0x20
+            chars.append(chr(char + 48))
+    return ''.join(chars)
+
+
+def _counts_from_string(string: str) -> np.ndarray:
+    """
+    Decompresses run lengths from the COCO string format.
+
+    Parameters
+    ----------
+    string : str
+        Compressed run lengths
+
+    Returns
+    -------
+    np.ndarray : run lengths
+    """
+    counts = []
+    position = 0
+    while position < len(string):
+        value = 0
+        shift = 0
+        more = True
+        while more:
+            char = ord(string[position]) - 48
+            value |= (char & 0x1f) << shift
+            more = char & 0x20
+            position += 1
+            shift += 5
+            if not more and char & 0x10:
+                value |= -1 << shift
+        if len(counts) > 2:
+            value += counts[-2]
+        counts.append(value)
+    return np.array(counts, dtype=np.uint32)
+
+
+class RLEMask(object):
+    """
+    Binary mask stored as run lengths.
+
+    ``np.asarray`` on the mask returns the decoded mask, with 255 for
+    foreground pixels, as dense masks used in Kenning.
+    """
+
+    def __init__(self, size: Tuple[int, int], counts: np.ndarray):
+        """
+        Creates the mask from run lengths.
+
+        Parameters
+        ----------
+        size : Tuple[int, int]
+            Height and width of the mask
+        counts : np.ndarray
+            Lengths of alternating background and foreground runs in
+            column-major order, starting with background
+        """
+        self.size = (int(size[0]), int(size[1]))
+        self.counts = np.asarray(counts, dtype=np.uint32)
+
+    @classmethod
+    def from_array(cls, mask: np.ndarray) -> 'RLEMask':
+        """
+        Encodes the dense mask.
+
+        Parameters
+        ----------
+        mask : np.ndarray
+            Mask of shape (height, width) or (height, width, 1), positive
+            values are foreground
+
+        Returns
+        -------
+        RLEMask : encoded mask
+        """
+        mask = np.asarray(mask)
+        if mask.ndim == 3 and mask.shape[-1] == 1:
+            mask = mask[..., 0]
+        if mask.ndim != 2:
+            raise ValueError(f'Expected two-dimensional mask, got {mask.shape}')  # noqa: E501
+        flat = mask.ravel(order='F') > 0
+        if len(flat) == 0:
+            return cls(mask.shape, np.zeros(0, dtype=np.uint32))
+        changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+        counts = np.diff(np.concatenate([[0], changes, [len(flat)]]))
+        if flat[0]:
+            counts = np.concatenate([[0], counts])
+        return cls(mask.shape, counts)
+
+    @classmethod
+    def from_coco(cls, rle: Dict) -> 'RLEMask':
+        """
+        Creates the mask from the COCO RLE dictionary.
+
+        Parameters
+        ----------
+        rle : Dict
+            Dictionary with ``size`` and ``counts`` - list of run lengths, or
+            a string with compressed run lengths
+
+        Returns
+        -------
+        RLEMask : the mask
+        """
+        counts = rle['counts']
+        if isinstance(counts, bytes):
+            counts = counts.decode('ascii')
+        if isinstance(counts, str):
+            counts = _counts_from_string(counts)
+        return cls(rle['size'], counts)
+
+    def to_coco(self, compress: bool = True) -> Dict:
+        """
+        Converts the mask to the COCO RLE dictionary.
+
+        Parameters
+        ----------
+        compress : bool
+            True if run lengths should be compressed to a string
+
+        Returns
+        -------
+        Dict : dictionary with ``size`` and ``counts``
+        """
+        return {
+            'size': list(self.size),
+            'counts': _counts_to_string(self.counts) if compress
+            else self.counts.tolist()
+        }
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.size
+
+    def toarray(self) -> np.ndarray:
+        """
+        Decodes the mask.
+
+        Returns
+        -------
+        np.ndarray : mask with 255 for foreground and 0 for background
+        """
+        height, width = self.size
+        values = np.zeros(len(self.counts), dtype=np.uint8)
+        values[1::2] = 255
+        return np.repeat(values, self.counts).reshape(
+            (height, width),
+            order='F'
+        )
+
+    def __array__(self, dtype=None) -> np.ndarray:
+        mask = self.toarray()
+        return mask if dtype is None else mask.astype(dtype)
+
+    def intervals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns foreground runs as intervals of column-major indices.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray] :
+            Starts and ends (exclusive) of foreground runs
+        """
+        bounds = np.cumsum(self.counts, dtype=np.int64)
+        ends = bounds[1::2]
+        return bounds[0::2][:len(ends)], ends
+
+    def area(self) -> int:
+        """
+        Returns the number of foreground pixels.
+
+        Returns
+        -------
+        int : area of the mask
+        """
+        return int(np.sum(self.counts[1::2], dtype=np.int64))
+
+
+def to_rle(mask: Union[np.ndarray, RLEMask]) -> RLEMask:
+    """
+    Encodes the mask, unless it is already encoded.
+
+    Parameters
+    ----------
+    mask : Union[np.ndarray, RLEMask]
+        Dense or encoded mask
+
+    Returns
+    -------
+    RLEMask : encoded mask
+    """
+    if isinstance(mask, RLEMask):
+        return mask
+    return RLEMask.from_array(mask)
+
+
+def mask_to_array(mask: Union[np.ndarray, RLEMask]) -> np.ndarray:
+    """
+    Decodes the mask, unless it is already dense.
+
+    Parameters
+    ----------
+    mask : Union[np.ndarray, RLEMask]
+        Dense or encoded mask
+
+    Returns
+    -------
+    np.ndarray : dense mask
+    """
+    if isinstance(mask, RLEMask):
+        return mask.toarray()
+    return mask
+
+
+def compute_rle_iou_matrix(
+        preds: List[RLEMask],
+        groundtruths: List[RLEMask]) -> np.ndarray:
+    """
+    Computes IoU between all pairs of encoded masks.
+
+    For every prediction, the intersection with all ground truths is computed
+    at once from the cumulative foreground length of the prediction at starts
+    and ends of foreground runs of ground truths. For pairs with empty union
+    IoU is 0.
+
+    Parameters
+    ----------
+    preds : List[RLEMask]
+        Predicted masks
+    groundtruths : List[RLEMask]
+        Ground truth masks, of the same size as predicted masks
+
+    Returns
+    -------
+    np.ndarray :
+        Matrix of IoU values, with a row for every prediction and a column
+        for every ground truth
+    """
+    ious = np.zeros((len(preds), len(groundtruths)), dtype=np.float64)
+    if len(preds) == 0 or len(groundtruths) == 0:
+        return ious
+    sizes = set(mask.size for mask in preds + groundtruths)
+    if len(sizes) > 1:
+        raise ValueError(f'Masks have different sizes: {sorted(sizes)}')
+    gtintervals = [gt.intervals() for gt in groundtruths]
+    gtstarts = np.concatenate([starts for starts, _ in gtintervals])
+    gtends = np.concatenate([ends for _, ends in gtintervals])
+    gtowners = np.repeat(
+        np.arange(len(groundtruths)),
+        [len(starts) for starts, _ in gtintervals]
+    )
+    gtareas = np.array([gt.area() for gt in groundtruths], dtype=np.int64)
+
+    def covered(starts: np.ndarray, ends: np.ndarray, positions: np.ndarray):
+        # foreground length of the mask before the positions
+        lengths = np.concatenate([[0], np.cumsum(ends - starts)])
+        runs = np.searchsorted(starts, positions, side='left')
+        # the last run starting before the position can extend beyond it
+        overflow = np.where(
+            runs > 0,
+            ends[np.maximum(runs - 1, 0)] - positions,
+            0
+        ) if len(ends) > 0 else np.zeros_like(positions)
+        return lengths[runs] - np.maximum(overflow, 0)
+
+    for predid, pred in enumerate(preds):
+        starts, ends = pred.intervals()
+        if len(starts) == 0:
+            intersections = np.zeros(len(groundtruths), dtype=np.int64)
+        else:
+            intersections = np.bincount(
+                gtowners,
+                weights=covered(starts, ends, gtends) -
+                covered(starts, ends, gtstarts),
+                minlength=len(groundtruths)
+            ).astype(np.int64)
+        unions = pred.area() + gtareas - intersections
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ious[predid] = np.where(unions != 0, intersections / unions, 0.0)
+    return ious
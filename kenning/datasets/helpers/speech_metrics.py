@@ -0,0 +1,211 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Edit distance and error rates of speech-to-text transcripts.
+
+The edit distance is computed with the bit-parallel algorithm by Myers
+(in the variant for the global distance by Hyyrö) - a column of the dynamic
+programming matrix is represented with bit vectors of vertical differences,
+stored in Python integers, so every element of the second sequence is
+processed with a few integer operations regardless of the length of the
+first one.
+"""
+
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+import string
+
+import numpy as np
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+
+def normalize_transcript(text: str) -> str:
+    """
+    Removes punctuation and surrounding whitespace, converts to lowercase.
+
+    Parameters
+    ----------
+    text : str
+        Transcript
+
+    Returns
+    -------
+    str :
+        Normalized transcript
+    """
+    return text.translate(_PUNCTUATION).lower().strip()
+
+
+def levenshtein_distance(a: Sequence[Hashable], b: Sequence[Hashable]) -> int:
+    """
+    Computes the Levenshtein distance between sequences.
+
+    Sequences can contain any hashable elements - characters of strings for
+    the character-level distance, words for the word-level distance.
+
+    Parameters
+    ----------
+    a : Sequence[Hashable]
+        First sequence
+    b : Sequence[Hashable]
+        Second sequence
+
+    Returns
+    -------
+    int :
+        Minimal number of insertions, deletions and substitutions
+        transforming one sequence to the other
+    """
+    # bit vectors are as long as the shorter sequence
+    if len(a) > len(b):
+        a, b = b, a
+    if len(a) == 0:
+        return len(b)
+    peq: Dict[Hashable, int] = {}
+    for i, element in enumerate(a):
+        peq[element] = peq.get(element, 0) | (1 << i)
+    mask = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    pv, mv = mask, 0
+    distance = len(a)
+    for element in b:
+        eq = peq.get(element, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            distance += 1
+        elif mh & last:
+            distance -= 1
+        # the first row of the matrix grows by one in every column
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return distance
+
+
+def edit_distances(
+        predictions: Iterable[Sequence[Hashable]],
+        references: Iterable[Sequence[Hashable]]) -> np.ndarray:
+    """
+    Computes Levenshtein distances for pairs of sequences.
+
+    Parameters
+    ----------
+    predictions : Iterable[Sequence[Hashable]]
+        Predicted sequences
+    references : Iterable[Sequence[Hashable]]
+        Reference sequences
+
+    Returns
+    -------
+    np.ndarray :
+        Distances between corresponding sequences
+    """
+    return np.fromiter(
+        (levenshtein_distance(p, r) for p, r in zip(predictions, references)),
+        dtype=np.int64
+    )
+
+
+def transcript_errors(
+        predictions: List[str],
+        references: List[str],
+        normalize: bool = True) -> Tuple[np.ndarray, ...]:
+    """
+    Computes character and word errors of the batch of transcripts.
+
+    Parameters
+    ----------
+    predictions : List[str]
+        Predicted transcripts
+    references : List[str]
+        Ground truth transcripts
+    normalize : bool
+        True if transcripts should be normalized with `normalize_transcript`
+
+    Returns
+    -------
+    Tuple[np.ndarray, ...] :
+        Character errors, lengths of references in characters, word errors
+        and lengths of references in words, for every transcript
+    """
+    if normalize:
+        predictions = [normalize_transcript(p) for p in predictions]
+        references = [normalize_transcript(r) for r in references]
+    predictedwords = [p.split() for p in predictions]
+    referencewords = [r.split() for r in references]
+    return (
+        edit_distances(predictions, references),
+        np.array([len(r) for r in references], dtype=np.int64),
+        edit_distances(predictedwords, referencewords),
+        np.array([len(r) for r in referencewords], dtype=np.int64)
+    )
+
+
+def character_error_rate(
+        predictions: List[str],
+        references: List[str],
+        normalize: bool = True) -> float:
+    """
+    Computes the character error rate of transcripts.
+
+    Errors of all transcripts are summed and divided by the total length of
+    references, so long transcripts have a proportionally larger weight.
+
+    Parameters
+    ----------
+    predictions : List[str]
+        Predicted transcripts
+    references : List[str]
+        Ground truth transcripts
+    normalize : bool
+        True if transcripts should be normalized with `normalize_transcript`
+
+    Returns
+    -------
+    float :
+        Character error rate
+    """
+    errors, lengths, _, _ = transcript_errors(
+        predictions,
+        references,
+        normalize
+    )
+    return float(errors.sum() / max(lengths.sum(), 1))
+
+
+def word_error_rate(
+        predictions: List[str],
+        references: List[str],
+        normalize: bool = True) -> float:
+    """
+    Computes the word error rate of transcripts.
+
+    Errors of all transcripts are summed and divided by the total number of
+    words in references.
+
+    Parameters
+    ----------
+    predictions : List[str]
+        Predicted transcripts
+    references : List[str]
+        Ground truth transcripts
+    normalize : bool
+        True if transcripts should be normalized with `normalize_transcript`
+
+    Returns
+    -------
+    float :
+        Word error rate
+    """
+    _, _, errors, lengths = transcript_errors(
+        predictions,
+        references,
+        normalize
+    )
+    return float(errors.sum() / max(lengths.sum(), 1))
@@ -14,7 +14,7 @@ from typing import Optional
 
 from kenning.core.dataset import Dataset
 from kenning.core.dataset import CannotDownloadDatasetError
-from kenning.core.measurements import Measurements
+from kenning.datasets.helpers.classification import ClassificationEvaluator
 
 
 class ImageNetDataset(Dataset):
@@ -38,6 +38,10 @@ class ImageNetDataset(Dataset):
         `ImageNet site <https://image-net.org/index.php>`_.
     """
 
+    cache_ignored_arguments = Dataset.cache_ignored_arguments + [
+        'record_top_5'
+    ]
+
     arguments_structure = {
         'image_memory_layout': {
             'argparse_name': '--image-memory-layout',
@@ -51,6 +55,12 @@ class ImageNetDataset(Dataset):
             'default': 'caffe',
             'enum': ['caffe', 'tf', 'torch', 'none']
         },
+        'record_top_5': {
+            'argparse_name': '--disable-top-5-records',
+            'description': 'Disables recording top 5 classes of every sample in measurements',  # noqa: E501
+            'type': bool,
+            'default': True
+        },
     }
 
     def __init__(
@@ -60,7 +70,14 @@ class ImageNetDataset(Dataset):
             download_dataset: bool = False,
             external_calibration_dataset: Optional[Path] = None,
             image_memory_layout: str = 'NHWC',
-            preprocess_type: str = 'caffe'):
+            preprocess_type: str = 'caffe',
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0,
+            record_top_5: bool = True):
         """
         Prepares all structures and data required for providing data samples.
 
@@ -90,6 +107,23 @@ class ImageNetDataset(Dataset):
                 * torch - will apply torch standardization
                 * caffe - will convert RGB to BGR and apply standardization
                 * none - data is passed as is from file, without conversions
+        prefetch_workers : int
+            Number of workers loading next batches in the background during
+            iteration. If 0, batches are loaded on demand.
+        prefetch_depth : int
+            Maximum number of batches loaded ahead of the current one
+        prefetch_executor : str
+            Type of prefetching workers, 'thread' or 'process'
+        samples_cache_dir : Optional[Path]
+            Path to the directory with the persistent cache of preprocessed
+            input samples. If None, samples are not cached.
+        num_shards : int
+            Number of shards the dataset is split into
+        shard_index : int
+            Index of the shard provided by the dataset
+        record_top_5 : bool
+            True if top 5 classes of every sample should be recorded in the
+            top_5 measurement
         """
         assert image_memory_layout in ['NHWC', 'NCHW']
         assert preprocess_type in ['caffe', 'torch', 'tf', 'none']
@@ -97,11 +131,18 @@ class ImageNetDataset(Dataset):
         self.classnames = dict()
         self.image_memory_layout = image_memory_layout
         self.preprocess_type = preprocess_type
+        self.record_top_5 = record_top_5
         super().__init__(
             root,
             batch_size,
             download_dataset,
-            external_calibration_dataset
+            external_calibration_dataset,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
         )
 
     @classmethod
@@ -112,7 +153,14 @@ class ImageNetDataset(Dataset):
             args.download_dataset,
             args.external_calibration_dataset,
             args.image_memory_layout,
-            args.preprocess_type
+            args.preprocess_type,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index,
+            record_top_5=args.record_top_5
         )
 
     def download_dataset_fun(self):
@@ -168,28 +216,19 @@ class ImageNetDataset(Dataset):
         return list(np.eye(self.numclasses)[samples])
 
     def evaluate(self, predictions, truth):
-        confusion_matrix = np.zeros((self.numclasses, self.numclasses))
-        top_5_count = 0
-        currindex = self._dataindex - len(predictions)
-        top_5_results = []
-        for prediction, label in zip(predictions, truth):
-            confusion_matrix[np.argmax(label), np.argmax(prediction)] += 1
-            top_5 = np.argsort(prediction)[::-1][:5]
-            top_5_count += 1 if np.argmax(label) in top_5 else 0
-            top_5_results.append(
-                {Path(self.dataX[currindex]).name: top_5.tolist()}
-            )
-            currindex += 1
-        measurements = Measurements()
-        measurements.accumulate(
-            'eval_confusion_matrix',
-            confusion_matrix,
-            lambda: np.zeros((self.numclasses, self.numclasses))
+        evaluator = ClassificationEvaluator(
+            self.numclasses,
+            top_k=5,
+            record_top_k=self.record_top_5
         )
-        measurements.add_measurement('top_5', top_5_results)
-        measurements.accumulate('top_5_count', top_5_count, lambda: 0)
-        measurements.accumulate('total', len(predictions), lambda: 0)
-        return measurements
+        names = None
+        if self.record_top_5:
+            currindex = self._dataindex - len(predictions)
+            names = [
+                Path(sample).name
+                for sample in self.dataX[currindex:currindex + len(predictions)]  # noqa: E501
+            ]
+        return evaluator.evaluate(predictions, truth, names)
 
     def get_class_names(self):
         return self.classnames
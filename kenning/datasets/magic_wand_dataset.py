@@ -6,12 +6,71 @@ from pathlib import Path
 import tarfile
 import tempfile
 import glob
+import hashlib
+import json
 import os
+import re
 import numpy as np
 
 from kenning.core.dataset import Dataset
-from kenning.utils.logger import download_url
-from kenning.core.measurements import Measurements
+from kenning.utils.atomic_file import replace_file
+from kenning.utils.logger import download_url, get_logger
+from kenning.datasets.helpers.classification import ClassificationEvaluator
+
+# Version of the windows cache layout, part of the cache key
+WINDOWS_CACHE_VERSION = 1
+WINDOWS_CACHE_DIR = '.windows-cache'
+
+_NUMBER = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+# whitespace other than line breaks
+_WHITESPACE = re.compile(r'[^\S\n]+')
+# lines without exactly three comma-separated fields
+_IGNORED_LINE = re.compile(
+    r'^(?![^,\n]*,[^,\n]*,[^,\n]*$)[^\n]*\n',
+    re.MULTILINE
+)
+# lines with three fields that are not all numbers
+_SEPARATOR_LINE = re.compile(
+    f'^(?!{_NUMBER},{_NUMBER},{_NUMBER}$)[^\\n]+\\n',
+    re.MULTILINE
+)
+
+
+def parse_gesture_file(path: Path) -> List[np.ndarray]:
+    """
+    Parses recordings of gestures from the Magic Wand data file.
+
+    Lines of the file contain three comma-separated values, recordings are
+    separated with lines with non-numeric values (i.e. ``-,-,-``). Only
+    recordings followed by a separator are returned, other lines are
+    ignored. Lines are classified with regular expressions applied to the
+    whole file, and values of every recording are converted at once.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the data file
+
+    Returns
+    -------
+    List[np.ndarray] :
+        Recordings, as arrays of shape (length, 3)
+    """
+    with open(path) as datafile:
+        text = datafile.read()
+    if not text.endswith('\n'):
+        text += '\n'
+    text = _IGNORED_LINE.sub('', _WHITESPACE.sub('', text))
+    # the last chunk is not followed by a separator
+    chunks = _SEPARATOR_LINE.split(text)[:-1]
+    return [
+        np.fromstring(
+            chunk.replace('\n', ',')[:-1],
+            dtype=np.float32,
+            sep=','
+        ).reshape(-1, 3)
+        for chunk in chunks if chunk
+    ]
 
 
 class MagicWandDataset(Dataset):
@@ -20,8 +79,17 @@ class MagicWandDataset(Dataset):
 
     It is a classification dataset with 4 classes representing different
     gestures captured by accelerometer and gyroscope.
+
+    Recordings are padded with noise and split into windows, delivered as a
+    contiguous array of shape (N, window_size, 3). Windows are cached in the
+    dataset directory, and the noise is generated from the seed, so the
+    cached windows are the same as the ones computed again.
     """
 
+    cache_ignored_arguments = Dataset.cache_ignored_arguments + [
+        'use_windows_cache'
+    ]
+
     arguments_structure = {
         'window_size': {
             'argparse_name': '--window-size',
@@ -40,6 +108,18 @@ class MagicWandDataset(Dataset):
             'description': 'Determines the level of noise added as padding',
             'default': 20,
             'type': int
+        },
+        'noise_seed': {
+            'argparse_name': '--noise-seed',
+            'description': 'Seed of the noise added as padding',
+            'default': 12345,
+            'type': int
+        },
+        'use_windows_cache': {
+            'argparse_name': '--disable-windows-cache',
+            'description': 'Parse data files on every run instead of loading cached windows',  # noqa: E501
+            'type': bool,
+            'default': True
         }
     }
 
@@ -51,7 +131,15 @@ class MagicWandDataset(Dataset):
             external_calibration_dataset: Optional[Path] = None,
             window_size: int = 128,
             window_shift: int = 128,
-            noise_level: int = 20):
+            noise_level: int = 20,
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0,
+            noise_seed: int = 12345,
+            use_windows_cache: bool = True):
         """
         Prepares all structures and data required for providing data samples.
 
@@ -73,15 +161,41 @@ class MagicWandDataset(Dataset):
             Shift of single sample window
         noise_level : int
             Noise level of padding added to sample
+        prefetch_workers : int
+            Number of workers loading next batches in the background during
+            iteration. If 0, batches are loaded on demand.
+        prefetch_depth : int
+            Maximum number of batches loaded ahead of the current one
+        prefetch_executor : str
+            Type of prefetching workers, 'thread' or 'process'
+        samples_cache_dir : Optional[Path]
+            Path to the directory with the persistent cache of preprocessed
+            input samples. If None, samples are not cached.
+        num_shards : int
+            Number of shards the dataset is split into
+        shard_index : int
+            Index of the shard provided by the dataset
+        noise_seed : int
+            Seed of the noise added as padding
+        use_windows_cache : bool
+            True if windows should be cached in the dataset directory
         """
         self.window_size = window_size
         self.window_shift = window_shift
         self.noise_level = noise_level
+        self.noise_seed = noise_seed
+        self.use_windows_cache = use_windows_cache
         super().__init__(
             root,
             batch_size,
             download_dataset,
-            external_calibration_dataset
+            external_calibration_dataset,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
         )
 
     @classmethod
@@ -93,7 +207,15 @@ class MagicWandDataset(Dataset):
             args.external_calibration_dataset,
             args.window_size,
             args.window_shift,
-            args.noise_level
+            args.noise_level,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index,
+            noise_seed=args.noise_seed,
+            use_windows_cache=args.use_windows_cache
         )
 
     def rev_class_id(self, classname: str) -> int:
@@ -122,41 +244,120 @@ class MagicWandDataset(Dataset):
             3: 'negative'
         }
         self.numclasses = 4
-        tmp_dataX = []
-        tmp_dataY = []
+        files = []
         for class_name in self.classnames.values():
             path = self.root / class_name
             if not path.is_dir():
                 raise FileNotFoundError
-            class_id = self.rev_class_id(class_name)
-            for file in glob.glob(str(path / '*.txt')):
-                data_frame = []
-                with open(file) as f:
-                    for line in f:
-                        line_split = line.strip().split(',')
-                        if len(line_split) != 3:
-                            continue
-                        try:
-                            values = [float(i) for i in line_split]
-                            data_frame.append(values)
-                        except ValueError:
-                            if data_frame:
-                                tmp_dataX.append(data_frame)
-                                tmp_dataY.append(class_id)
-                                data_frame = []
-
-        self.dataX = []
-        self.dataY = []
-        for data, label in zip(tmp_dataX, tmp_dataY):
-            padded_data = np.array(self.split_sample_to_windows(
-                self.generate_padding(data)
-            ))
-            for sample in padded_data:
-                self.dataX.append(sample)
-                self.dataY.append(np.eye(self.numclasses)[label])
+            files.append(sorted(path.glob('*.txt')))
+
+        cachepath = self.get_windows_cache_path(files)
+        if self.use_windows_cache and cachepath.exists():
+            with np.load(cachepath) as cached:
+                self.dataX = cached['windows']
+                labels = cached['labels']
+        else:
+            self.dataX, labels = self.compute_windows(files)
+            if self.use_windows_cache:
+                self.save_windows_cache(cachepath, self.dataX, labels)
+        self.dataY = np.eye(self.numclasses)[labels]
 
         assert len(self.dataX) == len(self.dataY)
 
+    def compute_windows(
+            self,
+            files: List[List[Path]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Parses data files, pads recordings and splits them into windows.
+
+        Parameters
+        ----------
+        files : List[List[Path]]
+            Data files of every class
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray] :
+            Windows of shape (N, window_size, 3) and their class ids
+        """
+        self._rng = np.random.default_rng(self.noise_seed)
+        windows = [np.zeros((0, self.window_size, 3), dtype=np.float32)]
+        labels = [np.zeros(0, dtype=np.int64)]
+        for class_id, classfiles in enumerate(files):
+            for file in classfiles:
+                for data_frame in parse_gesture_file(file):
+                    samplewindows = self.split_sample_to_windows(
+                        self.generate_padding(data_frame)
+                    )
+                    windows.append(samplewindows)
+                    labels.append(np.full(len(samplewindows), class_id))
+        return np.concatenate(windows), np.concatenate(labels)
+
+    def get_windows_cache_path(self, files: List[List[Path]]) -> Path:
+        """
+        Returns the path to windows cached for current data files and
+        parameters.
+
+        Parameters
+        ----------
+        files : List[List[Path]]
+            Data files of every class
+
+        Returns
+        -------
+        Path :
+            Path to the cache file
+        """
+        key = {
+            'version': WINDOWS_CACHE_VERSION,
+            'window_size': self.window_size,
+            'window_shift': self.window_shift,
+            'noise_level': self.noise_level,
+            'noise_seed': self.noise_seed,
+            'files': [
+                [
+                    str(file.relative_to(self.root)),
+                    file.stat().st_size,
+                    file.stat().st_mtime_ns
+                ]
+                for classfiles in files for file in classfiles
+            ]
+        }
+        keyhash = hashlib.sha256(
+            json.dumps(key, sort_keys=True).encode()
+        ).hexdigest()[:16]
+        return self.root / WINDOWS_CACHE_DIR / f'{keyhash}.npz'
+
+    def save_windows_cache(
+            self,
+            cachepath: Path,
+            windows: np.ndarray,
+            labels: np.ndarray):
+        """
+        Atomically writes windows to the cache file.
+
+        Parameters
+        ----------
+        cachepath : Path
+            Path to the cache file
+        windows : np.ndarray
+            Windows of recordings
+        labels : np.ndarray
+            Class ids of windows
+        """
+        try:
+            cachepath.parent.mkdir(parents=True, exist_ok=True)
+            replace_file(
+                cachepath,
+                lambda cachefile: np.savez(
+                    cachefile,
+                    windows=windows,
+                    labels=labels
+                )
+            )
+        except OSError as ex:
+            get_logger().warning(f'Windows were not cached: {ex}')
+
     def download_dataset_fun(self):
         dataset_url = r'http://download.tensorflow.org/models/tflite/magic_wand/data.tar.gz'  # noqa: E501
         with tempfile.TemporaryDirectory() as tempdir:
@@ -176,7 +377,7 @@ class MagicWandDataset(Dataset):
             self,
             noise_level: int,
             amount: int,
-            neighbor: List) -> List:
+            neighbor: np.ndarray) -> np.ndarray:
         """
         Generates noise padding of given length.
 
@@ -186,34 +387,38 @@ class MagicWandDataset(Dataset):
             Level of generated noise
         amount : int
             Length of generated noise
-        neighbor : List
+        neighbor : np.ndarray
             Neighbor data
 
         Returns
         -------
-        List :
+        np.ndarray :
             Neighbor data with noise padding
         """
-        padding = (np.round((np.random.rand(amount, 3) - 0.5)*noise_level, 1)
-                   + neighbor)
-        return [list(i) for i in padding]
+        if getattr(self, '_rng', None) is None:
+            self._rng = np.random.default_rng(self.noise_seed)
+        return (
+            np.round((self._rng.random((amount, 3)) - 0.5)*noise_level, 1)
+            + neighbor
+        )
 
     def generate_padding(
             self,
-            data_frame: List) -> List:
+            data_frame: np.ndarray) -> np.ndarray:
         """
         Generates neighbor-based padding around a given data frame
 
         Parameters
         ----------
-        data_frame : List
+        data_frame : np.ndarray
             A frame of data to be padded
 
         Returns
         -------
-        List :
+        np.ndarray :
             The padded data frame
         """
+        data_frame = np.asarray(data_frame, dtype=np.float32)
         pre_padding = self._generate_padding(
             self.noise_level,
             abs(self.window_size - len(data_frame)) % self.window_size,
@@ -227,23 +432,18 @@ class MagicWandDataset(Dataset):
             post_len,
             data_frame[-1]
         )
-        return pre_padding + data_frame + post_padding
+        return np.concatenate(
+            [pre_padding, data_frame, post_padding]
+        ).astype(np.float32)
 
     def get_class_names(self) -> List[str]:
         return list(self.classnames.values())
 
     def evaluate(self, predictions, truth):
-        confusion_matrix = np.zeros((self.numclasses, self.numclasses))
-        for prediction, label in zip(predictions, truth):
-            confusion_matrix[np.argmax(label), np.argmax(prediction)] += 1
-        measurements = Measurements()
-        measurements.accumulate(
-            'eval_confusion_matrix',
-            confusion_matrix,
-            lambda: np.zeros((self.numclasses, self.numclasses))
+        return ClassificationEvaluator(self.numclasses, top_k=None).evaluate(
+            predictions,
+            truth
         )
-        measurements.accumulate('total', len(predictions), lambda: 0)
-        return measurements
 
     def get_input_mean_std(self) -> Tuple[Any, Any]:
         return (
@@ -253,20 +453,28 @@ class MagicWandDataset(Dataset):
 
     def split_sample_to_windows(
             self,
-            data_frame: List) -> np.ndarray:
+            data_frame: np.ndarray) -> np.ndarray:
         """
         Splits given data sample into windows.
 
+        Windows of `window_size` entries start every `window_shift` entries,
+        trailing entries not filling the whole window are dropped.
+
         Parameters
         ----------
-        data_frame : List
+        data_frame : np.ndarray
             Data sample to be split
 
         Returns
         -------
         np.ndarray :
-            Data sample split into windows
+            Data sample split into windows, of shape (N, window_size, 3)
         """
-        return np.array(np.array_split(
-            data_frame, len(data_frame) // self.window_size, axis=0
-        ))
+        data_frame = np.asarray(data_frame)
+        if len(data_frame) < self.window_size:
+            return np.zeros((0, self.window_size, 3), dtype=data_frame.dtype)
+        return np.ascontiguousarray(np.lib.stride_tricks.sliding_window_view(
+            data_frame,
+            self.window_size,
+            axis=0
+        )[::self.window_shift].transpose(0, 2, 1))
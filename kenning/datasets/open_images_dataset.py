@@ -18,24 +18,24 @@ from math import floor, ceil
 import cv2
 import sys
 import psutil
-from concurrent import futures
 import botocore
-import tqdm
-import boto3
 import pandas as pd
 import shutil
 from pathlib import Path
 import re
 import numpy as np
-from typing import Tuple, List, Optional
-from collections import defaultdict
+from typing import Dict, Tuple, List, Optional
 if sys.version_info.minor < 9:
     from importlib_resources import path
 else:
     from importlib.resources import path
 
 from kenning.resources import coco_detection
-from kenning.utils.logger import download_url
+from kenning.utils.annotation_index import ANNOTATION_INDEX_DIR
+from kenning.utils.annotation_index import group_by_image
+from kenning.utils.annotation_index import load_annotation_index
+from kenning.utils.downloader import DOWNLOAD_MANIFEST
+from kenning.utils.downloader import Downloader
 
 import zipfile
 
@@ -43,8 +43,10 @@ from kenning.datasets.helpers.detection_and_segmentation import \
         DectObject, \
         SegmObject, \
         ObjectDetectionSegmentationDataset
+from kenning.datasets.helpers.rle import RLEMask
 
 BUCKET_NAME = 'open-images-dataset'
+BUCKET_URL = f'https://{BUCKET_NAME}.s3.amazonaws.com'
 REGEX = r'(test|train|validation|challenge2018)/([a-fA-F0-9]*)'
 
 
@@ -125,6 +127,10 @@ def download_all_images(
     """
     Downloads all images specified in list of images.
 
+    Images are downloaded over HTTPS from the public bucket. Downloaded
+    images are recorded in the manifest in `download_folder`, so they are
+    skipped when the download is repeated.
+
     Parameters
     ----------
     download_folder : Path
@@ -134,35 +140,19 @@ def download_all_images(
     num_processes : int
         Number of threads to use for image download
     """
-    bucket = boto3.resource(
-        's3', config=botocore.config.Config(
-            signature_version=botocore.UNSIGNED
-        )
-    ).Bucket(BUCKET_NAME)
-
     download_folder.mkdir(parents=True, exist_ok=True)
     image_list = list(check_and_homogenize_image_list(image_list))
 
-    progress_bar = tqdm.tqdm(
-        total=len(image_list),
-        desc='Downloading images',
-        leave=True
-    )
-    with futures.ThreadPoolExecutor(
-            max_workers=num_processes) as executor:
-        all_futures = [
-            executor.submit(
-                download_one_image,
-                bucket,
-                split,
-                image_id,
-                download_folder
+    Downloader(num_workers=num_processes).download(
+        [
+            (
+                f'{BUCKET_URL}/{split}/{image_id}.jpg',
+                download_folder / f'{image_id}.jpg'
             ) for (split, image_id) in image_list
-        ]
-        for future in futures.as_completed(all_futures):
-            future.result()
-            progress_bar.update(1)
-    progress_bar.close()
+        ],
+        download_folder / DOWNLOAD_MANIFEST,
+        desc='Downloading images'
+    )
 
 
 def download_instance_segmentation_zip_file(
@@ -182,7 +172,11 @@ def download_instance_segmentation_zip_file(
     Returns
     -------
     """
-    download_url(url, zipdir)
+    Downloader().download(
+        [(url, zipdir)],
+        zipdir.parent / DOWNLOAD_MANIFEST,
+        desc='Downloading zip file'
+    )
     with zipfile.ZipFile(zipdir, 'r') as zip_ref:
         zip_ref.extractall(zipdir.parent)
 
@@ -205,8 +199,17 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
 
     *Page*: `Open Images Dataset V6 site
     <https://storage.googleapis.com/openimages/web/index.html>`_.
+
+    Annotations are parsed once to the columnar index in the dataset
+    directory (``AnnotationIndex``), loaded by subsequent instantiations
+    as long as the annotations file is not modified.
     """
 
+    cache_ignored_arguments = \
+        ObjectDetectionSegmentationDataset.cache_ignored_arguments + [
+            'use_annotation_index'
+        ]
+
     arguments_structure = {
         'classes': {
             'argparse_name': '--classes',
@@ -242,6 +245,12 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
             'description': 'Seed for image sampling',
             'type': int,
             'default': 12345
+        },
+        'use_annotation_index': {
+            'argparse_name': '--disable-annotation-index',
+            'description': 'Parse annotations on every instantiation instead of loading the cached annotation index',  # noqa: E501
+            'type': bool,
+            'default': True
         }
     }
 
@@ -261,7 +270,14 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
             crop_input_margin_size: float = 0.1,
             download_seed: int = 12345,
             image_width: int = 416,
-            image_height: int = 416):
+            image_height: int = 416,
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0,
+            use_annotation_index: bool = True):
         assert image_memory_layout in ['NHWC', 'NCHW']
         self.classes = classes
         self.download_num_bboxes_per_class = download_num_bboxes_per_class
@@ -278,6 +294,7 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
         if self.crop_input_to_bboxes:
             self.crop_dict = {}
         self.download_seed = download_seed
+        self.use_annotation_index = use_annotation_index
         super().__init__(
             root,
             batch_size,
@@ -287,7 +304,13 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
             image_memory_layout,
             show_on_eval,
             image_width,
-            image_height
+            image_height,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
         )
 
     @classmethod
@@ -307,11 +330,21 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
             args.crop_margin,
             args.download_seed,
             args.image_width,
-            args.image_height
+            args.image_height,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index,
+            use_annotation_index=args.use_annotation_index
         )
 
     def download_dataset_fun(self):
         self.root.mkdir(parents=True, exist_ok=True)
+        # files are recorded in the manifest, so they are downloaded once
+        downloader = Downloader(num_workers=psutil.cpu_count())
+        manifestpath = self.root / DOWNLOAD_MANIFEST
 
         # prepare class files
         classnamespath = self.root / 'classnames.csv'
@@ -319,7 +352,11 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
             shutil.copy(self.classes_path, classnamespath)
         else:
             classnamesurl = 'https://storage.googleapis.com/openimages/v5/class-descriptions-boxable.csv'  # noqa: E501
-            download_url(classnamesurl, classnamespath)
+            downloader.download(
+                [(classnamesurl, classnamespath)],
+                manifestpath,
+                desc='Downloading class names'
+            )
 
         # prepare annotations
         annotationsurls = {
@@ -337,9 +374,13 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
             }
         }
         origannotationspath = self.root / 'original-annotations.csv'
-        download_url(
-            annotationsurls[self.download_annotations_type][self.task],
-            origannotationspath
+        downloader.download(
+            [(
+                annotationsurls[self.download_annotations_type][self.task],
+                origannotationspath
+            )],
+            manifestpath,
+            desc='Downloading annotations'
         )
 
         # load classes
@@ -398,26 +439,31 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
                 'validation': "https://storage.googleapis.com/openimages/v5/validation-masks/validation-masks-{}.zip",  # noqa: E501
                 'test': "https://storage.googleapis.com/openimages/v5/test-masks/test-masks-{}.zip"  # noqa: E501
             }
-            for i in tqdm.tqdm(
-                    sorted(imageidprefix),
-                    desc="Downloading zip files"):
-                zipdir = self.root / 'zip/'
-                zipdir.mkdir(parents=True, exist_ok=True)
-                zipdir = self.root / 'zip/file.zip'
-
-                pattern = '^{}.*png'.format(i)
-                download_instance_segmentation_zip_file(
-                    zipdir,
-                    zip_url_template[
-                        self.download_annotations_type
-                        ].format(i)
-                )
-                # for each file matching the current zip file's prefix
-                # copy this file  into mask directory
-                for j in final_annotations.MaskPath:
-                    if re.match(pattern, j):
-                        shutil.copy(zipdir.parent / j, maskdir)
-                shutil.rmtree(zipdir.parent)
+            # zip files are kept, so repeated downloads skip them
+            zipdir = self.root / 'zip'
+            zippaths = {
+                prefix: zipdir / f'{self.download_annotations_type}-masks-{prefix}.zip'  # noqa: E501
+                for prefix in sorted(imageidprefix)
+            }
+            downloader.download(
+                [
+                    (
+                        zip_url_template[
+                            self.download_annotations_type
+                            ].format(prefix),
+                        zippath
+                    ) for prefix, zippath in zippaths.items()
+                ],
+                zipdir / DOWNLOAD_MANIFEST,
+                desc='Downloading zip files'
+            )
+            # extract only masks of selected annotations
+            maskpaths = set(final_annotations.MaskPath)
+            for zippath in zippaths.values():
+                with zipfile.ZipFile(zippath, 'r') as zip_ref:
+                    for name in zip_ref.namelist():
+                        if name in maskpaths:
+                            zip_ref.extract(name, maskdir)
 
         # prepare download entries
         download_entries = [
@@ -431,23 +477,106 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
         imgdir.mkdir(parents=True, exist_ok=True)
         download_all_images(imgdir, download_entries, psutil.cpu_count())
 
-    def prepare_instance_segmentation(self):
-        annotations = defaultdict(list)
+    def parse_annotations(self) -> Dict[str, np.ndarray]:
+        """
+        Parses the annotations file to columns of the annotation index.
+
+        Returns
+        -------
+        Dict[str, np.ndarray] :
+            Images and labels, in the order of first occurrence, and objects
+            with their boxes (and mask paths for instance segmentation)
+        """
         annotationsfile = pd.read_csv(self.root / 'annotations.csv')
-        for index, row in annotationsfile.iterrows():
-            annotations[row['ImageID']].append(SegmObject(
-                clsname=self.classmap[row['LabelName']],
-                maskpath=self.root / 'masks' / row['MaskPath'],
-                xmin=row['BoxXMin'],
-                ymin=row['BoxYMin'],
-                xmax=row['BoxXMax'],
-                ymax=row['BoxYMax'],
+        objectimages, images = pd.factorize(annotationsfile.ImageID)
+        objectlabels, labels = pd.factorize(annotationsfile.LabelName)
+        columns = {
+            'image_ids': np.asarray(images, dtype=str),
+            'label_names': np.asarray(labels, dtype=str),
+            'object_images': objectimages.astype(np.int64),
+            'object_labels': objectlabels.astype(np.int64)
+        }
+        if self.task == 'instance_segmentation':
+            boxcolumns = ['BoxXMin', 'BoxYMin', 'BoxXMax', 'BoxYMax']
+            columns['object_masks'] = annotationsfile.MaskPath.to_numpy(
+                dtype=str
+            )
+        else:
+            boxcolumns = ['XMin', 'YMin', 'XMax', 'YMax']
+        columns['object_boxes'] = annotationsfile[boxcolumns].to_numpy(
+            dtype=np.float64
+        )
+        return columns
+
+    def load_annotations(self) -> Dict[str, np.ndarray]:
+        """
+        Loads columns of annotations, from the annotation index if enabled.
+
+        Returns
+        -------
+        Dict[str, np.ndarray] :
+            Columns of annotations returned by `parse_annotations`
+        """
+        if not self.use_annotation_index:
+            return self.parse_annotations()
+        return load_annotation_index(
+            self.root / ANNOTATION_INDEX_DIR,
+            [self.root / 'annotations.csv'],
+            {'dataset': 'OpenImagesDatasetV6', 'task': self.task},
+            self.parse_annotations
+        )
+
+    def set_samples(
+            self,
+            columns: Dict[str, np.ndarray],
+            objects: List):
+        """
+        Sets images as input samples and their objects as output samples.
+
+        Parameters
+        ----------
+        columns : Dict[str, np.ndarray]
+            Columns of annotations
+        objects : List
+            Objects created from rows of annotations
+        """
+        self.dataX = columns['image_ids'].tolist()
+        self.dataY = [
+            [objects[i] for i in group.tolist()]
+            for group in group_by_image(
+                columns['object_images'],
+                len(self.dataX)
+            )
+        ]
+
+    def prepare_instance_segmentation(
+            self,
+            columns: Optional[Dict[str, np.ndarray]] = None):
+        if columns is None:
+            columns = self.load_annotations()
+        clsnames = [
+            self.classmap[label] for label in columns['label_names'].tolist()
+        ]
+        maskdir = str(self.root / 'masks')
+        objects = [
+            SegmObject(
+                clsname=clsnames[label],
+                maskpath=Path(maskdir, maskpath),
+                xmin=xmin,
+                ymin=ymin,
+                xmax=xmax,
+                ymax=ymax,
                 mask=None,
-                score=1.0
-            ))
-        for k, v in annotations.items():
-            self.dataX.append(k)
-            self.dataY.append(v)
+                score=1.0,
+                iscrowd=False
+            )
+            for label, maskpath, (xmin, ymin, xmax, ymax) in zip(
+                columns['object_labels'].tolist(),
+                columns['object_masks'].tolist(),
+                columns['object_boxes'].tolist()
+            )
+        ]
+        self.set_samples(columns, objects)
         if self.crop_input_to_bboxes:
             for x in range(len(self.dataX)):
                 minx, miny = self.image_width+1, self.image_height+1
@@ -477,22 +606,30 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
                     if maxy < self.image_height else self.image_height-1
                 self.crop_dict[self.dataX[x]] = [minx, miny, maxx, maxy]
 
-    def prepare_object_detection(self):
-        annotations = defaultdict(list)
-        annotationsfile = pd.read_csv(self.root / 'annotations.csv')
-        for index, row in annotationsfile.iterrows():
-            annotations[row['ImageID']].append(DectObject(
-                clsname=self.classmap[row['LabelName']],
-                xmin=row['XMin'],
-                ymin=row['YMin'],
-                xmax=row['XMax'],
-                ymax=row['YMax'],
+    def prepare_object_detection(
+            self,
+            columns: Optional[Dict[str, np.ndarray]] = None):
+        if columns is None:
+            columns = self.load_annotations()
+        clsnames = [
+            self.classmap[label] for label in columns['label_names'].tolist()
+        ]
+        objects = [
+            DectObject(
+                clsname=clsnames[label],
+                xmin=xmin,
+                ymin=ymin,
+                xmax=xmax,
+                ymax=ymax,
                 score=1.0,
                 iscrowd=False
-            ))
-        for k, v in annotations.items():
-            self.dataX.append(k)
-            self.dataY.append(v)
+            )
+            for label, (xmin, ymin, xmax, ymax) in zip(
+                columns['object_labels'].tolist(),
+                columns['object_boxes'].tolist()
+            )
+        ]
+        self.set_samples(columns, objects)
 
     def prepare(self):
         classnamespath = self.root / 'classnames.csv'
@@ -549,6 +686,8 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
         """
         Loads instance segmentation masks.
 
+        Masks are stored as run-length encoded ``RLEMask`` objects.
+
         Parameters
         ----------
         samples : list[list[SegmObject]]
@@ -576,7 +715,7 @@ class OpenImagesDatasetV6(ObjectDetectionSegmentationDataset):
                         mask_img,
                         (self.image_width, self.image_height)
                     )
-                mask_img = np.array(mask_img, dtype=np.uint8)
+                mask_img = RLEMask.from_array(mask_img)
                 new_subsample = SegmObject(
                     clsname=subsample.clsname,
                     maskpath=subsample.maskpath,
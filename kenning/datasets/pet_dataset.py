@@ -11,11 +11,11 @@ from pathlib import Path
 import tarfile
 from PIL import Image
 import numpy as np
-from typing import Tuple, Any, Optional
+from typing import Tuple, Any, Optional, Dict
 
 from kenning.core.dataset import Dataset
 from kenning.utils.logger import download_url
-from kenning.core.measurements import Measurements
+from kenning.datasets.helpers.classification import ClassificationEvaluator
 
 
 class PetDataset(Dataset):
@@ -70,7 +70,13 @@ class PetDataset(Dataset):
             external_calibration_dataset: Optional[Path] = None,
             classify_by: str = 'breeds',
             image_memory_layout: str = 'NHWC',
-            standardize: bool = True):
+            standardize: bool = True,
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0):
         """
         Prepares all structures and data required for providing data samples.
 
@@ -98,6 +104,20 @@ class PetDataset(Dataset):
         standardize : bool
             Standardize the given input samples.
             Should be set to False when using compute_input_mean_std
+        prefetch_workers : int
+            Number of workers loading next batches in the background during
+            iteration. If 0, batches are loaded on demand.
+        prefetch_depth : int
+            Maximum number of batches loaded ahead of the current one
+        prefetch_executor : str
+            Type of prefetching workers, 'thread' or 'process'
+        samples_cache_dir : Optional[Path]
+            Path to the directory with the persistent cache of preprocessed
+            input samples. If None, samples are not cached.
+        num_shards : int
+            Number of shards the dataset is split into
+        shard_index : int
+            Index of the shard provided by the dataset
         """
         assert classify_by in self.classification_types, \
             f'Invalid {classify_by}, should be {self.classification_types}'
@@ -114,7 +134,13 @@ class PetDataset(Dataset):
             root,
             batch_size,
             download_dataset,
-            external_calibration_dataset
+            external_calibration_dataset,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
         )
 
     @classmethod
@@ -125,7 +151,13 @@ class PetDataset(Dataset):
             download_dataset=args.download_dataset,
             external_calibration_dataset=args.external_calibration_dataset,
             classify_by=args.classify_by,
-            image_memory_layout=args.image_memory_layout
+            image_memory_layout=args.image_memory_layout,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index
         )
 
     def download_dataset_fun(self):
@@ -187,21 +219,19 @@ class PetDataset(Dataset):
     def prepare_output_samples(self, samples):
         return list(np.eye(self.numclasses)[samples])
 
+    def get_cache_parameters(self) -> Dict[str, Any]:
+        parameters = super().get_cache_parameters()
+        parameters['standardize'] = self.standardize
+        if self.standardize:
+            parameters['mean'] = np.asarray(self.mean).tolist()
+            parameters['std'] = np.asarray(self.std).tolist()
+        return parameters
+
     def evaluate(self, predictions, truth):
-        confusion_matrix = np.zeros((self.numclasses, self.numclasses))
-        top_5_count = 0
-        for prediction, label in zip(predictions, truth):
-            confusion_matrix[np.argmax(label), np.argmax(prediction)] += 1
-            top_5_count += 1 if np.argmax(label) in np.argsort(prediction)[::-1][:5] else 0  # noqa: E501
-        measurements = Measurements()
-        measurements.accumulate(
-            'eval_confusion_matrix',
-            confusion_matrix,
-            lambda: np.zeros((self.numclasses, self.numclasses))
+        return ClassificationEvaluator(self.numclasses).evaluate(
+            predictions,
+            truth
         )
-        measurements.accumulate('top_5_count', top_5_count, lambda: 0)
-        measurements.accumulate('total', len(predictions), lambda: 0)
-        return measurements
 
     def compute_input_mean_std(self) -> Tuple[Any, Any]:
         """
@@ -2,7 +2,7 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
-from typing import Type, List
+from typing import Any, Dict, Type, List, Optional
 import numpy as np
 from pathlib import Path
 from random import shuffle
@@ -54,7 +54,13 @@ class RandomizedClassificationDataset(Dataset):
             numclasses: int = 3,
             integer_classes: bool = False,
             inputdims: List = [224, 224, 3],
-            dtype: Type = np.float32):
+            dtype: Type = np.float32,
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0):
         """
         Creates randomized dataset.
 
@@ -77,6 +83,20 @@ class RandomizedClassificationDataset(Dataset):
             The dimensionality of the inputs
         dtype : Type
             Type of the data
+        prefetch_workers : int
+            Number of workers loading next batches in the background during
+            iteration. If 0, batches are loaded on demand.
+        prefetch_depth : int
+            Maximum number of batches loaded ahead of the current one
+        prefetch_executor : str
+            Type of prefetching workers, 'thread' or 'process'
+        samples_cache_dir : Optional[Path]
+            Path to the directory with the persistent cache of preprocessed
+            input samples. If None, samples are not cached.
+        num_shards : int
+            Number of shards the dataset is split into
+        shard_index : int
+            Index of the shard provided by the dataset
         """
         self.samplescount = samplescount
         self.inputdims = inputdims
@@ -85,7 +105,17 @@ class RandomizedClassificationDataset(Dataset):
         self.dtype = dtype
         self.classnames = self.get_class_names()
 
-        super().__init__(root, batch_size, download_dataset)
+        super().__init__(
+            root,
+            batch_size,
+            download_dataset,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
+        )
 
     @classmethod
     def from_argparse(cls, args):
@@ -95,7 +125,13 @@ class RandomizedClassificationDataset(Dataset):
             download_dataset=False,
             samplescount=args.num_samples,
             numclasses=args.num_classes,
-            inputdims=args.input_dims
+            inputdims=args.input_dims,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index
         )
 
     def get_class_names(self):
@@ -125,6 +161,11 @@ class RandomizedClassificationDataset(Dataset):
             result.append(np.random.randn(*self.inputdims).astype(self.dtype))
         return result
 
+    def get_cache_parameters(self) -> Dict[str, Any]:
+        parameters = super().get_cache_parameters()
+        parameters['dtype'] = np.dtype(self.dtype).name
+        return parameters
+
     def prepare_output_samples(self, samples):
         if self.integer_classes:
             return samples
@@ -136,9 +177,18 @@ class RandomizedClassificationDataset(Dataset):
     def calibration_dataset_generator(
             self,
             percentage: float = 0.25,
-            seed: int = 12345):
-        for _ in range(int(self.samplescount * percentage)):
-            yield [np.random.randint(0, 255, size=self.inputdims)]
+            seed: int = 12345,
+            batch_size: int = 1,
+            pad_last_batch: bool = False):
+        numsamples = int(len(self.dataX) * percentage)
+        for start in range(0, numsamples, batch_size):
+            yield [
+                np.random.randint(0, 255, size=self.inputdims)
+                for _ in range(
+                    batch_size if pad_last_batch
+                    else min(batch_size, numsamples - start)
+                )
+            ]
 
 
 class RandomizedDetectionSegmentationDataset(ObjectDetectionSegmentationDataset):   # noqa: 501
@@ -180,7 +230,13 @@ class RandomizedDetectionSegmentationDataset(ObjectDetectionSegmentationDataset)
             samplescount: int = 100,
             numclasses: int = 3,
             inputdims: List = [224, 224, 3],
-            dtype: Type = np.float32):
+            dtype: Type = np.float32,
+            prefetch_workers: int = 0,
+            prefetch_depth: int = 2,
+            prefetch_executor: str = 'thread',
+            samples_cache_dir: Optional[Path] = None,
+            num_shards: int = 1,
+            shard_index: int = 0):
         """
         Creates randomized dataset.
 
@@ -200,13 +256,37 @@ class RandomizedDetectionSegmentationDataset(ObjectDetectionSegmentationDataset)
             The dimensionality of the inputs
         dtype : Type
             Type of the data
+        prefetch_workers : int
+            Number of workers loading next batches in the background during
+            iteration. If 0, batches are loaded on demand.
+        prefetch_depth : int
+            Maximum number of batches loaded ahead of the current one
+        prefetch_executor : str
+            Type of prefetching workers, 'thread' or 'process'
+        samples_cache_dir : Optional[Path]
+            Path to the directory with the persistent cache of preprocessed
+            input samples. If None, samples are not cached.
+        num_shards : int
+            Number of shards the dataset is split into
+        shard_index : int
+            Index of the shard provided by the dataset
         """
         self.samplescount = samplescount
         self.inputdims = inputdims
         self.numclasses = numclasses
         self.dtype = dtype
         self.classnames = self.get_class_names()
-        super().__init__(root, batch_size, download_dataset)
+        super().__init__(
+            root,
+            batch_size,
+            download_dataset,
+            prefetch_workers=prefetch_workers,
+            prefetch_depth=prefetch_depth,
+            prefetch_executor=prefetch_executor,
+            samples_cache_dir=samples_cache_dir,
+            num_shards=num_shards,
+            shard_index=shard_index
+        )
 
     @classmethod
     def from_argparse(cls, args):
@@ -216,7 +296,13 @@ class RandomizedDetectionSegmentationDataset(ObjectDetectionSegmentationDataset)
             download_dataset=False,
             samplescount=args.num_samples,
             numclasses=args.num_classes,
-            inputdims=args.input_dims
+            inputdims=args.input_dims,
+            prefetch_workers=args.prefetch_workers,
+            prefetch_depth=args.prefetch_depth,
+            prefetch_executor=args.prefetch_executor,
+            samples_cache_dir=args.samples_cache_dir,
+            num_shards=args.num_shards,
+            shard_index=args.shard_index
         )
 
     def get_class_names(self):
@@ -251,6 +337,11 @@ class RandomizedDetectionSegmentationDataset(ObjectDetectionSegmentationDataset)
             result.append(np.random.randn(*self.inputdims).astype(self.dtype))
         return result
 
+    def get_cache_parameters(self) -> Dict[str, Any]:
+        parameters = super().get_cache_parameters()
+        parameters['dtype'] = np.dtype(self.dtype).name
+        return parameters
+
     def prepare_output_samples(self, samples):
         return samples
 
@@ -15,6 +15,7 @@ import operator
 
 from kenning.core.dataset import Dataset
 from kenning.datasets.helpers.detection_and_segmentation import SegmObject
+from kenning.datasets.helpers.rle import RLEMask
 from kenning.modelwrappers.frameworks.pytorch import PyTorchWrapper
 from kenning.datasets.coco_dataset import COCODataset2017
 
@@ -81,10 +82,10 @@ class PyTorchCOCOMaskRCNN(PyTorchWrapper):
                     ymin=float(out['boxes'][i][1]),
                     xmax=float(out['boxes'][i][2]),
                     ymax=float(out['boxes'][i][3]),
-                    mask=np.multiply(
+                    mask=RLEMask.from_array(np.multiply(
                         masks_np.transpose(1, 2, 0),
                         255
-                    ).astype('uint8'),
+                    ).astype('uint8')),
                     score=float(out['scores'][i]),
                     iscrowd=False
                 ))
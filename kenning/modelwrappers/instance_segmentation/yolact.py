@@ -25,6 +25,7 @@ else:
 
 from kenning.core.dataset import Dataset
 from kenning.datasets.helpers.detection_and_segmentation import SegmObject
+from kenning.datasets.helpers.rle import RLEMask
 from kenning.core.model import ModelWrapper
 from kenning.interfaces.io_interface import IOInterface
 from kenning.datasets.coco_dataset import COCODataset2017
@@ -292,7 +293,7 @@ class YOLACT(ModelWrapper):
                 ymin=y1,
                 xmax=x2,
                 ymax=y2,
-                mask=y['output_1'][i],
+                mask=RLEMask.from_array(y['output_1'][i]),
                 score=y['output_3'][i],
                 iscrowd=False
             ))
@@ -19,6 +19,7 @@ from kenning.utils.args_manager import add_argparse_argument
 from kenning.core.outputcollector import OutputCollector
 from kenning.datasets.helpers.detection_and_segmentation import DectObject
 from kenning.datasets.helpers.detection_and_segmentation import SegmObject
+from kenning.datasets.helpers.rle import mask_to_array
 
 _FONT_SCALE = 1.5
 _FONT_SIZE = 16
@@ -575,7 +576,7 @@ class RealTimeSegmentationVisualization(BaseRealTimeVisualizer):
                 continue
 
             mask = cv2.resize(
-                out.mask,
+                mask_to_array(out.mask),
                 (self.width, self.height),
                 cv2.INTER_NEAREST
             ).astype(np.uint8)
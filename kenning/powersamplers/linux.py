@@ -0,0 +1,205 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Energy readings from Linux powercap and hwmon interfaces.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import re
+import time
+
+from kenning.core.powersampler import PowerSampler
+
+
+def _read_int(path: Path) -> Optional[int]:
+    """
+    Reads an integer from the sysfs attribute.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the attribute
+
+    Returns
+    -------
+    Optional[int] : value of the attribute, None if it cannot be read
+    """
+    try:
+        with open(path, 'r') as attribute:
+            return int(attribute.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _read_name(path: Path, default: str) -> str:
+    """
+    Reads a name from the sysfs attribute.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the attribute
+    default : str
+        Name returned if the attribute cannot be read
+
+    Returns
+    -------
+    str : name stored in the attribute
+    """
+    try:
+        with open(path, 'r') as attribute:
+            return attribute.read().strip() or default
+    except OSError:
+        return default
+
+
+def _domain_name(*parts: str) -> str:
+    """
+    Creates the name of the domain usable in measurement names.
+
+    Parameters
+    ----------
+    *parts : str
+        Parts of the name
+
+    Returns
+    -------
+    str : name of the domain
+    """
+    return re.sub(r'\W+', '_', '_'.join(parts)).strip('_')
+
+
+class LinuxPowerSampler(PowerSampler):
+    """
+    Reads energy from Linux powercap (i.e. Intel RAPL) and hwmon interfaces.
+
+    Powercap zones provide cumulative energy counters (``energy_uj``) that
+    wrap around at ``max_energy_range_uj``. Hwmon sensors provide either
+    cumulative energy (``energy*_input``) or current power
+    (``power*_input``), which is integrated over time between readings.
+
+    Only attributes readable by the current user are used, on many systems
+    powercap counters are readable only by root.
+    """
+
+    def __init__(self, sysfsroot: Path = Path('/sys')):
+        """
+        Finds power domains available in the system.
+
+        Parameters
+        ----------
+        sysfsroot : Path
+            Path to the sysfs mount point, can be changed for testing
+        """
+        self.sysfsroot = Path(sysfsroot)
+        # domain name -> (path to the counter in uJ, counter range in uJ)
+        self.energycounters: Dict[str, Tuple[Path, Optional[int]]] = {}
+        # domain name -> path to the power input in uW
+        self.powerinputs: Dict[str, Path] = {}
+        self._find_powercap_zones()
+        self._find_hwmon_sensors()
+
+        # last raw readings of counters, and of power inputs with timestamps
+        self._lastvalues = {}
+        self._energy = {domain: 0.0 for domain in self.get_domains()}
+        self.read_energy()
+
+    def _find_powercap_zones(self):
+        """
+        Finds powercap zones with readable energy counters.
+        """
+        powercap = self.sysfsroot / 'class' / 'powercap'
+        for counter in sorted(powercap.glob('*/energy_uj')):
+            if _read_int(counter) is None:
+                continue
+            zone = counter.parent
+            domain = _domain_name(
+                zone.name,
+                _read_name(zone / 'name', '')
+            )
+            self.energycounters[domain] = (
+                counter,
+                _read_int(zone / 'max_energy_range_uj')
+            )
+
+    def _find_hwmon_sensors(self):
+        """
+        Finds hwmon sensors with readable energy or power inputs.
+        """
+        hwmon = self.sysfsroot / 'class' / 'hwmon'
+        for device in sorted(hwmon.glob('hwmon*')):
+            devicename = _read_name(device / 'name', '')
+            for sensor in sorted(device.glob('energy*_input')):
+                if _read_int(sensor) is None:
+                    continue
+                sensorname = sensor.name[:-len('_input')]
+                domain = _domain_name(
+                    device.name,
+                    devicename,
+                    _read_name(device / f'{sensorname}_label', sensorname)
+                )
+                self.energycounters[domain] = (sensor, None)
+            for sensor in sorted(device.glob('power*_input')):
+                if _read_int(sensor) is None:
+                    continue
+                sensorname = sensor.name[:-len('_input')]
+                domain = _domain_name(
+                    device.name,
+                    devicename,
+                    _read_name(device / f'{sensorname}_label', sensorname)
+                )
+                self.powerinputs[domain] = sensor
+
+    def get_domains(self) -> List[str]:
+        return list(self.energycounters.keys()) + \
+            list(self.powerinputs.keys())
+
+    def read_energy(self) -> Dict[str, float]:
+        timestamp = time.perf_counter()
+        for domain, (counter, countrange) in self.energycounters.items():
+            value = _read_int(counter)
+            if value is None:
+                continue
+            last = self._lastvalues.get(domain)
+            if last is not None:
+                delta = value - last
+                if delta < 0:
+                    # the counter wrapped around or was reset
+                    delta = value + (countrange - last if countrange else 0)
+                self._energy[domain] += delta / 1e6
+            self._lastvalues[domain] = value
+        for domain, powerinput in self.powerinputs.items():
+            value = _read_int(powerinput)
+            if value is None:
+                continue
+            if domain in self._lastvalues:
+                # trapezoidal integration of power between readings
+                last, lasttimestamp = self._lastvalues[domain]
+                self._energy[domain] += (last + value) / 2 / 1e6 * (
+                    timestamp - lasttimestamp
+                )
+            self._lastvalues[domain] = (value, timestamp)
+        return dict(self._energy)
+
+    @classmethod
+    def detect(cls, sysfsroot: Path = Path('/sys')) -> Optional[
+            'LinuxPowerSampler']:
+        """
+        Creates the sampler if any power domain is available.
+
+        Parameters
+        ----------
+        sysfsroot : Path
+            Path to the sysfs mount point
+
+        Returns
+        -------
+        Optional[LinuxPowerSampler] : sampler, or None if no domain is found
+        """
+        sampler = cls(sysfsroot)
+        if not sampler.get_domains():
+            return None
+        return sampler
@@ -19,6 +19,7 @@ from kenning.core.runtimeprotocol import MessageType
 from kenning.core.runtimeprotocol import ServerStatus
 from kenning.core.measurements import Measurements
 from kenning.core.measurements import MeasurementsCollector
+from kenning.core.tracing import tracespan
 
 
 class NetworkProtocol(RuntimeProtocol):
@@ -326,11 +327,13 @@ class NetworkProtocol(RuntimeProtocol):
                     return False, None
         return False, None
 
+    @tracespan('upload_input', 'protocol')
     def upload_input(self, data):
         self.log.debug('Uploading input')
         self.send_message(MessageType.DATA, data)
         return self.receive_confirmation()[0]
 
+    @tracespan('upload_model', 'protocol')
     def upload_model(self, path):
         self.log.debug('Uploading model')
         with open(path, 'rb') as modfile:
@@ -338,6 +341,7 @@ class NetworkProtocol(RuntimeProtocol):
             self.send_message(MessageType.MODEL, data)
             return self.receive_confirmation()[0]
 
+    @tracespan('upload_io_specification', 'protocol')
     def upload_io_specification(self, path):
         self.log.debug('Uploading io specification')
         with open(path, 'rb') as detfile:
@@ -345,6 +349,7 @@ class NetworkProtocol(RuntimeProtocol):
             self.send_message(MessageType.IOSPEC, data)
             return self.receive_confirmation()[0]
 
+    @tracespan('request_processing', 'protocol')
     def request_processing(self):
         self.log.debug('Requesting processing')
         self.send_message(MessageType.PROCESS)
@@ -363,11 +368,13 @@ class NetworkProtocol(RuntimeProtocol):
         }
         return True
 
+    @tracespan('download_output', 'protocol')
     def download_output(self):
         self.log.debug('Downloading output')
         self.send_message(MessageType.OUTPUT)
         return self.receive_confirmation()
 
+    @tracespan('download_statistics', 'protocol')
     def download_statistics(self):
         self.log.debug('Downloading statistics')
         self.send_message(MessageType.STATS)
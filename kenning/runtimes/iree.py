@@ -43,7 +43,9 @@ class IREERuntime(Runtime):
             protocol: RuntimeProtocol,
             modelpath: Path,
             driver: str,
-            collect_performance_data: bool = True):
+            collect_performance_data: bool = True,
+            stats_sampling_interval: float = 0.1,
+            stats_include_children: bool = False):
         """
         Constructs IREE runtime
 
@@ -57,14 +59,22 @@ class IREERuntime(Runtime):
             Name of the deployment target on the device
         collect_performance_data : bool
             Disable collection and processing of performance metrics
+        stats_sampling_interval : float
+            Interval between samples of resource usage, in seconds
+        stats_include_children : bool
+            Include child processes in the resource usage of the runtime
+            process
         """
         self.modelpath = modelpath
         self.model = None
+        self.model_buffer = None
         self.input = None
         self.driver = driver
         super().__init__(
             protocol,
-            collect_performance_data
+            collect_performance_data,
+            stats_sampling_interval,
+            stats_include_children
         )
 
     @classmethod
@@ -73,7 +83,9 @@ class IREERuntime(Runtime):
             protocol,
             args.save_model_path,
             args.driver,
-            args.disable_performance_measurements
+            args.disable_performance_measurements,
+            args.stats_sampling_interval,
+            args.stats_include_children
         )
 
     def prepare_input(self, input_data):
@@ -91,19 +103,32 @@ class IREERuntime(Runtime):
     def prepare_model(self, input_data):
         self.log.info("loading model")
         if input_data:
-            with open(self.modelpath, 'wb') as outmodel:
-                outmodel.write(input_data)
-
-        with open(self.modelpath, "rb") as outmodel:
-            compiled_buffer = outmodel.read()
+            self.save_model_data(input_data)
 
+        # the flatbuffer is mapped instead of read, the mapping has to be
+        # kept as long as the module uses it
+        self.model = None
+        if self.model_buffer is not None:
+            try:
+                self.model_buffer.close()
+            except BufferError:
+                # still used by sessions, unmapped when no longer referenced
+                pass
+        self.model_buffer = self.map_model_file()
         self.model = ireert.load_vm_flatbuffer(
-            compiled_buffer, driver=self.driver
+            self.model_buffer, driver=self.driver
         )
 
         self.log.info('Model loading ended successfully')
         return True
 
+    def prepare_session(self):
+        self.input = None
+        self.model = ireert.load_vm_flatbuffer(
+            self.model_buffer, driver=self.driver
+        )
+        return True
+
     def run(self):
         if self.model is None:
             raise ModelNotPreparedError
@@ -44,7 +44,9 @@ class ONNXRuntime(Runtime):
             protocol: RuntimeProtocol,
             modelpath: Path,
             execution_providers: List[str] = ['CPUExecutionProvider'],
-            collect_performance_data: bool = True):
+            collect_performance_data: bool = True,
+            stats_sampling_interval: float = 0.1,
+            stats_include_children: bool = False):
         """
         Constructs ONNX runtime
 
@@ -60,6 +62,11 @@ class ONNXRuntime(Runtime):
             Path for the model file.
         collect_performance_data : bool
             Disable collection and processing of performance metrics
+        stats_sampling_interval : float
+            Interval between samples of resource usage, in seconds
+        stats_include_children : bool
+            Include child processes in the resource usage of the runtime
+            process
         """
         self.modelpath = modelpath
         self.session = None
@@ -67,7 +74,9 @@ class ONNXRuntime(Runtime):
         self.execution_providers = execution_providers
         super().__init__(
             protocol,
-            collect_performance_data
+            collect_performance_data,
+            stats_sampling_interval,
+            stats_include_children
         )
 
     @classmethod
@@ -76,7 +85,9 @@ class ONNXRuntime(Runtime):
             protocol,
             args.save_model_path,
             args.execution_providers,
-            args.disable_performance_measurements
+            args.disable_performance_measurements,
+            args.stats_sampling_interval,
+            args.stats_include_children
         )
 
     def prepare_input(self, input_data):
@@ -98,8 +109,8 @@ class ONNXRuntime(Runtime):
     def prepare_model(self, input_data):
         self.log.info('Loading model')
         if input_data:
-            with open(self.modelpath, 'wb') as outmodel:
-                outmodel.write(input_data)
+            self.save_model_data(input_data)
+            del input_data
 
         self.session = ort.InferenceSession(
             str(self.modelpath),
@@ -149,6 +160,13 @@ class ONNXRuntime(Runtime):
         self.log.info('Model loading ended successfully')
         return True
 
+    def prepare_session(self):
+        # InferenceSession.run is thread-safe, so the session is shared and
+        # only the inference state is separated
+        self.input = None
+        self.scores = None
+        return True
+
     def run(self):
         if self.session is None:
             raise ModelNotPreparedError
@@ -50,7 +50,9 @@ class TFLiteRuntime(Runtime):
             modelpath: Path,
             delegates: Optional[List] = None,
             num_threads: int = 4,
-            collect_performance_data: bool = True):
+            collect_performance_data: bool = True,
+            stats_sampling_interval: float = 0.1,
+            stats_include_children: bool = False):
         """
         Constructs TFLite Runtime pipeline.
 
@@ -66,6 +68,11 @@ class TFLiteRuntime(Runtime):
             Number of threads to use for inference
         collect_performance_data : bool
             Disable collection and processing of performance metrics
+        stats_sampling_interval : float
+            Interval between samples of resource usage, in seconds
+        stats_include_children : bool
+            Include child processes in the resource usage of the runtime
+            process
         """
         self.modelpath = modelpath
         self.interpreter = None
@@ -74,7 +81,9 @@ class TFLiteRuntime(Runtime):
         self.delegates = delegates
         super().__init__(
             protocol,
-            collect_performance_data
+            collect_performance_data,
+            stats_sampling_interval,
+            stats_include_children
         )
 
     @classmethod
@@ -84,7 +93,9 @@ class TFLiteRuntime(Runtime):
             args.save_model_path,
             args.delegates_list,
             args.num_threads,
-            args.disable_performance_measurements
+            args.disable_performance_measurements,
+            args.stats_sampling_interval,
+            args.stats_include_children
         )
 
     def prepare_model(self, input_data):
@@ -94,8 +105,8 @@ class TFLiteRuntime(Runtime):
             from tensorflow import lite as tflite
         self.log.info('Loading model')
         if input_data:
-            with open(self.modelpath, 'wb') as outmodel:
-                outmodel.write(input_data)
+            self.save_model_data(input_data)
+            del input_data
         delegates = None
         if self.delegates:
             delegates = [tflite.load_delegate(delegate) for delegate in self.delegates]  # noqa: E501
@@ -108,6 +119,12 @@ class TFLiteRuntime(Runtime):
         self.log.info('Model loading ended successfully')
         return True
 
+    def prepare_session(self):
+        # TFLite interpreters cannot be shared between threads, the model
+        # file is mapped by the interpreter so its pages are shared
+        self._input_prepared = False
+        return self.prepare_model(None)
+
     def prepare_input(self, input_data):
         self.log.debug(f'Preparing inputs of size {len(input_data)}')
         if self.interpreter is None:
@@ -60,7 +60,9 @@ class TVMRuntime(Runtime):
             contextname: str = 'cpu',
             contextid: int = 0,
             use_tvm_vm: bool = False,
-            collect_performance_data: bool = True):
+            collect_performance_data: bool = True,
+            stats_sampling_interval: float = 0.1,
+            stats_include_children: bool = False):
         """
         Constructs TVM runtime.
 
@@ -78,18 +80,26 @@ class TVMRuntime(Runtime):
             Use the TVM Relay VirtualMachine
         collect_performance_data : bool
             Disable collection and processing of performance metrics
+        stats_sampling_interval : float
+            Interval between samples of resource usage, in seconds
+        stats_include_children : bool
+            Include child processes in the resource usage of the runtime
+            process
         """
         self.modelpath = modelpath
         self.contextname = contextname
         self.contextid = contextid
         self.module = None
         self.func = None
+        self.vm_exec = None
         self.model = None
         self._input_prepared = False
         self.use_tvm_vm = use_tvm_vm
         super().__init__(
             protocol,
-            collect_performance_data
+            collect_performance_data,
+            stats_sampling_interval,
+            stats_include_children
         )
 
     @classmethod
@@ -100,7 +110,9 @@ class TVMRuntime(Runtime):
             args.target_device_context,
             args.target_device_context_id,
             args.runtime_use_vm,
-            args.disable_performance_measurements
+            args.disable_performance_measurements,
+            args.stats_sampling_interval,
+            args.stats_include_children
         )
 
     def prepare_input(self, input_data):
@@ -135,22 +147,36 @@ class TVMRuntime(Runtime):
         ctx = tvm.runtime.device(self.contextname, self.contextid)
         if self.use_tvm_vm:
             self.module = tvm.runtime.load_module(str(self.modelpath)+'.so')
-            loaded_bytecode = bytearray(
-                open(str(self.modelpath)+'.ro', "rb").read()
-            )
-            loaded_vm_exec = Executable.load_exec(loaded_bytecode, self.module)
-
-            self.model = VirtualMachine(loaded_vm_exec, ctx)
+            # bytecode is read directly into a preallocated buffer to avoid
+            # keeping both bytes and bytearray copies in memory
+            bytecodepath = Path(str(self.modelpath)+'.ro')
+            loaded_bytecode = bytearray(bytecodepath.stat().st_size)
+            with open(bytecodepath, 'rb') as bytecodefile:
+                bytecodefile.readinto(loaded_bytecode)
+            self.vm_exec = Executable.load_exec(loaded_bytecode, self.module)
+            del loaded_bytecode
+
+            self.model = VirtualMachine(self.vm_exec, ctx)
         else:
             if input_data:
-                with open(self.modelpath, 'wb') as outmodel:
-                    outmodel.write(input_data)
+                self.save_model_data(input_data)
+                del input_data
             self.module = tvm.runtime.load_module(str(self.modelpath))
             self.func = self.module.get_function('default')
             self.model = graph_executor.GraphModule(self.func(ctx))
         self.log.info('Model loading ended successfully')
         return True
 
+    def prepare_session(self):
+        # the loaded module is shared, every session gets its own executor
+        ctx = tvm.runtime.device(self.contextname, self.contextid)
+        if self.use_tvm_vm:
+            self.model = VirtualMachine(self.vm_exec, ctx)
+        else:
+            self.model = graph_executor.GraphModule(self.func(ctx))
+        self._input_prepared = False
+        return True
+
     def run(self):
         if self.model is None:
             raise ModelNotPreparedError
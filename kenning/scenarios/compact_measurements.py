@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A script that converts the measurements stream to the JSON measurements file.
+
+Streams are created with ``--measurements-stream`` option of inference
+testers. Damaged records, i.e. written when the process was killed, are
+skipped.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import kenning.utils.logger as logger
+from kenning.utils.measurements_io import compact_measurements_stream
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(argv[0])
+    parser.add_argument(
+        'stream',
+        help='The path to the JSON Lines file with measurements stream',
+        type=Path
+    )
+    parser.add_argument(
+        'output',
+        help='The path to the output JSON file with measurements',
+        type=Path
+    )
+    parser.add_argument(
+        '--verbosity',
+        help='Verbosity level',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        default='INFO'
+    )
+
+    args = parser.parse_args(argv[1:])
+
+    logger.set_verbosity(args.verbosity)
+
+    compact_measurements_stream(args.stream, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    ret = main(sys.argv)
+    sys.exit(ret)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A script that measures the overhead of measurement decorators.
+
+For every instrumentation level it calls an empty function wrapped with
+``timemeasurements`` and ``tagmeasurements`` decorators, and reports the
+time added to every call, in nanoseconds.
+
+The overhead is compared with the baseline - decorators as they were
+implemented before instrumentation levels and measurement scopes, adding
+lists of values to a dict-based collector.
+"""
+
+import argparse
+import json
+import sys
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from kenning.core.measurements import InstrumentationLevel
+from kenning.core.measurements import MeasurementsCollector
+from kenning.core.measurements import set_instrumentation_level
+from kenning.core.measurements import tagmeasurements
+from kenning.core.measurements import timemeasurements
+from kenning.utils.logger import get_logger
+
+BASELINE = 'BASELINE'
+
+logger = get_logger()
+
+
+def _noop(*args):
+    return None
+
+
+class _BaselineCollector(object):
+    """
+    Collector storing lists of measurements in a dict, as in the baseline.
+    """
+    def __init__(self):
+        self.data = dict()
+
+    def __iadd__(self, other: Dict[str, Any]) -> '_BaselineCollector':
+        for k, v in other.items():
+            if k in self.data:
+                self.data[k] += v
+            else:
+                self.data[k] = v
+        return self
+
+
+def _baseline_decorators(
+        collector: _BaselineCollector) -> Dict[str, Callable]:
+    """
+    Creates baseline versions of measurement decorators.
+
+    Parameters
+    ----------
+    collector : _BaselineCollector
+        Collector receiving measurements
+
+    Returns
+    -------
+    Dict[str, Callable] :
+        Wrapped empty functions, for every decorator
+    """
+    def baseline_timemeasurements(measurementname: str):
+        def statistics_decorator(function):
+            @wraps(function)
+            def statistics_wrapper(*args):
+                nonlocal collector
+                start = time.perf_counter()
+                returnvalue = function(*args)
+                duration = time.perf_counter() - start
+                logger.debug(
+                    f'{function.__name__} time:  {duration * 1000} ms'
+                )
+                collector += {
+                    measurementname: [duration],
+                    f'{measurementname}_timestamp': [time.perf_counter()]
+                }
+                return returnvalue
+            return statistics_wrapper
+        return statistics_decorator
+
+    def baseline_tagmeasurements(tagname: str):
+        def statistics_decorator(function):
+            @wraps(function)
+            def statistics_wrapper(*args):
+                nonlocal collector
+                starttimestamp = time.perf_counter()
+                returnvalue = function(*args)
+                endtimestamp = time.perf_counter()
+                logger.debug(
+                    f'{function.__name__} start: {starttimestamp * 1000} ms end: {endtimestamp * 1000} ms'  # noqa: E501
+                )
+                collector += {
+                    'tags': [
+                        {'name': tagname, 'start': starttimestamp, 'end': endtimestamp}  # noqa: E501
+                    ]
+                }
+                return returnvalue
+            return statistics_wrapper
+        return statistics_decorator
+
+    return {
+        'timemeasurements': baseline_timemeasurements('overhead_benchmark')(_noop),  # noqa: E501
+        'tagmeasurements': baseline_tagmeasurements('overhead_benchmark')(_noop)  # noqa: E501
+    }
+
+
+def _time_calls(function: Callable, iterations: int) -> float:
+    """
+    Measures the total time of calling the function.
+
+    Parameters
+    ----------
+    function : Callable
+        Called function
+    iterations : int
+        Number of calls
+
+    Returns
+    -------
+    float : total time of calls, in seconds
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return time.perf_counter() - start
+
+
+def _measure_overhead(
+        decorated: Callable,
+        iterations: int,
+        repeats: int) -> float:
+    """
+    Measures the overhead of the decorator.
+
+    Parameters
+    ----------
+    decorated : Callable
+        Empty function wrapped with the decorator
+    iterations : int
+        Number of calls in a single repeat
+    repeats : int
+        Number of repeats
+
+    Returns
+    -------
+    float : overhead per call, in nanoseconds
+    """
+    overheads = []
+    for _ in range(repeats):
+        with MeasurementsCollector.scope():
+            decoratedtime = _time_calls(decorated, iterations)
+        basetime = _time_calls(_noop, iterations)
+        overheads.append((decoratedtime - basetime) / iterations * 1e9)
+    return max(min(overheads), 0.0)
+
+
+def measure_instrumentation_overhead(
+        iterations: int = 100000,
+        repeats: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    Measures the overhead of measurement decorators for every level.
+
+    The minimum time over repeats is used to reduce the impact of other
+    processes. Measurements collected during the benchmark are discarded.
+    The overhead of baseline decorators is stored under the ``BASELINE``
+    key.
+
+    Parameters
+    ----------
+    iterations : int
+        Number of calls in a single repeat
+    repeats : int
+        Number of repeats
+
+    Returns
+    -------
+    Dict[str, Dict[str, float]] :
+        Overhead per call, in nanoseconds, for every level and decorator
+    """
+    decorators = {
+        'timemeasurements': timemeasurements('overhead_benchmark')(_noop),
+        'tagmeasurements': tagmeasurements('overhead_benchmark')(_noop)
+    }
+    results = {
+        BASELINE: {
+            name: _measure_overhead(decorated, iterations, repeats)
+            for name, decorated in _baseline_decorators(
+                _BaselineCollector()
+            ).items()
+        }
+    }
+    previouslevel = set_instrumentation_level(InstrumentationLevel.FULL)
+    try:
+        for level in InstrumentationLevel:
+            set_instrumentation_level(level)
+            results[level.name] = {
+                name: _measure_overhead(decorated, iterations, repeats)
+                for name, decorated in decorators.items()
+            }
+    finally:
+        set_instrumentation_level(previouslevel)
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(argv[0])
+    parser.add_argument(
+        '--iterations',
+        help='Number of calls of the decorated function in a single repeat',
+        type=int,
+        default=100000
+    )
+    parser.add_argument(
+        '--repeats',
+        help='Number of repeats, the fastest one is reported',
+        type=int,
+        default=5
+    )
+    parser.add_argument(
+        '--output',
+        help='The path to the output JSON file with results',
+        type=Path
+    )
+
+    args = parser.parse_args(argv[1:])
+
+    results = measure_instrumentation_overhead(args.iterations, args.repeats)
+    baseline = results[BASELINE]
+    for level, overheads in results.items():
+        for decorator, overhead in overheads.items():
+            line = f'{level:8} {decorator:17} {overhead:10.1f} ns/call'
+            if level != BASELINE and baseline[decorator] > 0:
+                line += f'  ({overhead / baseline[decorator]:.2f}x baseline)'  # noqa: E501
+            print(line)
+    if args.output:
+        with open(args.output, 'w') as outputfile:
+            json.dump(results, outputfile, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    ret = main(sys.argv)
+    sys.exit(ret)
@@ -5,7 +5,10 @@
 import argparse
 import json
 import sys
+from pathlib import Path
 from kenning.core.flow import KenningFlow
+from kenning.core.tracing import TraceCollector
+from kenning.core.measurements import set_instrumentation_level
 from kenning.utils import logger
 
 
@@ -21,6 +24,17 @@ def main(argv):
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
         default='INFO'
     )
+    parser.add_argument(
+        '--trace-output',
+        help='The path to the output JSON file with the execution trace in the Chrome Trace Event format',  # noqa: E501
+        type=Path
+    )
+    parser.add_argument(
+        '--instrumentation-level',
+        help='Amount of collected performance data: "off" disables measurement decorators, "minimal" collects only timings and tags, "full" collects all data',  # noqa: E501
+        choices=['off', 'minimal', 'full'],
+        default='full'
+    )
 
     args, _ = parser.parse_known_args(argv[1:])
 
@@ -30,8 +44,16 @@ def main(argv):
     with open(args.jsoncfg, 'r') as f:
         json_cfg = json.load(f)
 
+    set_instrumentation_level(args.instrumentation_level)
+    if args.trace_output:
+        TraceCollector.enable()
+
     flow: KenningFlow = KenningFlow.from_json(json_cfg)
-    _ = flow.run()
+    try:
+        _ = flow.run()
+    finally:
+        if args.trace_output:
+            TraceCollector.save_trace(args.trace_output)
 
     log.info('Processing has finished')
     return 0
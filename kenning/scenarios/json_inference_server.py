@@ -20,8 +20,11 @@ import sys
 import argparse
 import signal
 import json
+from pathlib import Path
 
 from kenning.utils.class_loader import load_class
+from kenning.core.tracing import TraceCollector
+from kenning.core.measurements import set_instrumentation_level
 import kenning.utils.logger as logger
 
 
@@ -37,6 +40,17 @@ def main(argv):
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
         default='INFO'
     )
+    parser.add_argument(
+        '--trace-output',
+        help='The path to the output JSON file with the execution trace in the Chrome Trace Event format',  # noqa: E501
+        type=Path
+    )
+    parser.add_argument(
+        '--instrumentation-level',
+        help='Amount of collected performance data: "off" disables measurement decorators, "minimal" collects only timings and tags, "full" collects all data',  # noqa: E501
+        choices=['off', 'minimal', 'full'],
+        default='full'
+    )
 
     args, _ = parser.parse_known_args(argv[1:])
 
@@ -64,7 +78,15 @@ def main(argv):
 
     signal.signal(signal.SIGINT, sigint_handler)
 
-    runtime.run_server()
+    set_instrumentation_level(args.instrumentation_level)
+    if args.trace_output:
+        TraceCollector.enable()
+
+    try:
+        runtime.run_server()
+    finally:
+        if args.trace_output:
+            TraceCollector.save_trace(args.trace_output)
 
 
 if __name__ == '__main__':
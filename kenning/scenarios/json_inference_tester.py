@@ -43,6 +43,10 @@ from jsonschema.exceptions import ValidationError
 
 import kenning.utils.logger as logger
 from kenning.utils.class_loader import get_command
+from kenning.core.tracing import TraceCollector
+from kenning.core.measurements import MeasurementsCollector
+from kenning.core.measurements import set_instrumentation_level
+from kenning.core.measurements import set_python_allocations_tracking
 from kenning.utils.pipeline_runner import run_pipeline_json
 
 
@@ -75,6 +79,27 @@ def main(argv):
         help='Instead of running the full compilation and testing flow, only testing of the model is executed',  # noqa: E501
         action='store_true'
     )
+    parser.add_argument(
+        '--trace-output',
+        help='The path to the output JSON file with the execution trace in the Chrome Trace Event format',  # noqa: E501
+        type=Path
+    )
+    parser.add_argument(
+        '--instrumentation-level',
+        help='Amount of collected performance data: "off" disables measurement decorators, "minimal" collects only timings and tags, "full" collects all data',  # noqa: E501
+        choices=['off', 'minimal', 'full'],
+        default='full'
+    )
+    parser.add_argument(
+        '--trace-python-allocations',
+        help='Records peaks of memory allocated by Python in every stage of the pipeline, using tracemalloc (slows down memory allocations)',  # noqa: E501
+        action='store_true'
+    )
+    parser.add_argument(
+        '--measurements-stream',
+        help='The path to the output JSON Lines file, to which measurements are written while they are collected. It can be converted to the JSON file with measurements using kenning.scenarios.compact_measurements',  # noqa: E501
+        type=Path
+    )
 
     args, _ = parser.parse_known_args(argv[1:])
 
@@ -84,6 +109,14 @@ def main(argv):
     with open(args.jsoncfg, 'r') as f:
         json_cfg = json.load(f)
 
+    set_instrumentation_level(args.instrumentation_level)
+    if args.trace_python_allocations:
+        set_python_allocations_tracking(True)
+    if args.trace_output:
+        TraceCollector.enable()
+    if args.measurements_stream:
+        MeasurementsCollector.start_stream(args.measurements_stream)
+
     try:
         ret = run_pipeline_json(
             json_cfg,
@@ -99,6 +132,11 @@ def main(argv):
     except Exception as ex:
         log.error(ex)
         raise
+    finally:
+        if args.trace_output:
+            TraceCollector.save_trace(args.trace_output)
+        if args.measurements_stream:
+            MeasurementsCollector.stop_stream()
 
     if not ret:
         return 1
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+A script that merges measurements collected on shards of the dataset.
+
+Shards are evaluated separately (i.e. on different devices) with
+``--num-shards`` and ``--shard-index`` dataset options. The merged
+measurements contain summed confusion matrices and sample counts, and
+concatenated per-sample results, so they can be used to render a single
+report for the whole dataset.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import kenning.utils.logger as logger
+from kenning.core.measurements import merge_measurements
+from kenning.utils.measurements_io import load_measurements
+from kenning.utils.measurements_io import save_measurements
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(argv[0])
+    parser.add_argument(
+        'output',
+        help='The path to the output file with merged measurements',
+        type=Path
+    )
+    parser.add_argument(
+        'measurements',
+        help='The paths to measurements of shards',
+        type=Path,
+        nargs='+'
+    )
+    parser.add_argument(
+        '--verbosity',
+        help='Verbosity level',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
+        default='INFO'
+    )
+
+    args = parser.parse_args(argv[1:])
+
+    logger.set_verbosity(args.verbosity)
+
+    merged = merge_measurements(
+        [load_measurements(path) for path in args.measurements]
+    )
+    save_measurements(merged, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    ret = main(sys.argv)
+    sys.exit(ret)
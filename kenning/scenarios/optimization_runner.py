@@ -11,6 +11,10 @@ optimization search. Currently supported strategy is `grid_search`, which
 performs a grid search to find optimal parameters for each block specified
 in `optimizable` parameter. Every block that is to be optimized should have
 list of parameters instead of a singular value specified.
+
+The `metric` can be any scalar metric computed from measurements of the
+pipeline, i.e. `inferencetime_mean`, `inferencetime_p99` for tail latency
+or `inferencetime_throughput`.
 """
 
 import argparse
@@ -22,9 +26,10 @@ from pathlib import Path
 from typing import Dict, List
 from pprint import pformat
 
+import numpy as np
 from jsonschema.exceptions import ValidationError
 
-from kenning.core.metrics import compute_classification_metrics, compute_performance_metrics, compute_detection_metrics  # noqa: E501
+from kenning.core.metrics import compute_classification_metrics, compute_performance_metrics, compute_detection_metrics, compute_speech_metrics  # noqa: E501
 import kenning.utils.logger as logger
 from kenning.core.measurements import MeasurementsCollector
 from kenning.utils.pipeline_runner import run_pipeline_json
@@ -359,7 +364,13 @@ def main(argv):
             computed_metrics |= compute_performance_metrics(measurements)
             computed_metrics |= compute_classification_metrics(measurements)
             computed_metrics |= compute_detection_metrics(measurements)
-            computed_metrics.pop('session_utilization_cpus_percent_avg')
+            computed_metrics |= compute_speech_metrics(measurements)
+            # only scalar metrics can be optimized, series are skipped
+            computed_metrics = {
+                name: value.item() if isinstance(value, np.generic) else value
+                for name, value in computed_metrics.items()
+                if np.isscalar(value)
+            }
 
             try:
                 pipelines_scores.append(
@@ -40,10 +40,12 @@ from kenning.core.drawing import (
     draw_bubble_plot, choose_theme,
     IMMATERIAL_COLORS, RED_GREEN_CMAP)
 from kenning.utils import logger
+from kenning.utils.measurements_io import load_measurements
 from kenning.core.report import create_report_from_measurements
 from kenning.utils.class_loader import get_command
 from kenning.core.metrics import compute_performance_metrics, \
-    compute_classification_metrics, compute_detection_metrics
+    compute_classification_metrics, compute_detection_metrics, \
+    compute_latency_metrics
 
 log = logger.get_logger()
 
@@ -195,6 +197,132 @@ def performance_report(
     else:
         log.warning('No memory usage measurements in the report')
 
+    if 'session_utilization_process_rss_mb' in measurementsdata:
+        log.info('Using runtime process memory usage')
+        usepath = imgdir / f'{imgprefix}process_memory_usage'
+        render_time_series_plot_with_histogram(
+            ydata=measurementsdata['session_utilization_process_rss_mb'],
+            xdata=measurementsdata['session_utilization_timestamp'],
+            title='Runtime process memory usage' if draw_titles else None,
+            xtitle='Time',
+            xunit='s',
+            ytitle='Resident memory',
+            yunit='MB',
+            outpath=str(usepath),
+            skipfirst=True,
+            outputext=image_formats,
+            **plot_options,
+        )
+
+        usepath_asterisk = Path(f'{usepath}.*')
+        measurementsdata['processmemusagepath'] = str(
+            usepath_asterisk.relative_to(rootdir)
+        )
+    else:
+        log.warning('No runtime process memory usage in the report')
+
+    if 'session_utilization_process_cpu_percent' in measurementsdata:
+        log.info('Using runtime process CPU usage')
+        usepath = imgdir / f'{imgprefix}process_cpu_usage'
+        render_time_series_plot_with_histogram(
+            ydata=measurementsdata['session_utilization_process_cpu_percent'],
+            xdata=measurementsdata['session_utilization_timestamp'],
+            title='Runtime process CPU usage' if draw_titles else None,
+            xtitle='Time',
+            xunit='s',
+            ytitle='CPU usage',
+            yunit='%',
+            outpath=str(usepath),
+            skipfirst=True,
+            outputext=image_formats,
+            **plot_options,
+        )
+
+        usepath_asterisk = Path(f'{usepath}.*')
+        measurementsdata['processcpuusagepath'] = str(
+            usepath_asterisk.relative_to(rootdir)
+        )
+    else:
+        log.warning('No runtime process CPU usage in the report')
+
+    powerprefix = 'session_utilization_power/'
+    powerdomains = [
+        key[len(powerprefix):] for key in measurementsdata.keys()
+        if key.startswith(powerprefix)
+    ]
+    if powerdomains:
+        log.info('Using energy measurements')
+        usepath = imgdir / f'{imgprefix}power_usage'
+        render_multiple_time_series_plot(
+            ydatas=[[
+                measurementsdata[f'{powerprefix}{domain}']
+                for domain in powerdomains
+            ]],
+            xdatas=[[
+                measurementsdata['session_utilization_power_timestamp']
+                for _ in powerdomains
+            ]],
+            title='Power consumption' if draw_titles else None,
+            subtitles=None,
+            xtitles=['Time'],
+            xunits=['s'],
+            ytitles=['Power'],
+            yunits=['W'],
+            legend_labels=powerdomains,
+            outpath=str(usepath),
+            outputext=image_formats,
+            **plot_options,
+        )
+
+        usepath_asterisk = Path(f'{usepath}.*')
+        measurementsdata['powerusagepath'] = str(
+            usepath_asterisk.relative_to(rootdir)
+        )
+        stages = sorted(set(
+            tag['name'] for tag in measurementsdata.get('tags', [])
+        ))
+        measurementsdata['energystages'] = stages
+        measurementsdata['energydomains'] = [
+            {
+                'name': domain,
+                'total': measurementsdata.get(
+                    f'session_utilization_energy_total/{domain}'),
+                'meanpower': measurementsdata.get(
+                    f'session_utilization_power_mean/{domain}'),
+                'perinference': measurementsdata.get(
+                    f'session_utilization_energy_per_inference/{domain}'),
+                'stages': [
+                    measurementsdata.get(
+                        f'session_utilization_power_{stage}/{domain}')
+                    for stage in stages
+                ]
+            }
+            for domain in powerdomains
+        ]
+    else:
+        log.warning('No energy measurements in the report')
+
+    memorystageprefix = 'memory_stage_count/'
+    memorystages = [
+        key[len(memorystageprefix):] for key in measurementsdata.keys()
+        if key.startswith(memorystageprefix)
+    ]
+    if memorystages:
+        log.info('Using memory usage of pipeline stages')
+        measurementsdata['memorystages'] = [
+            {
+                'name': stage,
+                'count': measurementsdata[f'{memorystageprefix}{stage}'],
+                'peak': measurementsdata.get(
+                    f'memory_stage_peak_rss_mb/{stage}'),
+                'delta': measurementsdata.get(
+                    f'memory_stage_peak_rss_delta_mb/{stage}'),
+                'pythondelta': measurementsdata.get(
+                    f'memory_stage_python_peak_delta_mb/{stage}'),
+            }
+            for stage in memorystages
+        ]
+
     if 'session_utilization_gpu_mem_utilization' in measurementsdata:
         log.info('Using target measurements GPU memory usage percentage')
         usepath = imgdir / f'{imgprefix}gpu_memory_usage'
@@ -377,6 +505,21 @@ def comparison_performance_report(
                 usepath.relative_to(rootdir)
             )
 
+    latencytable = []
+    for data in measurementsdata:
+        if 'inference_step' not in data:
+            continue
+        latencymetrics = compute_latency_metrics(
+            'inferencetime',
+            data['inference_step'],
+            data['inference_step_timestamp']
+        )
+        if latencymetrics:
+            latencymetrics['modelname'] = data['modelname']
+            latencytable.append(latencymetrics)
+    if latencytable:
+        report_variables['latencytable'] = latencytable
+
     common_metrics = sorted(list(common_metrics))
     visualizationdata = {}
     for data in measurementsdata:
@@ -629,15 +772,16 @@ def detection_report(
     """
 
     from kenning.datasets.helpers.detection_and_segmentation import \
-        get_recall_precision, \
-        compute_ap, \
-        compute_map_per_threshold
+        compute_ap
+    from kenning.datasets.helpers.detection_metrics import DetectionMetrics
 
     log.info(f'Running detection report for {measurementsdata["modelname"]}')
-    metrics = compute_detection_metrics(measurementsdata)
+    # detections are sorted once and reused for all plots and metrics
+    detectionmetrics = DetectionMetrics(measurementsdata)
+    metrics = compute_detection_metrics(measurementsdata, detectionmetrics)
     measurementsdata |= metrics
 
-    lines = get_recall_precision(measurementsdata, 0.5)
+    lines = detectionmetrics.recall_precision(0.5)
     # HTML plots format unsupported, removing html
     _image_formats = image_formats - {'html'}
 
@@ -673,12 +817,11 @@ def detection_report(
     tp_iou = []
     all_tp_ious = []
 
-    for i in measurementsdata['class_names']:
-        dets = measurementsdata[f'eval_det/{i}'] if f'eval_det/{i}' in measurementsdata else []  # noqa: E501
-        det_tp_iou = [i[2] for i in dets if i[1]]
+    for clsid in range(len(measurementsdata['class_names'])):
+        det_tp_iou = detectionmetrics.true_positive_ious(clsid)
         if len(det_tp_iou) > 0:
-            tp_iou.append(sum(det_tp_iou) / len(det_tp_iou))
-            all_tp_ious.extend(det_tp_iou)
+            tp_iou.append(np.mean(det_tp_iou))
+            all_tp_ious.extend(det_tp_iou.tolist())
         else:
             tp_iou.append(0)
 
@@ -711,7 +854,7 @@ def detection_report(
             iouhistpath.relative_to(rootdir)) + '.*'
 
     thresholds = np.arange(0.2, 1.05, 0.05)
-    mapvalues = compute_map_per_threshold(measurementsdata, thresholds)
+    mapvalues = detectionmetrics.map_per_threshold(thresholds)
 
     mappath = imgdir / f'{imgprefix}map'
     draw_plot(
@@ -913,7 +1056,7 @@ def main(argv):
     parser = argparse.ArgumentParser(argv[0])
     parser.add_argument(
         '--measurements',
-        help='Path to the JSON files with measurements. If more than one file is provided, model comparison will be generated.',  # noqa: E501
+        help='Path to the JSON files with measurements, JSON Lines (.jsonl) measurements streams or directories with measurements in the binary format (.measurements). If more than one file is provided, model comparison will be generated.',  # noqa: E501
         type=Path,
         nargs='+',
         required=True
@@ -988,8 +1131,7 @@ def main(argv):
 
     measurementsdata = []
     for i, measurementspath in enumerate(args.measurements):
-        with open(measurementspath, 'r') as measurementsfile:
-            measurements = json.load(measurementsfile)
+        measurements = load_measurements(measurementspath)
         if args.model_names is not None:
             modelname = args.model_names[i]
         else:
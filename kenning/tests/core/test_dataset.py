@@ -285,3 +285,311 @@ class TestDataset:
                 == pytest.approx(val_fraction, abs=tolerance))
         assert (len(dataYval)/len(dataset.dataY)
                 == pytest.approx(val_fraction, abs=tolerance))
+
+
+class SquaresDataset(Dataset):
+    """
+    Dataset computing squares of indices, used for testing iteration.
+    """
+
+    def prepare(self):
+        self.dataX = list(range(23))
+        self.dataY = list(range(23))
+
+    def prepare_input_samples(self, samples):
+        return [np.full((2, 2), sample ** 2) for sample in samples]
+
+    def evaluate(self, predictions, truth):
+        # evaluation relies on the index of the next batch
+        return list(range(self._dataindex - len(predictions), self._dataindex))
+
+
+@pytest.mark.fast
+class TestDatasetPrefetching:
+    @pytest.mark.parametrize('executor', ['thread', 'process'])
+    @pytest.mark.parametrize('workers,depth', [(1, 1), (3, 4)])
+    def test_order(self, executor, workers, depth):
+        """
+        Tests if prefetched batches are delivered in order.
+        """
+        reference = SquaresDataset(Path('.'), batch_size=4)
+        dataset = SquaresDataset(
+            Path('.'),
+            batch_size=4,
+            prefetch_workers=workers,
+            prefetch_depth=depth,
+            prefetch_executor=executor
+        )
+
+        expected = [
+            (X, y, reference.evaluate(X, y)) for X, y in reference
+        ]
+        batches = [(X, y, dataset.evaluate(X, y)) for X, y in dataset]
+
+        assert len(batches) == len(expected)
+        for (X, y, indices), (refX, refy, refindices) in zip(
+                batches,
+                expected):
+            assert np.array_equal(X, refX)
+            assert y == refy
+            assert indices == refindices
+        assert dataset._prefetchpool is None
+
+    def test_batch_size_change(self):
+        """
+        Tests changing the batch size during prefetching.
+        """
+        dataset = SquaresDataset(
+            Path('.'),
+            batch_size=2,
+            prefetch_workers=2,
+            prefetch_depth=3
+        )
+
+        iterator = iter(dataset)
+        _, y = next(iterator)
+        assert y == [0, 1]
+        dataset.set_batch_size(5)
+        _, y = next(iterator)
+        assert y == [2, 3, 4, 5, 6]
+        sizes = []
+        while True:
+            try:
+                sizes.append(len(next(iterator)[1]))
+            except StopIteration:
+                break
+        assert sizes == [5, 5, 5, 1]
+
+    def test_interrupted_iteration(self):
+        """
+        Tests restarting the interrupted iteration.
+        """
+        dataset = SquaresDataset(
+            Path('.'),
+            batch_size=3,
+            prefetch_workers=2
+        )
+
+        for i, (_, y) in enumerate(dataset):
+            if i == 2:
+                break
+        assert [y for _, y in dataset][0] == [0, 1, 2]
+        dataset.stop_prefetching()
+        assert dataset._prefetchpool is None
+
+
+@pytest.mark.fast
+class TestDatasetSamplesCache:
+    def test_cached_samples(self, tmp_path):
+        """
+        Tests if samples are read from the cache in the next run.
+        """
+        class CountingDataset(SquaresDataset):
+            loaded = 0
+
+            def prepare_input_samples(self, samples):
+                CountingDataset.loaded += len(samples)
+                return super().prepare_input_samples(samples)
+
+        first = CountingDataset(
+            Path('.'),
+            batch_size=5,
+            samples_cache_dir=tmp_path
+        )
+        expected = [X for X, _ in first]
+        assert CountingDataset.loaded == len(first)
+
+        second = CountingDataset(
+            Path('.'),
+            batch_size=5,
+            samples_cache_dir=tmp_path
+        )
+        cached = [X for X, _ in second]
+        assert CountingDataset.loaded == len(first)
+        for X, refX in zip(cached, expected):
+            assert np.array_equal(X, refX)
+
+        second.cache_ignored_arguments = []
+        second.batch_size = 3
+        [X for X, _ in second]
+        # batch size is a part of the key now
+        assert CountingDataset.loaded == 2 * len(first)
+
+
+@pytest.mark.fast
+class TestDatasetSharding:
+    def test_shards(self):
+        """
+        Tests if shards are disjoint and contain all samples.
+        """
+        samples = []
+        for index in range(4):
+            dataset = SquaresDataset(
+                Path('.'),
+                batch_size=2,
+                num_shards=4,
+                shard_index=index
+            )
+            dataX, dataY = dataset.get_data_unloaded()
+            assert dataX == list(range(index, 23, 4))
+            assert len(dataset) == len(dataX)
+            batches = [y for _, y in dataset]
+            assert sum(batches, []) == dataY
+            samples += dataY
+        assert sorted(samples) == list(range(23))
+
+    def test_from_argparse(self):
+        """
+        Tests if the shard is selected from command-line arguments.
+        """
+        parser, _ = SquaresDataset.form_argparse()
+        args = parser.parse_args([
+            '--dataset-root', '.',
+            '--num-shards', '4',
+            '--shard-index', '2'
+        ])
+        dataset = SquaresDataset.from_argparse(args)
+        assert dataset.get_data_unloaded()[1] == list(range(2, 23, 4))
+
+    def test_reshard(self):
+        """
+        Tests selecting another shard and restoring the whole dataset.
+        """
+        dataset = SquaresDataset(Path('.'), batch_size=4)
+        dataset.shard(3, 1)
+        assert dataset.get_data_unloaded()[1] == list(range(1, 23, 3))
+        dataset.shard(2, 0)
+        assert dataset.get_data_unloaded()[1] == list(range(0, 23, 2))
+        dataset.shard(1, 0)
+        assert [y for _, y in dataset][0] == [0, 1, 2, 3]
+        assert len(dataset) == 23
+        with pytest.raises(AssertionError):
+            dataset.shard(2, 2)
+
+    def test_calibration(self, tmp_path):
+        """
+        Tests if external calibration samples are split between shards.
+        """
+        for i in range(10):
+            (tmp_path / f'{i}.txt').touch()
+
+        def calibration_samples(index):
+            dataset = SquaresDataset(
+                Path('.'),
+                external_calibration_dataset=tmp_path,
+                num_shards=2,
+                shard_index=index
+            )
+            dataset.prepare_input_samples = lambda samples: samples
+            return [
+                x[0] for x in dataset.calibration_dataset_generator(1.0)
+            ]
+
+        first, second = calibration_samples(0), calibration_samples(1)
+        assert len(first) == len(second) == 5
+        assert set(first).isdisjoint(second)
+        assert calibration_samples(0) == first
+
+
+@pytest.mark.fast
+class TestDatasetCalibration:
+    class CalibrationDataset(SquaresDataset):
+        loaded = 0
+
+        def prepare_input_samples(self, samples):
+            CalibrationDataset = TestDatasetCalibration.CalibrationDataset
+            CalibrationDataset.loaded += len(samples)
+            return [
+                np.full((2, 2), int(Path(sample).stem) ** 2)
+                for sample in samples
+            ]
+
+    @pytest.fixture
+    def calibration_dir(self, tmp_path):
+        calibration_dir = tmp_path / 'calibration'
+        calibration_dir.mkdir()
+        for i in range(10):
+            (calibration_dir / f'{i}.txt').touch()
+        TestDatasetCalibration.CalibrationDataset.loaded = 0
+        return calibration_dir
+
+    @pytest.mark.parametrize('executor', ['thread', 'process'])
+    def test_prepared_once(self, calibration_dir, executor):
+        """
+        Tests if calibration samples are prepared once and served in
+        batches.
+        """
+        dataset = self.CalibrationDataset(
+            Path('.'),
+            external_calibration_dataset=calibration_dir,
+            prefetch_workers=3,
+            prefetch_executor=executor
+        )
+
+        batches = list(dataset.calibration_dataset_generator(0.8))
+        assert len(batches) == 8
+        assert all(len(batch) == 1 for batch in batches)
+
+        batched = list(dataset.calibration_dataset_generator(
+            0.8,
+            batch_size=3
+        ))
+        assert [len(batch) for batch in batched] == [3, 3, 2]
+        assert np.array_equal(
+            np.concatenate([np.stack(batch) for batch in batched]),
+            np.stack([batch[0] for batch in batches])
+        )
+        if executor == 'thread':
+            assert self.CalibrationDataset.loaded == 8
+
+    def test_fixed_batch_size(self, calibration_dir):
+        """
+        Tests if the last batch is padded for the fixed batch size.
+        """
+        dataset = self.CalibrationDataset(
+            Path('.'),
+            external_calibration_dataset=calibration_dir
+        )
+
+        batches = list(dataset.calibration_dataset_generator(
+            1.0,
+            batch_size=4
+        ))
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+
+        padded = list(dataset.calibration_dataset_generator(
+            1.0,
+            batch_size=4,
+            pad_last_batch=True
+        ))
+        assert [len(batch) for batch in padded] == [4, 4, 4]
+        samples = np.stack(sum(batches, []))
+        assert np.array_equal(np.stack(sum(padded, [])[:10]), samples)
+        assert np.array_equal(np.stack(padded[-1][2:]), samples[:2])
+
+    def test_cached_calibration(self, calibration_dir, tmp_path):
+        """
+        Tests if calibration samples are read from the cache by other
+        instances of the dataset.
+        """
+        def calibration_samples(percentage):
+            dataset = self.CalibrationDataset(
+                Path('.'),
+                external_calibration_dataset=calibration_dir,
+                samples_cache_dir=tmp_path / 'cache'
+            )
+            return [
+                batch[0]
+                for batch in dataset.calibration_dataset_generator(percentage)
+            ]
+
+        first = calibration_samples(0.5)
+        assert self.CalibrationDataset.loaded == 5
+        assert len(list((tmp_path / 'cache').glob('calibration-*.npy'))) == 1
+
+        second = calibration_samples(0.5)
+        assert self.CalibrationDataset.loaded == 5
+        assert np.array_equal(np.stack(first), np.stack(second))
+
+        calibration_samples(0.3)
+        assert self.CalibrationDataset.loaded == 8
@@ -0,0 +1,473 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import threading
+import time
+import numpy as np
+
+from kenning.core.measurements import Measurements
+from kenning.core.measurements import MeasurementSeries
+from kenning.core.measurements import MeasurementsCollector
+from kenning.core.measurements import SystemStatsCollector
+from kenning.core.measurements import InstrumentationLevel
+from kenning.core.measurements import MemoryStage
+from kenning.core.measurements import memorymeasurements
+from kenning.core.measurements import merge_measurements
+from kenning.core.measurements import set_python_allocations_tracking
+from kenning.core.measurements import SparseUpdate
+from kenning.core.measurements import set_instrumentation_level
+from kenning.core.measurements import tagmeasurements
+from kenning.core.measurements import _read_proc_stats
+from kenning.core.measurements import timemeasurements
+from kenning.core.powersampler import PowerSampler
+
+
+@pytest.mark.fast
+class TestMeasurementSeries:
+    def test_append_and_extend(self):
+        """
+        Tests growing the series beyond its initial capacity.
+        """
+        series = MeasurementSeries(np.float64, capacity=2)
+        for i in range(10):
+            series.append(float(i))
+        series.extend(np.arange(10, 100, dtype=np.float64))
+
+        assert len(series) == 100
+        assert np.array_equal(series.numpy(), np.arange(100))
+
+    def test_promotion(self):
+        """
+        Tests if adding floats to an integer series keeps their values.
+        """
+        series = MeasurementSeries.from_values([1, 2, 3])
+        assert series.dtype.kind == 'i'
+
+        series.append(0.5)
+        assert series.tolist() == [1.0, 2.0, 3.0, 0.5]
+
+    def test_non_numeric(self):
+        """
+        Tests if non-numeric and mismatched values are rejected.
+        """
+        assert MeasurementSeries.from_values(['a', 'b']) is None
+        assert MeasurementSeries.from_values([{'name': 'a'}]) is None
+
+        series = MeasurementSeries.from_values([[1.0, 2.0]])
+        with pytest.raises(ValueError):
+            series.extend([[1.0, 2.0, 3.0]])
+
+
+@pytest.mark.fast
+class TestMeasurements:
+    def test_data_view(self):
+        """
+        Tests if the dict view is equal to the one built with lists.
+        """
+        measurements = Measurements()
+        measurements += {
+            'inference': [0.1, 0.2],
+            'cpus': [[10.0, 20.0]],
+            'command': ['kenning'],
+            'tags': [{'name': 'inference', 'start': 0.0, 'end': 1.0}],
+            'size': 10
+        }
+        measurements.append('inference', 0.3)
+        measurements.append('cpus', [30.0, 40.0])
+        measurements += {'size': 5}
+
+        assert measurements.data == {
+            'inference': [0.1, 0.2, 0.3],
+            'cpus': [[10.0, 20.0], [30.0, 40.0]],
+            'command': ['kenning'],
+            'tags': [{'name': 'inference', 'start': 0.0, 'end': 1.0}],
+            'size': 15
+        }
+        assert isinstance(measurements.get_array('inference'), np.ndarray)
+
+    def test_to_dict_copy(self):
+        """
+        Tests if modifying the returned dictionary does not change data.
+        """
+        measurements = Measurements()
+        measurements += {
+            'inference': [0.1],
+            'command': ['kenning'],
+            'cm': np.zeros((2, 2))
+        }
+
+        data = measurements.to_dict()
+        data['inference'].append(0.2)
+        data['command'].append('test')
+        data['cm'][0, 0] = 1.0
+        data['total'] = 1
+
+        assert measurements.to_dict() == {
+            'inference': [0.1],
+            'command': ['kenning'],
+            'cm': pytest.approx(np.zeros((2, 2)))
+        }
+        assert measurements.data.keys() == measurements.to_dict().keys()
+
+    def test_merge(self):
+        """
+        Tests merging Measurements objects with series.
+        """
+        first = Measurements()
+        second = Measurements()
+        first += {'inference': [1.0]}
+        second += {'inference': [2.0, 3.0]}
+
+        first += second
+        first += second
+
+        assert first.get_values('inference') == [1.0, 2.0, 3.0, 2.0, 3.0]
+        assert second.get_values('inference') == [2.0, 3.0]
+
+    def test_mixed_values(self):
+        """
+        Tests if series falls back to list for non-numeric values.
+        """
+        measurements = Measurements()
+        measurements += {'values': [1.0]}
+        measurements.append('values', 'text')
+
+        assert measurements.get_values('values') == [1.0, 'text']
+
+    def test_sparse_update(self):
+        """
+        Tests accumulating sparse updates of the matrix.
+        """
+        measurements = Measurements()
+        measurements += {
+            'matrix': SparseUpdate((2, 3), ([0, 0, 1], [2, 2, 0]))
+        }
+        matrix = measurements.get_values('matrix')
+        measurements += {'matrix': SparseUpdate((2, 3), ([1], [1]))}
+        measurements.accumulate(
+            'matrix',
+            SparseUpdate((2, 3), ([0], [2]))
+        )
+
+        assert measurements.get_values('matrix') is matrix
+        assert matrix.dtype == np.int64
+        assert np.array_equal(matrix, [[0, 0, 3], [1, 1, 0]])
+
+        update = SparseUpdate((2, 2), ([0], [1])) + \
+            SparseUpdate((2, 2), ([0, 1], [1, 1]))
+        assert np.array_equal(update.toarray(), [[0, 2], [0, 1]])
+
+    def test_merge_shards(self):
+        """
+        Tests merging measurements of dataset shards.
+        """
+        first = Measurements()
+        first += {
+            'class_names': ['a', 'b'],
+            'build_cfg': {'dataset': {'shard_index': 0}},
+            'inferencetime': [0.1, 0.2],
+            'eval_det/a': [[0.9, True]],
+            'eval_gtcount/a': 2,
+            'total': 2
+        }
+        first.accumulate(
+            'eval_confusion_matrix',
+            np.array([[1, 0], [0, 1]]),
+            lambda: np.zeros((2, 2), dtype=np.int64)
+        )
+        # the second shard as loaded from JSON file
+        second = {
+            'class_names': ['a', 'b'],
+            'build_cfg': {'dataset': {'shard_index': 1}},
+            'inferencetime': [0.3],
+            'eval_det/a': [[0.5, False]],
+            'eval_det/b': [[0.7, True]],
+            'eval_gtcount/a': 1,
+            'total': 1,
+            'eval_confusion_matrix': [[0, 1], [0, 0]]
+        }
+
+        merged = merge_measurements([first, second])
+
+        assert merged.get_values('class_names') == ['a', 'b']
+        assert merged.get_values('build_cfg') == {
+            'dataset': {'shard_index': 0}
+        }
+        assert merged.get_values('inferencetime') == [0.1, 0.2, 0.3]
+        assert merged.get_values('eval_det/a') == [[0.9, True], [0.5, False]]
+        assert merged.get_values('eval_det/b') == [[0.7, True]]
+        assert merged.get_values('eval_gtcount/a') == 3
+        assert merged.get_values('total') == 3
+        assert np.array_equal(
+            merged.get_values('eval_confusion_matrix'),
+            [[1, 1], [0, 1]]
+        )
+        # merged shards are not modified
+        assert first.get_values('inferencetime') == [0.1, 0.2]
+        assert second['eval_det/a'] == [[0.5, False]]
+
+
+@pytest.mark.fast
+class TestMeasurementsScope:
+    def test_threads(self):
+        """
+        Tests if measurements from many threads are merged.
+        """
+        scope = MeasurementsCollector.scope()
+
+        def collect():
+            with scope:
+                for i in range(1000):
+                    MeasurementsCollector.measurements.append('values', i)
+
+        threads = [threading.Thread(target=collect) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(scope.get_values('values')) == 8000
+
+    def test_repeated_reads(self):
+        """
+        Tests if reading merged arrays does not modify thread buffers.
+        """
+        scope = MeasurementsCollector.scope()
+
+        def collect():
+            with scope:
+                MeasurementsCollector.measurements += {
+                    'cm': np.ones((2, 2))
+                }
+
+        threads = [threading.Thread(target=collect) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for _ in range(3):
+            assert np.array_equal(scope.data['cm'], np.full((2, 2), 2.0))
+
+    def test_isolation(self):
+        """
+        Tests if nested scopes do not mix measurements.
+        """
+        with MeasurementsCollector.scope() as outer:
+            MeasurementsCollector.measurements += {'values': [1]}
+            with MeasurementsCollector.scope() as inner:
+                MeasurementsCollector.measurements += {'values': [2]}
+            MeasurementsCollector.measurements += {'values': [3]}
+
+        assert outer.to_dict() == {'values': [1, 3]}
+        assert inner.to_dict() == {'values': [2]}
+        assert 'values' in outer
+        assert 'values' not in MeasurementsCollector.measurements
+
+
+@pytest.mark.fast
+class TestSystemStatsCollector:
+    def test_process_statistics(self):
+        """
+        Tests if statistics of the current process are collected.
+        """
+        with SystemStatsCollector('stats', 0.01) as collector:
+            time.sleep(0.1)
+        measurements = collector.get_measurements()
+
+        timestamps = measurements.get_values('stats_timestamp')
+        assert len(timestamps) > 1
+        for name in ('rss', 'peak_rss', 'cpu_percent', 'threads'):
+            assert len(measurements.get_values(f'stats_process_{name}')) == \
+                len(timestamps)
+        assert min(measurements.get_values('stats_process_rss')) > 0
+        assert max(measurements.get_values('stats_process_peak_rss')) >= \
+            max(measurements.get_values('stats_process_rss'))
+        overhead = measurements.get_values('stats_sampling_overhead')
+        assert len(overhead) == len(timestamps)
+        assert all(value >= 0 for value in overhead)
+
+    def test_energy(self):
+        """
+        Tests if readings from the power sampler are collected.
+        """
+        class ConstantPowerSampler(PowerSampler):
+            def __init__(self):
+                self.start = time.perf_counter()
+
+            def get_domains(self):
+                return ['board']
+
+            def read_energy(self):
+                return {'board': 5.0 * (time.perf_counter() - self.start)}
+
+        with SystemStatsCollector(
+                'stats',
+                0.01,
+                power_sampler=ConstantPowerSampler()) as collector:
+            time.sleep(0.1)
+        measurements = collector.get_measurements()
+
+        energy = measurements.get_values('stats_energy/board')
+        assert len(energy) == len(measurements.get_values('stats_timestamp'))
+        assert energy == sorted(energy)
+
+
+@pytest.mark.fast
+class TestInstrumentationLevel:
+    @pytest.mark.parametrize('level,expected', [
+        (InstrumentationLevel.OFF, False),
+        (InstrumentationLevel.MINIMAL, True),
+        (InstrumentationLevel.FULL, True),
+    ])
+    def test_decorators(self, level, expected):
+        """
+        Tests if decorators collect measurements only when enabled.
+        """
+        @timemeasurements('step')
+        @tagmeasurements('stage')
+        def function(value):
+            return value * 2
+
+        previous = set_instrumentation_level(level)
+        try:
+            with MeasurementsCollector.scope() as scope:
+                assert function(21) == 42
+        finally:
+            set_instrumentation_level(previous)
+
+        assert ('step' in scope) == expected
+        assert ('step_timestamp' in scope) == expected
+        assert ('tags' in scope) == expected
+
+    def test_decorators_follow_scope(self):
+        """
+        Tests if decorators follow changes of scopes, sinks and buffers.
+        """
+        class ListSink(object):
+            def __init__(self):
+                self.updates = []
+
+            def write_update(self, update):
+                self.updates.append(update)
+
+        @timemeasurements('step')
+        def function():
+            pass
+
+        with MeasurementsCollector.scope() as first:
+            function()
+            with MeasurementsCollector.scope() as second:
+                function()
+                function()
+            function()
+        assert len(first.get_values('step')) == 2
+        assert len(second.get_values('step')) == 2
+
+        with first:
+            function()
+            first.clear()
+            function()
+            assert len(first.get_values('step')) == 1
+            first.sink = ListSink()
+            function()
+            assert len(first.get_values('step')) == 2
+            assert [list(update) for update in first.sink.updates] == [
+                ['step'],
+                ['step_timestamp']
+            ]
+
+    def test_level_names(self):
+        """
+        Tests setting the level by its name.
+        """
+        previous = set_instrumentation_level('minimal')
+        try:
+            assert set_instrumentation_level('off') is \
+                InstrumentationLevel.MINIMAL
+        finally:
+            set_instrumentation_level(previous)
+
+
+@pytest.mark.fast
+class TestMemoryStage:
+    def test_nested_stages(self):
+        """
+        Tests if peaks of nested stages are included in enclosing stages.
+        """
+        size = 64 * 1024 * 1024
+
+        @memorymeasurements('allocation')
+        def allocate():
+            data = np.ones(size, dtype=np.uint8)
+            return int(data[-1])
+
+        set_python_allocations_tracking(True)
+        try:
+            with MeasurementsCollector.scope() as scope:
+                with MemoryStage('outer'):
+                    assert allocate() == 1
+        finally:
+            set_python_allocations_tracking(False)
+
+        stages = {
+            stage['name']: stage for stage in scope.get_values('memory_stages')
+        }
+        assert list(stages.keys()) == ['allocation', 'outer']
+        for stage in stages.values():
+            assert stage['python_peak_delta'] >= size
+            assert stage['peak_rss'] >= stage['rss_start']
+            assert stage['peak_rss_delta'] == \
+                stage['peak_rss'] - stage['rss_start']
+        assert stages['outer']['start'] <= stages['allocation']['start']
+        assert stages['outer']['peak_rss'] >= stages['allocation']['peak_rss']
+
+    def test_nested_stage_keeps_outer_peak(self):
+        """
+        Tests if nested stages do not reset the peak of enclosing stages.
+        """
+        size = 64 * 1024 * 1024
+
+        set_python_allocations_tracking(True)
+        try:
+            with MeasurementsCollector.scope() as scope:
+                with MemoryStage('outer'):
+                    data = np.ones(size, dtype=np.uint8)
+                    del data
+                    for _ in range(3):
+                        with MemoryStage('inner'):
+                            pass
+                    processpeak = _read_proc_stats('self').get('peak_rss')
+        finally:
+            set_python_allocations_tracking(False)
+
+        stages = scope.get_values('memory_stages')
+        assert [stage['name'] for stage in stages] == ['inner'] * 3 + ['outer']  # noqa: E501
+        outer = stages[-1]
+        assert outer['python_peak_delta'] >= size
+        assert outer['peak_rss'] >= outer['rss_start'] + size // 2
+        # the peak sampled by SystemStatsCollector is not reset either
+        if processpeak is not None:
+            assert processpeak >= outer['rss_start'] + size // 2
+        for stage in stages[:-1]:
+            assert stage['python_peak_delta'] < size
+            assert stage['peak_rss'] == max(
+                stage['rss_start'],
+                stage['rss_end']
+            )
+
+    def test_disabled(self):
+        """
+        Tests if stages are not recorded below the full level.
+        """
+        previous = set_instrumentation_level(InstrumentationLevel.MINIMAL)
+        try:
+            with MeasurementsCollector.scope() as scope:
+                with MemoryStage('stage'):
+                    pass
+        finally:
+            set_instrumentation_level(previous)
+
+        assert 'memory_stages' not in scope
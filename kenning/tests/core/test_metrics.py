@@ -0,0 +1,59 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import numpy as np
+
+from kenning.core.metrics import compute_latency_metrics
+from kenning.core.metrics import compute_performance_metrics
+
+
+@pytest.mark.fast
+class TestLatencyMetrics:
+    def test_latency_metrics(self):
+        """
+        Tests percentiles, jitter and throughput of latencies.
+        """
+        latencies = np.linspace(0.001, 0.1, 1000)
+        timestamps = np.arange(1, 1001) * 0.1
+
+        metrics = compute_latency_metrics('latency', latencies, timestamps)
+
+        assert metrics['latency_p50'] == pytest.approx(np.median(latencies))
+        assert metrics['latency_p99'] == pytest.approx(
+            np.percentile(latencies, 99)
+        )
+        assert metrics['latency_p90'] < metrics['latency_p99'] < \
+            metrics['latency_p99_9'] < metrics['latency_max']
+        assert metrics['latency_max'] == 0.1
+        assert metrics['latency_mean_ci_low'] < np.mean(latencies) < \
+            metrics['latency_mean_ci_high']
+        assert metrics['latency_interarrival_mean'] == pytest.approx(0.1)
+        assert metrics['latency_jitter'] == pytest.approx(0.0, abs=1e-9)
+        assert metrics['latency_throughput'] == pytest.approx(
+            1000 / (100 - 0.1 + 0.001)
+        )
+
+    def test_no_latencies(self):
+        """
+        Tests if no metrics are computed for empty series.
+        """
+        assert compute_latency_metrics('latency', []) == {}
+
+    def test_performance_metrics(self):
+        """
+        Tests if latency metrics are computed for inference steps.
+        """
+        measurementsdata = {
+            'target_inference_step': [0.5, 0.5, 0.5, 0.5],
+            'target_inference_step_timestamp': [1.0, 2.0, 3.0, 4.0],
+            'total': 8
+        }
+
+        metrics = compute_performance_metrics(measurementsdata)
+
+        assert metrics['inferencetime_p99'] == 0.5
+        assert metrics['inferencetime_throughput'] == pytest.approx(4 / 3.5)
+        assert metrics['inferencetime_samples_throughput'] == \
+            pytest.approx(8 / 3.5)
@@ -88,3 +88,76 @@ class TestRuntime:
         runtime, dataset, model = prepare_objects(runtime_cls, inputtype)
 
         runtime.run_locally(dataset, model, str(model.modelpath))
+
+
+class DummySessionRuntime(Runtime):
+    """
+    Runtime returning its input, used to test execution contexts.
+    """
+    def __init__(self):
+        super().__init__(protocol=None)
+        self.input = None
+        self.output = None
+        self.loaded = 0
+
+    def prepare_model(self, input_data):
+        self.loaded += 1
+        return True
+
+    def prepare_session(self):
+        self.input = None
+        self.output = None
+        return True
+
+    def prepare_input(self, input_data):
+        self.input = input_data
+        return True
+
+    def run(self):
+        self.output = self.input
+
+    def upload_output(self, input_data):
+        return self.output
+
+
+class DummyModelWrapper:
+    def _preprocess_input(self, X):
+        return X
+
+    def convert_input_to_bytes(self, X):
+        return X
+
+    def convert_output_from_bytes(self, X):
+        return X
+
+    def _postprocess_outputs(self, y):
+        return y
+
+
+class TestRuntimeSessionPool:
+    def test_create_session(self):
+        """
+        Tests if sessions do not share the inference state.
+        """
+        runtime = DummySessionRuntime()
+        runtime.prepare_model(None)
+        session = runtime.create_session()
+
+        assert session is not runtime
+        assert session.loaded == 1
+        runtime.prepare_input(b'runtime')
+        session.prepare_input(b'session')
+        assert runtime.input == b'runtime'
+
+    def test_infer_all(self):
+        """
+        Tests if concurrent inference returns results in order.
+        """
+        runtime = DummySessionRuntime()
+        runtime.prepare_model(None)
+        pool = runtime.create_session_pool(4)
+        batches = [bytes([i]) for i in range(64)]
+
+        assert len(pool.sessions) == 4
+        assert pool.infer_all(batches, DummyModelWrapper()) == batches
+        assert pool.freesessions.qsize() == 4
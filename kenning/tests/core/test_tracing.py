@@ -0,0 +1,66 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import threading
+import pytest
+
+from kenning.core.tracing import TraceRecorder
+
+
+@pytest.mark.fast
+class TestTraceRecorder:
+    def test_chrome_trace(self, tmp_path):
+        """
+        Tests if spans and counters are exported in Chrome Trace format.
+        """
+        recorder = TraceRecorder()
+        with recorder.span('outer', args={'batch': 1}):
+            with recorder.span('inner'):
+                pass
+        recorder.add_counter('utilization', {'mem_percent': 10.0})
+        recorder.save(tmp_path / 'trace.json')
+
+        with open(tmp_path / 'trace.json', 'r') as tracefile:
+            trace = json.load(tracefile)
+        events = {
+            event['name']: event for event in trace['traceEvents']
+        }
+        outer, inner = events['outer'], events['inner']
+
+        assert outer['ph'] == 'X' and outer['args'] == {'batch': 1}
+        assert outer['ts'] <= inner['ts']
+        assert inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+        assert events['utilization']['args'] == {'mem_percent': 10.0}
+        assert events['thread_name']['ph'] == 'M'
+
+    def test_ring_buffer(self):
+        """
+        Tests if the oldest events are dropped when the buffer is full.
+        """
+        recorder = TraceRecorder(capacity=10)
+        for i in range(20):
+            recorder.add_span(str(i), i, i + 1)
+
+        names = [event['name'] for event in
+                 recorder.to_chrome_trace()['traceEvents']
+                 if event['ph'] == 'X']
+        assert names == [str(i) for i in range(10, 20)]
+
+    def test_threads(self):
+        """
+        Tests if spans from different threads have different IDs.
+        """
+        recorder = TraceRecorder()
+        thread = threading.Thread(
+            target=lambda: recorder.add_span('thread', 0.0, 1.0)
+        )
+        thread.start()
+        thread.join()
+        recorder.add_span('main', 0.0, 1.0)
+
+        tids = {event['tid'] for event in
+                recorder.to_chrome_trace()['traceEvents']
+                if event['ph'] == 'X'}
+        assert len(tids) == 2
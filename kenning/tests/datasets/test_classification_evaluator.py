@@ -0,0 +1,60 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import numpy as np
+
+from kenning.core.measurements import Measurements
+from kenning.datasets.helpers.classification import ClassificationEvaluator
+
+
+@pytest.mark.fast
+class TestClassificationEvaluator:
+    def test_matches_reference(self):
+        """
+        Tests if measurements match the ones computed sample by sample.
+        """
+        numclasses = 10
+        rng = np.random.default_rng(12345)
+        evaluator = ClassificationEvaluator(numclasses, record_top_k=True)
+        measurements = Measurements()
+        reference = np.zeros((numclasses, numclasses))
+        top_5_count = 0
+        top_5_records = []
+        for batch in range(4):
+            predictions = list(rng.random((8, numclasses)))
+            truth = list(np.eye(numclasses)[rng.integers(0, numclasses, 8)])
+            names = [f'{batch}_{i}.jpg' for i in range(8)]
+            for prediction, label, name in zip(predictions, truth, names):
+                reference[np.argmax(label), np.argmax(prediction)] += 1
+                top_5 = np.argsort(prediction)[::-1][:5]
+                top_5_count += 1 if np.argmax(label) in top_5 else 0
+                top_5_records.append({name: top_5.tolist()})
+            measurements += evaluator.evaluate(predictions, truth, names)
+
+        assert np.array_equal(
+            measurements.get_values('eval_confusion_matrix'),
+            reference
+        )
+        assert measurements.get_values('top_5_count') == top_5_count
+        assert measurements.get_values('top_5') == top_5_records
+        assert measurements.get_values('total') == 32
+
+    def test_class_indices(self):
+        """
+        Tests evaluation with class indices as labels and without top-k.
+        """
+        evaluator = ClassificationEvaluator(3, top_k=None)
+        measurements = Measurements()
+        measurements += evaluator.evaluate(
+            [np.array([[0.1, 0.7, 0.2]]), np.array([[0.8, 0.1, 0.1]])],
+            [1, 2]
+        )
+
+        assert np.array_equal(
+            measurements.get_values('eval_confusion_matrix'),
+            [[0, 0, 0], [0, 1, 0], [1, 0, 0]]
+        )
+        assert 'top_5_count' not in measurements
+        assert measurements.get_values('total') == 2
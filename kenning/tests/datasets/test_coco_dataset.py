@@ -0,0 +1,88 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+from pathlib import Path
+
+import pytest
+
+from kenning.datasets.coco_dataset import COCODataset2017
+from kenning.datasets.helpers.detection_and_segmentation import DectObject
+from kenning.utils.annotation_index import ANNOTATION_INDEX_DIR
+
+
+@pytest.fixture
+def cocoroot(tmp_path: Path) -> Path:
+    """
+    Creates the COCO dataset directory with a small annotations file.
+
+    Returns
+    -------
+    Path: The path to the dataset directory.
+    """
+    (tmp_path / 'annotations').mkdir()
+    annotations = {
+        'categories': [
+            {'id': 1, 'name': 'person'},
+            {'id': 3, 'name': 'car'}
+        ],
+        'images': [
+            {'id': 10, 'file_name': '10.jpg', 'width': 100, 'height': 50},
+            {'id': 20, 'file_name': '20.jpg', 'width': 200, 'height': 100},
+            {'id': 30, 'file_name': '30.jpg', 'width': 10, 'height': 10}
+        ],
+        'annotations': [
+            {'id': 1, 'image_id': 20, 'category_id': 3,
+             'bbox': [20, 10, 100, 50], 'iscrowd': 0, 'area': 5000},
+            {'id': 2, 'image_id': 10, 'category_id': 1,
+             'bbox': [0, 0, 50, 25], 'iscrowd': 1, 'area': 1250},
+            {'id': 3, 'image_id': 20, 'category_id': 1,
+             'bbox': [0, 0, 200, 100], 'iscrowd': 0, 'area': 20000}
+        ]
+    }
+    with open(tmp_path / 'annotations' / 'instances_val2017.json', 'w') as f:
+        json.dump(annotations, f)
+    return tmp_path
+
+
+@pytest.mark.fast
+class TestCOCODataset2017:
+    def test_prepare(self, cocoroot: Path):
+        """
+        Tests if annotations are the same with and without the index.
+
+        List of methods that are being tested
+        --------------------------------
+        COCODataset2017.prepare()
+
+        Used fixtures
+        -------------
+        cocoroot - to get the dataset directory with annotations
+        """
+        parsed = COCODataset2017(cocoroot, use_annotation_index=False)
+        assert not (cocoroot / ANNOTATION_INDEX_DIR).exists()
+        built = COCODataset2017(cocoroot)
+        assert (cocoroot / ANNOTATION_INDEX_DIR).exists()
+        loaded = COCODataset2017(cocoroot)
+
+        imagesdir = cocoroot / 'val2017'
+        assert parsed.dataX == [
+            str(imagesdir / '10.jpg'),
+            str(imagesdir / '20.jpg'),
+            str(imagesdir / '30.jpg')
+        ]
+        assert parsed.dataY == [
+            [DectObject('person', 0.0, 0.0, 0.5, 0.5, 1.0, True)],
+            [
+                DectObject('car', 0.1, 0.1, 0.6, 0.6, 1.0, False),
+                DectObject('person', 0.0, 0.0, 1.0, 1.0, 1.0, False)
+            ],
+            []
+        ]
+        assert parsed.get_class_names() == ['person', 'car']
+        for dataset in (built, loaded):
+            assert dataset.dataX == parsed.dataX
+            assert dataset.dataY == parsed.dataY
+            assert dataset.classmap == parsed.classmap
+            assert dataset.imagesizes == parsed.imagesizes
@@ -0,0 +1,57 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import wave
+
+import numpy as np
+import pytest
+
+# the dataset requires the optional speech-to-text dependencies
+pytest.importorskip('librosa')
+
+from kenning.datasets.common_voice_dataset import CommonVoiceDataset  # noqa: E402, E501
+
+
+def write_recording(path, samples, sample_rate=16000):
+    """
+    Writes 16-bit mono WAV file.
+    """
+    with wave.open(str(path), 'wb') as wavfile:
+        wavfile.setnchannels(1)
+        wavfile.setsampwidth(2)
+        wavfile.setframerate(sample_rate)
+        wavfile.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+
+
+@pytest.mark.fast
+class TestCommonVoiceDataset:
+    def test_audio_store_key(self, tmp_path):
+        """
+        Tests if recordings are decoded again when source files change.
+        """
+        paths = [tmp_path / 'first.wav', tmp_path / 'second.wav']
+        write_recording(paths[0], [1, 2, 3])
+        write_recording(paths[1], [4, 5])
+        dataset = CommonVoiceDataset.__new__(CommonVoiceDataset)
+        dataset.root = tmp_path
+        dataset.dataX = [str(path) for path in paths]
+        dataset.sample_rate = 16000
+        dataset.decode_workers = 1
+
+        dataset.decode_recordings()
+        first = dataset.audiostore.directory
+        dataset.decode_recordings()
+
+        assert dataset.audiostore.directory == first
+        assert dataset.audiostore.get(str(paths[1])).tolist() == [4, 5]
+
+        write_recording(paths[1], [6, 7, 8, 9])
+        # modification time may not change on coarse-grained file systems
+        stat = os.stat(paths[1])
+        os.utime(paths[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        dataset.decode_recordings()
+
+        assert dataset.audiostore.directory != first
+        assert dataset.audiostore.get(str(paths[1])).tolist() == [6, 7, 8, 9]
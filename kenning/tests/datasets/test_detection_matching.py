@@ -0,0 +1,193 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import numpy as np
+
+from kenning.core.measurements import Measurements
+from kenning.datasets.helpers.detection_and_segmentation import DectObject
+from kenning.datasets.helpers.detection_and_segmentation import ObjectDetectionSegmentationDataset  # noqa: E501
+from kenning.datasets.helpers.detection_and_segmentation import compute_dect_iou  # noqa: E501
+from kenning.datasets.helpers.detection_and_segmentation import compute_dect_iou_matrix  # noqa: E501
+from kenning.datasets.helpers.detection_and_segmentation import SegmObject
+from kenning.datasets.helpers.detection_and_segmentation import compute_segm_iou  # noqa: E501
+from kenning.datasets.helpers.detection_and_segmentation import compute_segm_iou_matrix  # noqa: E501
+from kenning.datasets.helpers.rle import RLEMask
+from kenning.datasets.helpers.detection_metrics import DET_AREA
+from kenning.datasets.helpers.detection_metrics import DET_AREA_IOUS
+from kenning.datasets.helpers.detection_metrics import DET_TP_IOUS
+from kenning.datasets.helpers.detection_metrics import IOU_THRESHOLDS
+
+
+def reference_evaluate(predictions, truth, miniou=0.5):
+    """
+    Matches predictions with ground truths pair by pair.
+    """
+    measurements = Measurements()
+    for preds, groundtruths in zip(predictions, truth):
+        preds = sorted(preds, key=lambda x: -x.score)[:100]
+        matchedgt = np.zeros([len(groundtruths)], dtype=np.int32)
+        for pred in preds:
+            bestiou = 0.0
+            bestgt = -1
+            for gtid, gt in enumerate(groundtruths):
+                if pred.clsname != gt.clsname:
+                    continue
+                if matchedgt[gtid] > 0 and not gt.iscrowd:
+                    continue
+                iou = compute_dect_iou(pred, gt)
+                if iou < bestiou:
+                    continue
+                bestiou = iou
+                bestgt = gtid
+            matched = not (bestgt == -1 or bestiou < miniou)
+            measurements.add_measurement(
+                f'eval_det/{pred.clsname}',
+                [[float(pred.score), float(matched), float(bestiou)]],
+                lambda: list()
+            )
+            if matched:
+                matchedgt[bestgt] = 1
+        for gt in groundtruths:
+            measurements.accumulate(f'eval_gtcount/{gt.clsname}', 1, lambda: 0)
+    return measurements
+
+
+def random_objects(rng, count, score):
+    """
+    Creates random boxes gathered in a small area, so they overlap.
+    """
+    objects = []
+    for _ in range(count):
+        x = np.sort(rng.choice(np.linspace(0.0, 0.5, 11), 2))
+        y = np.sort(rng.choice(np.linspace(0.0, 0.5, 11), 2))
+        objects.append(DectObject(
+            clsname=str(rng.integers(0, 3)),
+            xmin=float(x[0]),
+            ymin=float(y[0]),
+            xmax=float(x[1]) + 0.05,
+            ymax=float(y[1]) + 0.05,
+            score=float(rng.choice([0.25, 0.5, 0.75])) if score else 1.0,
+            iscrowd=bool(rng.random() < 0.2)
+        ))
+    return objects
+
+
+@pytest.mark.fast
+class TestDetectionMatching:
+    def test_iou_matrix(self):
+        """
+        Tests if the IoU matrix matches IoU of single pairs.
+        """
+        rng = np.random.default_rng(1234)
+        preds = random_objects(rng, 20, True)
+        groundtruths = random_objects(rng, 15, False)
+
+        ious = compute_dect_iou_matrix(preds, groundtruths)
+
+        assert ious.shape == (20, 15)
+        for i, pred in enumerate(preds):
+            for j, gt in enumerate(groundtruths):
+                assert ious[i, j] == compute_dect_iou(pred, gt)
+
+    def test_segm_iou_matrix(self):
+        """
+        Tests if IoU of dense and encoded masks matches IoU of single pairs.
+        """
+        rng = np.random.default_rng(99)
+        masks = []
+        for _ in range(12):
+            mask = np.zeros((32, 40), dtype=np.uint8)
+            y, x = rng.integers(0, 24, size=2)
+            mask[y:y + rng.integers(1, 16), x:x + rng.integers(1, 16)] = 255
+            masks.append(mask)
+        objects = [
+            SegmObject('a', None, 0.0, 0.0, 1.0, 1.0, mask, 1.0, False)
+            for mask in masks
+        ]
+        encoded = [
+            obj._replace(mask=RLEMask.from_array(obj.mask)) for obj in objects
+        ]
+
+        ious = compute_segm_iou_matrix(objects[:5], objects)
+
+        assert np.array_equal(
+            compute_segm_iou_matrix(encoded[:5], encoded),
+            ious
+        )
+        for i in range(5):
+            for j in range(len(masks)):
+                assert ious[i, j] == compute_segm_iou(masks[i], masks[j])
+                assert ious[i, j] == compute_segm_iou(
+                    encoded[i].mask,
+                    masks[j]
+                )
+
+    def test_matches_reference(self):
+        """
+        Tests if evaluation gives the same results as pairwise matching.
+        """
+        rng = np.random.default_rng(4321)
+        predictions = [
+            random_objects(rng, rng.integers(0, 40), True) for _ in range(30)
+        ]
+        truth = [
+            random_objects(rng, rng.integers(0, 20), False) for _ in range(30)
+        ]
+        dataset = ObjectDetectionSegmentationDataset.__new__(
+            ObjectDetectionSegmentationDataset
+        )
+        dataset.task = 'object_detection'
+        dataset.show_on_eval = False
+
+        result = dataset.evaluate(predictions, truth).data
+
+        for thresholdid, miniou in enumerate(IOU_THRESHOLDS):
+            expected = reference_evaluate(predictions, truth, miniou).data
+            assert sorted(
+                key for key in result.keys()
+                if not key.startswith('eval_gtareas/')
+            ) == sorted(expected.keys())
+            for key, value in expected.items():
+                if not key.startswith('eval_det/'):
+                    assert result[key] == value, key
+                elif thresholdid == 0:
+                    assert [row[:DET_AREA] for row in result[key]] == \
+                        value, key
+                else:
+                    assert [
+                        row[DET_TP_IOUS + thresholdid - 1]
+                        for row in result[key]
+                    ] == [row[1] for row in value], (key, miniou)
+
+    def test_areas(self):
+        """
+        Tests if ground truth areas and areas of detections are recorded.
+        """
+        dataset = ObjectDetectionSegmentationDataset.__new__(
+            ObjectDetectionSegmentationDataset
+        )
+        dataset.task = 'object_detection'
+        dataset.show_on_eval = False
+        groundtruths = [
+            DectObject('a', 0.0, 0.0, 0.5, 0.5, 1.0, False),
+            DectObject('a', 0.5, 0.5, 0.6, 0.6, 1.0, False)
+        ]
+        preds = [
+            DectObject('a', 0.0, 0.0, 0.5, 0.4, 0.9, False),
+            DectObject('a', 0.8, 0.8, 1.0, 1.0, 0.8, False)
+        ]
+
+        result = dataset.evaluate([preds], [groundtruths]).data
+
+        assert result['eval_gtareas/a'] == pytest.approx([0.25, 0.01])
+        # matched detection has the area of the ground truth
+        assert [row[DET_AREA] for row in result['eval_det/a']] == \
+            pytest.approx([0.25, 0.04])
+        # at IoU thresholds above 0.8 the first detection is not matched
+        assert [
+            row[DET_AREA_IOUS + thresholdid - 1]
+            for row in result['eval_det/a']
+            for thresholdid in range(1, len(IOU_THRESHOLDS))
+        ] == pytest.approx([0.25] * 6 + [0.2] * 3 + [0.04] * 9)
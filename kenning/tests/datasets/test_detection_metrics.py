@@ -0,0 +1,203 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import numpy as np
+
+from kenning.core.metrics import compute_detection_metrics
+from kenning.datasets.helpers.detection_metrics import AREA_RANGES
+from kenning.datasets.helpers.detection_metrics import DET_COLUMNS
+from kenning.datasets.helpers.detection_metrics import DetectionMetrics
+from kenning.datasets.helpers.detection_metrics import IOU_THRESHOLDS
+
+
+def reference_recall_precision(measurementsdata, scorethresh, column=1):
+    """
+    Computes recall-precision curves detection by detection.
+    """
+    lines = -np.ones(
+        [len(measurementsdata['class_names']), 2, 101],
+        dtype=np.float32
+    )
+    for clsid, cls in enumerate(measurementsdata['class_names']):
+        gt_count = measurementsdata.get(f'eval_gtcount/{cls}', 0)
+        if gt_count == 0:
+            continue
+        dets = measurementsdata.get(f'eval_det/{cls}', [])
+        dets = [d for d in dets if d[0] >= scorethresh]
+        dets.sort(key=lambda d: -d[0])
+        tps = np.array([entry[column] != 0.0 for entry in dets])
+        fps = np.array([entry[column] == 0.0 for entry in dets])
+        tpacc = np.cumsum(tps).astype(dtype=np.float64)
+        fpacc = np.cumsum(fps).astype(dtype=np.float64)
+
+        recalls = tpacc / gt_count
+        precisions = tpacc / (fpacc + tpacc + np.spacing(1))
+
+        for i in range(len(precisions) - 1, 0, -1):
+            if precisions[i] > precisions[i - 1]:
+                precisions[i - 1] = precisions[i]
+
+        recallthresholds = np.linspace(0.0, 1.0, num=101)
+        inds = np.searchsorted(recalls, recallthresholds, side='left')
+        newprecisions = np.zeros(recallthresholds.shape, dtype=np.float32)
+        try:
+            for oldid, newid in enumerate(inds):
+                newprecisions[oldid] = precisions[newid]
+        except IndexError:
+            pass
+
+        lines[clsid, 0] = recallthresholds
+        lines[clsid, 1] = newprecisions
+    return lines
+
+
+def random_measurements(rng, numclasses=4, columns=DET_COLUMNS):
+    """
+    Creates random detection measurements.
+    """
+    data = {'class_names': [str(i) for i in range(numclasses)]}
+    # the last class has no ground truths
+    for cls in data['class_names'][:-1]:
+        numdets = int(rng.integers(0, 60))
+        dets = np.zeros((numdets, columns))
+        dets[:, 0] = rng.choice(np.linspace(0.0, 1.0, 21), numdets)
+        dets[:, 1] = rng.random(numdets) < 0.6
+        dets[:, 2] = rng.random(numdets)
+        if columns > 3:
+            dets[:, 3] = rng.random(numdets) * 0.1
+            dets[:, 4:13] = dets[:, 1:2] * (rng.random((numdets, 9)) < 0.7)
+        if columns > 13:
+            # true positives may match different ground truths
+            dets[:, 13:] = np.where(
+                dets[:, 4:13] != 0.0,
+                rng.random((numdets, 9)) * 0.1,
+                dets[:, 3:4]
+            )
+        data[f'eval_det/{cls}'] = dets.tolist()
+        numgts = int(rng.integers(1, 50))
+        data[f'eval_gtcount/{cls}'] = numgts
+        data[f'eval_gtareas/{cls}'] = (rng.random(numgts) * 0.1).tolist()
+    data[f'eval_det/{data["class_names"][-1]}'] = [
+        [0.5] + [0.0] * (columns - 1)
+    ]
+    return data
+
+
+@pytest.mark.fast
+class TestDetectionMetrics:
+    def test_recall_precision(self):
+        """
+        Tests if recall-precision curves match detection by detection results.
+        """
+        data = random_measurements(np.random.default_rng(12345))
+        metrics = DetectionMetrics(data)
+
+        for scorethresh in [0.0, 0.3, 0.5, 0.95, 1.1]:
+            assert np.array_equal(
+                metrics.recall_precision(scorethresh),
+                reference_recall_precision(data, scorethresh)
+            )
+        for thresholdid, iouthresh in enumerate(IOU_THRESHOLDS[1:]):
+            assert np.array_equal(
+                metrics.recall_precision(0.2, iouthresh),
+                reference_recall_precision(data, 0.2, 4 + thresholdid)
+            )
+
+    def test_map_per_threshold(self):
+        """
+        Tests if mAP values match values computed for every threshold.
+        """
+        data = random_measurements(np.random.default_rng(54321))
+        metrics = DetectionMetrics(data)
+        thresholds = np.arange(0.2, 1.05, 0.05)
+
+        expected = []
+        for thresh in thresholds:
+            precisions = reference_recall_precision(data, thresh)[:, 1, :]
+            expected.append(np.mean(precisions[precisions > -1]))
+
+        assert np.array_equal(
+            metrics.map_per_threshold(thresholds),
+            np.array(expected, dtype=np.float32)
+        )
+
+    def test_iou_and_area_ranges(self):
+        """
+        Tests mAP averaged over IoU thresholds and computed for area ranges.
+        """
+        data = random_measurements(np.random.default_rng(2023))
+        metrics = DetectionMetrics(data)
+
+        assert metrics.iou_thresholds == IOU_THRESHOLDS
+        assert metrics.has_areas
+        assert metrics.mean_average_precision() == pytest.approx(np.mean([
+            metrics.map_per_threshold([0.0], iouthresh)[0]
+            for iouthresh in IOU_THRESHOLDS
+        ]))
+
+        low, high = AREA_RANGES['small']
+        for thresholdid, iouthresh in enumerate(IOU_THRESHOLDS):
+            tpcolumn = 1 if thresholdid == 0 else 3 + thresholdid
+            areacolumn = 3 if thresholdid == 0 else 12 + thresholdid
+            filtered = {'class_names': data['class_names']}
+            for cls in data['class_names'][:-1]:
+                filtered[f'eval_det/{cls}'] = [
+                    det for det in data[f'eval_det/{cls}']
+                    if low <= det[areacolumn] <= high
+                ]
+                filtered[f'eval_gtcount/{cls}'] = sum(
+                    low <= area <= high
+                    for area in data[f'eval_gtareas/{cls}']
+                )
+            precisions = reference_recall_precision(
+                filtered,
+                0.0,
+                tpcolumn
+            )[:, 1, :]
+            assert metrics.map_per_threshold([0.0], iouthresh, 'small')[0] \
+                == np.mean(precisions[precisions > -1]), iouthresh
+
+    def test_empty_area_ranges(self):
+        """
+        Tests if area ranges without ground truths are skipped.
+        """
+        data = random_measurements(np.random.default_rng(99))
+        for cls in data['class_names'][:-1]:
+            data[f'eval_gtareas/{cls}'] = [0.5] * len(
+                data[f'eval_gtareas/{cls}']
+            )
+        metrics = DetectionMetrics(data)
+
+        assert metrics.mean_average_precision(arearange='small') is None
+        assert metrics.mean_average_precision(arearange='large') is not None
+        result = compute_detection_metrics(data, metrics)
+        assert 'mAP_small' not in result
+        assert 'mAP_medium' not in result
+        assert not np.isnan(result['mAP_large'])
+
+    def test_legacy_measurements(self):
+        """
+        Tests if measurements without areas and IoU thresholds are supported.
+        """
+        data = random_measurements(np.random.default_rng(7), columns=3)
+        del data['eval_gtareas/0']
+        metrics = DetectionMetrics(data)
+
+        assert metrics.iou_thresholds == [0.5]
+        assert not metrics.has_areas
+        assert np.array_equal(
+            metrics.recall_precision(0.5),
+            reference_recall_precision(data, 0.5)
+        )
+        with pytest.raises(ValueError):
+            metrics.map_per_threshold([0.0], 0.5, 'small')
+
+        # records with a single area use it for all IoU thresholds
+        data = random_measurements(np.random.default_rng(7), columns=13)
+        metrics = DetectionMetrics(data)
+
+        assert metrics.iou_thresholds == IOU_THRESHOLDS
+        assert not metrics.has_threshold_areas
+        assert metrics.mean_average_precision(arearange='small') is not None
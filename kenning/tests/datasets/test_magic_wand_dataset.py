@@ -0,0 +1,151 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from kenning.core.measurements import Measurements
+from kenning.datasets.magic_wand_dataset import MagicWandDataset
+from kenning.datasets.magic_wand_dataset import WINDOWS_CACHE_DIR
+from kenning.datasets.magic_wand_dataset import parse_gesture_file
+
+
+@pytest.fixture()
+def dataset_root(tmp_path) -> Path:
+    """
+    Creates data files of the Magic Wand dataset with random recordings.
+
+    Returns
+    -------
+    Path: The path to the dataset
+    """
+    generator = np.random.default_rng(12345)
+    for classname in ['wing', 'ring', 'slope', 'negative']:
+        (tmp_path / classname).mkdir()
+        for fileid in range(2):
+            lines = ['-,-,-']
+            for length in generator.integers(20, 300, size=5):
+                values = np.round(generator.uniform(-1000, 1000, (length, 3)))
+                lines += [','.join(str(v) for v in row) for row in values]
+                lines.append('-,-,-')
+            (tmp_path / classname / f'output_{fileid}.txt').write_text(
+                '\n'.join(lines) + '\n'
+            )
+    return tmp_path
+
+
+def reference_evaluate(numclasses, predictions, truth):
+    """
+    Computes the confusion matrix sample by sample.
+    """
+    confusion_matrix = np.zeros((numclasses, numclasses))
+    for prediction, label in zip(predictions, truth):
+        confusion_matrix[np.argmax(label), np.argmax(prediction)] += 1
+    measurements = Measurements()
+    measurements.accumulate(
+        'eval_confusion_matrix',
+        confusion_matrix,
+        lambda: np.zeros((numclasses, numclasses))
+    )
+    measurements.accumulate('total', len(predictions), lambda: 0)
+    return measurements
+
+
+@pytest.mark.fast
+class TestMagicWandDataset:
+    def test_parse_gesture_file(self, tmp_path):
+        """
+        Tests if recordings are split at separators and lines without three
+        fields are ignored.
+        """
+        path = tmp_path / 'output.txt'
+        path.write_text('\n'.join([
+            '-,-,-',
+            '1.0,2.0,3.0',
+            ' -4.5, 5 ,6e1',
+            'comment',
+            '1,2',
+            '-,-,-',
+            '-,-,-',
+            '7.0,8.0,9.0',
+            'a,b,c',
+            '10.0,11.0,12.0'
+        ]))
+
+        recordings = parse_gesture_file(path)
+
+        assert len(recordings) == 2
+        assert np.array_equal(
+            recordings[0],
+            [[1.0, 2.0, 3.0], [-4.5, 5.0, 60.0]]
+        )
+        # the last recording is not terminated with a separator
+        assert np.array_equal(recordings[1], [[7.0, 8.0, 9.0]])
+
+    def test_windows(self, dataset_root):
+        """
+        Tests if windows are contiguous, cached and deterministic.
+        """
+        dataset = MagicWandDataset(dataset_root)
+
+        assert dataset.dataX.dtype == np.float32
+        assert dataset.dataX.shape[1:] == (128, 3)
+        assert dataset.dataX.flags['C_CONTIGUOUS']
+        assert dataset.dataY.shape == (len(dataset.dataX), 4)
+        assert len(list((dataset_root / WINDOWS_CACHE_DIR).glob('*.npz'))) == 1
+
+        cached = MagicWandDataset(dataset_root)
+        computed = MagicWandDataset(dataset_root, use_windows_cache=False)
+        assert np.array_equal(cached.dataX, dataset.dataX)
+        assert np.array_equal(computed.dataX, dataset.dataX)
+        assert np.array_equal(computed.dataY, dataset.dataY)
+
+        reseeded = MagicWandDataset(dataset_root, noise_seed=1)
+        assert not np.array_equal(reseeded.dataX, dataset.dataX)
+        assert len(list((dataset_root / WINDOWS_CACHE_DIR).glob('*.npz'))) == 2
+
+    def test_recordings_in_windows(self, dataset_root):
+        """
+        Tests if recordings are padded to full windows.
+        """
+        dataset = MagicWandDataset(dataset_root, noise_level=0)
+        recordings = parse_gesture_file(dataset_root / 'ring' / 'output_0.txt')
+        padded = dataset.generate_padding(recordings[0])
+        windows = dataset.split_sample_to_windows(padded)
+
+        assert len(padded) % 128 == 0
+        assert len(windows) == len(padded) // 128
+        assert np.array_equal(windows.reshape(-1, 3), padded)
+        pre = abs(128 - len(recordings[0])) % 128
+        end = pre + len(recordings[0])
+        assert np.array_equal(padded[pre:end], recordings[0])
+        assert np.all(padded[:pre] == recordings[0][0])
+        assert np.all(padded[end:] == recordings[0][-1])
+
+    def test_evaluate(self, dataset_root):
+        """
+        Tests if accumulated measurements match sample by sample evaluation.
+        """
+        dataset = MagicWandDataset(dataset_root)
+        generator = np.random.default_rng(42)
+        measurements = Measurements()
+        expected = Measurements()
+
+        for batchsize in [1, 7, 32]:
+            predictions = list(generator.random((batchsize, 4)))
+            truth = list(np.eye(4)[generator.integers(0, 4, batchsize)])
+            measurements += dataset.evaluate(predictions, truth)
+            expected += reference_evaluate(4, predictions, truth)
+
+        confusion_matrix = measurements.get_values('eval_confusion_matrix')
+        # counts are accumulated in an integer matrix
+        assert confusion_matrix.dtype == np.int64
+        assert np.array_equal(
+            confusion_matrix,
+            expected.get_values('eval_confusion_matrix')
+        )
+        assert measurements.get_values('total') == \
+            expected.get_values('total') == 40
@@ -0,0 +1,96 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from pathlib import Path
+
+import pytest
+
+from kenning.datasets.helpers.detection_and_segmentation import DectObject
+from kenning.datasets.helpers.detection_and_segmentation import SegmObject
+from kenning.datasets.open_images_dataset import OpenImagesDatasetV6
+from kenning.utils.annotation_index import ANNOTATION_INDEX_DIR
+
+
+def create_dataset_dir(root: Path, task: str) -> Path:
+    """
+    Creates the Open Images dataset directory with small annotations.
+
+    Parameters
+    ----------
+    root : Path
+        The path to the created directory
+    task : str
+        Task of the dataset, determines columns of annotations
+
+    Returns
+    -------
+    Path: The path to the dataset directory.
+    """
+    root.mkdir()
+    (root / 'classnames.csv').write_text('/m/01,cat\n/m/02,dog\n')
+    rows = [
+        ('b', '/m/02', 0.1, 0.2, 0.3, 0.4),
+        ('a', '/m/01', 0.0, 0.5, 0.0, 0.5),
+        ('b', '/m/01', 0.5, 1.0, 0.5, 1.0)
+    ]
+    with open(root / 'annotations.csv', 'w') as f:
+        if task == 'instance_segmentation':
+            print('MaskPath,ImageID,LabelName,BoxXMin,BoxXMax,BoxYMin,BoxYMax', file=f)  # noqa: E501
+            for i, row in enumerate(rows):
+                print(f'{row[0]}_{i}.png,' + ','.join(map(str, row)), file=f)
+        else:
+            print('ImageID,LabelName,XMin,XMax,YMin,YMax', file=f)
+            for row in rows:
+                print(','.join(map(str, row)), file=f)
+    return root
+
+
+@pytest.mark.fast
+class TestOpenImagesDatasetV6:
+    @pytest.mark.parametrize('task', [
+        'object_detection',
+        'instance_segmentation'
+    ])
+    def test_prepare(self, tmp_path: Path, task: str):
+        """
+        Tests if annotations are the same with and without the index.
+
+        List of methods that are being tested
+        --------------------------------
+        OpenImagesDatasetV6.prepare()
+        """
+        root = create_dataset_dir(tmp_path / 'dataset', task)
+        kwargs = {'task': task, 'classes': str(root / 'classnames.csv')}
+
+        parsed = OpenImagesDatasetV6(
+            root,
+            use_annotation_index=False,
+            **kwargs
+        )
+        assert not (root / ANNOTATION_INDEX_DIR).exists()
+        built = OpenImagesDatasetV6(root, **kwargs)
+        assert (root / ANNOTATION_INDEX_DIR).exists()
+        loaded = OpenImagesDatasetV6(root, **kwargs)
+
+        assert parsed.dataX == ['b', 'a']
+        if task == 'instance_segmentation':
+            masks = root / 'masks'
+            assert parsed.dataY == [
+                [
+                    SegmObject('dog', masks / 'b_0.png', 0.1, 0.3, 0.2, 0.4, None, 1.0, False),  # noqa: E501
+                    SegmObject('cat', masks / 'b_2.png', 0.5, 0.5, 1.0, 1.0, None, 1.0, False)  # noqa: E501
+                ],
+                [SegmObject('cat', masks / 'a_1.png', 0.0, 0.0, 0.5, 0.5, None, 1.0, False)]  # noqa: E501
+            ]
+        else:
+            assert parsed.dataY == [
+                [
+                    DectObject('dog', 0.1, 0.3, 0.2, 0.4, 1.0, False),
+                    DectObject('cat', 0.5, 0.5, 1.0, 1.0, 1.0, False)
+                ],
+                [DectObject('cat', 0.0, 0.0, 0.5, 0.5, 1.0, False)]
+            ]
+        for dataset in (built, loaded):
+            assert dataset.dataX == parsed.dataX
+            assert dataset.dataY == parsed.dataY
@@ -136,3 +136,30 @@ class TestPetDataset:
         data = dataset.__next__()
         assert isinstance(data, tuple)
         assert len(data) > 0 and isinstance(data[0], list)
+
+    def test_cache_parameters(self, tmp_path: Path):
+        """
+        Tests if standardization is a part of the samples cache key.
+
+        List of methods that are being tested
+        --------------------------------
+        PetDataset.get_cache_parameters()
+        """
+        from kenning.utils.samples_cache import SamplesCache
+
+        (tmp_path / 'annotations').mkdir()
+        with open(tmp_path / 'annotations' / 'list.txt', 'w') as f:
+            [print(f'image_{i} 1 1 1', file=f) for i in range(10)]
+
+        directories = []
+        for standardize in (True, False):
+            dataset = PetDataset(tmp_path, standardize=standardize)
+            parameters = dataset.get_cache_parameters()
+            assert parameters['standardize'] == standardize
+            assert ('mean' in parameters) == standardize
+            directories.append(SamplesCache(
+                tmp_path / 'cache',
+                parameters,
+                len(dataset.dataX)
+            ).directory)
+        assert directories[0] != directories[1]
@@ -0,0 +1,94 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import numpy as np
+
+from kenning.datasets.helpers.rle import RLEMask
+from kenning.datasets.helpers.rle import compute_rle_iou_matrix
+
+
+def random_masks(rng, count, shape=(48, 64)):
+    """
+    Creates masks made of random rectangles, including empty and full ones.
+    """
+    masks = [np.zeros(shape, dtype=np.uint8), np.full(shape, 255, np.uint8)]
+    for _ in range(count):
+        mask = np.zeros(shape, dtype=np.uint8)
+        for _ in range(rng.integers(1, 4)):
+            y, x = rng.integers(0, shape[0]), rng.integers(0, shape[1])
+            height, width = rng.integers(1, 24, size=2)
+            mask[y:y + height, x:x + width] = 255
+        masks.append(mask)
+    return masks
+
+
+@pytest.mark.fast
+class TestRLEMask:
+    def test_encode_decode(self):
+        """
+        Tests if encoded masks are decoded to the original masks.
+        """
+        for mask in random_masks(np.random.default_rng(12), 20):
+            rle = RLEMask.from_array(mask)
+
+            assert rle.shape == mask.shape
+            assert rle.area() == np.count_nonzero(mask)
+            assert np.array_equal(rle.toarray(), mask)
+            assert np.array_equal(np.asarray(rle), mask)
+            assert np.array_equal(
+                RLEMask.from_array(mask[..., np.newaxis]).counts,
+                rle.counts
+            )
+
+    def test_coco_format(self):
+        """
+        Tests conversion from and to COCO RLE dictionaries.
+        """
+        # column-major order, starting with background
+        mask = np.array([[0, 255, 255], [255, 0, 0]], dtype=np.uint8)
+        rle = RLEMask.from_array(mask)
+
+        assert rle.to_coco(compress=False) == {
+            'size': [2, 3],
+            'counts': [1, 2, 1, 1, 1]
+        }
+        for mask in random_masks(np.random.default_rng(21), 20):
+            rle = RLEMask.from_array(mask)
+            for compress in (True, False):
+                decoded = RLEMask.from_coco(rle.to_coco(compress))
+                assert np.array_equal(decoded.counts, rle.counts)
+                assert decoded.size == rle.size
+
+    def test_iou_matrix(self):
+        """
+        Tests if IoU of encoded masks matches IoU of dense masks.
+        """
+        rng = np.random.default_rng(1234)
+        preds = random_masks(rng, 15)
+        groundtruths = random_masks(rng, 10)
+
+        ious = compute_rle_iou_matrix(
+            [RLEMask.from_array(mask) for mask in preds],
+            [RLEMask.from_array(mask) for mask in groundtruths]
+        )
+
+        assert ious.shape == (len(preds), len(groundtruths))
+        for i, pred in enumerate(preds):
+            for j, gt in enumerate(groundtruths):
+                union = np.count_nonzero(np.logical_or(pred, gt))
+                expected = np.count_nonzero(
+                    np.logical_and(pred, gt)
+                ) / union if union else 0.0
+                assert ious[i, j] == expected
+
+    def test_different_sizes(self):
+        """
+        Tests if masks of different sizes are rejected.
+        """
+        with pytest.raises(ValueError):
+            compute_rle_iou_matrix(
+                [RLEMask.from_array(np.ones((4, 4)))],
+                [RLEMask.from_array(np.ones((4, 5)))]
+            )
@@ -0,0 +1,98 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import random
+
+import numpy as np
+import pytest
+
+from kenning.core.metrics import compute_speech_metrics
+from kenning.datasets.helpers.speech_metrics import character_error_rate
+from kenning.datasets.helpers.speech_metrics import edit_distances
+from kenning.datasets.helpers.speech_metrics import levenshtein_distance
+from kenning.datasets.helpers.speech_metrics import transcript_errors
+from kenning.datasets.helpers.speech_metrics import word_error_rate
+
+
+def reference_distance(a, b):
+    """
+    Computes the Levenshtein distance with the full dynamic programming.
+    """
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1])
+            )
+        previous = current
+    return previous[-1]
+
+
+@pytest.mark.fast
+class TestSpeechMetrics:
+    @pytest.mark.parametrize('a,b,distance', [
+        ('', '', 0),
+        ('', 'abc', 3),
+        ('kitten', 'sitting', 3),
+        ('flaw', 'lawn', 2),
+        ('same', 'same', 0),
+        (['the', 'cat', 'sat'], ['the', 'cat', 'sat', 'down'], 1),
+    ])
+    def test_levenshtein_distance(self, a, b, distance):
+        """
+        Tests distances of known sequences.
+        """
+        assert levenshtein_distance(a, b) == distance
+        assert levenshtein_distance(b, a) == distance
+
+    def test_random_sequences(self):
+        """
+        Tests distances of random sequences, also longer than machine words,
+        against the dynamic programming.
+        """
+        generator = random.Random(12345)
+        predictions, references = [], []
+        for _ in range(300):
+            predictions.append(''.join(
+                generator.choice('abcd ')
+                for _ in range(generator.randint(0, 150))
+            ))
+            references.append(''.join(
+                generator.choice('abcd ')
+                for _ in range(generator.randint(0, 150))
+            ))
+        assert np.array_equal(
+            edit_distances(predictions, references),
+            [reference_distance(p, r) for p, r in zip(predictions, references)]
+        )
+
+    def test_error_rates(self):
+        """
+        Tests if error rates are computed for the whole batch of normalized
+        transcripts.
+        """
+        predictions = ['the cat sat', 'hello world']
+        references = ['The cat sat down.', 'Hello, world!']
+
+        charerrors, chars, worderrors, words = transcript_errors(
+            predictions,
+            references
+        )
+
+        assert list(charerrors) == [5, 0]
+        assert list(chars) == [16, 11]
+        assert list(worderrors) == [1, 0]
+        assert list(words) == [4, 2]
+        assert character_error_rate(predictions, references) == 5 / 27
+        assert word_error_rate(predictions, references) == 1 / 6
+        assert compute_speech_metrics({
+            'eval_stt_char_errors': 5,
+            'eval_stt_chars': 27,
+            'eval_stt_word_errors': 1,
+            'eval_stt_words': 6
+        }) == {'CER': 5 / 27, 'WER': 1 / 6}
+        assert compute_speech_metrics({}) == {}
@@ -0,0 +1,109 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import numpy as np
+from pathlib import Path
+
+from kenning.core.metrics import compute_performance_metrics
+from kenning.powersamplers.linux import LinuxPowerSampler
+
+
+def write_attribute(path: Path, value):
+    """
+    Writes the sysfs attribute to the fake sysfs tree.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f'{value}\n')
+
+
+@pytest.fixture
+def sysfs(tmp_path: Path) -> Path:
+    """
+    Creates a fake sysfs tree with one powercap zone and one hwmon sensor.
+    """
+    zone = tmp_path / 'class' / 'powercap' / 'intel-rapl:0'
+    write_attribute(zone / 'name', 'package-0')
+    write_attribute(zone / 'energy_uj', 900000)
+    write_attribute(zone / 'max_energy_range_uj', 1000000)
+    hwmon = tmp_path / 'class' / 'hwmon' / 'hwmon0'
+    write_attribute(hwmon / 'name', 'ina3221')
+    write_attribute(hwmon / 'power1_label', 'VDD_IN')
+    write_attribute(hwmon / 'power1_input', 2000000)
+    return tmp_path
+
+
+@pytest.mark.fast
+class TestLinuxPowerSampler:
+    def test_domains(self, sysfs: Path):
+        """
+        Tests if power domains are found in the sysfs tree.
+        """
+        sampler = LinuxPowerSampler(sysfs)
+
+        assert sampler.get_domains() == [
+            'intel_rapl_0_package_0',
+            'hwmon0_ina3221_VDD_IN'
+        ]
+        assert LinuxPowerSampler.detect(sysfs / 'missing') is None
+
+    def test_energy_counter_wraparound(self, sysfs: Path):
+        """
+        Tests if energy counter overflow is handled.
+        """
+        sampler = LinuxPowerSampler(sysfs)
+        counter = sysfs / 'class' / 'powercap' / 'intel-rapl:0' / 'energy_uj'
+        write_attribute(counter, 950000)
+        assert sampler.read_energy()['intel_rapl_0_package_0'] == \
+            pytest.approx(0.05)
+        write_attribute(counter, 150000)
+        assert sampler.read_energy()['intel_rapl_0_package_0'] == \
+            pytest.approx(0.25)
+
+    def test_power_integration(self, sysfs: Path, monkeypatch):
+        """
+        Tests if power readings are integrated over time.
+        """
+        clock = iter([0.0, 0.5, 1.0])
+        monkeypatch.setattr(
+            'kenning.powersamplers.linux.time.perf_counter',
+            lambda: next(clock)
+        )
+        sampler = LinuxPowerSampler(sysfs)
+        power = sysfs / 'class' / 'hwmon' / 'hwmon0' / 'power1_input'
+        write_attribute(power, 4000000)
+        sampler.read_energy()
+        energy = sampler.read_energy()
+
+        # 0.5 s at 3 W on average, then 0.5 s at 4 W
+        assert energy['hwmon0_ina3221_VDD_IN'] == pytest.approx(3.5)
+
+
+@pytest.mark.fast
+def test_energy_per_inference():
+    """
+    Tests if energy is attributed to inference spans.
+    """
+    timestamps = np.arange(0.0, 10.5, 0.5)
+    measurementsdata = {
+        'session_utilization_timestamp': timestamps.tolist(),
+        # constant power of 2 W
+        'session_utilization_energy/board': (2 * timestamps).tolist(),
+        'tags': [
+            {'name': 'inference', 'start': 1.0, 'end': 1.25},
+            {'name': 'inference', 'start': 2.0, 'end': 2.75},
+            {'name': 'preprocessing', 'start': 0.5, 'end': 1.0},
+        ]
+    }
+
+    metrics = compute_performance_metrics(measurementsdata)
+
+    assert metrics['session_utilization_energy_total/board'] == \
+        pytest.approx(20.0)
+    assert metrics['session_utilization_power_mean/board'] == \
+        pytest.approx(2.0)
+    assert metrics['session_utilization_energy_per_inference/board'] == \
+        pytest.approx(1.0)
+    assert metrics['session_utilization_power_preprocessing/board'] == \
+        pytest.approx(2.0)
@@ -0,0 +1,97 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+import numpy as np
+import pytest
+
+from kenning.utils.annotation_index import AnnotationIndex
+from kenning.utils.annotation_index import group_by_image
+from kenning.utils.annotation_index import load_annotation_index
+
+
+@pytest.fixture
+def annotations(tmp_path):
+    path = tmp_path / 'annotations.csv'
+    path.write_text('ImageID,LabelName\nimg0,cat\n')
+    return path
+
+
+def parse():
+    return {
+        'image_ids': np.array(['img0', 'img1', 'img2']),
+        'object_images': np.array([1, 0, 1, 1]),
+        'object_boxes': np.arange(16, dtype=np.float64).reshape(4, 4)
+    }
+
+
+@pytest.mark.fast
+class TestAnnotationIndex:
+    def test_build_and_load(self, annotations, tmp_path):
+        """
+        Tests if columns are built once and memory-mapped later.
+        """
+        calls = []
+
+        def counted_parse():
+            calls.append(1)
+            return parse()
+
+        columns = load_annotation_index(
+            tmp_path / 'index',
+            [annotations],
+            {'task': 'object_detection'},
+            counted_parse
+        )
+        loaded = load_annotation_index(
+            tmp_path / 'index',
+            [annotations],
+            {'task': 'object_detection'},
+            counted_parse
+        )
+
+        assert len(calls) == 1
+        for name, column in parse().items():
+            assert np.array_equal(columns[name], column)
+            assert np.array_equal(loaded[name], column)
+        assert isinstance(loaded['object_boxes'], np.memmap)
+
+    def test_invalidation(self, annotations, tmp_path):
+        """
+        Tests if the index is invalidated by modified sources and different
+        parameters.
+        """
+        index = AnnotationIndex(tmp_path / 'index', [annotations], {'a': 1})
+        index.build(parse())
+        assert AnnotationIndex(
+            tmp_path / 'index', [annotations], {'a': 1}
+        ).complete
+        assert not AnnotationIndex(
+            tmp_path / 'index', [annotations], {'a': 2}
+        ).complete
+
+        stat = annotations.stat()
+        os.utime(annotations, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert not AnnotationIndex(
+            tmp_path / 'index', [annotations], {'a': 1}
+        ).complete
+
+    def test_object_columns(self, annotations, tmp_path):
+        """
+        Tests if columns with Python objects are rejected.
+        """
+        index = AnnotationIndex(tmp_path / 'index', [annotations], {})
+        with pytest.raises(ValueError):
+            index.build({'objects': np.array([None, 'a'], dtype=object)})
+        assert not index.complete
+
+    def test_group_by_image(self):
+        """
+        Tests if objects are grouped by images in their original order.
+        """
+        groups = group_by_image(np.array([1, 0, 1, 3, 1]), 5)
+
+        assert [group.tolist() for group in groups] == \
+            [[1], [0, 2, 4], [], [3], []]
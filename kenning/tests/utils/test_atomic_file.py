@@ -0,0 +1,78 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import mmap
+
+import pytest
+
+from kenning.utils.atomic_file import create_exclusive
+from kenning.utils.atomic_file import replace_file
+from kenning.utils.downloader import DownloadManifest
+
+
+@pytest.mark.fast
+class TestAtomicFile:
+    def test_replace_keeps_mappings(self, tmp_path):
+        """
+        Tests if replacing the file does not change its existing mappings.
+        """
+        path = tmp_path / 'model.bin'
+        replace_file(path, lambda f: f.write(b'a' * 4096))
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        replace_file(path, lambda f: f.write('b'), mode='w')
+
+        assert mapping[:] == b'a' * 4096
+        assert path.read_bytes() == b'b'
+        assert [p.name for p in tmp_path.iterdir()] == ['model.bin']
+        mapping.close()
+
+    def test_failed_write(self, tmp_path):
+        """
+        Tests if failed writes keep the previous file and no temporary files.
+        """
+        path = tmp_path / 'data.bin'
+        path.write_bytes(b'old')
+
+        def writer(f):
+            f.write(b'new')
+            raise OSError('disk full')
+
+        def pathwriter(p):
+            p.write_bytes(b'new')
+            raise OSError('disk full')
+
+        with pytest.raises(OSError):
+            replace_file(path, writer)
+        with pytest.raises(OSError):
+            create_exclusive(tmp_path / 'other.bin', pathwriter)
+
+        assert path.read_bytes() == b'old'
+        assert [p.name for p in tmp_path.iterdir()] == ['data.bin']
+
+    def test_create_exclusive(self, tmp_path):
+        """
+        Tests if existing files are not overwritten.
+        """
+        path = tmp_path / 'data.bin'
+        assert create_exclusive(path, lambda p: p.write_bytes(b'first'))
+        assert not create_exclusive(path, lambda p: p.write_bytes(b'second'))
+        assert path.read_bytes() == b'first'
+        assert [p.name for p in tmp_path.iterdir()] == ['data.bin']
+
+    def test_download_manifest_failure(self, tmp_path, monkeypatch):
+        """
+        Tests if a failed save of the download manifest leaves no files.
+        """
+        def failing_replace(src, dst):
+            raise OSError('disk full')
+
+        monkeypatch.setattr('kenning.utils.atomic_file.os.replace', failing_replace)  # noqa: E501
+        manifest = DownloadManifest(tmp_path / 'manifest.json')
+        manifest.record('http://example.com/file', tmp_path / 'file', 1, '0')
+
+        with pytest.raises(OSError):
+            manifest.save()
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,85 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pickle
+
+import numpy as np
+import pytest
+
+from kenning.utils.audio_store import AudioStore
+
+
+@pytest.fixture
+def recordings():
+    generator = np.random.default_rng(12345)
+    return {
+        f'clip{i}.mp3': generator.integers(
+            -2**15, 2**15, size=100 * i, dtype=np.int16
+        )
+        for i in range(6)
+    }
+
+
+@pytest.mark.fast
+class TestAudioStore:
+    def test_build_and_get(self, recordings, tmp_path):
+        """
+        Tests if recordings are read back from the built store.
+        """
+        key = {'recordings': sorted(recordings), 'sample_rate': 16000}
+        store = AudioStore(tmp_path, key)
+        assert not store.complete
+
+        store.build(list(recordings), iter(recordings.values()))
+
+        assert store.complete
+        for name, recording in recordings.items():
+            assert name in store
+            assert np.array_equal(store.get(name), recording)
+        assert 'other.mp3' not in store
+
+        reopened = AudioStore(tmp_path, key)
+        assert reopened.complete
+        for name, recording in recordings.items():
+            assert np.array_equal(reopened.get(name), recording)
+
+    def test_keys(self, recordings, tmp_path):
+        """
+        Tests if stores with different keys are separate.
+        """
+        AudioStore(tmp_path, {'sample_rate': 16000}).build(
+            list(recordings),
+            recordings.values()
+        )
+        assert not AudioStore(tmp_path, {'sample_rate': 8000}).complete
+
+    def test_incomplete_build(self, recordings, tmp_path):
+        """
+        Tests if interrupted builds are not used.
+        """
+        store = AudioStore(tmp_path, {'sample_rate': 16000})
+        with pytest.raises(ValueError):
+            store.build(
+                list(recordings),
+                list(recordings.values())[:-1]
+            )
+        assert not store.complete
+        assert not AudioStore(tmp_path, {'sample_rate': 16000}).complete
+
+    def test_pickle(self, recordings, tmp_path):
+        """
+        Tests if the mapped data is not pickled.
+        """
+        store = AudioStore(tmp_path, {'sample_rate': 16000})
+        store.build(list(recordings), recordings.values())
+        store.get('clip3.mp3')
+        assert store._data is not None
+
+        restored = pickle.loads(pickle.dumps(store))
+
+        assert restored._data is None
+        assert np.array_equal(
+            restored.get('clip3.mp3'),
+            recordings['clip3.mp3']
+        )
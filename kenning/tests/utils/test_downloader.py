@@ -0,0 +1,194 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+import pytest
+
+from kenning.utils.downloader import DOWNLOAD_MANIFEST
+from kenning.utils.downloader import DownloadError
+from kenning.utils.downloader import Downloader
+
+
+class FileServer(ThreadingHTTPServer):
+    """
+    HTTP server with files in memory, injecting failures.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files):
+        super().__init__(('127.0.0.1', 0), FileHandler)
+        self.files = files
+        # path -> number of responses with 503 status
+        self.unavailable = {}
+        # path -> number of responses interrupted in the middle
+        self.interrupted = {}
+        self.connections = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def url(self, name):
+        return f'http://127.0.0.1:{self.server_address[1]}/{name}'
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        name = self.path.lstrip('/')
+        rangeheader = self.headers.get('Range')
+        with self.server.lock:
+            self.server.requests.append((name, rangeheader))
+            unavailable = self.server.unavailable.get(name, 0)
+            if unavailable:
+                self.server.unavailable[name] -= 1
+            interrupted = self.server.interrupted.get(name, 0)
+            if interrupted:
+                self.server.interrupted[name] -= 1
+        if name not in self.server.files or unavailable:
+            self.send_response(404 if not unavailable else 503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = self.server.files[name]
+        start = 0
+        if rangeheader is not None:
+            start = int(rangeheader[len('bytes='):].rstrip('-'))
+            self.send_response(206)
+            self.send_header(
+                'Content-Range',
+                f'bytes {start}-{len(data) - 1}/{len(data)}'
+            )
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        if interrupted:
+            self.wfile.write(data[start:start + (len(data) - start) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(data[start:])
+
+
+@pytest.fixture
+def server():
+    files = {
+        f'file{i}.bin': bytes((i + j) % 256 for j in range(1000 + 37 * i))
+        for i in range(20)
+    }
+    server = FileServer(files)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.fast
+class TestDownloader:
+    def test_download_and_skip(self, server, tmp_path):
+        """
+        Tests if files are downloaded over reused connections and skipped
+        when downloaded again.
+        """
+        entries = [
+            (server.url(name), tmp_path / 'files' / name)
+            for name in server.files
+        ]
+        manifestpath = tmp_path / 'files' / DOWNLOAD_MANIFEST
+
+        downloaded = Downloader(num_workers=4).download(entries, manifestpath)
+
+        assert downloaded == len(entries)
+        for name, data in server.files.items():
+            assert (tmp_path / 'files' / name).read_bytes() == data
+        assert server.connections <= 4
+        assert not list((tmp_path / 'files').glob('*.part'))
+
+        requests = len(server.requests)
+        assert Downloader(num_workers=4).download(entries, manifestpath) == 0
+        assert len(server.requests) == requests
+
+    def test_retry_and_resume(self, server, tmp_path):
+        """
+        Tests if failed downloads are retried and interrupted ones resumed.
+        """
+        server.unavailable['file3.bin'] = 2
+        server.interrupted['file5.bin'] = 1
+        entries = [
+            (server.url('file3.bin'), tmp_path / 'file3.bin'),
+            (server.url('file5.bin'), tmp_path / 'file5.bin')
+        ]
+
+        Downloader(num_workers=2, backoff=0.0).download(
+            entries,
+            tmp_path / DOWNLOAD_MANIFEST
+        )
+
+        assert (tmp_path / 'file3.bin').read_bytes() == \
+            server.files['file3.bin']
+        assert (tmp_path / 'file5.bin').read_bytes() == \
+            server.files['file5.bin']
+        assert [r for n, r in server.requests if n == 'file3.bin'] == \
+            [None] * 3
+        half = len(server.files['file5.bin']) // 2
+        assert [r for n, r in server.requests if n == 'file5.bin'] == \
+            [None, f'bytes={half}-']
+
+    def test_failures(self, server, tmp_path):
+        """
+        Tests if missing files are reported after other files are downloaded.
+        """
+        server.unavailable['file1.bin'] = 10
+        entries = [
+            (server.url('missing.bin'), tmp_path / 'missing.bin'),
+            (server.url('file1.bin'), tmp_path / 'file1.bin'),
+            (server.url('file2.bin'), tmp_path / 'file2.bin')
+        ]
+
+        with pytest.raises(DownloadError) as error:
+            Downloader(num_workers=2, retries=2, backoff=0.0).download(
+                entries,
+                tmp_path / DOWNLOAD_MANIFEST
+            )
+
+        assert '2 of 3' in str(error.value)
+        assert (tmp_path / 'file2.bin').read_bytes() == \
+            server.files['file2.bin']
+        assert not (tmp_path / 'missing.bin').exists()
+        # 404 is not retried
+        assert [n for n, _ in server.requests].count('missing.bin') == 1
+        assert [n for n, _ in server.requests].count('file1.bin') == 3
+
+    def test_modified_files(self, server, tmp_path):
+        """
+        Tests if files modified after the download are downloaded again.
+        """
+        entries = [(server.url('file7.bin'), tmp_path / 'file7.bin')]
+        manifestpath = tmp_path / DOWNLOAD_MANIFEST
+        Downloader().download(entries, manifestpath)
+
+        (tmp_path / 'file7.bin').write_bytes(b'modified')
+        assert Downloader().download(entries, manifestpath) == 1
+        assert (tmp_path / 'file7.bin').read_bytes() == \
+            server.files['file7.bin']
+
+        # files of the same size are compared when verification is enabled
+        (tmp_path / 'file7.bin').write_bytes(
+            bytes(len(server.files['file7.bin']))
+        )
+        assert Downloader().download(entries, manifestpath) == 0
+        assert Downloader(verify=True).download(entries, manifestpath) == 1
+        assert (tmp_path / 'file7.bin').read_bytes() == \
+            server.files['file7.bin']
@@ -0,0 +1,169 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import json
+import numpy as np
+
+from kenning.core.measurements import MeasurementsCollector
+from kenning.core.measurements import SparseUpdate
+from kenning.utils.measurements_io import compact_measurements_stream
+from kenning.utils.measurements_io import load_measurements
+from kenning.utils.measurements_io import load_measurements_stream
+from kenning.utils.measurements_io import MeasurementsArchive
+from kenning.scenarios.merge_measurements import main as merge_main
+
+
+@pytest.mark.fast
+class TestMeasurementsStream:
+    def test_stream_roundtrip(self, tmp_path):
+        """
+        Tests if measurements loaded from the stream match collected ones.
+        """
+        streampath = tmp_path / 'measurements.jsonl'
+        with MeasurementsCollector.scope() as scope:
+            MeasurementsCollector.measurements += {'build_cfg': {'a': 1}}
+            MeasurementsCollector.start_stream(streampath, flush_interval=0)
+            for i in range(10):
+                MeasurementsCollector.measurements.append('values', i * 0.5)
+                MeasurementsCollector.measurements += {
+                    'eval_confusion_matrix': np.eye(2, dtype=np.int64),
+                    'total': 2
+                }
+            MeasurementsCollector.stop_stream()
+
+        loaded = load_measurements_stream(streampath)
+
+        assert loaded.data['build_cfg'] == {'a': 1}
+        assert loaded.get_values('values') == scope.get_values('values')
+        assert loaded.data['total'] == 20
+        assert np.array_equal(
+            loaded.data['eval_confusion_matrix'],
+            np.eye(2) * 10
+        )
+
+    def test_sparse_updates(self, tmp_path):
+        """
+        Tests if sparse updates from the stream are accumulated.
+        """
+        streampath = tmp_path / 'measurements.jsonl'
+        with MeasurementsCollector.scope() as scope:
+            MeasurementsCollector.start_stream(streampath, flush_interval=0)
+            for labels, predictions in [([0, 1], [0, 0]), ([2, 2], [2, 2])]:
+                MeasurementsCollector.measurements += {
+                    'eval_confusion_matrix': SparseUpdate(
+                        (3, 3),
+                        (labels, predictions)
+                    )
+                }
+            MeasurementsCollector.stop_stream()
+            expected = scope.get_values('eval_confusion_matrix')
+
+        loaded = load_measurements_stream(streampath)
+
+        assert np.array_equal(
+            expected,
+            [[1, 0, 0], [1, 0, 0], [0, 0, 2]]
+        )
+        assert np.array_equal(
+            loaded.get_values('eval_confusion_matrix'),
+            expected
+        )
+
+    def test_damaged_stream(self, tmp_path):
+        """
+        Tests if the stream with a truncated last record can be compacted.
+        """
+        streampath = tmp_path / 'measurements.jsonl'
+        with MeasurementsCollector.scope():
+            MeasurementsCollector.start_stream(streampath, flush_interval=0)
+            MeasurementsCollector.measurements += {'values': [1, 2]}
+            MeasurementsCollector.measurements += {'values': [3]}
+            MeasurementsCollector.stop_stream()
+        with open(streampath, 'a') as streamfile:
+            streamfile.write('{"op": "update", "data": {"val')
+
+        resultpath = tmp_path / 'measurements.json'
+        compact_measurements_stream(streampath, resultpath)
+        with open(resultpath, 'r') as resultfile:
+            assert json.load(resultfile) == {'values': [1, 2, 3]}
+        assert load_measurements(streampath) == {'values': [1, 2, 3]}
+
+
+@pytest.mark.fast
+class TestMeasurementsArchive:
+    def test_binary_roundtrip(self, tmp_path):
+        """
+        Tests if measurements saved in the binary format are loaded lazily.
+        """
+        resultpath = tmp_path / 'results.measurements'
+        with MeasurementsCollector.scope() as scope:
+            MeasurementsCollector.measurements += {
+                'build_cfg': {'a': 1},
+                'target_inference_step': [0.1, 0.2, 0.3],
+                'eval_det/cat': [[0.9, 1.0, 0.7], [0.5, 0.0, 0.2]],
+                'eval_confusion_matrix': np.eye(2, dtype=np.int64),
+                'empty': [],
+                'total': 2
+            }
+            MeasurementsCollector.save_measurements(resultpath)
+
+        archive = load_measurements(resultpath)
+
+        assert isinstance(archive, MeasurementsArchive)
+        assert list(archive.keys()) == list(scope.data.keys())
+        assert archive['build_cfg'] == {'a': 1}
+        assert archive['total'] == 2
+        assert archive['empty'] == []
+        inference = archive['target_inference_step']
+        assert isinstance(inference, np.memmap)
+        assert np.array_equal(inference, [0.1, 0.2, 0.3])
+        assert archive['eval_det/cat'].shape == (2, 3)
+        assert np.array_equal(archive['eval_confusion_matrix'], np.eye(2))
+
+        archive['modelname'] = 'model'
+        archive |= {'accuracy': 1.0}
+        del archive['total']
+        assert archive['accuracy'] == 1.0
+        assert 'modelname' in archive
+        assert 'total' not in archive
+
+    def test_merge_binary_shards(self, tmp_path):
+        """
+        Tests merging shards saved in the binary format with the script.
+        """
+        shards = [
+            {
+                'eval_det/cat': [[0.9, 1.0, 0.7], [0.5, 0.0, 0.2]],
+                'eval_confusion_matrix': np.eye(2, dtype=np.int64),
+                'eval_gtcount/cat': 2,
+                'total': 2
+            },
+            {
+                'eval_det/cat': [[0.7, 1.0, 0.7], [0.2, 0.0, 0.1], [0.1, 0.0, 0.0]],  # noqa: E501
+                'eval_confusion_matrix': np.eye(2, dtype=np.int64),
+                'eval_gtcount/cat': 1,
+                'total': 3
+            }
+        ]
+        paths = []
+        for i, shard in enumerate(shards):
+            paths.append(tmp_path / f'shard{i}.measurements')
+            with MeasurementsCollector.scope():
+                MeasurementsCollector.measurements += shard
+                MeasurementsCollector.save_measurements(paths[-1])
+        outputpath = tmp_path / 'merged.json'
+
+        assert merge_main(
+            ['merge_measurements', str(outputpath)] + [str(p) for p in paths]
+        ) == 0
+
+        merged = load_measurements(outputpath)
+        assert np.allclose(
+            merged['eval_det/cat'],
+            shards[0]['eval_det/cat'] + shards[1]['eval_det/cat']
+        )
+        assert np.array_equal(merged['eval_confusion_matrix'], 2 * np.eye(2))
+        assert merged['eval_gtcount/cat'] == 3
+        assert merged['total'] == 5
@@ -0,0 +1,70 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+import numpy as np
+
+from kenning.utils.samples_cache import SamplesCache
+
+
+@pytest.mark.fast
+class TestSamplesCache:
+    def test_roundtrip(self, tmp_path):
+        """
+        Tests if stored samples are read by another cache object.
+        """
+        samples = [
+            np.full((3, 4), i, dtype=np.float32) for i in range(10)
+        ]
+        cache = SamplesCache(tmp_path, {'dataset': 'a'}, 10, shard_size=4)
+        assert cache.get(0, 3) is None
+        cache.put(0, samples[:3])
+        cache.put(3, samples[3:10])
+
+        reopened = SamplesCache(tmp_path, {'dataset': 'a'}, 10, shard_size=4)
+        loaded = reopened.get(2, 10)
+
+        assert len(loaded) == 8
+        for sample, expected in zip(loaded, samples[2:]):
+            assert sample.dtype == np.float32
+            assert np.array_equal(sample, expected)
+        assert isinstance(loaded[0].base, np.memmap)
+
+        # returned samples are copy-on-write
+        loaded[0] += 100
+        assert np.array_equal(
+            SamplesCache(tmp_path, {'dataset': 'a'}, 10, 4).get(2, 3)[0],
+            samples[2]
+        )
+
+    def test_partial(self, tmp_path):
+        """
+        Tests if ranges with missing samples are not returned.
+        """
+        cache = SamplesCache(tmp_path, {'dataset': 'a'}, 10, shard_size=4)
+        cache.put(0, [np.zeros(2), np.ones(2)])
+
+        assert cache.get(0, 2) is not None
+        assert cache.get(1, 3) is None
+        assert cache.get(4, 6) is None
+
+    def test_keys(self, tmp_path):
+        """
+        Tests if caches with different keys are separated.
+        """
+        SamplesCache(tmp_path, {'width': 224}, 1).put(0, [np.zeros(2)])
+
+        assert SamplesCache(tmp_path, {'width': 416}, 1).get(0, 1) is None
+        assert SamplesCache(tmp_path, {'width': 224}, 1).get(0, 1) is not None
+
+    def test_mismatched_samples(self, tmp_path):
+        """
+        Tests if samples with different shapes disable the cache.
+        """
+        cache = SamplesCache(tmp_path, {'dataset': 'a'}, 4)
+        cache.put(0, [np.zeros(2)])
+        cache.put(1, [np.zeros(3)])
+
+        assert not cache.enabled
+        assert cache.get(0, 1) is None
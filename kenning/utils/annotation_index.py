@@ -0,0 +1,181 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Persistent columnar index of dataset annotations.
+
+Annotations parsed from large JSON or CSV files are stored as NumPy arrays
+(one array per column), which are memory-mapped when the index is loaded,
+so later instantiations of the dataset do not parse annotation files again.
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import hashlib
+import json
+
+import numpy as np
+
+from kenning.utils.atomic_file import replace_file
+from kenning.utils.logger import get_logger
+
+# Version of the index layout, part of the index key
+INDEX_VERSION = 1
+INDEX_MANIFEST = 'manifest.json'
+ANNOTATION_INDEX_DIR = '.annotation-index'
+
+
+def group_by_image(
+        imageindices: np.ndarray,
+        numimages: int) -> List[np.ndarray]:
+    """
+    Groups objects by images they belong to.
+
+    Parameters
+    ----------
+    imageindices : np.ndarray
+        Index of the image of every object
+    numimages : int
+        Number of images
+
+    Returns
+    -------
+    List[np.ndarray] :
+        Indices of objects of every image, in the order of objects
+    """
+    imageindices = np.asarray(imageindices)
+    order = np.argsort(imageindices, kind='stable')
+    counts = np.bincount(imageindices, minlength=numimages)
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+class AnnotationIndex(object):
+    """
+    Annotations stored in columns, identified by annotation files and
+    parameters used to process them.
+
+    The index is stored in a directory named after the hash of the key,
+    containing sizes and modification times of source files, so modified
+    annotations are parsed again. Columns are written first and the
+    manifest last, so interrupted builds are never used.
+    """
+
+    def __init__(
+            self,
+            indexdir: Path,
+            sources: List[Path],
+            parameters: Dict[str, Any]):
+        """
+        Opens the index, if it was already built.
+
+        Parameters
+        ----------
+        indexdir : Path
+            Directory with annotation indexes
+        sources : List[Path]
+            Annotation files the index is built from
+        parameters : Dict[str, Any]
+            Parameters affecting the content of the index, i.e. the task
+        """
+        self.key = {
+            'version': INDEX_VERSION,
+            'parameters': parameters,
+            'sources': [
+                [
+                    str(Path(source).resolve()),
+                    Path(source).stat().st_size,
+                    Path(source).stat().st_mtime_ns
+                ]
+                for source in sources
+            ]
+        }
+        keyhash = hashlib.sha256(
+            json.dumps(self.key, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        self.directory = Path(indexdir) / keyhash
+        self.columns: Optional[Dict[str, np.ndarray]] = None
+        self._load()
+
+    def _load(self):
+        """
+        Memory-maps columns of the index, if it is built.
+        """
+        manifestpath = self.directory / INDEX_MANIFEST
+        if not manifestpath.exists():
+            return
+        with open(manifestpath, 'r') as manifestfile:
+            manifest = json.load(manifestfile)
+        self.columns = {
+            name: np.load(self.directory / f'{name}.npy', mmap_mode='r')
+            for name in manifest['columns']
+        }
+
+    @property
+    def complete(self) -> bool:
+        return self.columns is not None
+
+    def build(self, columns: Dict[str, np.ndarray]):
+        """
+        Stores columns of the index.
+
+        Parameters
+        ----------
+        columns : Dict[str, np.ndarray]
+            Columns of annotations. Strings should be stored in arrays of
+            fixed-width strings, arrays of objects can not be memory-mapped.
+        """
+        columns = {
+            name: np.asarray(column) for name, column in columns.items()
+        }
+        for name, column in columns.items():
+            if column.dtype == object:
+                raise ValueError(f'Column {name} contains Python objects')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for name, column in columns.items():
+            replace_file(
+                self.directory / f'{name}.npy',
+                lambda columnfile: np.save(columnfile, column)
+            )
+        replace_file(
+            self.directory / INDEX_MANIFEST,
+            lambda manifestfile: manifestfile.write(json.dumps(
+                {'key': self.key, 'columns': list(columns)},
+                default=str
+            ).encode())
+        )
+        self._load()
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+
+def load_annotation_index(
+        indexdir: Path,
+        sources: List[Path],
+        parameters: Dict[str, Any],
+        parse: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    Returns columns of annotations from the index, building it if needed.
+
+    Parameters
+    ----------
+    indexdir : Path
+        Directory with annotation indexes
+    sources : List[Path]
+        Annotation files the index is built from
+    parameters : Dict[str, Any]
+        Parameters affecting the content of the index
+    parse : Callable[[], Dict[str, np.ndarray]]
+        Function parsing annotation files to columns
+
+    Returns
+    -------
+    Dict[str, np.ndarray] :
+        Memory-mapped columns of annotations
+    """
+    index = AnnotationIndex(indexdir, sources, parameters)
+    if not index.complete:
+        get_logger().info(f'Building annotation index in {index.directory}')
+        index.build(parse())
+    return index.columns
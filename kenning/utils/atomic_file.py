@@ -0,0 +1,106 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Atomic creation and replacement of files.
+
+Files are written to temporary files in the same directory and moved or
+linked under the final name, so readers (other processes, memory mappings
+of the previous file) never see partially written content.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Generator
+import os
+import tempfile
+
+
+@contextmanager
+def temporary_file(path: Path) -> Generator[Path, None, None]:
+    """
+    Creates a temporary file next to the given path.
+
+    The temporary file is removed on exit, unless it was moved.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the target file
+
+    Yields
+    ------
+    Path : path to the empty temporary file
+    """
+    path = Path(path)
+    fd, tmpname = tempfile.mkstemp(
+        dir=path.parent,
+        prefix=f'.{path.name}.',
+        suffix='.tmp'
+    )
+    os.close(fd)
+    tmppath = Path(tmpname)
+    try:
+        yield tmppath
+    finally:
+        if tmppath.exists():
+            tmppath.unlink()
+
+
+def replace_file(
+        path: Path,
+        writer: Callable[[IO], None],
+        mode: str = 'wb'):
+    """
+    Atomically creates or replaces the file.
+
+    The previous file is replaced, not truncated, so its existing memory
+    mappings remain valid.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the written file
+    writer : Callable[[IO], None]
+        Function writing the content to the opened file
+    mode : str
+        Mode the file is opened with, 'wb' or 'w'
+    """
+    with temporary_file(path) as tmppath:
+        with open(tmppath, mode) as tmpfile:
+            writer(tmpfile)
+        os.replace(tmppath, path)
+
+
+def create_exclusive(path: Path, writer: Callable[[Path], None]) -> bool:
+    """
+    Atomically creates the file, unless it already exists.
+
+    The temporary file is linked under the final name, so concurrent
+    processes never overwrite each other's files.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the created file
+    writer : Callable[[Path], None]
+        Function writing the content of the file to the given path
+
+    Returns
+    -------
+    bool : True if the file was created by this call
+    """
+    path = Path(path)
+    with temporary_file(path) as tmppath:
+        writer(tmppath)
+        try:
+            os.link(tmppath, path)
+        except FileExistsError:
+            return False
+        except OSError:
+            # file systems without hard links
+            if path.exists():
+                return False
+            os.replace(tmppath, path)
+        return True
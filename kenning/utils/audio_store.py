@@ -0,0 +1,150 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Memory-mapped store of decoded audio recordings.
+
+Recordings of different lengths are concatenated in a single file of 16-bit
+samples, with an index of offsets of recordings. Reading a recording is a
+slice of the memory-mapped file.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import hashlib
+import json
+
+import numpy as np
+
+from kenning.utils.atomic_file import replace_file
+
+# Version of the store layout, part of the store key
+STORE_VERSION = 1
+STORE_MANIFEST = 'manifest.json'
+STORE_DATA = 'recordings.bin'
+STORE_INDEX = 'offsets.npy'
+
+
+class AudioStore(object):
+    """
+    Decoded recordings identified by names (i.e. paths to source files).
+
+    The directory of the store is derived from the hash of the key, which
+    should contain all parameters affecting decoding. The store is complete
+    once its manifest is written - data and the index are written first, so
+    interrupted builds are never used.
+    """
+
+    def __init__(self, storedir: Path, key: Dict[str, Any]):
+        """
+        Opens the store, if it was already built.
+
+        Parameters
+        ----------
+        storedir : Path
+            Directory with audio stores
+        key : Dict[str, Any]
+            Parameters identifying recordings and their decoding
+        """
+        self.key = dict(key, store_version=STORE_VERSION)
+        keyhash = hashlib.sha256(
+            json.dumps(self.key, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        self.directory = Path(storedir) / keyhash
+        self.names: Dict[str, int] = {}
+        self.offsets: Optional[np.ndarray] = None
+        self._data: Optional[np.ndarray] = None
+        self._read_manifest()
+
+    def _read_manifest(self):
+        """
+        Reads names of recordings and their offsets, if the store is built.
+        """
+        manifestpath = self.directory / STORE_MANIFEST
+        if not manifestpath.exists():
+            return
+        with open(manifestpath, 'r') as manifestfile:
+            manifest = json.load(manifestfile)
+        self.names = {name: i for i, name in enumerate(manifest['names'])}
+        self.offsets = np.load(self.directory / STORE_INDEX)
+
+    @property
+    def complete(self) -> bool:
+        return self.offsets is not None
+
+    def build(self, names: List[str], recordings: Iterable[np.ndarray]):
+        """
+        Stores recordings, replacing the previous content of the store.
+
+        Parameters
+        ----------
+        names : List[str]
+            Names of recordings
+        recordings : Iterable[np.ndarray]
+            Recordings in the order of names, consumed one by one, so they
+            can be decoded lazily
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+
+        def writedata(datafile):
+            count = 0
+            for i, recording in enumerate(recordings):
+                recording = np.ascontiguousarray(recording, dtype=np.int16)
+                datafile.write(recording.tobytes())
+                offsets[i + 1] = offsets[i] + len(recording)
+                count += 1
+            if count != len(names):
+                raise ValueError(
+                    f'Expected {len(names)} recordings, got {count}'
+                )
+
+        replace_file(self.directory / STORE_DATA, writedata)
+        replace_file(
+            self.directory / STORE_INDEX,
+            lambda indexfile: np.save(indexfile, offsets)
+        )
+        replace_file(
+            self.directory / STORE_MANIFEST,
+            lambda manifestfile: manifestfile.write(json.dumps(
+                {'key': self.key, 'names': list(names)},
+                default=str
+            ).encode())
+        )
+        self._data = None
+        self._read_manifest()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def get(self, name: str) -> np.ndarray:
+        """
+        Returns the recording.
+
+        Parameters
+        ----------
+        name : str
+            Name of the recording
+
+        Returns
+        -------
+        np.ndarray : read-only view of 16-bit samples of the recording
+        """
+        index = self.names[name]
+        start, end = self.offsets[index], self.offsets[index + 1]
+        if start == end:
+            return np.zeros(0, dtype=np.int16)
+        if self._data is None:
+            self._data = np.memmap(
+                self.directory / STORE_DATA,
+                dtype=np.int16,
+                mode='r'
+            )
+        return self._data[start:end]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        # worker processes map the data on their own
+        state['_data'] = None
+        return state
@@ -0,0 +1,573 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Parallel, resumable downloads of many files over HTTP(S).
+
+Files are downloaded by a bounded pool of threads, reusing persistent
+connections to every host. Failed transfers are retried with exponential
+backoff, and partially downloaded files are resumed with HTTP range
+requests. Completed files are recorded in a manifest with their sizes and
+SHA-256 checksums, so repeated downloads skip them.
+"""
+
+from collections import defaultdict
+from concurrent import futures
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+import hashlib
+import http.client
+import json
+import os
+import re
+import threading
+import time
+
+import tqdm
+
+from kenning.utils.atomic_file import replace_file
+from kenning.utils.logger import get_logger
+
+# Name of the manifest file created in the download directory
+DOWNLOAD_MANIFEST = '.download-manifest.json'
+MANIFEST_VERSION = 1
+
+# Statuses of responses worth retrying
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _RetryableError(Exception):
+    pass
+
+
+def _file_checksum(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-256 checksum of the file.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the file
+    chunk_size : int
+        Size of read chunks
+
+    Returns
+    -------
+    str : hexadecimal checksum
+    """
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as checkedfile:
+        for chunk in iter(lambda: checkedfile.read(chunk_size), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class DownloadManifest(object):
+    """
+    Record of completely downloaded files.
+
+    Files are identified by paths relative to the directory of the manifest
+    (or by absolute paths for files outside of it). The manifest is written
+    atomically, so it is never left partially written.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Loads the manifest, if it exists.
+
+        Parameters
+        ----------
+        path : Path
+            Path to the manifest file
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.files: Dict[str, Dict] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as manifestfile:
+                    manifest = json.load(manifestfile)
+                if manifest.get('version') == MANIFEST_VERSION:
+                    self.files = manifest['files']
+            except (OSError, ValueError, KeyError):
+                get_logger().warning(
+                    f'Download manifest {self.path} is invalid, ignoring it'
+                )
+
+    def _key(self, path: Path) -> str:
+        path = Path(path).absolute()
+        try:
+            return str(path.relative_to(self.path.parent.absolute()))
+        except ValueError:
+            return str(path)
+
+    def is_complete(self, url: str, path: Path, verify: bool = False) -> bool:
+        """
+        Tells if the file was completely downloaded from the URL.
+
+        Parameters
+        ----------
+        url : str
+            URL of the file
+        path : Path
+            Path to the downloaded file
+        verify : bool
+            True if the checksum of the file should be verified, otherwise
+            only its size is compared
+
+        Returns
+        -------
+        bool : True if the file does not have to be downloaded
+        """
+        entry = self.files.get(self._key(path))
+        if entry is None or entry['url'] != url:
+            return False
+        try:
+            if Path(path).stat().st_size != entry['size']:
+                return False
+        except OSError:
+            return False
+        return not verify or _file_checksum(path) == entry['sha256']
+
+    def record(self, url: str, path: Path, size: int, sha256: str):
+        """
+        Records the downloaded file.
+
+        Parameters
+        ----------
+        url : str
+            URL of the file
+        path : Path
+            Path to the downloaded file
+        size : int
+            Size of the file in bytes
+        sha256 : str
+            SHA-256 checksum of the file
+        """
+        with self._lock:
+            self.files[self._key(path)] = {
+                'url': url,
+                'size': size,
+                'sha256': sha256
+            }
+
+    def save(self):
+        """
+        Writes the manifest to the file.
+        """
+        with self._lock:
+            content = json.dumps(
+                {'version': MANIFEST_VERSION, 'files': self.files},
+                indent=2,
+                sort_keys=True
+            )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        replace_file(
+            self.path,
+            lambda manifestfile: manifestfile.write(content),
+            mode='w'
+        )
+
+
+class ConnectionPool(object):
+    """
+    Idle persistent connections, grouped by host.
+    """
+
+    def __init__(self, timeout: float):
+        """
+        Creates an empty pool.
+
+        Parameters
+        ----------
+        timeout : float
+            Timeout of socket operations, in seconds
+        """
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = defaultdict(list)
+        self.created = 0
+
+    def acquire(
+            self,
+            scheme: str,
+            netloc: str) -> http.client.HTTPConnection:
+        """
+        Returns an idle connection to the host, or a new one.
+
+        Parameters
+        ----------
+        scheme : str
+            URL scheme, http or https
+        netloc : str
+            Host and port
+
+        Returns
+        -------
+        http.client.HTTPConnection : connection to the host
+        """
+        with self._lock:
+            if self._idle[(scheme, netloc)]:
+                return self._idle[(scheme, netloc)].pop()
+            self.created += 1
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        if scheme == 'http':
+            return http.client.HTTPConnection(netloc, timeout=self.timeout)
+        raise DownloadError(f'Unsupported URL scheme: {scheme}')
+
+    def release(
+            self,
+            scheme: str,
+            netloc: str,
+            connection: http.client.HTTPConnection,
+            reuse: bool):
+        """
+        Returns the connection to the pool.
+
+        Parameters
+        ----------
+        scheme : str
+            URL scheme, http or https
+        netloc : str
+            Host and port
+        connection : http.client.HTTPConnection
+            Released connection
+        reuse : bool
+            False if the connection is not usable anymore and should be
+            closed
+        """
+        if not reuse:
+            connection.close()
+            return
+        with self._lock:
+            self._idle[(scheme, netloc)].append(connection)
+
+    def close(self):
+        """
+        Closes all idle connections.
+        """
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+class Downloader(object):
+    """
+    Downloads files in parallel, resuming interrupted downloads.
+
+    Data is written to ``<file>.part`` files, renamed to the target name
+    when the download is complete. Existing ``.part`` files are continued
+    with ``Range`` requests, servers ignoring them send the whole file.
+    """
+
+    def __init__(
+            self,
+            num_workers: int = 8,
+            retries: int = 5,
+            backoff: float = 0.5,
+            timeout: float = 60.0,
+            chunk_size: int = 1 << 20,
+            verify: bool = False):
+        """
+        Creates the downloader.
+
+        Parameters
+        ----------
+        num_workers : int
+            Number of concurrent downloads
+        retries : int
+            Number of retries of a failed download
+        backoff : float
+            Delay before the first retry, in seconds, doubled with every
+            subsequent retry
+        timeout : float
+            Timeout of socket operations, in seconds
+        chunk_size : int
+            Size of chunks of data written to files
+        verify : bool
+            True if checksums of files recorded in the manifest should be
+            verified before skipping them
+        """
+        self.num_workers = max(1, num_workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.verify = verify
+        self.pool = ConnectionPool(timeout)
+        self.log = get_logger()
+
+    def _open(
+            self,
+            url: str,
+            headers: Dict[str, str]) -> Tuple[
+                http.client.HTTPResponse, Tuple]:
+        """
+        Sends the GET request, following redirects.
+
+        Parameters
+        ----------
+        url : str
+            Requested URL
+        headers : Dict[str, str]
+            Headers of the request
+
+        Returns
+        -------
+        Tuple[http.client.HTTPResponse, Tuple] :
+            Response and the pool key with the connection, to be released
+            when the response is consumed
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            target = parts.path or '/'
+            if parts.query:
+                target += f'?{parts.query}'
+            connection = self.pool.acquire(parts.scheme, parts.netloc)
+            while True:
+                reused = connection.sock is not None
+                try:
+                    connection.request('GET', target, headers=headers)
+                    response = connection.getresponse()
+                    break
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    # idle connection could be closed by the server, then
+                    # the request is sent again over a new connection
+                    if not reused:
+                        raise
+            handle = (parts.scheme, parts.netloc, connection)
+            if response.status not in REDIRECT_STATUSES:
+                return response, handle
+            location = response.getheader('Location')
+            self._discard(response, handle)
+            if location is None:
+                raise DownloadError(f'Redirect without location: {url}')
+            url = urljoin(url, location)
+        raise DownloadError(f'Too many redirects: {url}')
+
+    def _discard(self, response: http.client.HTTPResponse, handle: Tuple):
+        """
+        Reads the rest of the response and releases its connection.
+
+        Parameters
+        ----------
+        response : http.client.HTTPResponse
+            Response to discard
+        handle : Tuple
+            Pool key with the connection
+        """
+        try:
+            response.read()
+            reuse = not response.will_close
+        except (OSError, http.client.HTTPException):
+            reuse = False
+        self.pool.release(*handle, reuse)
+
+    def _fetch(self, url: str, path: Path) -> Tuple[int, str]:
+        """
+        Downloads the file once, continuing the partial download.
+
+        Parameters
+        ----------
+        url : str
+            URL of the file
+        path : Path
+            Path to the downloaded file
+
+        Returns
+        -------
+        Tuple[int, str] : size and SHA-256 checksum of the file
+        """
+        partpath = path.with_name(path.name + '.part')
+        offset = partpath.stat().st_size if partpath.exists() else 0
+        headers = {'Accept-Encoding': 'identity'}
+        if offset > 0:
+            headers['Range'] = f'bytes={offset}-'
+        response, handle = self._open(url, headers)
+        reuse = False
+        streaming = False
+        try:
+            if response.status == 416 and offset > 0:
+                # the partial file is not a prefix of the current file
+                partpath.unlink()
+                raise _RetryableError(f'Invalid range of {url}')
+            if response.status in RETRY_STATUSES:
+                raise _RetryableError(f'HTTP {response.status} for {url}')
+            if response.status not in (200, 206):
+                raise DownloadError(f'HTTP {response.status} for {url}')
+            total = response.getheader('Content-Length')
+            total = int(total) if total is not None else None
+            checksum = hashlib.sha256()
+            if response.status == 206:
+                match = re.match(
+                    r'bytes (\d+)-\d+/(\d+|\*)',
+                    response.getheader('Content-Range', '')
+                )
+                if match is None or int(match.group(1)) != offset:
+                    partpath.unlink()
+                    raise _RetryableError(f'Invalid range of {url}')
+                if match.group(2) != '*':
+                    total = int(match.group(2))
+                elif total is not None:
+                    total += offset
+                with open(partpath, 'rb') as partfile:
+                    for chunk in iter(
+                            lambda: partfile.read(self.chunk_size), b''):
+                        checksum.update(chunk)
+                mode = 'ab'
+            else:
+                offset = 0
+                mode = 'wb'
+            size = offset
+            streaming = True
+            with open(partpath, mode) as partfile:
+                for chunk in iter(
+                        lambda: response.read(self.chunk_size), b''):
+                    partfile.write(chunk)
+                    checksum.update(chunk)
+                    size += len(chunk)
+            if total is not None and size != total:
+                raise _RetryableError(
+                    f'Incomplete download of {url}: {size} of {total} bytes'
+                )
+            reuse = not response.will_close
+        finally:
+            if reuse or streaming:
+                # connections broken during the transfer are closed
+                self.pool.release(*handle, reuse)
+            else:
+                self._discard(response, handle)
+        os.replace(partpath, path)
+        return size, checksum.hexdigest()
+
+    def download_file(
+            self,
+            url: str,
+            path: Path,
+            manifest: Optional[DownloadManifest] = None) -> bool:
+        """
+        Downloads the file, retrying failed attempts.
+
+        Parameters
+        ----------
+        url : str
+            URL of the file
+        path : Path
+            Path to the downloaded file
+        manifest : Optional[DownloadManifest]
+            Manifest of downloaded files, the file is skipped if it is
+            recorded there and recorded after it is downloaded
+
+        Returns
+        -------
+        bool : True if the file was downloaded, False if it was skipped
+        """
+        path = Path(path)
+        if manifest is not None and manifest.is_complete(
+                url, path, self.verify):
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for attempt in range(self.retries + 1):
+            try:
+                size, checksum = self._fetch(url, path)
+                break
+            except (
+                    _RetryableError,
+                    OSError,
+                    http.client.HTTPException) as exception:
+                if attempt == self.retries:
+                    raise DownloadError(
+                        f'Failed to download {url}: {exception}'
+                    ) from exception
+                delay = self.backoff * 2 ** attempt
+                self.log.debug(
+                    f'Retrying download of {url} in {delay:.1f}s: '
+                    f'{exception}'
+                )
+                time.sleep(delay)
+        if manifest is not None:
+            manifest.record(url, path, size, checksum)
+        return True
+
+    def download(
+            self,
+            entries: List[Tuple[str, Path]],
+            manifestpath: Optional[Path] = None,
+            desc: str = 'Downloading files',
+            save_interval: float = 5.0) -> int:
+        """
+        Downloads files in parallel.
+
+        Parameters
+        ----------
+        entries : List[Tuple[str, Path]]
+            URLs of files and paths to store them in
+        manifestpath : Optional[Path]
+            Path to the manifest of downloaded files
+        desc : str
+            Description of the progress bar
+        save_interval : float
+            Minimal time between writes of the manifest, in seconds
+
+        Returns
+        -------
+        int : number of downloaded files, excluding skipped ones
+
+        Raises
+        ------
+        DownloadError :
+            Raised if any of files cannot be downloaded, after all other
+            files are downloaded
+        """
+        entries = list(dict(
+            (Path(path).absolute(), url) for url, path in entries
+        ).items())
+        manifest = DownloadManifest(manifestpath) \
+            if manifestpath is not None else None
+        downloaded = 0
+        errors = []
+        lastsave = time.monotonic()
+        progress_bar = tqdm.tqdm(total=len(entries), desc=desc, leave=True)
+        try:
+            with futures.ThreadPoolExecutor(
+                    max_workers=self.num_workers) as executor:
+                all_futures = {
+                    executor.submit(
+                        self.download_file,
+                        url,
+                        path,
+                        manifest
+                    ): url for path, url in entries
+                }
+                for future in futures.as_completed(all_futures):
+                    try:
+                        downloaded += future.result()
+                    except DownloadError as exception:
+                        errors.append(str(exception))
+                    progress_bar.update(1)
+                    if manifest is not None and \
+                            time.monotonic() - lastsave > save_interval:
+                        manifest.save()
+                        lastsave = time.monotonic()
+        finally:
+            progress_bar.close()
+            self.pool.close()
+            if manifest is not None:
+                manifest.save()
+        if errors:
+            raise DownloadError(
+                f'{len(errors)} of {len(entries)} files could not be '
+                'downloaded:\n' + '\n'.join(errors[:10])
+            )
+        return downloaded
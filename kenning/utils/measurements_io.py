@@ -0,0 +1,502 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Module with routines for storing and loading measurements files.
+"""
+
+from collections.abc import MutableMapping
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional, Union
+import json
+import os
+import time
+
+import numpy as np
+
+from kenning.core.measurements import Measurements, MeasurementSeries
+from kenning.core.measurements import MeasurementsScope
+from kenning.core.measurements import SparseUpdate
+from kenning.utils import logger
+
+log = logger.get_logger()
+
+STREAM_FORMAT = 'kenning-measurements-stream'
+STREAM_VERSION = 1
+
+BINARY_FORMAT = 'kenning-measurements-binary'
+BINARY_VERSION = 1
+BINARY_SUFFIX = '.measurements'
+BINARY_MANIFEST = 'manifest.json'
+
+
+def _json_default(value: Any) -> Any:
+    """
+    Converts numpy objects to types serializable by json module.
+
+    Parameters
+    ----------
+    value : Any
+        Object not serializable by default
+
+    Returns
+    -------
+    Any : serializable representation of the object
+    """
+    if isinstance(value, (np.ndarray, np.generic, MeasurementSeries)):
+        return value.tolist()
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f'Object of type {type(value)} is not JSON serializable')
+
+
+class MeasurementsStreamWriter(object):
+    """
+    Appends measurement records to a JSON Lines file.
+
+    Every operation modifying measurements is stored as a separate line, so
+    the data collected before a crash or an interrupt can be recovered.
+    Records are buffered and written to the file when ``flush_interval``
+    passes, or when ``flush`` or ``close`` is called.
+
+    The stream can be converted to the regular measurements JSON file with
+    ``compact_measurements_stream``.
+    """
+    def __init__(
+            self,
+            streampath: Path,
+            flush_interval: float = 1.0,
+            fsync: bool = False):
+        """
+        Opens the stream for appending.
+
+        Parameters
+        ----------
+        streampath : Path
+            Path to the JSON Lines file
+        flush_interval : float
+            Maximal time between writes of buffered records to the file, in
+            seconds
+        fsync : bool
+            If True, the file is synchronized with the storage on every
+            flush
+        """
+        self.streampath = Path(streampath)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._lock = Lock()
+        self._buffer = []
+        self._lastflush = time.monotonic()
+        self._file = open(self.streampath, 'a')
+        if self._file.tell() == 0:
+            self._write_record({
+                'op': 'header',
+                'format': STREAM_FORMAT,
+                'version': STREAM_VERSION
+            })
+            self.flush()
+
+    def _write_record(self, record: Dict[str, Any]):
+        """
+        Adds record to the buffer and flushes it if needed.
+
+        Parameters
+        ----------
+        record : Dict[str, Any]
+            Record to store
+        """
+        line = json.dumps(record, default=_json_default) + '\n'
+        with self._lock:
+            self._buffer.append(line)
+            shouldflush = (
+                time.monotonic() - self._lastflush >= self.flush_interval
+            )
+        if shouldflush:
+            self.flush()
+
+    def write_update(self, other: Union[Dict, Measurements]):
+        """
+        Stores measurements added with ``Measurements.update_measurements``.
+
+        Arrays and sparse updates are stored as separate ``accumulate``
+        records, so they are summed instead of concatenated when the stream
+        is loaded.
+
+        Parameters
+        ----------
+        other : Union[Dict, Measurements]
+            Added measurements
+        """
+        if isinstance(other, Measurements):
+            other = other.to_dict()
+        data = {}
+        for k, v in list(other.items()):
+            if isinstance(v, (np.ndarray, SparseUpdate)):
+                self.write_accumulate(k, v)
+            else:
+                data[k] = v
+        if data:
+            self._write_record({'op': 'update', 'data': data})
+
+    def write_accumulate(self, measurementtype: str, value: Any):
+        """
+        Stores value added with ``Measurements.accumulate``.
+
+        Parameters
+        ----------
+        measurementtype : str
+            The name of the measurement
+        value : Any
+            Added value
+        """
+        if isinstance(value, SparseUpdate):
+            self._write_record({
+                'op': 'accumulate',
+                'key': measurementtype,
+                'value': value.flatindices,
+                'sparse': {'shape': value.shape, 'dtype': value.dtype.str}
+            })
+            return
+        self._write_record({
+            'op': 'accumulate',
+            'key': measurementtype,
+            'value': value,
+            'array': isinstance(value, np.ndarray)
+        })
+
+    def write_initialize(self, measurementtype: str, value: Any):
+        """
+        Stores value set with ``Measurements.initialize_measurement``.
+
+        Parameters
+        ----------
+        measurementtype : str
+            The name of the measurement
+        value : Any
+            Initial value
+        """
+        self._write_record({
+            'op': 'initialize',
+            'key': measurementtype,
+            'value': value,
+            'array': isinstance(value, np.ndarray)
+        })
+
+    def flush(self):
+        """
+        Writes buffered records to the file.
+        """
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            self._lastflush = time.monotonic()
+            if self._file.closed:
+                return
+            self._file.writelines(lines)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        """
+        Flushes remaining records and closes the file.
+        """
+        self.flush()
+        with self._lock:
+            self._file.close()
+
+
+def load_measurements_stream(streampath: Path) -> Measurements:
+    """
+    Reconstructs measurements from the JSON Lines stream.
+
+    Incomplete last line, i.e. written during a crash, is skipped.
+
+    Parameters
+    ----------
+    streampath : Path
+        Path to the JSON Lines file
+
+    Returns
+    -------
+    Measurements : measurements stored in the stream
+    """
+    measurements = Measurements()
+    with open(streampath, 'r') as streamfile:
+        for linenum, line in enumerate(streamfile):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                log.warning(
+                    f'Skipping damaged record {linenum} in {streampath}'
+                )
+                continue
+            op = record['op']
+            if op == 'update':
+                measurements += record['data']
+            elif op in ('accumulate', 'initialize'):
+                value = record['value']
+                if record.get('array'):
+                    value = np.asarray(value)
+                if record.get('sparse'):
+                    shape = tuple(record['sparse']['shape'])
+                    indices = np.unravel_index(
+                        np.asarray(value, dtype=np.intp),
+                        shape
+                    )
+                    measurements += {
+                        record['key']: SparseUpdate(
+                            shape,
+                            indices,
+                            record['sparse']['dtype']
+                        )
+                    }
+                elif op == 'accumulate':
+                    measurements.accumulate(record['key'], value)
+                else:
+                    measurements.initialize_measurement(record['key'], value)
+    return measurements
+
+
+def save_measurements_json(
+        measurements: Union[Dict, Measurements],
+        resultpath: Path):
+    """
+    Saves measurements to JSON file.
+
+    Parameters
+    ----------
+    measurements : Union[Dict, Measurements]
+        Measurements or their data to save
+    resultpath : Path
+        Path to the saved JSON file
+    """
+    if isinstance(measurements, Measurements):
+        measurements = measurements.to_dict()
+    with open(resultpath, 'w') as measurementsfile:
+        json.dump(
+            measurements,
+            measurementsfile,
+            indent=2,
+            default=_json_default
+        )
+
+
+def compact_measurements_stream(streampath: Path, resultpath: Path):
+    """
+    Converts the JSON Lines stream to the measurements file.
+
+    Parameters
+    ----------
+    streampath : Path
+        Path to the JSON Lines file
+    resultpath : Path
+        Path to the saved measurements, check ``save_measurements``
+    """
+    save_measurements(load_measurements_stream(streampath), resultpath)
+
+
+def _to_column(value: Any) -> Optional[np.ndarray]:
+    """
+    Converts the measurement to an array, if it is a numeric series.
+
+    Parameters
+    ----------
+    value : Any
+        Value of the measurement
+
+    Returns
+    -------
+    Optional[np.ndarray] : numeric array or None
+    """
+    if isinstance(value, MeasurementSeries):
+        return value.numpy()
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'biuf':
+        return value
+    if isinstance(value, list):
+        series = MeasurementSeries.from_values(value)
+        if series is not None:
+            return series.numpy()
+    return None
+
+
+def save_measurements_binary(
+        measurements: Union[Dict, Measurements],
+        resultpath: Path):
+    """
+    Saves measurements to a directory with numpy columns.
+
+    Every numeric series and array is stored in a separate ``.npy`` file,
+    remaining values are stored in the JSON manifest. Such measurements can
+    be loaded lazily with ``MeasurementsArchive``.
+
+    Parameters
+    ----------
+    measurements : Union[Dict, Measurements]
+        Measurements or their data to save
+    resultpath : Path
+        Path to the created directory
+    """
+    if isinstance(measurements, MeasurementsScope):
+        measurements = measurements.merge()
+    if isinstance(measurements, Measurements):
+        measurements = measurements._data
+    resultpath = Path(resultpath)
+    resultpath.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        'format': BINARY_FORMAT,
+        'version': BINARY_VERSION,
+        'keys': [],
+        'columns': {},
+        'values': {}
+    }
+    for k, v in list(measurements.items()):
+        manifest['keys'].append(k)
+        column = _to_column(v)
+        if column is None:
+            manifest['values'][k] = v
+            continue
+        filename = f'column_{len(manifest["columns"])}.npy'
+        np.save(resultpath / filename, column)
+        manifest['columns'][k] = {
+            'file': filename,
+            'dtype': column.dtype.str,
+            'shape': list(column.shape)
+        }
+    with open(resultpath / BINARY_MANIFEST, 'w') as manifestfile:
+        json.dump(manifest, manifestfile, indent=2, default=_json_default)
+
+
+class MeasurementsArchive(MutableMapping):
+    """
+    Dictionary-like view of measurements saved in the binary format.
+
+    Only the manifest is read on creation. Numeric columns are memory-mapped
+    when they are accessed for the first time, so only the series used by
+    the caller are read from the disk.
+
+    Assigned values are kept in memory and do not modify the files.
+    """
+    def __init__(self, measurementspath: Path):
+        """
+        Reads the manifest of the measurements.
+
+        Parameters
+        ----------
+        measurementspath : Path
+            Path to the directory with measurements
+        """
+        self.measurementspath = Path(measurementspath)
+        with open(self.measurementspath / BINARY_MANIFEST, 'r') as manifest:
+            manifest = json.load(manifest)
+        if manifest.get('format') != BINARY_FORMAT:
+            raise ValueError(
+                f'{self.measurementspath} is not a measurements directory'
+            )
+        self._keys = dict.fromkeys(manifest['keys'])
+        self._columns = manifest['columns']
+        self._values = manifest['values']
+
+    def __getitem__(self, measurementtype: str) -> Any:
+        if measurementtype in self._values:
+            return self._values[measurementtype]
+        column = self._columns[measurementtype]
+        columnpath = self.measurementspath / column['file']
+        # empty arrays cannot be memory-mapped
+        mmap_mode = 'r' if np.prod(column['shape']) > 0 else None
+        value = np.load(columnpath, mmap_mode=mmap_mode)
+        self._values[measurementtype] = value
+        return value
+
+    def __setitem__(self, measurementtype: str, value: Any):
+        self._keys[measurementtype] = None
+        self._values[measurementtype] = value
+
+    def __delitem__(self, measurementtype: str):
+        del self._keys[measurementtype]
+        self._values.pop(measurementtype, None)
+        self._columns.pop(measurementtype, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, measurementtype: object) -> bool:
+        return measurementtype in self._keys
+
+    def __ior__(self, other: Dict[str, Any]) -> 'MeasurementsArchive':
+        self.update(other)
+        return self
+
+
+def save_measurements(
+        measurements: Union[Dict, Measurements],
+        resultpath: Path):
+    """
+    Saves measurements in the format matching the path.
+
+    Paths with the ``.measurements`` suffix are saved in the binary format,
+    other paths are saved as JSON files.
+
+    Parameters
+    ----------
+    measurements : Union[Dict, Measurements]
+        Measurements or their data to save
+    resultpath : Path
+        Path to the saved measurements
+    """
+    if Path(resultpath).suffix == BINARY_SUFFIX:
+        save_measurements_binary(measurements, resultpath)
+    else:
+        save_measurements_json(measurements, resultpath)
+
+
+def is_binary_measurements(measurementspath: Path) -> bool:
+    """
+    Checks if the path points to measurements in the binary format.
+
+    Parameters
+    ----------
+    measurementspath : Path
+        Path to the measurements
+
+    Returns
+    -------
+    bool : True if the path is a directory with measurements manifest
+    """
+    return (Path(measurementspath) / BINARY_MANIFEST).is_file()
+
+
+def load_measurements(
+        measurementspath: Path) -> Union[Dict[str, Any], MeasurementsArchive]:
+    """
+    Loads measurements data from a file in any supported format.
+
+    Files with ``.jsonl`` suffix are treated as measurements streams,
+    directories with the manifest are opened lazily as
+    ``MeasurementsArchive``, other files are loaded as JSON.
+
+    Parameters
+    ----------
+    measurementspath : Path
+        Path to the measurements file
+
+    Returns
+    -------
+    Union[Dict[str, Any], MeasurementsArchive] : measurements data
+    """
+    measurementspath = Path(measurementspath)
+    if is_binary_measurements(measurementspath):
+        return MeasurementsArchive(measurementspath)
+    if measurementspath.suffix == '.jsonl':
+        data = load_measurements_stream(measurementspath).to_dict()
+        if 'eval_confusion_matrix' in data:
+            data['eval_confusion_matrix'] = np.asarray(
+                data['eval_confusion_matrix']
+            ).tolist()
+        return data
+    with open(measurementspath, 'r') as measurementsfile:
+        return json.load(measurementsfile)
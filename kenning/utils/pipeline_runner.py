@@ -15,6 +15,7 @@ from kenning.utils.class_loader import load_class
 from kenning.utils.args_manager import serialize_inference
 import kenning.utils.logger as logger
 from kenning.core.measurements import MeasurementsCollector
+from kenning.core.measurements import memorymeasurements
 
 
 def assert_io_formats(model, optimizers, runtime) -> None:
@@ -303,7 +304,9 @@ def run_pipeline(
 
             prev_block.save_io_specification(modelpath)
             next_block.set_input_type(format)
-            next_block.compile(modelpath)
+            memorymeasurements(
+                f'compilation/{type(next_block).__name__}'
+            )(next_block.compile)(modelpath)
 
             prev_block = next_block
             modelpath = prev_block.compiled_model_path
@@ -0,0 +1,265 @@
+# Copyright (c) 2020-2023 Antmicro <www.antmicro.com>
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Persistent cache of preprocessed dataset samples.
+
+Preprocessed samples are stored in fixed-shape shards, which are
+memory-mapped when read, so cached samples are not decoded again and pages
+of unused samples are not loaded to memory.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+
+import numpy as np
+
+from kenning.utils.atomic_file import create_exclusive
+from kenning.utils.logger import get_logger
+
+# Version of the cache layout, part of the cache key
+CACHE_VERSION = 1
+CACHE_MANIFEST = 'manifest.json'
+
+
+class SamplesCache(object):
+    """
+    On-disk cache of preprocessed input samples.
+
+    Samples are identified by their position in the dataset. They are
+    stored in shards with ``shard_size`` samples each (``shard_<n>.npy``),
+    with flags marking already stored samples (``filled_<n>.npy``). Shape
+    and type of samples are stored in the manifest when the first sample is
+    written, and all samples have to match them - otherwise caching is
+    disabled for the dataset.
+
+    Cached samples are returned as copy-on-write memory-mapped arrays, so
+    they can be modified without affecting the cache.
+
+    The directory of the cache is derived from the hash of the key, which
+    should contain all parameters affecting preprocessing. Multiple
+    processes can fill the same cache concurrently.
+    """
+
+    def __init__(
+            self,
+            cachedir: Path,
+            key: Dict[str, Any],
+            numsamples: int,
+            shard_size: int = 256):
+        """
+        Opens the cache, creating its directory if necessary.
+
+        Parameters
+        ----------
+        cachedir : Path
+            Directory with caches of datasets
+        key : Dict[str, Any]
+            Parameters identifying the dataset and its preprocessing
+        numsamples : int
+            Number of samples in the dataset
+        shard_size : int
+            Number of samples in a single shard
+        """
+        self.log = get_logger()
+        self.key = dict(key, cache_version=CACHE_VERSION)
+        keyhash = hashlib.sha256(
+            json.dumps(self.key, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+        self.directory = Path(cachedir) / keyhash
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.numsamples = numsamples
+        self.shard_size = shard_size
+        self.enabled = True
+        self.shape = None
+        self.dtype = None
+        self._shards = {}
+        self._writable = {}
+        self._filled = {}
+        self._read_manifest()
+
+    def _read_manifest(self):
+        """
+        Reads shape and type of samples from the manifest, if it exists.
+        """
+        manifestpath = self.directory / CACHE_MANIFEST
+        if not manifestpath.exists():
+            return
+        with open(manifestpath, 'r') as manifestfile:
+            manifest = json.load(manifestfile)
+        if manifest.get('numsamples') != self.numsamples or \
+                manifest.get('shard_size') != self.shard_size:
+            self.log.warning(
+                f'Samples cache in {self.directory} does not match the '
+                'dataset, caching is disabled'
+            )
+            self.enabled = False
+            return
+        self.shape = tuple(manifest['shape'])
+        self.dtype = np.dtype(manifest['dtype'])
+
+    def _write_manifest(self, shape: tuple, dtype: np.dtype):
+        """
+        Stores shape and type of samples in the manifest.
+
+        If another process created the manifest in the meantime, its values
+        are used.
+
+        Parameters
+        ----------
+        shape : tuple
+            Shape of a single sample
+        dtype : np.dtype
+            Type of samples
+        """
+        manifest = {
+            'key': self.key,
+            'numsamples': self.numsamples,
+            'shard_size': self.shard_size,
+            'shape': list(shape),
+            'dtype': np.dtype(dtype).str
+        }
+
+        def writer(path: Path):
+            with open(path, 'w') as manifestfile:
+                json.dump(manifest, manifestfile, indent=2, default=str)
+
+        create_exclusive(self.directory / CACHE_MANIFEST, writer)
+        self._read_manifest()
+
+    def _open_shard(self, shard: int, create: bool) -> bool:
+        """
+        Memory-maps the shard and its flags.
+
+        Parameters
+        ----------
+        shard : int
+            Index of the shard
+        create : bool
+            True if the shard should be created if it does not exist
+
+        Returns
+        -------
+        bool : True if the shard is available
+        """
+        if shard in self._shards:
+            return True
+        shardpath = self.directory / f'shard_{shard}.npy'
+        filledpath = self.directory / f'filled_{shard}.npy'
+        if not (shardpath.exists() and filledpath.exists()):
+            if not create:
+                return False
+            size = min(
+                self.shard_size,
+                self.numsamples - shard * self.shard_size
+            )
+            create_exclusive(
+                shardpath,
+                lambda path: np.lib.format.open_memmap(
+                    path,
+                    mode='w+',
+                    dtype=self.dtype,
+                    shape=(size,) + self.shape
+                ).flush()
+            )
+
+            def writefilled(path: Path):
+                with open(path, 'wb') as filledfile:
+                    np.save(filledfile, np.zeros(size, dtype=np.uint8))
+
+            create_exclusive(filledpath, writefilled)
+        # copy-on-write mapping, samples are written through a separate
+        # mapping, so returned samples can be safely modified
+        self._shards[shard] = np.load(shardpath, mmap_mode='c')
+        self._filled[shard] = np.load(filledpath, mmap_mode='r+')
+        return True
+
+    def get(self, start: int, end: int) -> Optional[List[np.ndarray]]:
+        """
+        Returns cached samples from the given range.
+
+        Parameters
+        ----------
+        start : int
+            Index of the first sample
+        end : int
+            Index after the last sample
+
+        Returns
+        -------
+        Optional[List[np.ndarray]] :
+            Cached samples, or None if any of them is not cached
+        """
+        if not self.enabled or self.shape is None:
+            return None
+        end = min(end, self.numsamples)
+        samples = []
+        for index in range(start, end):
+            shard, position = divmod(index, self.shard_size)
+            if not self._open_shard(shard, create=False) or \
+                    not self._filled[shard][position]:
+                return None
+            samples.append(self._shards[shard][position])
+        return samples
+
+    def put(self, start: int, samples: List[Any]):
+        """
+        Stores samples starting from the given index.
+
+        Samples that are not arrays matching the shape and type of cached
+        samples disable the cache.
+
+        Parameters
+        ----------
+        start : int
+            Index of the first sample
+        samples : List[Any]
+            Preprocessed samples
+        """
+        if not self.enabled or len(samples) == 0:
+            return
+        if self.shape is None:
+            first = samples[0]
+            if not isinstance(first, np.ndarray):
+                self._disable('samples are not numpy arrays')
+                return
+            self._write_manifest(first.shape, first.dtype)
+        for sample in samples:
+            if not isinstance(sample, np.ndarray) or \
+                    sample.shape != self.shape or sample.dtype != self.dtype:
+                self._disable('samples do not have the same shape and type')
+                return
+        written = set()
+        for offset, sample in enumerate(samples):
+            shard, position = divmod(start + offset, self.shard_size)
+            self._open_shard(shard, create=True)
+            if shard not in self._writable:
+                self._writable[shard] = np.load(
+                    self.directory / f'shard_{shard}.npy',
+                    mmap_mode='r+'
+                )
+            self._writable[shard][position] = sample
+            written.add(shard)
+        # samples are marked as cached only after they are stored
+        for shard in written:
+            self._writable[shard].flush()
+        for offset in range(len(samples)):
+            shard, position = divmod(start + offset, self.shard_size)
+            self._filled[shard][position] = 1
+        for shard in written:
+            self._filled[shard].flush()
+
+    def _disable(self, reason: str):
+        """
+        Disables caching for the dataset.
+
+        Parameters
+        ----------
+        reason : str
+            Reason logged as a warning
+        """
+        self.log.warning(f'Samples cache disabled: {reason}')
+        self.enabled = False